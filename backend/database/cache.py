@@ -0,0 +1,243 @@
+import asyncio
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from database import redis_db, redis_db_async
+from utils.other import metrics
+
+# Two-tier cache for hot lookups (app catalog, GitHub releases, ...).
+#
+# - in-process LRU in front of Redis, with a short TTL so invalidations on other workers land quickly
+# - single-flight: concurrent misses of the same key share one computation per process
+# - stale-while-revalidate: after `ttl` the value is still served for `stale_ttl` seconds while
+#   one background refresh recomputes it
+#
+# Values are shared between callers, treat them as read-only.
+
+LOCAL_TTL = int(os.getenv('LOCAL_CACHE_TTL_SECONDS', '10'))
+LOCAL_MAX_ITEMS = int(os.getenv('LOCAL_CACHE_MAX_ITEMS', '1024'))
+
+
+class _LocalLRU:
+    def __init__(self, max_items: int):
+        self.max_items = max_items
+        self._items: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Tuple[Any, float]]:
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return None
+            value, fresh_until, expires_at = item
+            if time.time() >= expires_at:
+                del self._items[key]
+                return None
+            self._items.move_to_end(key)
+            return value, fresh_until
+
+    def set(self, key: str, value: Any, fresh_until: float, local_ttl: int):
+        with self._lock:
+            self._items[key] = (value, fresh_until, time.time() + local_ttl)
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_items:
+                self._items.popitem(last=False)
+
+    def delete(self, key: str):
+        with self._lock:
+            self._items.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+
+_local = _LocalLRU(LOCAL_MAX_ITEMS)
+_flights: Dict[str, Future] = {}
+_flights_lock = threading.Lock()
+_async_flights: Dict[str, asyncio.Future] = {}
+
+
+def _from_envelope(path: str, envelope, local_ttl: int) -> Optional[Tuple[Any, float]]:
+    if isinstance(envelope, dict) and 'fresh_until' in envelope:
+        metrics.incr('cache.redis_hit')
+        entry = (envelope['value'], envelope['fresh_until'])
+        _local.set(path, entry[0], entry[1], local_ttl)
+        return entry
+
+    metrics.incr('cache.miss')
+    return None
+
+
+def _read(path: str, local_ttl: int) -> Optional[Tuple[Any, float]]:
+    if entry := _local.get(path):
+        metrics.incr('cache.local_hit')
+        return entry
+    return _from_envelope(path, redis_db.get_generic_cache(path), local_ttl)
+
+
+async def _aread(path: str, local_ttl: int) -> Optional[Tuple[Any, float]]:
+    if entry := _local.get(path):
+        metrics.incr('cache.local_hit')
+        return entry
+    return _from_envelope(path, await redis_db_async.get_generic_cache(path), local_ttl)
+
+
+def _write_local(path: str, value: Any, ttl: int, local_ttl: int) -> dict:
+    fresh_until = time.time() + ttl
+    _local.set(path, value, fresh_until, min(local_ttl, ttl))
+    return {'value': value, 'fresh_until': fresh_until}
+
+
+def _write(path: str, value: Any, ttl: int, stale_ttl: int, local_ttl: int):
+    envelope = _write_local(path, value, ttl, local_ttl)
+    redis_db.set_generic_cache(path, envelope, ttl=ttl + stale_ttl)
+
+
+async def _awrite(path: str, value: Any, ttl: int, stale_ttl: int, local_ttl: int):
+    envelope = _write_local(path, value, ttl, local_ttl)
+    await redis_db_async.set_generic_cache(path, envelope, ttl=ttl + stale_ttl)
+
+
+def _single_flight(path: str, compute: Callable[[], Any], ttl: int, stale_ttl: int, local_ttl: int) -> Future:
+    with _flights_lock:
+        future = _flights.get(path)
+        if future is not None:
+            return future
+        future = _flights[path] = Future()
+
+    start = time.perf_counter()
+    try:
+        # a request that missed just before the previous flight landed finds its result here
+        if (entry := _local.get(path)) and time.time() < entry[1]:
+            future.set_result(entry[0])
+            return future
+        metrics.incr('cache.compute')
+        value = compute()
+        if value is not None:
+            _write(path, value, ttl, stale_ttl, local_ttl)
+        future.set_result(value)
+    except Exception as e:
+        future.set_exception(e)
+    finally:
+        metrics.observe('cache.compute', time.perf_counter() - start)
+        with _flights_lock:
+            _flights.pop(path, None)
+    return future
+
+
+def _refresh_in_background(path: str, compute: Callable[[], Any], ttl: int, stale_ttl: int, local_ttl: int):
+    with _flights_lock:
+        if path in _flights:
+            return
+    metrics.incr('cache.stale')
+
+    def refresh():
+        try:
+            _single_flight(path, compute, ttl, stale_ttl, local_ttl).result()
+        except Exception as e:
+            print(f'cache: background refresh of {path} failed', e)
+
+    threading.Thread(target=refresh, daemon=True).start()
+
+
+def get_or_compute(
+    path: str,
+    compute: Callable[[], Any],
+    ttl: int,
+    stale_ttl: Optional[int] = None,
+    local_ttl: int = LOCAL_TTL,
+) -> Any:
+    """
+    Returns the cached value for `path`, computing it with `compute` on a miss. `None` results are not cached.
+    `stale_ttl` defaults to `ttl`: an expired value keeps being served for that long while it refreshes.
+    """
+    stale_ttl = ttl if stale_ttl is None else stale_ttl
+    start = time.perf_counter()
+    try:
+        entry = _read(path, local_ttl)
+        if entry is not None:
+            value, fresh_until = entry
+            if time.time() >= fresh_until:
+                _refresh_in_background(path, compute, ttl, stale_ttl, local_ttl)
+            return value
+
+        with _flights_lock:
+            future = _flights.get(path)
+        if future is not None:
+            metrics.incr('cache.coalesced')
+            return future.result()
+        return _single_flight(path, compute, ttl, stale_ttl, local_ttl).result()
+    finally:
+        metrics.observe('cache.get', time.perf_counter() - start)
+
+
+async def aget_or_compute(
+    path: str,
+    compute: Callable[[], Awaitable[Any]],
+    ttl: int,
+    stale_ttl: Optional[int] = None,
+    local_ttl: int = LOCAL_TTL,
+) -> Any:
+    """`get_or_compute` for coroutine producers, coalescing concurrent misses on the running event loop."""
+    stale_ttl = ttl if stale_ttl is None else stale_ttl
+    start = time.perf_counter()
+    try:
+        entry = await _aread(path, local_ttl)
+        if entry is not None:
+            value, fresh_until = entry
+            if time.time() >= fresh_until and path not in _async_flights:
+                metrics.incr('cache.stale')
+                _start_async_flight(path, compute, ttl, stale_ttl, local_ttl)
+            return value
+
+        if flight := _async_flights.get(path):
+            metrics.incr('cache.coalesced')
+            return await asyncio.shield(flight)
+        return await asyncio.shield(_start_async_flight(path, compute, ttl, stale_ttl, local_ttl))
+    finally:
+        metrics.observe('cache.get', time.perf_counter() - start)
+
+
+def _start_async_flight(path: str, compute, ttl: int, stale_ttl: int, local_ttl: int) -> asyncio.Future:
+    async def run():
+        start = time.perf_counter()
+        try:
+            if (entry := _local.get(path)) and time.time() < entry[1]:
+                return entry[0]
+            metrics.incr('cache.compute')
+            value = await compute()
+            if value is not None:
+                await _awrite(path, value, ttl, stale_ttl, local_ttl)
+            return value
+        finally:
+            metrics.observe('cache.compute', time.perf_counter() - start)
+            _async_flights.pop(path, None)
+
+    task = asyncio.ensure_future(run())
+    # background refreshes nobody awaits must not log "exception never retrieved"
+    task.add_done_callback(lambda t: t.cancelled() or t.exception())
+    _async_flights[path] = task
+    return task
+
+
+def invalidate(path: str):
+    """Drops `path` from this process and from Redis. Other workers pick the change up within their local TTL."""
+    _local.delete(path)
+    redis_db.delete_generic_cache(path)
+
+
+async def ainvalidate(path: str):
+    _local.delete(path)
+    await redis_db_async.delete_generic_cache(path)
+
+
+def hit_ratio() -> Optional[float]:
+    counters = metrics.snapshot('cache.')['counters']
+    hits = counters.get('cache.local_hit', 0) + counters.get('cache.redis_hit', 0)
+    total = hits + counters.get('cache.miss', 0)
+    return hits / total if total else None
@@ -24,6 +24,7 @@ from .helpers import set_data_protection_level, prepare_for_write, prepare_for_r
 from utils.other.storage import list_audio_chunks
 
 conversations_collection = 'conversations'
+digests_collection = 'conversation_digests'
 
 
 def _ensure_timezone_aware(dt: datetime) -> datetime:
@@ -324,6 +325,7 @@ def delete_conversation(uid, conversation_id):
     user_ref = db.collection('users').document(uid)
     conversation_ref = user_ref.collection(conversations_collection).document(conversation_id)
     conversation_ref.delete()
+    user_ref.collection(digests_collection).document(conversation_id).delete()
 
 
 @prepare_for_read(decrypt_func=_prepare_conversation_for_read)
@@ -361,6 +363,71 @@ def get_conversations_by_id(uid, conversation_ids):
     return conversations
 
 
+def get_conversations_search_fields(uid: str) -> List[dict]:
+    """Id, created_at, title and overview of every non-discarded conversation, without transcripts."""
+    conversations_ref = db.collection('users').document(uid).collection(conversations_collection)
+    query = conversations_ref.where(filter=FieldFilter('discarded', '==', False)).select(
+        ['created_at', 'structured.title', 'structured.overview']
+    )
+    return [{'id': doc.id, **doc.to_dict()} for doc in query.stream()]
+
+
+# *****************************
+# ********** DIGESTS **********
+# *****************************
+
+
+def get_conversation_ids(
+    uid: str,
+    limit: int = 100,
+    offset: int = 0,
+    include_discarded: bool = False,
+    statuses: List[str] = [],
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+) -> List[str]:
+    """Ids of the conversations `get_conversations` would return, newest first, without reading their contents."""
+    conversations_ref = db.collection('users').document(uid).collection(conversations_collection)
+    if not include_discarded:
+        conversations_ref = conversations_ref.where(filter=FieldFilter('discarded', '==', False))
+    if len(statuses) > 0:
+        conversations_ref = conversations_ref.where(filter=FieldFilter('status', 'in', statuses))
+    if start_date:
+        conversations_ref = conversations_ref.where(filter=FieldFilter('created_at', '>=', start_date))
+    if end_date:
+        conversations_ref = conversations_ref.where(filter=FieldFilter('created_at', '<=', end_date))
+    conversations_ref = conversations_ref.order_by('created_at', direction=firestore.Query.DESCENDING)
+    conversations_ref = conversations_ref.limit(limit).offset(offset).select(['created_at'])
+    return [doc.id for doc in conversations_ref.stream()]
+
+
+def get_conversations_digest_fields(uid: str, conversation_ids: List[str]) -> List[dict]:
+    """Dates and structured fields of the given conversations, without transcripts or photos."""
+    conversations_ref = db.collection('users').document(uid).collection(conversations_collection)
+    doc_refs = [conversations_ref.document(conversation_id) for conversation_id in conversation_ids]
+    docs = db.get_all(doc_refs, field_paths=['created_at', 'started_at', 'finished_at', 'structured'])
+    return [{'id': doc.id, **doc.to_dict()} for doc in docs if doc.exists]
+
+
+def get_conversation_digests(uid: str, conversation_ids: List[str]) -> Dict[str, dict]:
+    digests_ref = db.collection('users').document(uid).collection(digests_collection)
+    docs = db.get_all([digests_ref.document(conversation_id) for conversation_id in conversation_ids])
+    return {doc.id: doc.to_dict() for doc in docs if doc.exists}
+
+
+def upsert_conversation_digests(uid: str, digests: List[dict]):
+    digests_ref = db.collection('users').document(uid).collection(digests_collection)
+    for i in range(0, len(digests), 450):
+        batch = db.batch()
+        for digest in digests[i : i + 450]:
+            batch.set(digests_ref.document(digest['id']), digest)
+        batch.commit()
+
+
+def delete_conversation_digest(uid: str, conversation_id: str):
+    db.collection('users').document(uid).collection(digests_collection).document(conversation_id).delete()
+
+
 # **************************************
 # ********* MIGRATION HELPERS **********
 # **************************************
@@ -812,13 +879,10 @@ def store_conversation_photos(uid: str, conversation_id: str, photos: List[Conve
 
 
 @prepare_for_read(decrypt_func=_prepare_conversation_for_read)
-@with_photos(get_conversation_photos)
-def get_closest_conversation_to_timestamps(uid: str, start_timestamp: int, end_timestamp: int) -> Optional[dict]:
-    print('get_closest_conversation_to_timestamps', start_timestamp, end_timestamp)
+def get_conversations_in_time_range(uid: str, start_timestamp: float, end_timestamp: float) -> List[dict]:
+    """Single range scan over the whole span of a sync dump, matched in memory afterwards."""
     start_threshold = datetime.utcfromtimestamp(start_timestamp) - timedelta(minutes=2)
     end_threshold = datetime.utcfromtimestamp(end_timestamp) + timedelta(minutes=2)
-    print('get_closest_conversation_to_timestamps', start_threshold, end_threshold)
-
     query = (
         db.collection('users')
         .document(uid)
@@ -827,30 +891,7 @@ def get_closest_conversation_to_timestamps(uid: str, start_timestamp: int, end_t
         .where(filter=FieldFilter('started_at', '<=', end_threshold))
         .order_by('created_at', direction=firestore.Query.DESCENDING)
     )
-
-    conversations = [doc.to_dict() for doc in query.stream()]
-    print('get_closest_conversation_to_timestamps len(conversations)', len(conversations))
-    if not conversations:
-        return None
-
-    print('get_closest_conversation_to_timestamps found:')
-    for conversation in conversations:
-        print('-', conversation['id'], conversation['started_at'], conversation['finished_at'])
-
-    # get the conversation that has the closest start timestamp or end timestamp
-    closest_conversation = None
-    min_diff = float('inf')
-    for conversation in conversations:
-        conversation_start_timestamp = conversation['started_at'].timestamp()
-        conversation_end_timestamp = conversation['finished_at'].timestamp()
-        diff1 = abs(conversation_start_timestamp - start_timestamp)
-        diff2 = abs(conversation_end_timestamp - end_timestamp)
-        if diff1 < min_diff or diff2 < min_diff:
-            min_diff = min(diff1, diff2)
-            closest_conversation = conversation
-
-    print('get_closest_conversation_to_timestamps closest_conversation:', closest_conversation['id'])
-    return closest_conversation
+    return [doc.to_dict() for doc in query.stream()]
 
 
 @prepare_for_read(decrypt_func=_prepare_conversation_for_read)
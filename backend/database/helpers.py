@@ -1,4 +1,6 @@
 import inspect
+import os
+from concurrent.futures import ThreadPoolExecutor
 from functools import wraps
 from typing import List, Dict, Any, Callable
 
@@ -7,6 +9,11 @@ from google.cloud import firestore
 from database import users as users_db, redis_db
 from ._client import db
 
+# photo reads of the conversations in a list, one sub-collection query each, run concurrently on it
+_photos_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv('PHOTOS_FETCH_WORKERS', '64')), thread_name_prefix='conversation-photos'
+)
+
 
 def set_data_protection_level(data_arg_name: str):
     """
@@ -231,17 +238,22 @@ def with_photos(photos_getter: Callable):
                 conversation_data['photos'] = photos
                 return conversation_data
 
+            def _fetch_and_attach_all(conversations):
+                if len(conversations) < 2:
+                    return [_fetch_and_attach_photos(item) for item in conversations]
+                return list(_photos_executor.map(_fetch_and_attach_photos, conversations))
+
             if isinstance(result, dict):
                 return _fetch_and_attach_photos(result)
             elif isinstance(result, list):
-                return [_fetch_and_attach_photos(item) for item in result]
+                return _fetch_and_attach_all(result)
             elif isinstance(result, tuple):
                 processed_elements = []
                 for element in result:
                     if isinstance(element, dict):
                         processed_elements.append(_fetch_and_attach_photos(element))
                     elif isinstance(element, list):
-                        processed_elements.append([_fetch_and_attach_photos(item) for item in element])
+                        processed_elements.append(_fetch_and_attach_all(element))
                     else:
                         processed_elements.append(element)
                 return tuple(processed_elements)
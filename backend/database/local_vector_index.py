@@ -0,0 +1,514 @@
+import atexit
+import json
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Protocol
+from urllib.parse import quote, unquote
+
+import numpy as np
+
+# Embedded vector index, a drop-in for the subset of the Pinecone `Index` API used by `database.vector_db`.
+#
+# Vectors are partitioned per namespace and per user (`metadata['uid']`), so a query filtered on `uid` only looks at
+# that user's vectors. Small partitions are scanned exactly; once a partition reaches IVF_MIN_VECTORS it gets an
+# inverted file index (spherical k-means centroids, vectors bucketed by nearest centroid) and queries scan the
+# IVF_NPROBE closest buckets. Scores are cosine similarities, like the Pinecone index.
+#
+# Partitions are loaded from disk on first use and written back (one .npz file each) by a background flush.
+
+IVF_MIN_VECTORS = int(os.getenv('LOCAL_VECTOR_IVF_MIN_VECTORS', '20000'))
+IVF_NPROBE = int(os.getenv('LOCAL_VECTOR_IVF_NPROBE', '32'))
+FLUSH_SECONDS = float(os.getenv('LOCAL_VECTOR_FLUSH_SECONDS', '5'))
+
+# metadata fields also kept as columns, so range filters on them don't touch the metadata dicts
+NUMERIC_FIELDS = ('created_at',)
+
+_KMEANS_ITERATIONS = 10
+_KMEANS_SAMPLE_PER_LIST = 64
+_CHUNK = 16384
+
+
+class VectorIndex(Protocol):
+    """The vector store operations `database.vector_db` relies on (Pinecone `Index` signatures)."""
+
+    def upsert(self, vectors: List[dict], namespace: str = '') -> dict: ...
+
+    def query(
+        self,
+        vector: List[float],
+        top_k: int,
+        filter: Optional[dict] = None,
+        namespace: str = '',
+        include_values: bool = False,
+        include_metadata: bool = False,
+    ) -> dict: ...
+
+    def update(self, id: str, set_metadata: Optional[dict] = None, namespace: str = '') -> dict: ...
+
+    def delete(self, ids: List[str], namespace: str = '') -> dict: ...
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1
+    return vectors / norms
+
+
+def _nearest(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    assign = np.empty(len(vectors), dtype=np.int32)
+    for start in range(0, len(vectors), _CHUNK):
+        assign[start : start + _CHUNK] = np.argmax(vectors[start : start + _CHUNK] @ centroids.T, axis=1)
+    return assign
+
+
+def _kmeans(vectors: np.ndarray, n_lists: int, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    sample = vectors[rng.choice(len(vectors), min(len(vectors), n_lists * _KMEANS_SAMPLE_PER_LIST), replace=False)]
+    centroids = sample[rng.choice(len(sample), n_lists, replace=False)].copy()
+    for _ in range(_KMEANS_ITERATIONS):
+        assign = _nearest(sample, centroids)
+        counts = np.bincount(assign, minlength=n_lists)
+        empty = counts == 0
+        sums = np.zeros_like(centroids)
+        sums[~empty] = np.add.reduceat(sample[np.argsort(assign)], (np.cumsum(counts) - counts)[~empty])
+        # re-seed empty lists so every centroid keeps covering part of the data
+        sums[empty] = sample[rng.choice(len(sample), int(empty.sum()))]
+        centroids = _normalize(sums)
+    return centroids
+
+
+def _matches(value: Any, op: str, operand: Any) -> bool:
+    # list-valued metadata (topics, people, ...) matches when any element does, as in Pinecone
+    if isinstance(value, list):
+        if op in ('$ne', '$nin'):
+            return all(_matches(v, op, operand) for v in value)
+        return any(_matches(v, op, operand) for v in value)
+    if op == '$eq':
+        return value == operand
+    if op == '$ne':
+        return value != operand
+    if op == '$in':
+        return value in operand
+    if op == '$nin':
+        return value not in operand
+    if value is None:
+        return False
+    if op == '$gt':
+        return value > operand
+    if op == '$gte':
+        return value >= operand
+    if op == '$lt':
+        return value < operand
+    if op == '$lte':
+        return value <= operand
+    raise ValueError(f'Unsupported filter operator {op}')
+
+
+_COLUMN_OPS: Dict[str, Callable[[np.ndarray, Any], np.ndarray]] = {
+    '$eq': lambda column, operand: column == operand,
+    '$ne': lambda column, operand: column != operand,
+    '$gt': lambda column, operand: column > operand,
+    '$gte': lambda column, operand: column >= operand,
+    '$lt': lambda column, operand: column < operand,
+    '$lte': lambda column, operand: column <= operand,
+    '$in': lambda column, operand: np.isin(column, list(operand)),
+    '$nin': lambda column, operand: ~np.isin(column, list(operand)),
+}
+
+
+def _filter_uid(filter: Optional[dict]) -> Optional[str]:
+    """The uid a filter is restricted to (`{'uid': x}`, `{'uid': {'$eq': x}}`, possibly inside `$and`)."""
+    if not filter:
+        return None
+    condition = filter.get('uid')
+    if isinstance(condition, str):
+        return condition
+    if isinstance(condition, dict) and isinstance(condition.get('$eq'), str):
+        return condition['$eq']
+    for clause in filter.get('$and', []):
+        if (uid := _filter_uid(clause)) is not None:
+            return uid
+    return None
+
+
+class _Partition:
+    def __init__(self, uid: str, dimension: int):
+        self.uid = uid
+        self.lock = threading.RLock()
+        self.count = 0
+        self.vectors = np.zeros((0, dimension), dtype=np.float32)
+        self.columns = {field: np.zeros(0, dtype=np.float64) for field in NUMERIC_FIELDS}
+        self.ids: List[str] = []
+        self.metadata: List[dict] = []
+        self.rows: Dict[str, int] = {}
+
+        self.centroids: Optional[np.ndarray] = None
+        self.assign = np.zeros(0, dtype=np.int32)
+        self.lists: List[List[int]] = []
+        self._list_rows: Dict[int, np.ndarray] = {}
+        self.trained_count = 0
+
+    def _grow(self, needed: int):
+        if needed <= len(self.vectors):
+            return
+        capacity = max(needed, 2 * len(self.vectors), 64)
+        vectors = np.zeros((capacity, self.vectors.shape[1]), dtype=np.float32)
+        vectors[: self.count] = self.vectors[: self.count]
+        self.vectors = vectors
+        for field, column in self.columns.items():
+            grown = np.full(capacity, np.nan)
+            grown[: self.count] = column[: self.count]
+            self.columns[field] = grown
+        assign = np.zeros(capacity, dtype=np.int32)
+        assign[: self.count] = self.assign[: self.count]
+        self.assign = assign
+
+    def _set_columns(self, row: int, metadata: dict):
+        for field, column in self.columns.items():
+            value = metadata.get(field)
+            column[row] = value if isinstance(value, (int, float)) else np.nan
+
+    def _move_to_list(self, row: int, list_id: int, previous: Optional[int] = None):
+        if previous is not None:
+            self.lists[previous].remove(row)
+            self._list_rows.pop(previous, None)
+        self.assign[row] = list_id
+        self.lists[list_id].append(row)
+        self._list_rows.pop(list_id, None)
+
+    def upsert(self, ids: List[str], vectors: np.ndarray, metadata: List[dict]):
+        self._grow(self.count + len(ids))
+        vectors = _normalize(vectors)
+        assign = _nearest(vectors, self.centroids) if self.centroids is not None else None
+        for i, (vector_id, vector, meta) in enumerate(zip(ids, vectors, metadata)):
+            row = self.rows.get(vector_id)
+            previous = None
+            if row is None:
+                row = self.count
+                self.count += 1
+                self.rows[vector_id] = row
+                self.ids.append(vector_id)
+                self.metadata.append(meta)
+            else:
+                self.metadata[row] = meta
+                previous = int(self.assign[row])
+            self.vectors[row] = vector
+            self._set_columns(row, meta)
+            if assign is not None:
+                self._move_to_list(row, int(assign[i]), previous)
+
+        if self.count >= IVF_MIN_VECTORS and self.count >= 2 * self.trained_count:
+            self.train()
+
+    def update_metadata(self, vector_id: str, metadata: dict) -> bool:
+        row = self.rows.get(vector_id)
+        if row is None:
+            return False
+        self.metadata[row] = {**self.metadata[row], **metadata}
+        self._set_columns(row, self.metadata[row])
+        return True
+
+    def delete(self, vector_id: str) -> bool:
+        row = self.rows.pop(vector_id, None)
+        if row is None:
+            return False
+        last = self.count - 1
+        if self.centroids is not None:
+            self.lists[self.assign[row]].remove(row)
+            self._list_rows.pop(int(self.assign[row]), None)
+            if row != last:
+                moved = self.lists[self.assign[last]]
+                moved[moved.index(last)] = row
+                self._list_rows.pop(int(self.assign[last]), None)
+        if row != last:
+            # keep rows dense: the last row takes the deleted one's place
+            self.vectors[row] = self.vectors[last]
+            self.assign[row] = self.assign[last]
+            for column in self.columns.values():
+                column[row] = column[last]
+            self.ids[row] = self.ids[last]
+            self.metadata[row] = self.metadata[last]
+            self.rows[self.ids[row]] = row
+        self.ids.pop()
+        self.metadata.pop()
+        self.count = last
+        return True
+
+    def train(self):
+        n_lists = int(min(4096, max(16, np.sqrt(self.count))))
+        vectors = self.vectors[: self.count]
+        self.centroids = _kmeans(vectors, n_lists)
+        self.assign[: self.count] = _nearest(vectors, self.centroids)
+        order = np.argsort(self.assign[: self.count], kind='stable')
+        bounds = np.searchsorted(self.assign[: self.count][order], np.arange(n_lists + 1))
+        self.lists = [order[bounds[i] : bounds[i + 1]].tolist() for i in range(n_lists)]
+        self._list_rows = {}
+        self.trained_count = self.count
+
+    def _probe(self, query: np.ndarray, nprobe: int) -> np.ndarray:
+        closest = np.argsort(-(self.centroids @ query))[:nprobe]
+        parts = []
+        for list_id in closest.tolist():
+            rows = self._list_rows.get(list_id)
+            if rows is None:
+                rows = self._list_rows[list_id] = np.array(self.lists[list_id], dtype=np.int64)
+            parts.append(rows)
+        return np.concatenate(parts) if parts else np.zeros(0, dtype=np.int64)
+
+    def _mask(self, filter: dict, rows: np.ndarray, columns_only: bool = False) -> np.ndarray:
+        """
+        Rows matching `filter`. With `columns_only`, conditions on non-column metadata are treated as true, which
+        gives a superset of the matches from the numeric columns alone.
+        """
+        mask = np.ones(len(rows), dtype=bool)
+        for field, condition in filter.items():
+            if field == '$and':
+                for clause in condition:
+                    mask &= self._mask(clause, rows, columns_only)
+            elif field == '$or':
+                any_mask = np.zeros(len(rows), dtype=bool)
+                for clause in condition:
+                    any_mask |= self._mask(clause, rows, columns_only)
+                mask &= any_mask
+            else:
+                ops = condition.items() if isinstance(condition, dict) else [('$eq', condition)]
+                if field == 'uid':
+                    mask &= all(_matches(self.uid, op, operand) for op, operand in ops)
+                elif field in self.columns:
+                    column = self.columns[field][rows]
+                    for op, operand in ops:
+                        mask &= _COLUMN_OPS[op](column, operand)
+                elif not columns_only:
+                    for op, operand in ops:
+                        mask &= np.fromiter(
+                            (_matches(self.metadata[row].get(field), op, operand) for row in rows.tolist()),
+                            dtype=bool,
+                            count=len(rows),
+                        )
+        return mask
+
+    def query(self, query: np.ndarray, top_k: int, filter: Optional[dict], nprobe: int) -> List[tuple]:
+        if self.count == 0:
+            return []
+        allowed = np.arange(self.count)
+        prefilter = None
+        if filter:
+            prefilter = self._mask(filter, allowed, columns_only=True)
+            if prefilter.all():
+                prefilter = None
+            else:
+                allowed = allowed[prefilter]
+
+        def search(candidates: np.ndarray) -> List[tuple]:
+            if filter:
+                candidates = candidates[self._mask(filter, candidates)]
+            if len(candidates) == 0:
+                return []
+            scores = self.vectors[candidates] @ query
+            if len(candidates) > top_k:
+                best = np.argpartition(-scores, top_k - 1)[:top_k]
+            else:
+                best = np.arange(len(candidates))
+            best = best[np.argsort(-scores[best])]
+            return [(int(candidates[i]), float(scores[i])) for i in best]
+
+        probed_rows = nprobe * self.count // max(1, len(self.lists))
+        if self.centroids is None or len(allowed) <= 2 * probed_rows:
+            # about as cheap as probing: scan the allowed rows exactly
+            return search(allowed)
+        if prefilter is not None:
+            # probe more buckets for selective filters, so about as many rows get scored as without a filter
+            selectivity = len(allowed) / self.count
+            candidates = self._probe(query, min(len(self.lists), int(np.ceil(nprobe / selectivity))))
+            candidates = candidates[prefilter[candidates]]
+        else:
+            candidates = self._probe(query, nprobe)
+        matches = search(candidates)
+        if len(matches) < top_k and len(allowed) > len(candidates):
+            # selective filters can leave the probed buckets short, fall back to the exact scan
+            matches = search(allowed)
+        return matches
+
+    def snapshot(self) -> Dict[str, np.ndarray]:
+        payload = json.dumps({'uid': self.uid, 'ids': self.ids, 'metadata': self.metadata}).encode('utf-8')
+        arrays = {
+            'vectors': self.vectors[: self.count].copy(),
+            'assign': self.assign[: self.count].copy(),
+            'payload': np.frombuffer(payload, dtype=np.uint8),
+            'trained_count': np.array(self.trained_count),
+        }
+        if self.centroids is not None:
+            arrays['centroids'] = self.centroids
+        return arrays
+
+    @classmethod
+    def load(cls, path: str) -> '_Partition':
+        with np.load(path) as data:
+            payload = json.loads(data['payload'].tobytes().decode('utf-8'))
+            vectors = data['vectors']
+            partition = cls(payload['uid'], vectors.shape[1])
+            partition._grow(len(vectors))
+            partition.count = len(vectors)
+            partition.vectors[: partition.count] = vectors
+            partition.ids = payload['ids']
+            partition.metadata = payload['metadata']
+            partition.rows = {vector_id: row for row, vector_id in enumerate(partition.ids)}
+            for row, meta in enumerate(partition.metadata):
+                partition._set_columns(row, meta)
+            partition.trained_count = int(data['trained_count'])
+            if 'centroids' in data:
+                partition.centroids = data['centroids']
+                partition.assign[: partition.count] = data['assign']
+                partition.lists = [[] for _ in range(len(partition.centroids))]
+                for row, list_id in enumerate(data['assign'].tolist()):
+                    partition.lists[list_id].append(row)
+        return partition
+
+
+class LocalVectorIndex:
+    """
+    Embedded, on-disk vector index with the Pinecone `Index` methods `database.vector_db` uses.
+
+    Selected with `VECTOR_STORE=local`; data lives under `path`, one file per namespace and user.
+    """
+
+    def __init__(self, path: str, nprobe: int = IVF_NPROBE, flush_seconds: float = FLUSH_SECONDS):
+        self.path = path
+        self.nprobe = nprobe
+        self._partitions: Dict[tuple, _Partition] = {}
+        self._dirty: set = set()
+        self._lock = threading.Lock()
+        os.makedirs(path, exist_ok=True)
+
+        if flush_seconds > 0:
+            threading.Thread(target=self._flush_loop, args=(flush_seconds,), daemon=True).start()
+        atexit.register(self.flush)
+
+    def _file(self, namespace: str, uid: str) -> str:
+        return os.path.join(self.path, quote(namespace or '_', safe=''), f'{quote(uid, safe="")}.npz')
+
+    def _stored_uids(self, namespace: str) -> List[str]:
+        directory = os.path.dirname(self._file(namespace, ''))
+        if not os.path.isdir(directory):
+            return []
+        return [unquote(name[: -len('.npz')]) for name in os.listdir(directory) if name.endswith('.npz')]
+
+    def _partition(self, namespace: str, uid: str, dimension: Optional[int] = None) -> Optional[_Partition]:
+        key = (namespace, uid)
+        with self._lock:
+            partition = self._partitions.get(key)
+            if partition is None:
+                file = self._file(namespace, uid)
+                if os.path.exists(file):
+                    partition = _Partition.load(file)
+                elif dimension is not None:
+                    partition = _Partition(uid, dimension)
+                else:
+                    return None
+                self._partitions[key] = partition
+            return partition
+
+    def _all_uids(self, namespace: str) -> List[str]:
+        with self._lock:
+            loaded = [uid for ns, uid in self._partitions if ns == namespace]
+        return list(dict.fromkeys(loaded + self._stored_uids(namespace)))
+
+    def _mark_dirty(self, namespace: str, uid: str):
+        with self._lock:
+            self._dirty.add((namespace, uid))
+
+    def upsert(self, vectors: List[dict], namespace: str = '') -> dict:
+        by_uid: Dict[str, List[dict]] = {}
+        for vector in vectors:
+            by_uid.setdefault(vector.get('metadata', {}).get('uid', ''), []).append(vector)
+        for uid, items in by_uid.items():
+            values = np.asarray([item['values'] for item in items], dtype=np.float32)
+            partition = self._partition(namespace, uid, values.shape[1])
+            with partition.lock:
+                metadata = [dict(item.get('metadata', {})) for item in items]
+                partition.upsert([item['id'] for item in items], values, metadata)
+            self._mark_dirty(namespace, uid)
+        return {'upserted_count': len(vectors)}
+
+    def query(
+        self,
+        vector: List[float],
+        top_k: int,
+        filter: Optional[dict] = None,
+        namespace: str = '',
+        include_values: bool = False,
+        include_metadata: bool = False,
+    ) -> dict:
+        query = _normalize(np.asarray([vector], dtype=np.float32))[0]
+        uid = _filter_uid(filter)
+        uids = [uid] if uid is not None else self._all_uids(namespace)
+
+        found = []
+        for uid in uids:
+            partition = self._partition(namespace, uid)
+            if partition is None:
+                continue
+            with partition.lock:
+                for row, score in partition.query(query, top_k, filter, self.nprobe):
+                    match = {'id': partition.ids[row], 'score': score}
+                    if include_values:
+                        match['values'] = partition.vectors[row].tolist()
+                    if include_metadata:
+                        match['metadata'] = dict(partition.metadata[row])
+                    found.append(match)
+        found.sort(key=lambda match: match['score'], reverse=True)
+        return {'matches': found[:top_k], 'namespace': namespace}
+
+    def _uids_for_id(self, namespace: str, vector_id: str) -> List[str]:
+        # ids are `{uid}-{conversation_id}`, so only partitions whose uid prefixes the id can hold it
+        return [uid for uid in self._all_uids(namespace) if vector_id.startswith(f'{uid}-') or not uid]
+
+    def update(self, id: str, set_metadata: Optional[dict] = None, namespace: str = '') -> dict:
+        uid = (set_metadata or {}).get('uid')
+        for uid in [uid] if uid is not None else self._uids_for_id(namespace, id):
+            partition = self._partition(namespace, uid)
+            if partition is None:
+                continue
+            with partition.lock:
+                updated = partition.update_metadata(id, set_metadata or {})
+            if updated:
+                self._mark_dirty(namespace, uid)
+                break
+        return {}
+
+    def delete(self, ids: List[str], namespace: str = '') -> dict:
+        for vector_id in ids:
+            for uid in self._uids_for_id(namespace, vector_id):
+                partition = self._partition(namespace, uid)
+                if partition is None:
+                    continue
+                with partition.lock:
+                    deleted = partition.delete(vector_id)
+                if deleted:
+                    self._mark_dirty(namespace, uid)
+        return {}
+
+    def flush(self):
+        """Writes partitions changed since the last flush to disk."""
+        with self._lock:
+            dirty, self._dirty = self._dirty, set()
+        for namespace, uid in dirty:
+            partition = self._partitions[(namespace, uid)]
+            file = self._file(namespace, uid)
+            os.makedirs(os.path.dirname(file), exist_ok=True)
+            try:
+                # copy under the lock, write outside it so queries aren't blocked on disk
+                with partition.lock:
+                    arrays = partition.snapshot()
+                tmp = f'{file}.tmp.npz'
+                np.savez(tmp, **arrays)
+                os.replace(tmp, file)
+            except Exception as e:
+                print('local_vector_index: flush failed', namespace, uid, e)
+                self._mark_dirty(namespace, uid)
+
+    def _flush_loop(self, interval: float):
+        while True:
+            time.sleep(interval)
+            self.flush()
@@ -1,13 +1,18 @@
 import copy
+import json
+import os
+import threading
+from collections import OrderedDict
 from datetime import datetime, timezone
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple
 
 from google.cloud import firestore
 from google.cloud.firestore_v1 import FieldFilter
 
 from ._client import db
-from database import users as users_db
+from database import users as users_db, redis_db
 from utils import encryption
+from utils.other import metrics
 from .helpers import set_data_protection_level, prepare_for_write, prepare_for_read
 
 memories_collection = 'memories'
@@ -55,12 +60,166 @@ def _prepare_memory_for_read(memory_data: Optional[Dict[str, Any]], uid: str) ->
     return memory_data
 
 
+# *****************************
+# ********** SNAPSHOT *********
+# *****************************
+
+# Every memory of a user, decrypted and sorted the way the memory readers list them (scoring, then newest first), so
+# chat tools, persona prompts, extraction and notifications filter and slice a list instead of each streaming and
+# decrypting the whole collection.
+#
+# Redis holds the snapshot in its stored form (enhanced content stays encrypted) under a version that every write
+# below bumps, applying its change to the stored snapshot in place. Each process keeps the decrypted list of recently
+# read users, and serves it while its version is the current one; writes made by this process update it in place.
+# Writes that go around these functions (bulk migrations, scripts) must call `invalidate_memories_snapshot`.
+
+SNAPSHOT_USERS = int(os.getenv('MEMORY_SNAPSHOT_USERS', '128'))
+
+_snapshots: 'OrderedDict[str, Tuple[int, List[dict]]]' = OrderedDict()
+_snapshots_lock = threading.Lock()
+# striped, so builds for one user are serialized without keeping a lock per user
+_build_locks = [threading.Lock() for _ in range(64)]
+
+_DATETIME_FIELDS = ('created_at', 'updated_at')
+
+
+def _encode_memory(memory: dict) -> str:
+    return json.dumps(memory, separators=(',', ':'), default=str)
+
+
+def _decode_memory(data) -> dict:
+    memory = json.loads(data)
+    for field in _DATETIME_FIELDS:
+        if isinstance(memory.get(field), str):
+            memory[field] = datetime.fromisoformat(memory[field])
+    return memory
+
+
+def _timestamp(value) -> float:
+    if not isinstance(value, datetime):
+        return 0.0
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+
+def _sort_key(memory: dict):
+    # Firestore's descending order puts missing scores last
+    scoring = memory.get('scoring')
+    return scoring is not None, scoring or '', _timestamp(memory.get('created_at'))
+
+
+def _decrypt_in_place(memory: dict, uid: str) -> dict:
+    # snapshot entries are freshly decoded or streamed, the deep copy of `_decrypt_memory_data` isn't needed
+    if memory.get('data_protection_level') == 'enhanced' and isinstance(memory.get('content'), str):
+        try:
+            memory['content'] = encryption.decrypt(memory['content'], uid)
+        except Exception:
+            pass
+    return memory
+
+
+def _sorted_for_read(uid: str, stored: List[dict]) -> List[dict]:
+    return sorted((_decrypt_in_place(memory, uid) for memory in stored), key=_sort_key, reverse=True)
+
+
+def _local_snapshot(uid: str, version: int) -> Optional[List[dict]]:
+    with _snapshots_lock:
+        entry = _snapshots.get(uid)
+        if entry is None or entry[0] != version:
+            return None
+        _snapshots.move_to_end(uid)
+        return entry[1]
+
+
+def _set_local_snapshot(uid: str, version: int, memories: List[dict]):
+    with _snapshots_lock:
+        entry = _snapshots.get(uid)
+        if entry is not None and entry[0] > version:
+            return
+        _snapshots[uid] = (version, memories)
+        _snapshots.move_to_end(uid)
+        while len(_snapshots) > SNAPSHOT_USERS:
+            _snapshots.popitem(last=False)
+
+
+def _stream_stored_memories(uid: str) -> List[dict]:
+    memories_ref = db.collection(users_collection).document(uid).collection(memories_collection)
+    return [doc.to_dict() for doc in memories_ref.stream()]
+
+
+def get_memories_snapshot(uid: str) -> List[dict]:
+    """All of the user's memories, decrypted and sorted. Shared between callers, treat it as read-only."""
+    version = redis_db.get_memory_snapshot_version(uid)
+    if version is None:
+        # Redis is unavailable, nothing can tell whether a copy is current
+        metrics.incr('memories.snapshot.uncached')
+        return _sorted_for_read(uid, _stream_stored_memories(uid))
+
+    memories = _local_snapshot(uid, version)
+    if memories is not None:
+        metrics.incr('memories.snapshot.local_hit')
+        return memories
+
+    # one build per user at a time, concurrent reads wait for it
+    with _build_locks[hash(uid) % len(_build_locks)]:
+        memories = _local_snapshot(uid, version)
+        if memories is not None:
+            return memories
+        stored = redis_db.get_memory_snapshot(uid, version)
+        if stored is not None:
+            metrics.incr('memories.snapshot.redis_hit')
+            with metrics.timer('memories.snapshot.load'):
+                memories = _sorted_for_read(uid, [_decode_memory(data) for data in stored.values()])
+        else:
+            metrics.incr('memories.snapshot.build')
+            with metrics.timer('memories.snapshot.build'):
+                stored_memories = _stream_stored_memories(uid)
+                redis_db.store_memory_snapshot(
+                    uid, version, {memory['id']: _encode_memory(memory) for memory in stored_memories}
+                )
+                memories = _sorted_for_read(uid, stored_memories)
+        _set_local_snapshot(uid, version, memories)
+    return memories
+
+
+def _update_snapshot(uid: str, deleted_ids: List[str] = (), upserted: List[dict] = ()):
+    """Applies a write to the stored snapshot and to this process' copy. `upserted` are memories as stored."""
+    encoded = {memory['id']: _encode_memory(memory) for memory in upserted if memory and memory.get('id')}
+    version = redis_db.apply_memory_snapshot_delta(uid, list(deleted_ids), encoded)
+    with _snapshots_lock:
+        entry = _snapshots.get(uid)
+    if entry is None:
+        return
+    if version is None or entry[0] != version - 1:
+        with _snapshots_lock:
+            if _snapshots.get(uid) is entry:
+                del _snapshots[uid]
+        return
+    changed = set(deleted_ids) | set(encoded)
+    # decoded from what was stored, so this copy matches what other processes load
+    memories = [memory for memory in entry[1] if memory.get('id') not in changed]
+    memories += [_decrypt_in_place(_decode_memory(data), uid) for data in encoded.values()]
+    memories.sort(key=_sort_key, reverse=True)
+    _set_local_snapshot(uid, version, memories)
+
+
+def invalidate_memories_snapshot(uid: str):
+    redis_db.reset_memory_snapshot(uid)
+    with _snapshots_lock:
+        _snapshots.pop(uid, None)
+
+
+def _get_stored_memory(uid: str, memory_id: str) -> Optional[dict]:
+    memory_ref = db.collection(users_collection).document(uid).collection(memories_collection).document(memory_id)
+    return memory_ref.get().to_dict()
+
+
 # *****************************
 # ********** CRUD *************
 # *****************************
 
 
-@prepare_for_read(decrypt_func=_prepare_memory_for_read)
 def get_memories(
     uid: str,
     limit: int = 100,
@@ -70,48 +229,47 @@ def get_memories(
     end_date: Optional[datetime] = None,
 ):
     print('get_memories db', uid, limit, offset, categories, start_date, end_date)
-    memories_ref = db.collection(users_collection).document(uid).collection(memories_collection)
-
-    if categories:
-        memories_ref = memories_ref.where(filter=FieldFilter('category', 'in', categories))
+    starts_at = _timestamp(start_date) if start_date else None
+    ends_at = _timestamp(end_date) if end_date else None
 
-    if start_date:
-        memories_ref = memories_ref.where(filter=FieldFilter('created_at', '>=', start_date))
-
-    if end_date:
-        memories_ref = memories_ref.where(filter=FieldFilter('created_at', '<=', end_date))
-
-    memories_ref = (
-        memories_ref.order_by('scoring', direction=firestore.Query.DESCENDING)
-        .order_by('created_at', direction=firestore.Query.DESCENDING)
-        .limit(limit)
-        .offset(offset)
-    )
-
-    # TODO: put user review to firestore query
-    memories = [doc.to_dict() for doc in memories_ref.stream()]
-    print("get_memories", len(memories))
-    result = [memory for memory in memories if memory['user_review'] is not False]
-    return result
+    result = []
+    for memory in get_memories_snapshot(uid):
+        if memory.get('user_review') is False:
+            continue
+        if categories and memory.get('category') not in categories:
+            continue
+        if starts_at is not None or ends_at is not None:
+            created_at = _timestamp(memory.get('created_at'))
+            if (starts_at is not None and created_at < starts_at) or (ends_at is not None and created_at > ends_at):
+                continue
+        result.append(memory)
+        if len(result) >= offset + limit:
+            break
+    print("get_memories", len(result) - offset if len(result) > offset else 0)
+    return [dict(memory) for memory in result[offset:]]
+
+
+def get_memories_search_fields(uid: str):
+    """Content and source conversation of every memory the user hasn't rejected."""
+    return [
+        {
+            'content': memory.get('content'),
+            'conversation_id': memory.get('conversation_id'),
+            'memory_id': memory.get('memory_id'),
+        }
+        for memory in get_memories_snapshot(uid)
+        if memory.get('user_review') is not False
+    ]
 
 
-@prepare_for_read(decrypt_func=_prepare_memory_for_read)
 def get_user_public_memories(uid: str, limit: int = 100, offset: int = 0):
     print('get_public_memories', limit, offset)
 
-    memories_ref = db.collection(users_collection).document(uid).collection(memories_collection)
-    memories_ref = memories_ref.order_by('scoring', direction=firestore.Query.DESCENDING).order_by(
-        'created_at', direction=firestore.Query.DESCENDING
-    )
-
-    memories_ref = memories_ref.limit(limit).offset(offset)
-
-    memories = [doc.to_dict() for doc in memories_ref.stream()]
-
     # Consider visibility as 'public' if it's missing
-    public_memories = [memory for memory in memories if memory.get('visibility', 'public') == 'public']
-
-    return public_memories
+    public_memories = [
+        memory for memory in get_memories_snapshot(uid) if memory.get('visibility', 'public') == 'public'
+    ]
+    return [dict(memory) for memory in public_memories[offset : offset + limit]]
 
 
 @prepare_for_read(decrypt_func=_prepare_memory_for_read)
@@ -131,6 +289,7 @@ def create_memory(uid: str, data: dict):
     memories_ref = user_ref.collection(memories_collection)
     memory_ref = memories_ref.document(data['id'])
     memory_ref.set(data)
+    _update_snapshot(uid, upserted=[data])
 
 
 @set_data_protection_level(data_arg_name='data')
@@ -146,6 +305,7 @@ def save_memories(uid: str, data: List[dict]):
         memory_ref = memories_ref.document(memory['id'])
         batch.set(memory_ref, memory)
     batch.commit()
+    _update_snapshot(uid, upserted=data)
 
 
 def delete_memories(uid: str):
@@ -155,6 +315,7 @@ def delete_memories(uid: str):
     for doc in memories_ref.stream():
         batch.delete(doc.reference)
     batch.commit()
+    invalidate_memories_snapshot(uid)
 
 
 @prepare_for_read(decrypt_func=_prepare_memory_for_read)
@@ -171,6 +332,7 @@ def review_memory(uid: str, memory_id: str, value: bool):
     memories_ref = user_ref.collection(memories_collection)
     memory_ref = memories_ref.document(memory_id)
     memory_ref.update({'reviewed': True, 'user_review': value})
+    _update_snapshot(uid, upserted=[_get_stored_memory(uid, memory_id)])
 
 
 def change_memory_visibility(uid: str, memory_id: str, value: str):
@@ -178,6 +340,7 @@ def change_memory_visibility(uid: str, memory_id: str, value: str):
     memories_ref = user_ref.collection(memories_collection)
     memory_ref = memories_ref.document(memory_id)
     memory_ref.update({'visibility': value})
+    _update_snapshot(uid, upserted=[_get_stored_memory(uid, memory_id)])
 
 
 def edit_memory(uid: str, memory_id: str, value: str):
@@ -194,7 +357,9 @@ def edit_memory(uid: str, memory_id: str, value: str):
     if doc_level == 'enhanced':
         content = encryption.encrypt(content, uid)
 
-    memory_ref.update({'content': content, 'edited': True, 'updated_at': datetime.now(timezone.utc)})
+    update = {'content': content, 'edited': True, 'updated_at': datetime.now(timezone.utc)}
+    memory_ref.update(update)
+    _update_snapshot(uid, upserted=[{**doc_snapshot.to_dict(), **update}])
 
 
 def delete_memory(uid: str, memory_id: str):
@@ -202,6 +367,7 @@ def delete_memory(uid: str, memory_id: str):
     memories_ref = user_ref.collection(memories_collection)
     memory_ref = memories_ref.document(memory_id)
     memory_ref.delete()
+    _update_snapshot(uid, deleted_ids=[memory_id])
 
 
 def delete_all_memories(uid: str):
@@ -211,6 +377,7 @@ def delete_all_memories(uid: str):
     for doc in memories_ref.stream():
         batch.delete(doc.reference)
     batch.commit()
+    invalidate_memories_snapshot(uid)
 
 
 def delete_memories_for_conversation(uid: str, memory_id: str):
@@ -224,6 +391,8 @@ def delete_memories_for_conversation(uid: str, memory_id: str):
         batch.delete(doc.reference)
         removed_ids.append(doc.id)
     batch.commit()
+    if removed_ids:
+        _update_snapshot(uid, deleted_ids=removed_ids)
     print('delete_memories_for_conversation', memory_id, len(removed_ids))
 
 
@@ -246,6 +415,7 @@ def unlock_all_memories(uid: str):
             count = 0
     if count > 0:
         batch.commit()
+    invalidate_memories_snapshot(uid)
     print(f"Unlocked all memories for user {uid}")
 
 
@@ -307,6 +477,7 @@ def migrate_memories_level_batch(uid: str, memory_ids: List[str], target_level:
         batch.update(doc_snapshot.reference, update_data)
 
     batch.commit()
+    invalidate_memories_snapshot(uid)
 
 
 def migrate_memories(prev_uid: str, new_uid: str, app_id: str = None):
@@ -345,5 +516,6 @@ def migrate_memories(prev_uid: str, new_uid: str, app_id: str = None):
 
     # Commit batch
     batch.commit()
+    invalidate_memories_snapshot(new_uid)
     print(f'Migrated {len(memories_to_migrate)} memories from {prev_uid} to {new_uid}')
     return len(memories_to_migrate)
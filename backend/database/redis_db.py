@@ -1,6 +1,8 @@
+import ast
 import base64
 import json
 import os
+import time
 from typing import List, Union, Optional
 
 import redis
@@ -25,30 +27,141 @@ def try_catch_decorator(func):
     return wrapper
 
 
+def generic_cache_key(path: str) -> str:
+    return f"cache:{base64.b64encode(path.encode('utf-8')).decode('utf-8')}"
+
+
 @try_catch_decorator
 def get_generic_cache(path: str):
-    key = base64.b64encode(f'{path}'.encode('utf-8'))
-    key = key.decode('utf-8')
-
-    data = r.get(f'cache:{key}')
+    data = r.get(generic_cache_key(path))
     return json.loads(data) if data else None
 
 
 @try_catch_decorator
 def set_generic_cache(path: str, data: Union[dict, list], ttl: int = None):
-    key = base64.b64encode(f'{path}'.encode('utf-8'))
-    key = key.decode('utf-8')
-
-    r.set(f'cache:{key}', json.dumps(data, default=str))
-    if ttl:
-        r.expire(f'cache:{key}', ttl)
+    r.set(generic_cache_key(path), json.dumps(data, default=str), ex=ttl)
 
 
 @try_catch_decorator
 def delete_generic_cache(path: str):
-    key = base64.b64encode(f'{path}'.encode('utf-8'))
-    key = key.decode('utf-8')
-    r.delete(f'cache:{key}')
+    r.delete(generic_cache_key(path))
+
+
+# ******************************************************
+# ********************* EMBEDDINGS *********************
+# ******************************************************
+
+
+@try_catch_decorator
+def get_cached_embeddings(keys: List[str]) -> List[Optional[bytes]]:
+    return r.mget([f'embedding:{key}' for key in keys])
+
+
+@try_catch_decorator
+def set_cached_embeddings(vectors: dict, ttl: int):
+    pipe = r.pipeline(transaction=False)
+    for key, data in vectors.items():
+        pipe.set(f'embedding:{key}', data, ex=ttl)
+    pipe.execute()
+
+
+# ******************************************************
+# ****************** MEMORY SNAPSHOTS ******************
+# ******************************************************
+
+# A user's memories as a hash (memory id -> stored JSON, plus '_version') next to a version key that every write
+# bumps. A write's delta is only applied to a hash at the previous version, any other hash is dropped, so a stored
+# snapshot is either current or absent. Versions start from a millisecond timestamp, not 0, so a version from before
+# the key expired never matches a later one.
+MEMORY_SNAPSHOT_TTL = 60 * 60
+_MEMORY_VERSION_TTL = 60 * 60 * 24 * 7
+
+_APPLY_MEMORY_DELTA_LUA = """
+if redis.call('EXISTS', KEYS[2]) == 0 then redis.call('SET', KEYS[2], ARGV[1]) end
+local version = redis.call('INCR', KEYS[2])
+redis.call('EXPIRE', KEYS[2], ARGV[2])
+if redis.call('HGET', KEYS[1], '_version') ~= tostring(version - 1) then
+    redis.call('DEL', KEYS[1])
+    return version
+end
+local deleted = tonumber(ARGV[4])
+for i = 5, 4 + deleted do redis.call('HDEL', KEYS[1], ARGV[i]) end
+for i = 5 + deleted, #ARGV, 2 do redis.call('HSET', KEYS[1], ARGV[i], ARGV[i + 1]) end
+redis.call('HSET', KEYS[1], '_version', version)
+redis.call('EXPIRE', KEYS[1], ARGV[3])
+return version
+"""
+_apply_memory_delta_script = r.register_script(_APPLY_MEMORY_DELTA_LUA)
+
+_STORE_MEMORY_SNAPSHOT_LUA = """
+if redis.call('GET', KEYS[2]) ~= ARGV[1] then return 0 end
+redis.call('DEL', KEYS[1])
+for i = 3, #ARGV, 2 do redis.call('HSET', KEYS[1], ARGV[i], ARGV[i + 1]) end
+redis.call('HSET', KEYS[1], '_version', ARGV[1])
+redis.call('EXPIRE', KEYS[1], ARGV[2])
+return 1
+"""
+_store_memory_snapshot_script = r.register_script(_STORE_MEMORY_SNAPSHOT_LUA)
+
+_RESET_MEMORY_SNAPSHOT_LUA = """
+if redis.call('EXISTS', KEYS[2]) == 0 then redis.call('SET', KEYS[2], ARGV[1]) end
+local version = redis.call('INCR', KEYS[2])
+redis.call('EXPIRE', KEYS[2], ARGV[2])
+redis.call('DEL', KEYS[1])
+return version
+"""
+_reset_memory_snapshot_script = r.register_script(_RESET_MEMORY_SNAPSHOT_LUA)
+
+
+def _memory_snapshot_keys(uid: str) -> List[str]:
+    return [f'users:{uid}:memories:snapshot', f'users:{uid}:memories:version']
+
+
+def _memory_version_seed() -> int:
+    return int(time.time() * 1000)
+
+
+@try_catch_decorator
+def get_memory_snapshot_version(uid: str) -> Optional[int]:
+    version_key = _memory_snapshot_keys(uid)[1]
+    pipe = r.pipeline(transaction=False)
+    pipe.set(version_key, _memory_version_seed(), nx=True, ex=_MEMORY_VERSION_TTL)
+    pipe.get(version_key)
+    return int(pipe.execute()[1])
+
+
+@try_catch_decorator
+def get_memory_snapshot(uid: str, version: int) -> Optional[dict]:
+    """Memory id -> stored JSON, if the stored snapshot is at `version`."""
+    snapshot = r.hgetall(_memory_snapshot_keys(uid)[0])
+    if snapshot.pop(b'_version', None) != str(version).encode():
+        return None
+    return {key.decode(): value for key, value in snapshot.items()}
+
+
+@try_catch_decorator
+def store_memory_snapshot(uid: str, version: int, memories: dict) -> bool:
+    """Stores the snapshot built at `version`, unless a write bumped the version meanwhile."""
+    args = [version, MEMORY_SNAPSHOT_TTL]
+    for memory_id, data in memories.items():
+        args += [memory_id, data]
+    return bool(_store_memory_snapshot_script(keys=_memory_snapshot_keys(uid), args=args))
+
+
+@try_catch_decorator
+def apply_memory_snapshot_delta(uid: str, deleted: List[str], upserted: dict) -> Optional[int]:
+    """Bumps the user's memories version and applies the change to the stored snapshot. Returns the new version."""
+    args = [_memory_version_seed(), _MEMORY_VERSION_TTL, MEMORY_SNAPSHOT_TTL, len(deleted), *deleted]
+    for memory_id, data in upserted.items():
+        args += [memory_id, data]
+    return int(_apply_memory_delta_script(keys=_memory_snapshot_keys(uid), args=args))
+
+
+@try_catch_decorator
+def reset_memory_snapshot(uid: str) -> Optional[int]:
+    """Bumps the user's memories version and drops the stored snapshot, for changes made in bulk."""
+    args = [_memory_version_seed(), _MEMORY_VERSION_TTL]
+    return int(_reset_memory_snapshot_script(keys=_memory_snapshot_keys(uid), args=args))
 
 
 # ******************************************************
@@ -169,35 +282,140 @@ def set_app_money_made_cache(app_id: str, money: dict):
     r.set(f'apps:{app_id}:money', json.dumps(money, default=str), ex=60 * 10)  # 10 minutes
 
 
-def set_app_review_cache(app_id: str, uid: str, data: dict):
+# Reviews live in a hash per app (uid -> review JSON) next to a rating aggregate hash
+# (count, sum, h1..h5 histogram). Both are updated together by one script, so catalog builds
+# read ratings without loading or scoring individual reviews.
+_APP_REVIEWS_MIGRATED_KEY = 'plugins:reviews:migrated'
+_UPSERT_APP_REVIEW_LUA = """
+local reviews_key = KEYS[1]
+local rating_key = KEYS[2]
+local uid = ARGV[1]
+local review = ARGV[2]
+local score = tonumber(ARGV[3])
+local keep_existing = ARGV[4] == '1'
+
+local function bucket(value)
+    return 'h' .. math.max(1, math.min(5, math.floor(value + 0.5)))
+end
+
+local old = redis.call('HGET', reviews_key, uid)
+if old and keep_existing then
+    return 0
+end
+if old then
+    local old_score = tonumber(cjson.decode(old)['score'])
+    if old_score then
+        redis.call('HINCRBY', rating_key, 'count', -1)
+        redis.call('HINCRBYFLOAT', rating_key, 'sum', -old_score)
+        redis.call('HINCRBY', rating_key, bucket(old_score), -1)
+    end
+end
+redis.call('HSET', reviews_key, uid, review)
+if score then
+    redis.call('HINCRBY', rating_key, 'count', 1)
+    redis.call('HINCRBYFLOAT', rating_key, 'sum', score)
+    redis.call('HINCRBY', rating_key, bucket(score), 1)
+end
+return 1
+"""
+_upsert_app_review_script = r.register_script(_UPSERT_APP_REVIEW_LUA)
+
+# uid rename keeps the aggregate untouched
+_MOVE_APP_REVIEW_LUA = """
+local review = redis.call('HGET', KEYS[1], ARGV[1])
+if not review then
+    return 0
+end
+local data = cjson.decode(review)
+data['uid'] = ARGV[2]
+redis.call('HDEL', KEYS[1], ARGV[1])
+redis.call('HSET', KEYS[1], ARGV[2], cjson.encode(data))
+return 1
+"""
+_move_app_review_script = r.register_script(_MOVE_APP_REVIEW_LUA)
+
+_app_reviews_migrated = False
+
+
+def _app_reviews_key(app_id: str) -> str:
+    return f'plugins:{app_id}:reviews_v2'
+
+
+def _app_rating_key(app_id: str) -> str:
+    return f'plugins:{app_id}:rating'
+
+
+def _legacy_app_reviews(app_id: str) -> dict:
+    # legacy storage: str(dict) of uid -> review, parsed without eval
     reviews = r.get(f'plugins:{app_id}:reviews')
     if not reviews:
-        reviews = {}
-    else:
-        reviews = eval(reviews)
-    reviews[uid] = data
-    r.set(f'plugins:{app_id}:reviews', str(reviews))
+        return {}
+    return ast.literal_eval(reviews.decode())
+
+
+def _is_app_reviews_migrated() -> bool:
+    global _app_reviews_migrated
+    if not _app_reviews_migrated:
+        _app_reviews_migrated = bool(r.exists(_APP_REVIEWS_MIGRATED_KEY))
+    return _app_reviews_migrated
+
+
+def _upsert_app_review(app_id: str, uid: str, data: dict, pipe=None, keep_existing: bool = False):
+    score = data.get('score')
+    _upsert_app_review_script(
+        keys=[_app_reviews_key(app_id), _app_rating_key(app_id)],
+        args=[uid, json.dumps(data, default=str), '' if score is None else score, '1' if keep_existing else '0'],
+        client=pipe,
+    )
+
+
+def _copy_legacy_app_reviews(app_id: str, reviews: dict, pipe=None):
+    # only the users without a review in the hash, theirs is newer
+    for uid, review in reviews.items():
+        _upsert_app_review(app_id, uid, review, pipe, keep_existing=True)
+
+
+def migrate_app_reviews_to_hashes():
+    """Copies the legacy `plugins:{app_id}:reviews` strings into the review hashes and rating aggregates."""
+    migrated = 0
+    for key in r.scan_iter('plugins:*:reviews'):
+        app_id = key.decode().split(':')[1]
+        pipe = r.pipeline()
+        _copy_legacy_app_reviews(app_id, _legacy_app_reviews(app_id), pipe)
+        pipe.execute()
+        migrated += 1
+    r.set(_APP_REVIEWS_MIGRATED_KEY, '1')
+    return migrated
+
+
+def set_app_review_cache(app_id: str, uid: str, data: dict):
+    if not _is_app_reviews_migrated() and not r.exists(_app_reviews_key(app_id)):
+        _copy_legacy_app_reviews(app_id, _legacy_app_reviews(app_id))
+    _upsert_app_review(app_id, uid, data)
 
 
 def get_specific_user_review(app_id: str, uid: str) -> dict:
-    reviews = r.get(f'plugins:{app_id}:reviews')
-    if not reviews:
+    if not _is_app_reviews_migrated():
+        return get_app_reviews(app_id).get(uid, {})
+    review = r.hget(_app_reviews_key(app_id), uid)
+    if not review:
         return {}
-    reviews = eval(reviews)
-    return reviews.get(uid, {})
+    return json.loads(review)
 
 
 def migrate_user_apps_reviews(prev_uid: str, new_uid: str):
+    for key in r.scan_iter(f'plugins:*:reviews_v2'):
+        _move_app_review_script(keys=[key], args=[prev_uid, new_uid])
+    if _is_app_reviews_migrated():
+        return
+    # until then, apps without a hash are read from the legacy string and copied from it later
     for key in r.scan_iter(f'plugins:*:reviews'):
         app_id = key.decode().split(':')[1]
-        reviews = r.get(key)
-        if not reviews:
-            continue
-        reviews = eval(reviews)
+        reviews = _legacy_app_reviews(app_id)
         if prev_uid in reviews:
             reviews[new_uid] = reviews.pop(prev_uid)
             reviews[new_uid]['uid'] = new_uid
-            r.set(f'plugins:{app_id}:reviews', str(reviews))
+            r.set(key, str(reviews))
 
 
 def set_user_paid_app(app_id: str, uid: str, ttl: int):
@@ -240,21 +458,86 @@ def get_enabled_apps(uid: str):
 
 
 def get_app_reviews(app_id: str) -> dict:
-    reviews = r.get(f'plugins:{app_id}:reviews')
-    if not reviews:
-        return {}
-    return eval(reviews)
+    reviews = r.hgetall(_app_reviews_key(app_id))
+    if not reviews and not _is_app_reviews_migrated():
+        return _legacy_app_reviews(app_id)
+    return {uid.decode(): json.loads(review) for uid, review in reviews.items()}
 
 
 def get_apps_reviews(app_ids: list) -> dict:
     if not app_ids:
         return {}
 
-    keys = [f'plugins:{app_id}:reviews' for app_id in app_ids]
-    reviews = r.mget(keys)
-    if reviews is None:
+    # until the migration ran, an app's hash only exists once it got a review, the legacy string is read otherwise
+    migrated = _is_app_reviews_migrated()
+    pipe = r.pipeline(transaction=False)
+    for app_id in app_ids:
+        pipe.hgetall(_app_reviews_key(app_id))
+        if not migrated:
+            pipe.get(f'plugins:{app_id}:reviews')
+    results = pipe.execute()
+    if migrated:
+        results = [(reviews, None) for reviews in results]
+    else:
+        results = zip(results[::2], results[1::2])
+
+    apps_reviews = {}
+    for app_id, (reviews, legacy) in zip(app_ids, results):
+        if reviews or not legacy:
+            apps_reviews[app_id] = {uid.decode(): json.loads(review) for uid, review in reviews.items()}
+        else:
+            apps_reviews[app_id] = ast.literal_eval(legacy.decode())
+    return apps_reviews
+
+
+def _rating_summary_from_reviews(reviews: dict) -> dict:
+    scores = [review['score'] for review in reviews.values() if review.get('score') is not None]
+    histogram = [0] * 5
+    for score in scores:
+        histogram[max(1, min(5, int(score + 0.5))) - 1] += 1
+    total = float(sum(scores))
+    return {
+        'count': len(scores),
+        'sum': total,
+        'avg': total / len(scores) if scores else None,
+        'histogram': histogram,
+    }
+
+
+def get_apps_rating_summaries(app_ids: list) -> dict:
+    """Rating count, sum, avg and 1-5 histogram for every app, in a single pipelined round trip."""
+    if not app_ids:
         return {}
-    return {app_id: eval(review) if review else {} for app_id, review in zip(app_ids, reviews)}
+
+    # until the migration ran, the ratings of the apps without a review hash are computed from the legacy string
+    migrated = _is_app_reviews_migrated()
+    fields = ['count', 'sum', 'h1', 'h2', 'h3', 'h4', 'h5']
+    pipe = r.pipeline(transaction=False)
+    for app_id in app_ids:
+        pipe.hmget(_app_rating_key(app_id), fields)
+        if not migrated:
+            pipe.exists(_app_reviews_key(app_id))
+            pipe.get(f'plugins:{app_id}:reviews')
+    results = pipe.execute()
+    if migrated:
+        results = [(values, True, None) for values in results]
+    else:
+        results = zip(results[::3], results[1::3], results[2::3])
+
+    summaries = {}
+    for app_id, (values, has_hash, legacy) in zip(app_ids, results):
+        if not has_hash and legacy:
+            summaries[app_id] = _rating_summary_from_reviews(ast.literal_eval(legacy.decode()))
+            continue
+        count = int(values[0] or 0)
+        total = float(values[1] or 0)
+        summaries[app_id] = {
+            'count': count,
+            'sum': total,
+            'avg': total / count if count else None,
+            'histogram': [int(v or 0) for v in values[2:]],
+        }
+    return summaries
 
 
 def set_app_installs_count(app_id: str, count: int):
@@ -686,3 +969,43 @@ def remove_conversation_summary_app_id(app_id: str) -> bool:
     """Remove an app ID from the conversation summary apps set"""
     result = r.srem(CONVERSATION_SUMMARY_APPS_KEY, app_id)
     return result > 0
+
+
+# ******************************************************
+# ******************* RATE LIMITING ********************
+# ******************************************************
+
+# Sliding window log: one sorted-set member per accepted request, scored by its time in ms.
+# Trim, count and add run atomically so every worker shares the same window, timed by the Redis
+# clock so workers with skewed clocks don't trim each other's requests early or late.
+_SLIDING_WINDOW_LUA = """
+local key = KEYS[1]
+local time = redis.call('TIME')
+local now = tonumber(time[1]) * 1000 + math.floor(tonumber(time[2]) / 1000)
+local window = tonumber(ARGV[1])
+local limit = tonumber(ARGV[2])
+local member = ARGV[3]
+redis.call('ZREMRANGEBYSCORE', key, 0, now - window)
+local count = redis.call('ZCARD', key)
+if count >= limit then
+    local oldest = redis.call('ZRANGE', key, 0, 0, 'WITHSCORES')
+    local retry_after = window
+    if oldest[2] then
+        retry_after = tonumber(oldest[2]) + window - now
+    end
+    return {0, 0, retry_after}
+end
+redis.call('ZADD', key, now, member)
+redis.call('PEXPIRE', key, window)
+return {1, limit - count - 1, 0}
+"""
+_sliding_window_script = r.register_script(_SLIDING_WINDOW_LUA)
+
+
+@try_catch_decorator
+def check_sliding_window_rate_limit(key: str, limit: int, window_seconds: int, request_id: str):
+    """Returns (allowed, remaining, retry_after_ms), None if Redis is unavailable."""
+    allowed, remaining, retry_after = _sliding_window_script(
+        keys=[key], args=[window_seconds * 1000, limit, request_id]
+    )
+    return bool(allowed), int(remaining), int(retry_after)
@@ -0,0 +1,148 @@
+import ast
+import asyncio
+import json
+import os
+import threading
+from typing import Dict, List, Optional, Tuple, Union
+
+import redis.asyncio as aioredis
+
+from database.redis_db import generic_cache_key
+
+# asyncio counterparts of the `database.redis_db` helpers that are called from the event loop (websocket handlers,
+# async routers, chat streaming). Same keys and return values as the sync versions, so both can be mixed freely.
+
+# A redis.asyncio client and its connections belong to the event loop they were created on, so each loop gets its own:
+# the server's, and the short-lived ones of `asyncio.run` (e.g. agentic chat streaming), which should `close()` theirs
+# before they end. Clients of loops that closed anyway are dropped on the next lookup.
+_clients: Dict[asyncio.AbstractEventLoop, aioredis.Redis] = {}
+_clients_lock = threading.Lock()
+
+
+def _new_client() -> aioredis.Redis:
+    return aioredis.Redis(
+        host=os.getenv('REDIS_DB_HOST'),
+        port=int(os.getenv('REDIS_DB_PORT')) if os.getenv('REDIS_DB_PORT') is not None else 6379,
+        username='default',
+        password=os.getenv('REDIS_DB_PASSWORD'),
+        health_check_interval=30,
+    )
+
+
+def _client() -> aioredis.Redis:
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None:
+        with _clients_lock:
+            for closed in [other for other in _clients if other.is_closed()]:
+                del _clients[closed]
+            client = _clients.setdefault(loop, _new_client())
+    return client
+
+
+def try_catch_decorator(func):
+    async def wrapper(*args, **kwargs):
+        try:
+            return await func(*args, **kwargs)
+        except Exception as e:
+            print(f'Error calling {func.__name__}', e)
+            return None
+
+    return wrapper
+
+
+async def close():
+    """Closes the running loop's client."""
+    client = _clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
+
+
+# ******************************************************
+# ******************* GENERIC CACHE ********************
+# ******************************************************
+
+
+@try_catch_decorator
+async def get_generic_cache(path: str):
+    data = await _client().get(generic_cache_key(path))
+    return json.loads(data) if data else None
+
+
+@try_catch_decorator
+async def set_generic_cache(path: str, data: Union[dict, list], ttl: int = None):
+    await _client().set(generic_cache_key(path), json.dumps(data, default=str), ex=ttl)
+
+
+@try_catch_decorator
+async def delete_generic_cache(path: str):
+    await _client().delete(generic_cache_key(path))
+
+
+# ******************************************************
+# *********************** APPS *************************
+# ******************************************************
+
+
+async def get_enabled_apps(uid: str) -> List[str]:
+    val = await _client().smembers(f'users:{uid}:enabled_plugins')
+    if not val:
+        return []
+    return [x.decode() for x in val]
+
+
+async def get_apps_installs_count(app_ids: list) -> dict:
+    if not app_ids:
+        return {}
+
+    counts = await _client().mget([f'plugins:{app_id}:installs' for app_id in app_ids])
+    if counts is None:
+        return {}
+    return {app_id: int(count) if count else 0 for app_id, count in zip(app_ids, counts)}
+
+
+# ******************************************************
+# *********************** USERS ************************
+# ******************************************************
+
+
+async def get_cached_user_geolocation(uid: str):
+    geolocation = await _client().get(f'users:{uid}:geolocation')
+    if not geolocation:
+        return None
+    return ast.literal_eval(geolocation.decode())
+
+
+async def set_in_progress_conversation_id(uid: str, conversation_id: str, ttl: int = 150):
+    await _client().set(f'users:{uid}:in_progress_memory_id', conversation_id, ex=ttl)
+
+
+async def get_in_progress_conversation_id(uid: str) -> str:
+    conversation_id = await _client().get(f'users:{uid}:in_progress_memory_id')
+    if not conversation_id:
+        return ''
+    return conversation_id.decode()
+
+
+async def user_webhook_status_db(uid: str, wtype: str):
+    status = await _client().get(f'users:{uid}:developer:webhook_status:{wtype}')
+    if status is None:
+        return None
+    return status.decode() == str(True).lower()
+
+
+async def get_user_webhook_db(uid: str, wtype: str) -> str:
+    url = await _client().get(f'users:{uid}:developer:webhook:{wtype}')
+    if not url:
+        return ''
+    return url.decode()
+
+
+async def get_user_webhook_with_status(uid: str, wtype: str) -> Tuple[Optional[bool], str]:
+    """Webhook status and url in one round trip, `(None, '')` when the user never configured it."""
+    async with _client().pipeline(transaction=False) as pipe:
+        pipe.get(f'users:{uid}:developer:webhook_status:{wtype}')
+        pipe.get(f'users:{uid}:developer:webhook:{wtype}')
+        status, url = await pipe.execute()
+    toggled = None if status is None else status.decode() == str(True).lower()
+    return toggled, url.decode() if url else ''
@@ -101,11 +101,23 @@ def delete_person(uid: str, person_id: str):
 
 
 def delete_user_data(uid: str):
+    # both import this module (database.conversations through utils.other.storage)
+    import database.conversations as conversations_db
+    import database.memories as memories_db
+
     user_ref = db.collection('users').document(uid)
     if not user_ref.get().exists:
         return {'status': 'error', 'message': 'User not found'}
 
-    subcollections_to_delete = ['conversations', 'messages', 'chat_sessions', 'people', 'memories', 'files']
+    subcollections_to_delete = [
+        'conversations',
+        conversations_db.digests_collection,
+        'messages',
+        'chat_sessions',
+        'people',
+        'memories',
+        'files',
+    ]
     batch_size = 450
 
     for cname in subcollections_to_delete:
@@ -131,6 +143,9 @@ def delete_user_data(uid: str):
                 print(f"Processed all documents in {collection_ref.path}")
                 break
 
+    # the memories were deleted under the snapshot's feet
+    memories_db.invalidate_memories_snapshot(uid)
+
     # delete the user document itself
     print(f"Deleting user document: {uid}")
     user_ref.delete()
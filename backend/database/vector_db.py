@@ -1,20 +1,43 @@
 import json
 import os
-from collections import defaultdict
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone, timedelta
-from typing import List
+from typing import Dict, List
 
-from pinecone import Pinecone
+import numpy as np
 
 from models.conversation import Conversation
-from utils.llm.clients import embeddings
+from utils.llm.clients import embedding_service
+from utils.other.lazy import Lazy
+
+
+def _create_index():
+    from pinecone import Pinecone
 
-if os.getenv('PINECONE_API_KEY') is not None:
     pc = Pinecone(api_key=os.getenv('PINECONE_API_KEY', ''))
-    index = pc.Index(os.getenv('PINECONE_INDEX_NAME', ''))
+    return pc.Index(os.getenv('PINECONE_INDEX_NAME', ''))
+
+
+def _create_local_index():
+    from database.local_vector_index import LocalVectorIndex
+
+    return LocalVectorIndex(os.getenv('LOCAL_VECTOR_INDEX_PATH', '_vector_index'))
+
+
+# every function below goes through `index`, Pinecone or the embedded index (same `Index` methods)
+if os.getenv('VECTOR_STORE') == 'local':
+    index = Lazy('local_vector_index', _create_local_index)
+elif os.getenv('PINECONE_API_KEY') is not None:
+    index = Lazy('pinecone', _create_index)
 else:
     index = None
 
+# shared by batched queries, instead of a thread per query
+_query_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv('VECTOR_QUERY_WORKERS', '16')), thread_name_prefix='vector-query'
+)
+
 
 def _get_data(uid: str, conversation_id: str, vector: List[float]):
     return {
@@ -57,11 +80,60 @@ def query_vectors(query: str, uid: str, starts_at: int = None, ends_at: int = No
     if starts_at is not None:
         filter_data['created_at'] = {'$gte': starts_at, '$lte': ends_at}
 
-    xq = embeddings.embed_query(query)
+    xq = embedding_service.embed(query)
     xc = index.query(vector=xq, top_k=k, include_metadata=False, filter=filter_data, namespace="ns1")
     return [item['id'].replace(f'{uid}-', '') for item in xc['matches']]
 
 
+def query_vectors_many(
+    queries: List[str], uid: str, starts_at: int = None, ends_at: int = None, k: int = 5
+) -> List[List[str]]:
+    """`query_vectors` for each query, in order: the queries are embedded in one batch, then queried concurrently."""
+    if not queries:
+        return []
+    filter_data = {'uid': uid}
+    if starts_at is not None:
+        filter_data['created_at'] = {'$gte': starts_at, '$lte': ends_at}
+
+    def query(xq: List[float]) -> List[str]:
+        xc = index.query(vector=xq, top_k=k, include_metadata=False, filter=filter_data, namespace="ns1")
+        return [item['id'].replace(f'{uid}-', '') for item in xc['matches']]
+
+    return list(_query_executor.map(query, embedding_service.embed_many(queries)))
+
+
+def _metadata_overlap_scores(matches: List[dict], terms_by_field: Dict[str, List[str]]) -> np.ndarray:
+    """
+    Per match, how many of the query terms its metadata lists contain (a term asked for twice counts twice).
+
+    Matches are encoded as a sparse (match, term) incidence list in one pass over their metadata, the weighted
+    counting happens in numpy.
+    """
+    vocab: Dict[str, Dict[str, int]] = {}
+    weights: List[int] = []
+    for field, terms in terms_by_field.items():
+        field_vocab = vocab.setdefault(field, {})
+        for term, count in Counter(terms).items():
+            field_vocab[term] = len(weights)
+            weights.append(count)
+    if not weights:
+        return np.zeros(len(matches))
+
+    rows, columns = [], []
+    for row, match in enumerate(matches):
+        metadata = match['metadata'] or {}
+        for field, field_vocab in vocab.items():
+            # set intersection, so a term repeated in the match's metadata still counts once
+            for value in field_vocab.keys() & (metadata.get(field) or ()):
+                rows.append(row)
+                columns.append(field_vocab[value])
+    if not rows:
+        return np.zeros(len(matches))
+
+    term_weights = np.asarray(weights, dtype=np.float64)[np.asarray(columns, dtype=np.int64)]
+    return np.bincount(np.asarray(rows, dtype=np.int64), weights=term_weights, minlength=len(matches))
+
+
 def query_vectors_by_metadata(
     uid: str,
     vector: List[float],
@@ -94,8 +166,14 @@ def query_vectors_by_metadata(
             {'created_at': {'$gte': int(dates_filter[0].timestamp()), '$lte': int(dates_filter[1].timestamp())}}
         )
 
+    terms_by_field = {'topics': topics, 'entities': entities, 'people': people}
+    terms_by_field = {field: terms for field, terms in terms_by_field.items() if terms}
+    # without terms to rerank on, the order is the similarity order: fetch only `limit` ids, no metadata
+    rerank = bool(terms_by_field)
+    top_k = 1000 if rerank else limit
+
     xc = index.query(
-        vector=vector, filter=filter_data, namespace="ns1", include_values=False, include_metadata=True, top_k=1000
+        vector=vector, filter=filter_data, namespace="ns1", include_values=False, include_metadata=rerank, top_k=top_k
     )
     if not xc['matches']:
         if len(filter_data['$and']) == 3:
@@ -106,29 +184,21 @@ def query_vectors_by_metadata(
                 filter=filter_data,
                 namespace="ns1",
                 include_values=False,
-                include_metadata=True,
+                include_metadata=rerank,
                 top_k=20,
             )
         else:
             return []
 
-    conversation_id_to_matches = defaultdict(int)
-    for item in xc['matches']:
-        metadata = item['metadata']
-        conversation_id = metadata['memory_id']
-        for topic in topics:
-            if topic in metadata.get('topics', []):
-                conversation_id_to_matches[conversation_id] += 1
-        for entity in entities:
-            if entity in metadata.get('entities', []):
-                conversation_id_to_matches[conversation_id] += 1
-        for person in people:
-            if person in metadata.get('people_mentioned', []):
-                conversation_id_to_matches[conversation_id] += 1
-
-    conversations_id = [item['id'].replace(f'{uid}-', '') for item in xc['matches']]
-    conversations_id.sort(key=lambda x: conversation_id_to_matches[x], reverse=True)
-    return conversations_id[:limit] if len(conversations_id) > limit else conversations_id
+    matches = xc['matches']
+    conversations_id = [item['id'].replace(f'{uid}-', '') for item in matches]
+    if not rerank or not matches:
+        return conversations_id[:limit]
+
+    # most overlapping first, ties keep the similarity order
+    scores = _metadata_overlap_scores(matches, terms_by_field)
+    order = np.argsort(-scores, kind='stable')[:limit]
+    return [conversations_id[i] for i in order]
 
 
 def delete_vector(conversation_id: str):
@@ -1,9 +1,9 @@
 from fastapi import Depends, HTTPException, Security
 from fastapi.security import APIKeyHeader, HTTPAuthorizationCredentials, HTTPBearer
-from firebase_admin import auth
 
 import database.mcp_api_key as mcp_api_key_db
 import database.dev_api_key as dev_api_key_db
+from utils.other.endpoints import verify_id_token
 
 bearer_scheme = HTTPBearer()
 
@@ -15,7 +15,7 @@ async def get_current_user_id(
         raise HTTPException(status_code=401, detail="Not authenticated")
     try:
         id_token = credentials.credentials
-        decoded_token = auth.verify_id_token(id_token)
+        decoded_token = verify_id_token(id_token)
         return decoded_token["uid"]
     except Exception as e:
         print(f"Error verifying Firebase ID token: {e}")
@@ -1,3 +1,4 @@
+import asyncio
 import json
 import os
 
@@ -34,6 +35,9 @@ from routers import (
     updates,
 )
 
+from database import redis_db_async
+from utils.other import task_runner
+from utils.other.lazy import warm_up
 from utils.other.timeout import TimeoutMiddleware
 
 if os.environ.get('SERVICE_ACCOUNT_JSON'):
@@ -88,6 +92,28 @@ methods_timeout = {
 
 app.add_middleware(TimeoutMiddleware, methods_timeout=methods_timeout)
 
+
+@app.on_event('startup')
+def warm_up_resources():
+    # Heavy models and clients load on first use, WARM_UP_RESOURCES=all (or a comma separated list of names,
+    # e.g. silero_vad,pinecone) builds them while the container starts instead.
+    resources = os.environ.get('WARM_UP_RESOURCES', '').strip()
+    if not resources:
+        return
+    warm_up(None if resources == 'all' else [name.strip() for name in resources.split(',')])
+
+
+@app.on_event('shutdown')
+async def drain_background_tasks():
+    # post-conversation work already accepted finishes before the worker exits
+    await asyncio.to_thread(task_runner.drain_all)
+
+
+@app.on_event('shutdown')
+async def close_redis_connections():
+    await redis_db_async.close()
+
+
 modal_app = App(
     name='backend',
     secrets=[Secret.from_name("gcp-credentials"), Secret.from_name('envs')],
@@ -0,0 +1,21 @@
+import os
+import sys
+
+# Add project root to the Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from database import redis_db
+
+
+def main():
+    """
+    Copies app reviews from the legacy `plugins:{app_id}:reviews` strings into per-app review hashes
+    and rating aggregates. Safe to re-run: only users without a review in the hash are copied, so
+    reviews written since the deploy are kept. Until this has run, reads fall back to the legacy keys.
+    """
+    migrated = redis_db.migrate_app_reviews_to_hashes()
+    print(f'Migrated reviews for {migrated} apps')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,9 +1,11 @@
 import json
 import os
+import time
 from collections import defaultdict
 from typing import List, Optional
 
 import modal.gpu
+import numpy as np
 import torch
 from fastapi import File, UploadFile, Form
 from modal import App, web_endpoint, Secret, Image
@@ -11,7 +13,7 @@ from pydantic import BaseModel
 from pydub import AudioSegment
 from speechbrain.inference.speaker import SpeakerRecognition
 
-from utils.stt.speech_profile import get_speech_profile_expanded, get_people_with_speech_samples
+from utils.stt.speech_profile import get_reference_embeddings, score_against_references
 
 
 class TranscriptSegment(BaseModel):
@@ -33,50 +35,67 @@ model = SpeakerRecognition.from_hparams(
 )
 
 
-def sample_same_speaker_as_segment(sample_audio: str, segment: str) -> float:
-    try:
-        score, prediction = model.verify_files(sample_audio, segment)
-        if bool(prediction[0]):
-            return float(score[0])
-        return 0
-    except Exception as e:
-        print(e)
-        return 0
+# chunks per encode_batch call, bounds memory on long conversations
+EMBEDDING_BATCH_SIZE = 16
+
+
+def embed_file(path: str) -> np.ndarray:
+    signal = model.load_audio(path)
+    return model.encode_batch(signal.unsqueeze(0)).squeeze().cpu().numpy()
+
 
+def embed_chunks(chunks: List[np.ndarray]) -> np.ndarray:
+    embeddings = []
+    for i in range(0, len(chunks), EMBEDDING_BATCH_SIZE):
+        batch = chunks[i : i + EMBEDDING_BATCH_SIZE]
+        longest = max(len(c) for c in batch)
+        wavs = torch.zeros(len(batch), longest)
+        for j, chunk in enumerate(batch):
+            wavs[j, : len(chunk)] = torch.from_numpy(chunk)
+        wav_lens = torch.tensor([len(c) / longest for c in batch])
+        with torch.no_grad():
+            embeddings.append(model.encode_batch(wavs, wav_lens).squeeze(1).cpu().numpy())
+    return np.concatenate(embeddings)
 
-def classify_segments(audio_file_path: str, profile_path: str, people: List[dict], segments: List[TranscriptSegment]):
+
+def classify_segments(
+    audio_file_path: str, labels: List[str], references: np.ndarray, segments: List[TranscriptSegment]
+):
     matches = [{'is_user': False, 'person_id': None}] * len(segments)
-    if not profile_path:
+    if references is None or not labels:
         return matches
 
     # TODO: do per segment cleaning later. 1 by 1, maybe running pyannote VAD here (gpu), or using silero
     # cleaning start, end doesn't do anything, cause segments are already pointing that
 
-    print('Duration:', AudioSegment.from_wav(audio_file_path).duration_seconds)
+    # decode once, 16khz mono float32, same as the model's own audio loading
+    aseg = AudioSegment.from_wav(audio_file_path).set_frame_rate(16000).set_channels(1).set_sample_width(2)
+    print('Duration:', aseg.duration_seconds)
+    samples = np.array(aseg.get_array_of_samples(), dtype=np.float32) / 32768.0
 
-    file_name = os.path.basename(audio_file_path)
+    chunks, owners = [], []
     for i, segment in enumerate(segments):
-
         duration = segment.end - segment.start
-        by_chunk_matches = defaultdict(float)
-
         for j in range(0, int(duration), 30):
             start = segment.start + j
             end = min(segment.end, start + 30)
+            chunk = samples[int(start * 16000) : int(end * 16000)]
+            if len(chunk) == 0:
+                continue
+            chunks.append(chunk)
+            owners.append(i)
 
-            temporal_file = f"_temp/{file_name}_{start}_{end}.wav"
-            AudioSegment.from_wav(audio_file_path)[start * 1000 : end * 1000].export(temporal_file, format="wav")
+    if not chunks:
+        return matches
 
-            by_chunk_matches['user'] += sample_same_speaker_as_segment(temporal_file, profile_path)
-            for person in people:
-                by_chunk_matches[person['id']] += sample_same_speaker_as_segment(temporal_file, person['path'])
+    scores = score_against_references(embed_chunks(chunks), references)
 
-            os.remove(temporal_file)
+    by_segment = defaultdict(lambda: np.zeros(len(labels)))
+    for owner, chunk_scores in zip(owners, scores):
+        by_segment[owner] += chunk_scores
 
-        if not by_chunk_matches:
-            continue
-        print(by_chunk_matches)
-        max_match = max(by_chunk_matches, key=by_chunk_matches.get)
+    for i, totals in by_segment.items():
+        max_match = labels[int(np.argmax(totals))]
         matches[i] = {'is_user': max_match == 'user', 'person_id': None if max_match == 'user' else max_match}
 
     return matches
@@ -86,6 +105,7 @@ app = App(name='speech_profile')
 image = (
     Image.debian_slim()
     .apt_install('ffmpeg')
+    .pip_install("numpy")
     .pip_install("torch")
     .pip_install("torchaudio")
     .pip_install("torchvision")
@@ -116,10 +136,11 @@ def endpoint(uid: str, audio_file: UploadFile = File(...), segments: str = Form(
 
     :return: List of ResponseItem with is_user and person_id.
     """
-    profile_path = get_speech_profile_expanded(uid)
     default = [{'is_user': False}] * len(json.loads(segments))
 
-    if not profile_path:
+    started = time.time()
+    labels, references = get_reference_embeddings(uid, embed_file)
+    if references is None:
         return default
 
     with open(audio_file.filename, 'wb') as f:
@@ -128,14 +149,14 @@ def endpoint(uid: str, audio_file: UploadFile = File(...), segments: str = Form(
     segments_data = json.loads(segments)
     transcript_segments = [TranscriptSegment(**segment) for segment in segments_data]
 
-    # people = get_people_with_speech_samples(uid)
-    people = []
     try:
-        result = classify_segments(audio_file.filename, profile_path, people, transcript_segments)
-        # print(result)
+        result = classify_segments(audio_file.filename, labels, references, transcript_segments)
+        print(
+            'classify_segments',
+            f'segments={len(transcript_segments)} people={len(labels) - 1} took={time.time() - started:.3f}s',
+        )
         return result
     except:
         return default
     finally:
-        os.remove(profile_path)
         os.remove(audio_file.filename)
@@ -409,6 +409,62 @@ class Conversation(BaseModel):
         return conversation_dict
 
 
+class ConversationDigest(BaseModel):
+    """What LLM tools need from a processed conversation, without its transcript."""
+
+    id: str
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    category: CategoryEnum = CategoryEnum.other
+    emoji: str = '🧠'
+    title: str = ''
+    overview: str = ''
+    people: List[str] = []
+    entities: List[str] = []
+    action_items: List[str] = []
+    events: List[str] = []
+    tokens: int = 0
+
+    def as_context(self) -> str:
+        """Same layout as `Conversation.conversations_to_string`, without the numbered header."""
+
+        def _format(dt: datetime) -> str:
+            return dt.astimezone(timezone.utc).strftime("%d %b %Y at %H:%M") + " UTC"
+
+        result = f"{_format(self.created_at)} ({str(self.category.value).capitalize()})\n"
+        if self.started_at:
+            result += f"Started: {_format(self.started_at)}\n"
+        if self.finished_at:
+            result += f"Finished: {_format(self.finished_at)}\n"
+        result += f"{self.title.capitalize()}\n{self.overview.capitalize()}\n"
+        if self.people:
+            result += f"People: {', '.join(self.people)}\n"
+        if self.entities:
+            result += f"Entities: {', '.join(self.entities)}\n"
+        if self.action_items:
+            result += "Action Items:\n" + ''.join(f"- {item}\n" for item in self.action_items)
+        if self.events:
+            result += "Events:\n" + ''.join(f"- {event}\n" for event in self.events)
+        return result.strip()
+
+    def as_conversation_dict(self) -> dict:
+        """Lightweight conversation dict, as tools collect for citations."""
+        return {
+            'id': self.id,
+            'created_at': self.created_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+            'structured': {
+                'title': self.title,
+                'overview': self.overview,
+                'emoji': self.emoji,
+                'category': self.category,
+                'action_items': [{'description': item} for item in self.action_items],
+            },
+        }
+
+
 class CreateConversation(BaseModel):
     started_at: datetime
     finished_at: datetime
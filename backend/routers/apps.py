@@ -8,7 +8,11 @@ import requests
 from ulid import ULID
 from fastapi import APIRouter, Depends, Form, UploadFile, File, HTTPException, Header, Query
 
-from utils.apps import fetch_app_chat_tools_from_manifest
+from utils.apps import (
+    fetch_app_chat_tools_from_manifest,
+    invalidate_app_chat_tools_definition,
+    resolve_chat_tool_endpoints,
+)
 
 from database.apps import (
     change_app_approval_status,
@@ -32,10 +36,8 @@ from database.apps import (
     search_apps_db,
 )
 from database.auth import get_user_from_uid
+from database import cache
 from database.redis_db import (
-    delete_generic_cache,
-    get_generic_cache,
-    set_generic_cache,
     get_specific_user_review,
     increase_app_installs_count,
     decrease_app_installs_count,
@@ -49,13 +51,13 @@ from database.redis_db import (
     add_conversation_summary_app_id,
     remove_conversation_summary_app_id,
     get_apps_installs_count,
-    get_apps_reviews,
+    get_apps_rating_summaries,
 )
 from utils.apps import (
     get_available_apps,
     get_available_app_by_id,
-    get_approved_available_apps,
     get_available_app_by_id_with_reviews,
+    apply_rating_summary,
     set_app_review,
     get_app_reviews,
     add_tester,
@@ -70,18 +72,10 @@ from utils.apps import (
     get_persona_by_uid,
     increment_username,
     generate_api_key,
-    get_popular_apps,
-    paginate_apps,
     build_pagination_metadata,
-    get_capabilities_list,
     normalize_app_numeric_fields,
-    filter_apps_by_capability,
-    sort_apps_by_installs,
-    group_apps_by_capability,
-    build_capability_groups_response,
-    group_capability_apps_by_category,
-    build_capability_category_groups_response,
 )
+from utils import app_catalog, app_search
 
 from database.memories import migrate_memories
 
@@ -133,7 +127,7 @@ def get_apps(uid: str = Depends(auth.get_current_user_uid), include_reviews: boo
 
 
 @router.get('/v2/apps', tags=['v2'])
-def get_apps_v2(
+async def get_apps_v2(
     capability: str | None = Query(default=None, description='Filter by capability id'),
     offset: int = Query(default=0, ge=0),
     limit: int = Query(default=20, ge=1, le=50),
@@ -148,61 +142,25 @@ def get_apps_v2(
     - Always excludes persona type apps.
     """
 
-    capabilities = get_capabilities_list()
+    snapshot = await app_catalog.aget_snapshot(include_reviews)
 
     if capability:
-        cache_key = f"apps:capability:v2:{capability}:offset={offset}:limit={limit}:reviews={int(include_reviews)}"
-    else:
-        cache_key = f"apps:capability_groups:v2:offset={offset}:limit={limit}:reviews={int(include_reviews)}"
+        return snapshot.capability_page(capability, offset, limit)
 
-    cached = get_generic_cache(cache_key)
-    if cached:
-        return cached
-
-    # Fetch and filter approved public apps
-    apps = get_approved_available_apps(include_reviews=include_reviews)
-    approved_apps = [a for a in apps if a.approved and (a.private is None or not a.private)]
-    # Always exclude persona type apps
-    approved_apps = [a for a in approved_apps if not a.is_a_persona()]
-
-    # Capability-specific response
-    if capability:
-        filtered_apps = filter_apps_by_capability(approved_apps, capability)
-        sorted_apps = sort_apps_by_installs(filtered_apps)
-        page = paginate_apps(sorted_apps, offset, limit)
-
-        res = {
-            'data': [normalize_app_numeric_fields(app.model_dump(mode='json')) for app in page],
-            'pagination': build_pagination_metadata(len(sorted_apps), offset, limit, capability),
-            'capability': {
-                'id': capability,
-                'title': next(
-                    (c['title'] for c in capabilities if c['id'] == capability), capability.title().replace('_', ' ')
-                ),
-            },
-        }
-        set_generic_cache(cache_key, res, ttl=60 * 10)
-        return res
-
-    # Grouped response by capability
-    grouped_apps = group_apps_by_capability(approved_apps, capabilities)
-    groups = build_capability_groups_response(grouped_apps, capabilities, offset, limit)
-
-    res = {
+    groups = snapshot.capability_groups(offset, limit)
+    return {
         'groups': groups,
         'meta': {
-            'capabilities': capabilities,
+            'capabilities': snapshot.capabilities,
             'groupCount': len(groups),
             'limit': limit,
             'offset': offset,
         },
     }
-    set_generic_cache(cache_key, res, ttl=60 * 10)
-    return res
 
 
 @router.get('/v2/apps/capability/{capability_id}/grouped', tags=['v2'])
-def get_capability_apps_grouped_by_category(
+async def get_capability_apps_grouped_by_category(
     capability_id: str,
     include_reviews: bool = Query(default=True),
 ):
@@ -213,43 +171,16 @@ def get_capability_apps_grouped_by_category(
     - For others: Productivity & Tools, Personal & Lifestyle, Social & Entertainment
     """
 
-    cache_key = f"apps:capability:{capability_id}:grouped:reviews={int(include_reviews)}"
-
-    cached = get_generic_cache(cache_key)
-    if cached:
-        return cached
-
-    capabilities = get_capabilities_list()
-
-    # Fetch and filter approved public apps
-    apps = get_approved_available_apps(include_reviews=include_reviews)
-    approved_apps = [a for a in apps if a.approved and (a.private is None or not a.private)]
-    # Always exclude persona type apps
-    approved_apps = [a for a in approved_apps if not a.is_a_persona()]
-
-    # Filter apps by capability
-    filtered_apps = filter_apps_by_capability(approved_apps, capability_id)
-
-    # Group filtered apps by master category
-    grouped_apps = group_capability_apps_by_category(filtered_apps, capability_id)
-    groups = build_capability_category_groups_response(grouped_apps, capability_id)
-
-    res = {
+    snapshot = await app_catalog.aget_snapshot(include_reviews)
+    groups, total = snapshot.capability_category_groups(capability_id)
+    return {
         'groups': groups,
-        'capability': {
-            'id': capability_id,
-            'title': next(
-                (c['title'] for c in capabilities if c['id'] == capability_id),
-                capability_id.title().replace('_', ' '),
-            ),
-        },
+        'capability': {'id': capability_id, 'title': snapshot.capability_title(capability_id)},
         'meta': {
-            'totalApps': len(filtered_apps),
+            'totalApps': total,
             'groupCount': len(groups),
         },
     }
-    set_generic_cache(cache_key, res, ttl=60 * 10)
-    return res
 
 
 @router.get('/v2/apps/search', tags=['v2'])
@@ -272,74 +203,42 @@ def search_apps(
     Returns a flat list of apps matching the search and filter criteria.
     """
 
-    enabled_app_ids = None
-    if installed_apps:
-        enabled_app_ids = list(get_enabled_apps(uid))
-
-    apps_data = search_apps_db(
-        uid=uid,
-        category=category,
-        capability=capability,
-        my_apps=my_apps or False,
-        installed_apps=installed_apps or False,
-        enabled_app_ids=enabled_app_ids,
-    )
-
     user_enabled = set(get_enabled_apps(uid))
 
-    app_ids = [app['id'] for app in apps_data]
-    apps_installs = get_apps_installs_count(app_ids)
-    apps_reviews = get_apps_reviews(app_ids)
-
-    apps = []
-
-    for app_dict in apps_data:
-        app_dict['enabled'] = app_dict['id'] in user_enabled
-        app_dict['rejected'] = app_dict.get('approved') is False
-        app_dict['installs'] = apps_installs.get(app_dict['id'], 0)
-
-        # Calculate average from reviews
-        reviews = apps_reviews.get(app_dict['id'], {})
-        sorted_reviews = list(reviews.values())
-        rating_avg = sum([x['score'] for x in sorted_reviews]) / len(sorted_reviews) if reviews else None
-        app_dict['rating_avg'] = rating_avg
-        app_dict['rating_count'] = len(sorted_reviews)
-
-        apps.append(App(**app_dict))
-
-    # Always exclude persona type apps from results
-    filtered_apps = [app for app in apps if not app.is_a_persona()]
-
-    # Apply text search filter
-    if q and q.strip():
-        search_query = q.strip().lower()
-        filtered_apps = [app for app in filtered_apps if search_query in app.name.lower()]
-
-    # Apply rating filter
-    if rating is not None:
-        filtered_apps = [app for app in filtered_apps if (app.rating_avg or 0) >= rating]
-
-    # Apply sorting
-    if sort == 'rating_desc':
-        filtered_apps = sorted(filtered_apps, key=lambda a: (a.rating_avg or 0), reverse=True)
-    elif sort == 'rating_asc':
-        filtered_apps = sorted(filtered_apps, key=lambda a: (a.rating_avg or 0))
-    elif sort == 'name_asc':
-        filtered_apps = sorted(filtered_apps, key=lambda a: a.name.lower())
-    elif sort == 'name_desc':
-        filtered_apps = sorted(filtered_apps, key=lambda a: a.name.lower(), reverse=True)
-    elif sort == 'installs_desc':
-        filtered_apps = sorted(filtered_apps, key=lambda a: (a.installs or 0), reverse=True)
+    if not my_apps and not installed_apps:
+        # public catalog: served from the in-memory search index
+        page, total = app_search.search_public_apps(
+            q, category=category, capability=capability, min_rating=rating, sort=sort, offset=offset, limit=limit
+        )
+        page = [app.model_copy(update={'enabled': app.id in user_enabled}) for app in page]
     else:
-        # sort by installs when searching, otherwise by name
-        if q and q.strip():
-            filtered_apps = sorted(filtered_apps, key=lambda a: (a.installs or 0), reverse=True)
-        else:
-            filtered_apps = sorted(filtered_apps, key=lambda a: a.name.lower())
+        apps_data = search_apps_db(
+            uid=uid,
+            category=category,
+            capability=capability,
+            my_apps=my_apps or False,
+            installed_apps=installed_apps or False,
+            enabled_app_ids=list(user_enabled) if installed_apps else None,
+        )
+
+        app_ids = [app['id'] for app in apps_data]
+        apps_installs = get_apps_installs_count(app_ids)
+        apps_ratings = get_apps_rating_summaries(app_ids)
+
+        apps = []
+
+        for app_dict in apps_data:
+            app_dict['enabled'] = app_dict['id'] in user_enabled
+            app_dict['rejected'] = app_dict.get('approved') is False
+            app_dict['installs'] = apps_installs.get(app_dict['id'], 0)
+            apply_rating_summary(app_dict, apps_ratings.get(app_dict['id']))
+
+            apps.append(App(**app_dict))
 
-    # Paginate results
-    total = len(filtered_apps)
-    page = paginate_apps(filtered_apps, offset, limit)
+        # Always exclude persona type apps from results
+        index = app_search.AppSearchIndex()
+        index.sync(app for app in apps if not app.is_a_persona())
+        page, total = index.search(q, min_rating=rating, sort=sort, offset=offset, limit=limit)
 
     return {
         'data': [normalize_app_numeric_fields(app.model_dump()) for app in page],
@@ -358,14 +257,14 @@ def search_apps(
 
 @router.get('/v1/approved-apps', tags=['v1'], response_model=List[App])
 def get_approved_apps(include_reviews: bool = False):
-    apps = get_approved_available_apps(include_reviews=include_reviews)
+    apps = app_catalog.get_snapshot(include_reviews).approved_apps
     # Always exclude persona type apps
     return [app for app in apps if not app.is_a_persona()]
 
 
 @router.get('/v1/apps/popular', tags=['v1'], response_model=List[App])
 def get_popular_apps_endpoint(uid: str = Depends(auth.get_current_user_uid)):
-    apps = get_popular_apps()
+    apps = app_catalog.get_snapshot().popular_apps
     # Always exclude persona type apps
     return [app for app in apps if not app.is_a_persona()]
 
@@ -446,13 +345,9 @@ def create_app(app_data: str = Form(...), file: UploadFile = File(...), uid=Depe
             fetched_tools = fetch_app_chat_tools_from_manifest(manifest_url)
             if fetched_tools:
                 # Resolve relative endpoints to absolute URLs
-                base_url = external_integration.get('app_home_url', '').rstrip('/')
-                if base_url:
-                    for tool in fetched_tools:
-                        endpoint = tool.get('endpoint', '')
-                        if endpoint.startswith('/') and not endpoint.startswith('//'):
-                            tool['endpoint'] = f"{base_url}{endpoint}"
-                app_dict['chat_tools'] = fetched_tools
+                app_dict['chat_tools'] = resolve_chat_tool_endpoints(
+                    fetched_tools, external_integration.get('app_home_url')
+                )
 
     add_app_to_db(app_dict)
 
@@ -550,7 +445,8 @@ async def update_persona(
     update_app_in_db(update_app.model_dump(exclude_unset=True))
 
     if persona['approved'] and (persona['private'] is None or persona['private'] is False):
-        delete_generic_cache('get_public_approved_apps_data')
+        cache.invalidate('get_public_approved_apps_data')
+        app_catalog.invalidate()
     delete_app_cache_by_id(persona_id)
     return {'status': 'ok', 'app_id': persona_id, 'username': data['username']}
 
@@ -681,13 +577,9 @@ def update_app(
             fetched_tools = fetch_app_chat_tools_from_manifest(manifest_url)
             if fetched_tools:
                 # Resolve relative endpoints to absolute URLs
-                base_url = external_integration.get('app_home_url', '').rstrip('/')
-                if base_url:
-                    for tool in fetched_tools:
-                        endpoint = tool.get('endpoint', '')
-                        if endpoint.startswith('/') and not endpoint.startswith('//'):
-                            tool['endpoint'] = f"{base_url}{endpoint}"
-                update_dict['chat_tools'] = fetched_tools
+                update_dict['chat_tools'] = resolve_chat_tool_endpoints(
+                    fetched_tools, external_integration.get('app_home_url')
+                )
 
     update_app_in_db(update_dict)
 
@@ -702,8 +594,10 @@ def update_app(
     )
 
     if app['approved'] and (app['private'] is None or app['private'] is False):
-        delete_generic_cache('get_public_approved_apps_data')
+        cache.invalidate('get_public_approved_apps_data')
+        app_catalog.invalidate()
     delete_app_cache_by_id(app_id)
+    invalidate_app_chat_tools_definition(app_id)
     return {'status': 'ok'}
 
 
@@ -716,8 +610,10 @@ def delete_app(app_id: str, uid: str = Depends(auth.get_current_user_uid)):
         raise HTTPException(status_code=403, detail='You are not authorized to perform this action')
     delete_app_from_db(app_id)
     if app['approved']:
-        delete_generic_cache('get_public_approved_apps_data')
+        cache.invalidate('get_public_approved_apps_data')
+        app_catalog.invalidate()
     delete_app_cache_by_id(app_id)
+    invalidate_app_chat_tools_definition(app_id)
     return {'status': 'ok'}
 
 
@@ -1366,7 +1262,8 @@ def set_app_popular(app_id: str, value: bool = Query(...), secret_key: str = Hea
         raise HTTPException(status_code=403, detail='You are not authorized to perform this action')
     set_app_popular_db(app_id, value)
     delete_app_cache_by_id(app_id)
-    delete_generic_cache('get_popular_apps_data')
+    cache.invalidate('get_popular_apps_data')
+    app_catalog.invalidate()
     return {'status': 'ok'}
 
 
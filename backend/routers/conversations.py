@@ -11,11 +11,13 @@ from models.conversation import *
 from models.conversation import SearchRequest
 from models.other import Person
 
+from utils.conversations import digests
 from utils.conversations.process_conversation import process_conversation, retrieve_in_progress_conversation
 from utils.conversations.search import search_conversations
 from utils.llm.conversation_processing import generate_summary_with_prompt
 from utils.other import endpoints as auth
 from utils.other.storage import get_conversation_recording_if_exists
+from utils.retrieval import lexical
 from utils.app_integrations import trigger_external_integrations
 
 router = APIRouter()
@@ -111,8 +113,10 @@ def get_conversation_by_id(conversation_id: str, uid: str = Depends(auth.get_cur
 
 @router.patch("/v1/conversations/{conversation_id}/title", tags=['conversations'])
 def patch_conversation_title(conversation_id: str, title: str, uid: str = Depends(auth.get_current_user_uid)):
-    _get_valid_conversation_by_id(uid, conversation_id)
+    conversation = Conversation(**_get_valid_conversation_by_id(uid, conversation_id))
     conversations_db.update_conversation_title(uid, conversation_id, title)
+    conversation.structured.title = title
+    digests.refresh_digest(uid, conversation)
     return {'status': 'Ok'}
 
 
@@ -139,6 +143,7 @@ def delete_conversation(conversation_id: str, uid: str = Depends(auth.get_curren
     print('delete_conversation', conversation_id, uid)
     conversations_db.delete_conversation(uid, conversation_id)
     delete_vector(conversation_id)
+    lexical.remove_conversation(uid, conversation_id)
     return {"status": "Ok"}
 
 
@@ -161,6 +166,7 @@ def set_conversation_events_state(
         events[event_idx].created = data.values[i]
 
     conversations_db.update_conversation_events(uid, conversation_id, [event.dict() for event in events])
+    digests.refresh_digest(uid, conversation)
     return {"status": "Ok"}
 
 
@@ -196,6 +202,7 @@ def set_action_item_status(
     conversations_db.update_conversation_action_items(
         uid, conversation_id, [action_item.dict() for action_item in action_items]
     )
+    digests.refresh_digest(uid, conversation)
 
     # Mirror status updates to the standalone action_items collection
     try:
@@ -246,6 +253,7 @@ def update_action_item_description(
     conversations_db.update_conversation_action_items(
         uid, conversation_id, [action_item.dict() for action_item in action_items]
     )
+    digests.refresh_digest(uid, conversation)
 
     # Mirror description update in the standalone action_items collection
     try:
@@ -267,6 +275,8 @@ def delete_action_item(data: DeleteActionItemRequest, conversation_id: str, uid=
     conversations_db.update_conversation_action_items(
         uid, conversation_id, [action_item.dict() for action_item in updated_action_items]
     )
+    conversation.structured.action_items = updated_action_items
+    digests.refresh_digest(uid, conversation)
 
     # Mirror deletion in the standalone action_items collection
     try:
@@ -7,7 +7,7 @@ from fastapi import APIRouter, HTTPException
 from enum import Enum
 import ast
 
-from database.redis_db import get_generic_cache, set_generic_cache
+from database import cache
 
 
 class DeviceModel(int, Enum):
@@ -45,13 +45,10 @@ def _get_device_by_model_number(device_model: str):
 
 async def get_omi_github_releases(cache_key: str) -> Optional[List[Dict]]:
     """Fetch releases from GitHub API with caching"""
+    return await cache.aget_or_compute(cache_key, _fetch_omi_github_releases, ttl=300)
 
-    # Check cache first
-    cached_releases = get_generic_cache(cache_key)
-    if cached_releases:
-        return cached_releases
 
-    # Make GitHub API request if not cached
+async def _fetch_omi_github_releases() -> List[Dict]:
     async with httpx.AsyncClient() as client:
         url = "https://api.github.com/repos/BasedHardware/omi/releases?per_page=100"
         headers = {
@@ -63,10 +60,7 @@ async def get_omi_github_releases(cache_key: str) -> Optional[List[Dict]]:
         if response.status_code != 200:
             print(f"Error fetching GitHub releases: {response.status_code} {response.text}")
             raise HTTPException(status_code=500, detail="Failed to fetch release information")
-        releases = response.json()
-        # Cache successful response for 5 minutes
-        set_generic_cache(cache_key, releases, ttl=300)
-        return releases
+        return response.json()
 
 
 def _parse_firmware_version(version_str: Optional[str]) -> Tuple[int, ...]:
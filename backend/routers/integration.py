@@ -1,3 +1,4 @@
+import asyncio
 import os
 from datetime import datetime, timedelta, timezone
 from typing import Optional, List, Tuple, Union
@@ -128,7 +129,7 @@ async def create_conversation_via_integration(
     create_conversation.app_id = app_id
 
     # Process
-    conversation = process_conversation(uid, language_code, create_conversation)
+    conversation = await asyncio.to_thread(process_conversation, uid, language_code, create_conversation)
 
     # Always trigger integration
     trigger_external_integrations(uid, conversation)
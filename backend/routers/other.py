@@ -1,4 +1,8 @@
-from fastapi import APIRouter
+import os
+
+from fastapi import APIRouter, Header, HTTPException
+
+from utils.other import metrics
 
 router = APIRouter()
 
@@ -9,3 +13,13 @@ async def health_check():
     Health check endpoint.
     """
     return {"status": "ok"}
+
+
+@router.get("/v1/metrics", tags=['v1'])
+def get_process_metrics(prefix: str = None, secret_key: str = Header(...)):
+    """
+    In-process counters, gauges and latencies of the worker serving the request.
+    """
+    if secret_key != os.getenv('ADMIN_KEY'):
+        raise HTTPException(status_code=403, detail='You are not authorized to perform this action')
+    return metrics.snapshot(prefix)
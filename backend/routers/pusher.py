@@ -8,12 +8,12 @@ from fastapi.websockets import WebSocketDisconnect, WebSocket
 from starlette.websockets import WebSocketState
 
 from database import users as users_db
-from utils.apps import is_audio_bytes_app_enabled
+from utils.apps import ais_audio_bytes_app_enabled
 from utils.app_integrations import trigger_realtime_integrations, trigger_realtime_audio_bytes
 from utils.webhooks import (
     send_audio_bytes_developer_webhook,
     realtime_transcript_webhook,
-    get_audio_bytes_webhook_seconds,
+    aget_audio_bytes_webhook_seconds,
 )
 from utils.other.storage import upload_audio_chunk
 
@@ -40,9 +40,9 @@ async def _websocket_util_trigger(
     loop = asyncio.get_event_loop()
 
     # audio bytes
-    audio_bytes_webhook_delay_seconds = get_audio_bytes_webhook_seconds(uid)
+    audio_bytes_webhook_delay_seconds = await aget_audio_bytes_webhook_seconds(uid)
     audio_bytes_trigger_delay_seconds = 4
-    has_audio_apps_enabled = is_audio_bytes_app_enabled(uid)
+    has_audio_apps_enabled = await ais_audio_bytes_app_enabled(uid)
     private_cloud_sync_enabled = users_db.get_user_private_cloud_sync_enabled(uid)
     private_cloud_sync_delay_seconds = 5
 
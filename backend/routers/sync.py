@@ -15,10 +15,16 @@ from pydub import AudioSegment
 
 from database import conversations as conversations_db
 from database import users as users_db
-from database.conversations import get_closest_conversation_to_timestamps, update_conversation_segments
+from database.conversations import update_conversation_segments
 from models.conversation import CreateConversation
 from models.transcript_segment import TranscriptSegment
 from utils.conversations.process_conversation import process_conversation
+from utils.conversations.timeline import (
+    ConversationTimelineIndex,
+    cluster_unmatched,
+    group_segments_by_conversation,
+    merge_segments_into_conversation,
+)
 from utils.other import endpoints as auth
 from utils.other.storage import (
     get_syncing_file_temporal_signed_url,
@@ -282,7 +288,7 @@ def retrieve_vad_segments(path: str, segmented_paths: set):
         segmented_paths.add(segment_path)
 
 
-def process_segment(path: str, uid: str, response: dict):
+def transcribe_segment(path: str, uid: str, transcribed: list):
     url = get_syncing_file_temporal_signed_url(path)
 
     def delete_file():
@@ -298,42 +304,56 @@ def process_segment(path: str, uid: str, response: dict):
         return
 
     timestamp = get_timestamp_from_path(path)
-    closest_memory = get_closest_conversation_to_timestamps(uid, timestamp, timestamp + transcript_segments[-1].end)
+    transcribed.append(
+        (timestamp, timestamp + transcript_segments[-1].end, [s.dict() for s in transcript_segments], language)
+    )
+
+
+def process_segments(uid: str, transcribed: list, response: dict):
+    """
+    Matches every transcribed segment of a dump against the user's conversations in memory.
+    Conversations for the dump's whole time span are loaded once, and merges are batched so
+    each existing conversation is rewritten a single time.
+    """
+    if not transcribed:
+        return
+
+    span_start = min(t[0] for t in transcribed)
+    span_end = max(t[1] for t in transcribed)
+    index = ConversationTimelineIndex(conversations_db.get_conversations_in_time_range(uid, span_start, span_end))
+    print('process_segments', len(transcribed), 'segments', len(index), 'conversations in range')
+
+    languages = {}
+    synced = []
+    for start, end, segments, language in transcribed:
+        languages[start] = language
+        synced.append((start, end, segments))
+
+    matched, unmatched = group_segments_by_conversation(index, synced)
 
-    if not closest_memory:
+    for conversation_id, (conversation, batches) in matched.items():
+        segments = merge_segments_into_conversation(conversation, batches)
+        response['updated_memories'].add(conversation_id)
+        update_conversation_segments(uid, conversation_id, segments)
+
+    def create_conversation(start: float, end: float, segments: List[dict]):
         create_memory = CreateConversation(
-            started_at=datetime.fromtimestamp(timestamp),
-            finished_at=datetime.fromtimestamp(timestamp + transcript_segments[-1].end),
-            transcript_segments=transcript_segments,
+            started_at=datetime.fromtimestamp(start),
+            finished_at=datetime.fromtimestamp(end),
+            transcript_segments=[TranscriptSegment(**s) for s in segments],
         )
-        created = process_conversation(uid, language, create_memory)
+        created = process_conversation(uid, languages.get(start), create_memory)
         response['new_memories'].add(created.id)
-    else:
-        transcript_segments = [s.dict() for s in transcript_segments]
-
-        # assign timestamps to each segment
-        for segment in transcript_segments:
-            segment['timestamp'] = timestamp + segment['start']
-        for segment in closest_memory['transcript_segments']:
-            segment['timestamp'] = closest_memory['started_at'].timestamp() + segment['start']
-
-        # merge and sort segments by start timestamp
-        segments = closest_memory['transcript_segments'] + transcript_segments
-        segments.sort(key=lambda x: x['timestamp'])
 
-        # fix segment.start .end to be relative to the memory
-        for i, segment in enumerate(segments):
-            duration = segment['end'] - segment['start']
-            segment['start'] = segment['timestamp'] - closest_memory['started_at'].timestamp()
-            segment['end'] = segment['start'] + duration
+    threads = [threading.Thread(target=create_conversation, args=cluster) for cluster in cluster_unmatched(unmatched)]
+    chunk_threads(threads)
 
-        # remove timestamp field
-        for segment in segments:
-            segment.pop('timestamp')
 
-        # save
-        response['updated_memories'].add(closest_memory['id'])
-        update_conversation_segments(uid, closest_memory['id'], segments)
+def chunk_threads(threads):
+    chunk_size = 5
+    for i in range(0, len(threads), chunk_size):
+        [t.start() for t in threads[i : i + chunk_size]]
+        [t.join() for t in threads[i : i + chunk_size]]
 
 
 @router.post("/v1/sync-local-files")
@@ -342,31 +362,18 @@ async def sync_local_files(files: List[UploadFile] = File(...), uid: str = Depen
     paths = retrieve_file_paths(files, uid)
     wav_paths = decode_files_to_wav(paths)
 
-    def chunk_threads(threads):
-        chunk_size = 5
-        for i in range(0, len(threads), chunk_size):
-            [t.start() for t in threads[i : i + chunk_size]]
-            [t.join() for t in threads[i : i + chunk_size]]
-
     segmented_paths = set()
     threads = [threading.Thread(target=retrieve_vad_segments, args=(path, segmented_paths)) for path in wav_paths]
     chunk_threads(threads)
 
     print('sync_local_files len(segmented_paths)', len(segmented_paths))
 
-    response = {'updated_memories': set(), 'new_memories': set()}
-    threads = [
-        threading.Thread(
-            target=process_segment,
-            args=(
-                path,
-                uid,
-                response,
-            ),
-        )
-        for path in segmented_paths
-    ]
+    transcribed = []
+    threads = [threading.Thread(target=transcribe_segment, args=(path, uid, transcribed)) for path in segmented_paths]
     chunk_threads(threads)
 
+    response = {'updated_memories': set(), 'new_memories': set()}
+    process_segments(uid, transcribed, response)
+
     # notify through FCM too ?
     return response
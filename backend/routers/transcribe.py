@@ -25,8 +25,7 @@ av.logging.set_level(av.logging.ERROR)
 
 import database.conversations as conversations_db
 import database.users as user_db
-from database import redis_db
-from database.redis_db import get_cached_user_geolocation
+from database import redis_db_async
 from models.conversation import (
     Conversation,
     ConversationPhoto,
@@ -374,12 +373,13 @@ async def _listen(
 
         try:
             # Geolocation
-            geolocation = get_cached_user_geolocation(uid)
+            geolocation = await redis_db_async.get_cached_user_geolocation(uid)
             if geolocation:
                 geolocation = Geolocation(**geolocation)
                 conversation.geolocation = get_google_maps_location(geolocation.latitude, geolocation.longitude)
 
-            conversation = process_conversation(uid, language, conversation)
+            # off the loop: it blocks on LLM calls, and on the post-conversation runner when it's full
+            conversation = await asyncio.to_thread(process_conversation, uid, language, conversation)
             messages = trigger_external_integrations(uid, conversation)
         except Exception as e:
             print(f"Error processing conversation: {e}", uid, session_id)
@@ -442,7 +442,7 @@ async def _listen(
             private_cloud_sync_enabled=private_cloud_sync_enabled,
         )
         conversations_db.upsert_conversation(uid, conversation_data=stub_conversation.dict())
-        redis_db.set_in_progress_conversation_id(uid, new_conversation_id)
+        await redis_db_async.set_in_progress_conversation_id(uid, new_conversation_id)
         current_conversation_id = new_conversation_id
         seconds_to_trim = None
         seconds_to_add = None
@@ -8,7 +8,7 @@ from fastapi import APIRouter, HTTPException, Header, Query
 from fastapi.responses import Response
 
 from routers.firmware import get_omi_github_releases, extract_key_value_pairs
-from database.redis_db import delete_generic_cache
+from database import cache
 
 
 router = APIRouter()
@@ -401,5 +401,5 @@ async def clear_desktop_cache(secret_key: str = Header(...)):
     """
     if secret_key != os.getenv('ADMIN_KEY'):
         raise HTTPException(status_code=403, detail='You are not authorized to perform this action')
-    delete_generic_cache("github_releases_desktop")
+    await cache.ainvalidate("github_releases_desktop")
     return {"success": True, "message": "Desktop releases cache cleared successfully"}
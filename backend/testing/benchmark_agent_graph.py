@@ -0,0 +1,82 @@
+"""
+Benchmark: agentic chat time-to-first-token, compiling the agent per request vs the compiled graph cache.
+
+A local fake chat model streams a fixed answer word by word (no tool calls, no network), so the measured time is
+agent construction plus graph execution up to the first streamed token. Compares:
+- previous: `create_react_agent(model, tools)` on every request
+- cached: `utils.retrieval.agentic.get_agent_graph`, one compile per model + tool set
+
+Run from backend/: python testing/benchmark_agent_graph.py [requests]
+"""
+
+import asyncio
+import itertools
+import os
+import sys
+import time
+import uuid
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel  # noqa: E402
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage  # noqa: E402
+from langgraph.prebuilt import create_react_agent  # noqa: E402
+
+from utils.retrieval.agentic import CORE_TOOLS, get_agent_graph  # noqa: E402
+
+ANSWER = 'You met Alex on Tuesday to review the launch plan and agreed to ship on Friday.'
+
+
+class FakeStreamingChatModel(GenericFakeChatModel):
+    """Streams ANSWER token by token, deterministic and offline."""
+
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+
+def fake_model():
+    return FakeStreamingChatModel(messages=itertools.cycle([AIMessage(content=ANSWER)]))
+
+
+async def time_to_first_token(agent, started: float) -> float:
+    config = {'configurable': {'user_id': 'bench', 'thread_id': str(uuid.uuid4())}}
+    messages = [SystemMessage(content='You are a helpful assistant.'), HumanMessage(content='What did I agree on?')]
+    first_token = None
+    tokens = []
+    async for event in agent.astream_events({'messages': messages}, config=config, version='v2'):
+        if event.get('event') == 'on_chat_model_stream':
+            chunk = event['data']['chunk']
+            if chunk.content:
+                first_token = first_token or time.perf_counter() - started
+                tokens.append(chunk.content)
+    assert ''.join(tokens) == ANSWER, ''.join(tokens)
+    return first_token
+
+
+def percentiles(timings):
+    timings = sorted(timings)
+    return timings[len(timings) // 2] * 1000, timings[min(len(timings) - 1, int(len(timings) * 0.99))] * 1000
+
+
+async def main(n: int):
+    model = fake_model()
+    tools = list(CORE_TOOLS)
+
+    results = {}
+    for name, build in [
+        ('previous', lambda: create_react_agent(model=model, tools=tools)),
+        ('cached', lambda: get_agent_graph(model, tools)),
+    ]:
+        timings = []
+        for _ in range(n):
+            started = time.perf_counter()
+            timings.append(await time_to_first_token(build(), started))
+        results[name] = percentiles(timings)
+
+    print(f'{n} requests, {len(tools)} tools, time to first token:')
+    for name, (p50, p99) in results.items():
+        print(f'  {name:9} p50 {p50:8.2f} ms   p99 {p99:8.2f} ms')
+
+
+if __name__ == '__main__':
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 50))
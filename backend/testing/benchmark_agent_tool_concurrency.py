@@ -0,0 +1,125 @@
+"""
+Benchmark: one agentic chat turn with several independent tool calls, sequential vs concurrent tool execution.
+
+A scripted chat model asks for a conversation search, a memory lookup and a calendar fetch in one turn, then
+answers. Each tool talks to a local fake of its backend that blocks for a fixed time (Pinecone query,
+Firestore read, Google Calendar HTTP call). The agent is built with `utils.retrieval.agentic.GuardedToolNode`
+and run with `max_concurrent_tool_calls` 1 (one after another) and the default cap.
+
+It also checks that tool results come back in the order the model emitted the calls, and that the request's
+AgentSafetyGuard saw every call.
+
+Run from backend/: python testing/benchmark_agent_tool_concurrency.py [runs]
+"""
+
+import asyncio
+import os
+import sys
+import time
+import uuid
+from typing import Any, List, Optional
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from langchain_core.callbacks import CallbackManagerForLLMRun  # noqa: E402
+from langchain_core.language_models import BaseChatModel  # noqa: E402
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, ToolMessage  # noqa: E402
+from langchain_core.outputs import ChatGeneration, ChatResult  # noqa: E402
+from langchain_core.tools import tool  # noqa: E402
+from langgraph.prebuilt import create_react_agent  # noqa: E402
+
+from utils.retrieval.agentic import MAX_CONCURRENT_TOOL_CALLS, GuardedToolNode  # noqa: E402
+from utils.retrieval.safety import AgentSafetyGuard  # noqa: E402
+
+BACKEND_LATENCY = {'pinecone': 0.12, 'firestore': 0.08, 'calendar_http': 0.15}
+
+
+def fake_backend(name: str, payload: str) -> str:
+    time.sleep(BACKEND_LATENCY[name])
+    return f'{name}: {payload}'
+
+
+@tool
+def vector_search_conversations_tool(query: str) -> str:
+    """Search the user's conversations."""
+    return fake_backend('pinecone', f'3 conversations about {query}')
+
+
+@tool
+def get_memories_tool(limit: int = 10) -> str:
+    """Get the user's memories."""
+    return fake_backend('firestore', f'{limit} memories')
+
+
+@tool
+def get_calendar_events_tool(day: str) -> str:
+    """Get the user's calendar events."""
+    return fake_backend('calendar_http', f'2 events on {day}')
+
+
+TOOL_CALLS = [
+    {'name': 'vector_search_conversations_tool', 'args': {'query': 'launch'}, 'id': 'call-1'},
+    {'name': 'get_memories_tool', 'args': {'limit': 5}, 'id': 'call-2'},
+    {'name': 'get_calendar_events_tool', 'args': {'day': 'friday'}, 'id': 'call-3'},
+]
+
+
+class ScriptedChatModel(BaseChatModel):
+    """Asks for TOOL_CALLS on the first turn, answers once tool results are in."""
+
+    @property
+    def _llm_type(self) -> str:
+        return 'scripted'
+
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        if isinstance(messages[-1], ToolMessage):
+            message = AIMessage(content='You have the launch review on Friday.')
+        else:
+            message = AIMessage(content='', tool_calls=TOOL_CALLS)
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+
+async def run_turn(agent, max_concurrent_tool_calls: int) -> float:
+    safety_guard = AgentSafetyGuard(max_tool_calls=10, max_context_tokens=500000)
+    config = {
+        'configurable': {
+            'user_id': 'bench',
+            'thread_id': str(uuid.uuid4()),
+            'safety_guard': safety_guard,
+            'max_concurrent_tool_calls': max_concurrent_tool_calls,
+        }
+    }
+    started = time.perf_counter()
+    result = await agent.ainvoke({'messages': [HumanMessage(content='What is on for the launch?')]}, config=config)
+    elapsed = time.perf_counter() - started
+
+    tool_messages = [m for m in result['messages'] if isinstance(m, ToolMessage)]
+    assert [m.tool_call_id for m in tool_messages] == [call['id'] for call in TOOL_CALLS]
+    assert safety_guard.tool_call_count == len(TOOL_CALLS)
+    return elapsed
+
+
+async def main(runs: int):
+    tools = [vector_search_conversations_tool, get_memories_tool, get_calendar_events_tool]
+    agent = create_react_agent(model=ScriptedChatModel(), tools=GuardedToolNode(tools))
+
+    print(f'{len(TOOL_CALLS)} tool calls per turn, backend latencies {BACKEND_LATENCY} s, {runs} runs')
+    sequential_ms, concurrent_ms = sum(BACKEND_LATENCY.values()) * 1000, max(BACKEND_LATENCY.values()) * 1000
+    print(f'  backends alone: sequential {sequential_ms:7.1f} ms, concurrent {concurrent_ms:7.1f} ms')
+    modes = [('sequential', 1), (f'concurrent (cap {MAX_CONCURRENT_TOOL_CALLS})', MAX_CONCURRENT_TOOL_CALLS)]
+    for name, limit in modes:
+        timings = sorted([await run_turn(agent, limit) for _ in range(runs)])
+        print(f'  {name:18} p50 {timings[len(timings) // 2] * 1000:7.1f} ms   max {timings[-1] * 1000:7.1f} ms')
+
+
+if __name__ == '__main__':
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 10))
@@ -0,0 +1,233 @@
+"""
+Benchmark: /v2/apps latency end to end, the page-cached route vs the in-memory catalog snapshot.
+
+Calls the route handler on a synthetic 1,500 app catalog (capabilities, categories, installs and ratings drawn at
+random). Firestore is not used: its catalog queries are served from memory with injected latency. Installs and the
+page and catalog caches are in a real Redis (REDIS_DB_HOST / REDIS_DB_PORT must be reachable). Compares:
+- previous: the route as it was, a Redis page cache per capability/offset/limit; a miss rebuilt `App` models from
+  the cached catalog, then filtered, scored, sorted, paginated and serialized the whole catalog
+- snapshot: `routers.apps.get_apps_v2`, slices of `utils.app_catalog.AppCatalogSnapshot`
+on the same 200 request mix:
+- cold: every cache empty, as after a deploy
+- page misses: the catalog is cached but not the pages, what each page cost whenever its key expired (10 minutes)
+- warm: every page cached
+It also checks that both return identical responses for every request in the mix.
+
+Run from backend/: python testing/benchmark_app_catalog_listing.py [apps]
+"""
+
+import asyncio
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# nothing reaches Google Cloud: the clients are created against unreachable emulators and never called
+os.environ.setdefault('FIRESTORE_EMULATOR_HOST', 'localhost:1')
+os.environ.setdefault('STORAGE_EMULATOR_HOST', 'http://localhost:1')
+os.environ.setdefault('GOOGLE_CLOUD_PROJECT', 'benchmark')
+
+import routers.apps as apps_router  # noqa: E402
+import utils.apps as apps_utils  # noqa: E402
+from database import cache, redis_db  # noqa: E402
+from utils import app_catalog  # noqa: E402
+from utils.apps import (  # noqa: E402
+    build_capability_category_groups_response,
+    build_capability_groups_response,
+    build_pagination_metadata,
+    filter_apps_by_capability,
+    get_approved_available_apps,
+    get_capabilities_list,
+    get_categories_list,
+    group_apps_by_capability,
+    group_capability_apps_by_category,
+    normalize_app_numeric_fields,
+    paginate_apps,
+    sort_apps_by_installs,
+)
+
+LATENCY_MS = {'public_apps_query': 400, 'popular_apps_query': 40}
+
+
+def synthetic_catalog(n: int):
+    rng = random.Random(7)
+    categories = [c['id'] for c in get_categories_list()]
+    capability_sets = [
+        {'chat'},
+        {'memories'},
+        {'chat', 'memories'},
+        {'proactive_notification'},
+        {'external_integration'},
+    ]
+    apps = []
+    for i in range(n):
+        capabilities = set(rng.choice(capability_sets))
+        app = {
+            'id': f'app-{i}',
+            'name': f'App {i}',
+            'category': rng.choice(categories),
+            'author': 'bench',
+            'description': 'Synthetic app used by the listing benchmark. ' * 4,
+            'image': f'https://example.com/{i}.png',
+            'capabilities': sorted(capabilities),
+            'approved': True,
+            'private': False,
+            'is_popular': rng.random() < 0.03,
+            'installs': int(rng.paretovariate(1.2) * 10),
+            'rating_avg': round(rng.uniform(2, 5), 2) if rng.random() < 0.7 else None,
+            'rating_count': rng.randint(0, 300),
+        }
+        if 'external_integration' in capabilities:
+            app['external_integration'] = {
+                'triggers_on': 'memory_creation',
+                'webhook_url': 'https://example.com/hook',
+                'setup_instructions_file_path': None,
+                'auth_steps': [{'name': 'Connect', 'url': 'https://example.com/auth'}] if i % 2 else [],
+            }
+        apps.append(app)
+    return apps
+
+
+class FakeAppsCollection:
+    def __init__(self, catalog: list):
+        self.catalog = catalog
+
+    def public_approved_apps(self):
+        time.sleep(LATENCY_MS['public_apps_query'] / 1000)
+        return [{**app} for app in self.catalog]
+
+    def popular_apps(self):
+        time.sleep(LATENCY_MS['popular_apps_query'] / 1000)
+        return [{**app} for app in self.catalog if app['is_popular']]
+
+
+def _previous_build_page(capabilities: list, capability, offset: int, limit: int, include_reviews: bool):
+    # the route's page builder before the snapshot
+    apps = get_approved_available_apps(include_reviews=include_reviews)
+    approved_apps = [a for a in apps if a.approved and (a.private is None or not a.private)]
+    approved_apps = [a for a in approved_apps if not a.is_a_persona()]
+
+    if capability:
+        sorted_apps = sort_apps_by_installs(filter_apps_by_capability(approved_apps, capability))
+        return {
+            'data': [
+                normalize_app_numeric_fields(a.model_dump(mode='json'))
+                for a in paginate_apps(sorted_apps, offset, limit)
+            ],
+            'pagination': build_pagination_metadata(len(sorted_apps), offset, limit, capability),
+            'capability': {
+                'id': capability,
+                'title': next(
+                    (c['title'] for c in capabilities if c['id'] == capability), capability.title().replace('_', ' ')
+                ),
+            },
+        }
+
+    groups = build_capability_groups_response(
+        group_apps_by_capability(approved_apps, capabilities), capabilities, offset, limit
+    )
+    return {
+        'groups': groups,
+        'meta': {'capabilities': capabilities, 'groupCount': len(groups), 'limit': limit, 'offset': offset},
+    }
+
+
+def previous_category_groups(capability_id: str):
+    apps = get_approved_available_apps(include_reviews=True)
+    filtered = filter_apps_by_capability([a for a in apps if not a.is_a_persona()], capability_id)
+    return build_capability_category_groups_response(
+        group_capability_apps_by_category(filtered, capability_id), capability_id
+    )
+
+
+def _page_key(capability, offset: int, limit: int, include_reviews: bool = False) -> str:
+    if capability:
+        return f"apps:capability:v2:{capability}:offset={offset}:limit={limit}:reviews={int(include_reviews)}"
+    return f"apps:capability_groups:v2:offset={offset}:limit={limit}:reviews={int(include_reviews)}"
+
+
+async def previous_route(capability, offset: int, limit: int, include_reviews: bool = False):
+    capabilities = get_capabilities_list()
+    return await cache.aget_or_compute(
+        _page_key(capability, offset, limit, include_reviews),
+        lambda: asyncio.to_thread(_previous_build_page, capabilities, capability, offset, limit, include_reviews),
+        60 * 10,
+    )
+
+
+async def snapshot_route(capability, offset: int, limit: int):
+    return await apps_router.get_apps_v2(capability=capability, offset=offset, limit=limit, include_reviews=False)
+
+
+def clear_caches(requests_mix, catalog_too: bool = True):
+    cache._local.clear()
+    for request in set(requests_mix):
+        redis_db.delete_generic_cache(_page_key(*request))
+    if catalog_too:
+        for path in ('get_public_approved_apps_data', 'get_popular_apps_data'):
+            redis_db.delete_generic_cache(path)
+        app_catalog._snapshots.clear()
+
+
+def percentiles(timings):
+    timings = sorted(timings)
+    return (
+        timings[len(timings) // 2] * 1000,
+        timings[min(len(timings) - 1, int(len(timings) * 0.99))] * 1000,
+        timings[-1] * 1000,
+    )
+
+
+async def run(route, requests_mix, before=None):
+    timings = []
+    for request in requests_mix:
+        if before:
+            before()
+        started = time.perf_counter()
+        await route(*request)
+        timings.append(time.perf_counter() - started)
+    return percentiles(timings)
+
+
+async def main(n: int):
+    catalog = synthetic_catalog(n)
+    apps_collection = FakeAppsCollection(catalog)
+    apps_utils.get_public_approved_apps_db = apps_collection.public_approved_apps
+    apps_utils.get_popular_apps_db = apps_collection.popular_apps
+    for app in catalog:
+        redis_db.set_app_installs_count(app['id'], app['installs'])
+
+    rng = random.Random(11)
+    capability_ids = [None] + [c['id'] for c in get_capabilities_list()]
+    requests_mix = [(rng.choice(capability_ids), rng.choice([0, 20, 40, 60]), 20) for _ in range(200)]
+
+    clear_caches(requests_mix)
+    for request in set(requests_mix):
+        assert await snapshot_route(*request) == await previous_route(*request), request
+    for capability_id in capability_ids[1:]:
+        grouped = await apps_router.get_capability_apps_grouped_by_category(capability_id, include_reviews=True)
+        assert grouped['groups'] == previous_category_groups(capability_id), capability_id
+
+    results = []
+    for name, route in [('previous', previous_route), ('snapshot', snapshot_route)]:
+        clear_caches(requests_mix)
+        results.append(('cold', name, await run(route, requests_mix)))
+        if name == 'previous':
+            drop_page = lambda: clear_caches(requests_mix, catalog_too=False)  # noqa: E731
+            results.append(('page misses', name, await run(route, requests_mix, drop_page)))
+        # fills every page
+        await run(route, requests_mix)
+        results.append(('warm', name, await run(route, requests_mix)))
+
+    print(
+        f'{n} apps, {len(requests_mix)} /v2/apps requests, responses identical, injected latencies (ms): {LATENCY_MS}'
+    )
+    for scenario, name, (p50, p99, slowest) in results:
+        print(f'  {scenario:11} {name:9} p50 {p50:8.3f} ms   p99 {p99:8.3f} ms   max {slowest:8.3f} ms')
+    clear_caches(requests_mix)
+
+
+if __name__ == '__main__':
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 1500))
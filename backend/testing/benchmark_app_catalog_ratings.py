@@ -0,0 +1,85 @@
+"""
+Benchmark: rating assembly for a 5,000 app catalog.
+
+Seeds a local Redis with reviews for 5,000 apps in both the legacy format (one `str(dict)` per app) and the
+hash + aggregate format, then compares:
+- legacy: MGET every app's reviews, eval each one, average the scores in Python, sort by weighted rating
+- summaries: one pipelined HMGET of the per-app rating aggregates, sort by weighted rating
+
+Run from backend/ against a throwaway Redis: REDIS_DB_HOST=localhost python testing/benchmark_app_catalog_ratings.py
+"""
+
+import os
+import random
+import sys
+import time
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from database import redis_db  # noqa: E402
+from database.redis_db import r  # noqa: E402
+
+APPS = 5000
+
+
+def weighted_rating(app):
+    # same formula as utils.apps.weighted_rating, kept local to avoid importing the whole apps module
+    C, m = 3.0, 5
+    R = app.rating_avg or 0
+    v = app.rating_count or 0
+    return (v / (v + m) * R) + (m / (v + m) * C)
+
+
+def seed(app_ids):
+    rng = random.Random(5)
+    pipe = r.pipeline()
+    for app_id in app_ids:
+        reviews = {
+            f'u{j}': {'score': rng.randint(1, 5), 'review': 'ok' if j % 3 else '', 'uid': f'u{j}', 'rated_at': 'x'}
+            for j in range(rng.choice([0, 0, 1, 3, 10, 40]))
+        }
+        pipe.set(f'plugins:{app_id}:reviews', str(reviews))
+    pipe.execute()
+    redis_db.migrate_app_reviews_to_hashes()
+
+
+def legacy(app_ids):
+    values = r.mget([f'plugins:{app_id}:reviews' for app_id in app_ids])
+    apps = []
+    for app_id, value in zip(app_ids, values):
+        reviews = eval(value) if value else {}
+        scores = [x['score'] for x in reviews.values()]
+        avg = sum(scores) / len(scores) if scores else None
+        apps.append(SimpleNamespace(id=app_id, rating_avg=avg, rating_count=len(scores)))
+    return sorted(apps, key=weighted_rating, reverse=True)
+
+
+def summaries(app_ids):
+    ratings = redis_db.get_apps_rating_summaries(app_ids)
+    apps = [
+        SimpleNamespace(id=app_id, rating_avg=ratings[app_id]['avg'], rating_count=ratings[app_id]['count'])
+        for app_id in app_ids
+    ]
+    return sorted(apps, key=weighted_rating, reverse=True)
+
+
+def bench(fn, app_ids, runs=7):
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        result = fn(app_ids)
+        timings.append(time.perf_counter() - started)
+    timings.sort()
+    return timings[len(timings) // 2] * 1000, result
+
+
+if __name__ == '__main__':
+    app_ids = [f'bench-app-{i}' for i in range(APPS)]
+    seed(app_ids)
+    legacy_ms, legacy_apps = bench(legacy, app_ids)
+    summary_ms, summary_apps = bench(summaries, app_ids)
+    assert [a.id for a in legacy_apps[:100]] == [a.id for a in summary_apps[:100]]
+    print(f'{APPS} apps')
+    print(f'legacy eval + python ratings: {legacy_ms:8.2f} ms')
+    print(f'pipelined rating summaries:   {summary_ms:8.2f} ms')
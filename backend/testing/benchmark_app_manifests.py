@@ -0,0 +1,173 @@
+"""
+Benchmark: chat tools manifests and per-chat app tool loading.
+
+Serves manifests from a local HTTP server that honours If-None-Match, and compares:
+- manifest fetch: a full download + parse (previous) vs the conditional revalidation in `utils.app_manifests`
+  (304 for an unchanged manifest)
+- tool loading for one agentic chat with every app enabled: previous behaviour built `App` models and one
+  LangChain tool (with its pydantic args model) per chat tool on every request (the Firestore reads it also
+  paid are left out), vs `utils.retrieval.tools.app_tools.load_app_tools` with the definitions cached
+
+Runs against a local Redis (REDIS_DB_HOST/REDIS_DB_PORT/REDIS_DB_PASSWORD, e.g. `docker run -p 6379:6379 redis`).
+
+Run from backend/: REDIS_DB_HOST=localhost python testing/benchmark_app_manifests.py [apps] [tools_per_app]
+"""
+
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import requests  # noqa: E402
+
+from database import cache  # noqa: E402
+from models.app import App  # noqa: E402
+from utils import app_manifests  # noqa: E402
+from utils.apps import parse_chat_tools_manifest  # noqa: E402
+from utils.retrieval.tools.app_tools import create_app_tool, load_app_tools  # noqa: E402
+
+
+def manifest(app_index: int, tools_per_app: int) -> dict:
+    return {
+        'tools': [
+            {
+                'name': f'tool_{app_index}_{t}',
+                'description': f'Tool {t} of app {app_index}',
+                'endpoint': f'/tools/{t}',
+                'method': 'POST',
+                'parameters': {
+                    'properties': {
+                        'query': {'type': 'string', 'description': 'What to look for'},
+                        'limit': {'type': 'integer', 'description': 'How many results'},
+                        'tags': {'type': 'array', 'description': 'Tags'},
+                    },
+                    'required': ['query'],
+                },
+                'status_message': 'Working...',
+            }
+            for t in range(tools_per_app)
+        ]
+    }
+
+
+class ManifestHandler(BaseHTTPRequestHandler):
+    bodies = {}
+    requests_served = {'200': 0, '304': 0}
+
+    def do_GET(self):
+        body = self.bodies.get(self.path)
+        if body is None:
+            self.send_response(404)
+            self.end_headers()
+            return
+        etag = '"' + hashlib.md5(body).hexdigest() + '"'
+        if self.headers.get('If-None-Match') == etag:
+            self.requests_served['304'] += 1
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.end_headers()
+            return
+        self.requests_served['200'] += 1
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('ETag', etag)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def timed(fn, runs: int) -> float:
+    started = time.perf_counter()
+    for _ in range(runs):
+        fn()
+    return (time.perf_counter() - started) / runs * 1000
+
+
+if __name__ == '__main__':
+    n_apps = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    tools_per_app = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), ManifestHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f'http://127.0.0.1:{server.server_port}'
+
+    apps = []
+    for i in range(n_apps):
+        path = f'/bench-{i}/omi-tools.json'
+        ManifestHandler.bodies[path] = json.dumps(manifest(i, tools_per_app)).encode('utf-8')
+        apps.append(
+            {
+                'id': f'manifest-bench-{i}',
+                'name': f'Bench App {i}',
+                'category': 'productivity',
+                'author': 'bench',
+                'description': 'Manifest benchmark app',
+                'image': '',
+                'capabilities': {'chat'},
+                'external_integration': {
+                    'triggers_on': 'memory_creation',
+                    'webhook_url': f'{base_url}/hook',
+                    'setup_instructions_file_path': None,
+                    'app_home_url': f'{base_url}/bench-{i}',
+                    'chat_tools_manifest_url': f'{base_url}{path}',
+                },
+            }
+        )
+
+    url = apps[0]['external_integration']['chat_tools_manifest_url']
+
+    def full_fetch():
+        response = requests.get(url, timeout=10)
+        parse_chat_tools_manifest(response.json(), url)
+
+    app_manifests.refresh(url)
+    print(f'manifest fetch ({tools_per_app} tools):')
+    print(f'  full download + parse   {timed(full_fetch, 50):8.3f} ms')
+    print(f'  conditional (304)       {timed(lambda: app_manifests.refresh(url), 50):8.3f} ms')
+
+    # previous: every chat rebuilt the stored tools of every enabled app
+    for app in apps:
+        app['chat_tools'] = manifest(int(app['id'].rsplit('-', 1)[1]), tools_per_app)['tools']
+
+    def previous_load():
+        tools = []
+        for app_data in apps:
+            app = App(**app_data)
+            for app_tool in app.chat_tools:
+                tools.append(create_app_tool(app_tool, app.id, app.name))
+        return tools
+
+    # the definitions cache is seeded from the same app documents the Firestore read would return
+    for app_data in apps:
+        app_id = app_data['id']
+        cache.invalidate(f'app_chat_tools:{app_id}')
+        cache.get_or_compute(
+            f'app_chat_tools:{app_id}',
+            lambda app_data=app_data: {
+                'name': app_data['name'],
+                'tools': app_data['chat_tools'],
+                'version': app_manifests.tools_version(app_data['chat_tools']),
+                'manifest_url': app_data['external_integration']['chat_tools_manifest_url'],
+                'app_home_url': app_data['external_integration']['app_home_url'],
+            },
+            60,
+        )
+    for app_data in apps:
+        app_manifests.refresh(app_data['external_integration']['chat_tools_manifest_url'])
+
+    app_ids = [app['id'] for app in apps]
+    assert len(load_app_tools('bench', enabled_app_ids=app_ids)) == len(previous_load())
+
+    print(f'tool loading per chat ({n_apps} apps x {tools_per_app} tools):')
+    print(f'  previous (rebuild)      {timed(previous_load, 20):8.3f} ms')
+    print(f'  cached tools            {timed(lambda: load_app_tools("bench", enabled_app_ids=app_ids), 200):8.3f} ms')
+    print(f'manifest server: {ManifestHandler.requests_served}')
+    server.shutdown()
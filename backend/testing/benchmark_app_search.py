@@ -0,0 +1,105 @@
+"""
+Benchmark: /v2/apps/search latency over the public catalog, previous per-request filtering vs `utils.app_search`.
+
+Uses a synthetic catalog (default 10,000 apps) whose names and descriptions draw words from a Zipf-distributed
+vocabulary, so a few queries match thousands of apps and most match a handful. Compares:
+- previous: substring match on the name over every app, rating filter, sort and paginate, on each request
+  (after the Firestore read and model building it also paid, which are left out here)
+- index (cold): the first time a query/filter combination is seen after a catalog sync
+- index (warm): repeats and next pages of a query until the next sync
+
+Run from backend/: python testing/benchmark_app_search.py [apps]
+"""
+
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from models.app import App  # noqa: E402
+from utils.app_search import AppSearchIndex  # noqa: E402
+from utils.apps import get_categories_list  # noqa: E402
+
+COMMON_WORDS = ['app', 'your', 'notes', 'summary', 'meeting', 'daily', 'chat', 'memory', 'assistant', 'the', 'and']
+
+
+def synthetic_catalog(n: int):
+    rng = random.Random(3)
+    syllables = ['ka', 'lo', 'mi', 'ne', 'ra', 'su', 'to', 'vi', 'da', 'pe', 'zo', 'fi', 'ga', 'hu', 'be', 'co']
+    vocabulary = list(
+        dict.fromkeys(''.join(rng.choice(syllables) for _ in range(rng.randint(2, 4))) for _ in range(8000))
+    )
+
+    def word():
+        if rng.random() < 0.3:
+            return rng.choice(COMMON_WORDS)
+        return vocabulary[min(len(vocabulary) - 1, int(rng.paretovariate(1.1)) - 1)]
+
+    categories = [c['id'] for c in get_categories_list()]
+    apps = [
+        App(
+            id=f'app-{i}',
+            name=' '.join(word() for _ in range(2)).title(),
+            category=rng.choice(categories),
+            author='bench',
+            description=' '.join(word() for _ in range(30)),
+            image=f'https://example.com/{i}.png',
+            capabilities={rng.choice(['chat', 'memories', 'proactive_notification'])},
+            approved=True,
+            private=False,
+            installs=int(rng.paretovariate(1.2) * 10),
+            rating_avg=round(rng.uniform(1, 5), 2) if rng.random() < 0.7 else None,
+        )
+        for i in range(n)
+    ]
+    return apps, vocabulary
+
+
+def previous_search(apps, q, rating, offset, limit):
+    search_query = q.strip().lower()
+    filtered = [app for app in apps if search_query in app.name.lower()]
+    if rating is not None:
+        filtered = [app for app in filtered if (app.rating_avg or 0) >= rating]
+    filtered = sorted(filtered, key=lambda a: (a.installs or 0), reverse=True)
+    return filtered[offset : offset + limit], len(filtered)
+
+
+def percentiles(timings):
+    timings = sorted(timings)
+    return timings[len(timings) // 2] * 1000, timings[min(len(timings) - 1, int(len(timings) * 0.99))] * 1000
+
+
+if __name__ == '__main__':
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    apps, vocabulary = synthetic_catalog(n)
+
+    index = AppSearchIndex()
+    started = time.perf_counter()
+    index.sync(apps)
+    build_ms = (time.perf_counter() - started) * 1000
+
+    rng = random.Random(11)
+    prefixes = [w[:3] for w in vocabulary[:30]]
+    typos = [w[1] + w[0] + w[2:] for w in vocabulary[:30]]
+    queries = COMMON_WORDS + vocabulary[:50] + prefixes + typos
+    requests_mix = [(rng.choice(queries), rng.choice([None, 3.0, 4.0]), rng.choice([0, 0, 20])) for _ in range(2000)]
+
+    results = {'previous': [], 'index (cold)': [], 'index (warm)': []}
+    seen = set()
+    for q, rating, offset in requests_mix:
+        t = time.perf_counter()
+        previous_search(apps, q, rating, offset, 20)
+        results['previous'].append(time.perf_counter() - t)
+
+        t = time.perf_counter()
+        index.search(q, min_rating=rating, offset=offset, limit=20)
+        results['index (warm)' if (q, rating) in seen else 'index (cold)'].append(time.perf_counter() - t)
+        seen.add((q, rating))
+
+    print(f'{n} apps, {len(requests_mix)} searches')
+    print(f'  index build: {build_ms:8.1f} ms (incremental afterwards, see AppSearchIndex.sync)')
+    for name, timings in results.items():
+        p50, p99 = percentiles(timings)
+        print(f'  {name:13} p50 {p50:8.3f} ms   p99 {p99:8.3f} ms   ({len(timings)} searches)')
@@ -0,0 +1,96 @@
+"""
+Benchmark: authenticated request overhead with and without the ID-token cache.
+
+Tokens are generated locally: an RSA key is created on the fly, RS256 ID tokens are signed with it, and
+`auth.verify_id_token` is replaced by the same google-auth signature and claim verification firebase_admin
+performs, but against the local public key so no network or Firebase project is needed.
+
+Run from backend/: python testing/benchmark_auth_token_cache.py [--users 200] [--requests 20000]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from cryptography.hazmat.primitives import serialization  # noqa: E402
+from cryptography.hazmat.primitives.asymmetric import rsa  # noqa: E402
+from google.auth import crypt, jwt  # noqa: E402
+
+import utils.other.endpoints as endpoints  # noqa: E402
+
+PROJECT_ID = 'omi-benchmark'
+KEY_ID = 'local-key'
+
+
+def build_keys():
+    private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    private_pem = private_key.private_bytes(
+        serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+    )
+    public_pem = private_key.public_key().public_bytes(
+        serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo
+    )
+    return crypt.RSASigner.from_string(private_pem, key_id=KEY_ID), public_pem
+
+
+def make_token(signer, uid: str) -> str:
+    now = int(time.time())
+    payload = {
+        'iss': f'https://securetoken.google.com/{PROJECT_ID}',
+        'aud': PROJECT_ID,
+        'auth_time': now,
+        'user_id': uid,
+        'sub': uid,
+        'iat': now,
+        'exp': now + 3600,
+    }
+    return jwt.encode(signer, payload).decode('utf-8')
+
+
+def local_verifier(public_pem: bytes):
+    certs = {KEY_ID: public_pem}
+
+    def verify_id_token(token, check_revoked=False):
+        claims = jwt.decode(token, certs=certs, audience=PROJECT_ID)
+        if claims['iss'] != f'https://securetoken.google.com/{PROJECT_ID}' or not claims.get('sub'):
+            raise ValueError('invalid claims')
+        claims['uid'] = claims['sub']
+        return claims
+
+    return verify_id_token
+
+
+def run(headers, requests: int, cache: bool):
+    endpoints.TOKEN_CACHE_ENABLED = cache
+    endpoints._token_cache.clear()
+    rng = random.Random(1)
+    timings = []
+    for _ in range(requests):
+        header = rng.choice(headers)
+        started = time.perf_counter()
+        endpoints.get_current_user_uid(header)
+        timings.append(time.perf_counter() - started)
+    timings.sort()
+    return timings[len(timings) // 2] * 1e6, timings[int(len(timings) * 0.99)] * 1e6, sum(timings)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--requests', type=int, default=20000)
+    args = parser.parse_args()
+
+    os.environ.setdefault('ADMIN_KEY', 'benchmark-admin-key-not-in-tokens')
+    signer, public_pem = build_keys()
+    endpoints.auth.verify_id_token = local_verifier(public_pem)
+    headers = [f'Bearer {make_token(signer, f"user-{i}")}' for i in range(args.users)]
+
+    print(f'{args.requests} requests from {args.users} users')
+    for cache in (False, True):
+        p50, p99, total = run(headers, args.requests, cache)
+        label = 'cached' if cache else 'uncached'
+        print(f'{label:<9} p50 {p50:8.1f} us  p99 {p99:8.1f} us  total {total:6.2f}s')
@@ -0,0 +1,207 @@
+"""
+Benchmark: chat time-to-first-token through `execute_graph_chat_stream`, sequential pre-processing vs speculative
+prefetch (utils/retrieval/prefetch.py).
+
+Every dependency is a local fake with injected latency: question extraction and classification LLM calls, the user's
+time zone and name, their memories snapshot (cold in this worker, warm once read), app tools, and the answering models
+(time to their first token). The agent calls `get_memories_tool` and then answers, as its prompt tells it to. Both
+branches are measured: a question that needs context (agent) and one that doesn't (simple answer). Each request asks
+a new question, so the response cache of classification calls starts cold.
+
+Run from backend/: python testing/benchmark_chat_prefetch.py [requests]
+"""
+
+import asyncio
+import itertools
+import json
+import os
+import re
+import sys
+import time
+import uuid
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel  # noqa: E402
+from langchain_core.messages import AIMessage, AIMessageChunk  # noqa: E402
+from langchain_core.outputs import ChatGenerationChunk  # noqa: E402
+
+import database.memories as memories_db  # noqa: E402
+import database.notifications as notification_db  # noqa: E402
+import utils.llm.chat as chat  # noqa: E402
+import utils.llms.memory as llms_memory  # noqa: E402
+import utils.retrieval.agentic as agentic  # noqa: E402
+import utils.retrieval.graph as graph  # noqa: E402
+import utils.retrieval.prefetch as prefetch  # noqa: E402
+from models.chat import Message  # noqa: E402
+from utils.other import metrics  # noqa: E402
+
+LATENCY_MS = {
+    'extract_question': 450,
+    'classify': 350,
+    'time_zone': 25,
+    'user_name': 25,
+    'memories_cold': 150,
+    'app_tools': 40,
+    'first_token': 300,
+}
+UID = 'bench-user'
+ANSWER = 'You told me you prefer tea over coffee and go hiking most weekends.'
+
+
+def sleep(name: str):
+    time.sleep(LATENCY_MS[name] / 1000)
+
+
+class Request:
+    question = ''
+    requires_context = True
+
+
+class FakeStructuredLLM:
+    def __init__(self, latency: str, answer):
+        self.latency = latency
+        self.answer = answer
+
+    def with_structured_output(self, schema):
+        return self
+
+    def invoke(self, prompt, *args, **kwargs):
+        sleep(self.latency)
+        return self.answer()
+
+
+class FakeStreamingModel(GenericFakeChatModel):
+    """Streams the next scripted message after the model's time to first token."""
+
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+    def _should_stream(self, **kwargs):
+        # like ChatOpenAI(streaming=True), `invoke` streams to the callbacks too
+        return True
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        sleep('first_token')
+        message = next(self.messages)
+        if message.tool_calls:
+            tool_call_chunks = [
+                {'name': call['name'], 'args': json.dumps(call['args']), 'id': call['id'], 'index': i}
+                for i, call in enumerate(message.tool_calls)
+            ]
+            yield ChatGenerationChunk(message=AIMessageChunk(content='', tool_call_chunks=tool_call_chunks))
+            return
+        for token in re.split(r'(\s)', message.content):
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=token))
+            if run_manager:
+                run_manager.on_llm_new_token(chunk.message.content, chunk=chunk)
+            yield chunk
+
+
+def agent_model():
+    tool_call = {'name': 'get_memories_tool', 'args': {'limit': 5000}, 'id': 'call-1'}
+    return FakeStreamingModel(messages=iter([AIMessage(content='', tool_calls=[tool_call]), AIMessage(content=ANSWER)]))
+
+
+def memory(i: int) -> dict:
+    now = datetime.now(timezone.utc)
+    return {
+        'id': f'memory-{i}',
+        'uid': UID,
+        'content': f'Fact number {i} about the user',
+        'category': 'interesting',
+        'created_at': now,
+        'updated_at': now,
+        'manually_added': i % 10 == 0,
+        'user_review': None,
+        'scoring': f'01_{i:05d}',
+    }
+
+
+MEMORIES = [memory(i) for i in range(300)]
+warm = set()
+
+
+def get_memories_snapshot(uid):
+    # loaded once per worker, then served from memory
+    if uid not in warm:
+        sleep('memories_cold')
+        warm.add(uid)
+    return MEMORIES
+
+
+async def get_enabled_apps(uid):
+    return []
+
+
+def load_app_tools(uid, enabled_app_ids=None):
+    sleep('app_tools')
+    return []
+
+
+def get_user_name(uid, *args, **kwargs):
+    sleep('user_name')
+    return 'Sam'
+
+
+def get_user_time_zone(uid):
+    sleep('time_zone')
+    return 'UTC'
+
+
+def install_fakes():
+    chat.llm_mini = FakeStructuredLLM('extract_question', lambda: chat.OutputQuestion(question=Request.question))
+    chat.llm_mini_deterministic = FakeStructuredLLM(
+        'classify', lambda: chat.RequiresContext(value=Request.requires_context)
+    )
+    chat.llm_mini_stream = FakeStreamingModel(messages=itertools.cycle([AIMessage(content=ANSWER)]))
+    chat.get_user_name = get_user_name
+    llms_memory.get_user_name = get_user_name
+    notification_db.get_user_time_zone = get_user_time_zone
+    memories_db.get_memories_snapshot = get_memories_snapshot
+    agentic.redis_db_async.get_enabled_apps = get_enabled_apps
+    agentic.load_app_tools = load_app_tools
+    prefetch.load_app_tools = load_app_tools
+
+
+async def time_to_first_token(question: str, needs_context: bool) -> float:
+    Request.question, Request.requires_context = question, needs_context
+    agentic.llm_agent_stream = agent_model()
+    warm.clear()
+    messages = [
+        Message(id=str(uuid.uuid4()), text=question, created_at=datetime.now(timezone.utc), sender='human', type='text')
+    ]
+    started = time.perf_counter()
+    first_token = None
+    callback_data = {}
+    async for chunk in graph.execute_graph_chat_stream(UID, messages, callback_data=callback_data):
+        if first_token is None and chunk and chunk.startswith('data: '):
+            first_token = time.perf_counter() - started
+    assert callback_data.get('answer') == ANSWER, callback_data
+    return first_token
+
+
+def percentiles(timings):
+    timings = sorted(timings)
+    return timings[len(timings) // 2] * 1000, timings[min(len(timings) - 1, int(len(timings) * 0.99))] * 1000
+
+
+async def main(n: int):
+    install_fakes()
+    counter = itertools.count()
+    print(f'{n} requests per row, injected latencies (ms): {LATENCY_MS}')
+    for branch, needs_context in [('agent', True), ('simple answer', False)]:
+        for name, enabled in [('sequential', False), ('prefetch', True)]:
+            prefetch.ENABLED = enabled
+            metrics.reset()
+            timings = []
+            for _ in range(n):
+                timings.append(await time_to_first_token(f'Question {next(counter)} about me', needs_context))
+            p50, p99 = percentiles(timings)
+            counters = metrics.snapshot('chat.prefetch.')['counters']
+            print(f'  {branch:14} {name:11} time to first token p50 {p50:8.1f} ms   p99 {p99:8.1f} ms   {counters}')
+
+
+if __name__ == '__main__':
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 10))
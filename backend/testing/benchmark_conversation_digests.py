@@ -0,0 +1,193 @@
+"""
+Benchmark: `get_conversations_tool` for a summary-style call (limit=5000, no transcript segments), latency and tokens
+of the tool output.
+
+Builds one user's conversations as they are stored (compressed transcripts, a share of them at the 'enhanced'
+protection level, i.e. encrypted), with their digests. Firestore reads are replaced with in-memory lookups over the
+stored documents, decoded by the same `prepare_for_read` path, so read latency over the network is not included; the
+bytes each version reads from the store are reported instead. Compares:
+- previous: load the full conversations, decode transcripts, parse them and render every one with
+  `Conversation.conversations_to_string`
+- digests: the tool as it is now, conversation ids then their precomputed digests, rendered up to the token budget
+- digests (no budget): the same, with every digest rendered
+
+Run from backend/: python testing/benchmark_conversation_digests.py [conversations] [calls]
+"""
+
+import json
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import database.conversations as conversations_db  # noqa: E402
+import database.users as users_db  # noqa: E402
+from database.helpers import prepare_for_read  # noqa: E402
+from models.conversation import Conversation  # noqa: E402
+from models.other import Person  # noqa: E402
+from utils.conversations import digests  # noqa: E402
+from utils.llm.clients import num_tokens_from_string  # noqa: E402
+from utils.retrieval.tools.conversation_tools import get_conversations_tool  # noqa: E402
+
+UID = 'bench-user'
+NOW = datetime(2026, 10, 1, tzinfo=timezone.utc)
+WORDS = (
+    'we should probably look at the numbers again before the meeting tomorrow and then decide whether the plan still '
+    'makes sense for the team given everything that happened last week with the launch and the customers'
+).split()
+CATEGORIES = ['personal', 'work', 'business', 'health', 'education', 'social', 'other']
+PEOPLE = [
+    {'id': f'person-{i}', 'name': name, 'created_at': NOW, 'updated_at': NOW}
+    for i, name in enumerate('Priya Mateo Aisha Lars Keiko Tomasz'.split())
+]
+
+
+def sentence(rng: random.Random, n: int) -> str:
+    return ' '.join(rng.choice(WORDS) for _ in range(n)).capitalize() + '.'
+
+
+def synthetic_conversation(rng: random.Random, i: int) -> dict:
+    created_at = NOW - timedelta(minutes=rng.randrange(365 * 24 * 60))
+    segments, start = [], 0.0
+    for _ in range(rng.randint(40, 400)):
+        is_user = rng.random() < 0.5
+        person = None if is_user or rng.random() < 0.5 else rng.choice(PEOPLE)['id']
+        segments.append(
+            {
+                'text': sentence(rng, rng.randint(6, 30)),
+                'speaker': f'SPEAKER_0{int(not is_user)}',
+                'is_user': is_user,
+                'person_id': person,
+                'start': start,
+                'end': start + 6,
+            }
+        )
+        start += 6
+    return {
+        'id': f'conv-{i}',
+        'created_at': created_at,
+        'started_at': created_at,
+        'finished_at': created_at + timedelta(seconds=start),
+        'structured': {
+            'title': sentence(rng, 6)[:-1],
+            'overview': ' '.join(sentence(rng, 15) for _ in range(rng.randint(2, 6))),
+            'emoji': '🧠',
+            'category': rng.choice(CATEGORIES),
+            'action_items': [{'description': sentence(rng, 10)} for _ in range(rng.choice([0, 0, 1, 2, 3]))],
+            'events': [],
+        },
+        'transcript_segments': segments,
+        'discarded': False,
+        'status': 'completed',
+        'data_protection_level': 'enhanced' if rng.random() < 0.3 else 'standard',
+    }
+
+
+def stored_bytes(document: dict) -> int:
+    return sum(len(v) if isinstance(v, (bytes, str)) else len(json.dumps(v, default=str)) for v in document.values())
+
+
+def previous_get_conversations(uid, config, limit, start_dt=None, end_dt=None):
+    """The tool's path before digests, for max_transcript_segments=0."""
+    conversations_data = conversations_db.get_conversations(uid, limit=limit, start_date=start_dt, end_date=end_dt)
+    all_person_ids = set()
+    for conv_data in conversations_data:
+        segments = conv_data.get('transcript_segments', [])
+        all_person_ids.update([s.get('person_id') for s in segments if s.get('person_id')])
+    people = [Person(**p) for p in users_db.get_people_by_ids(uid, list(all_person_ids))]
+    conversations = []
+    for conv_data in conversations_data:
+        conversation = Conversation(**conv_data)
+        conversation.transcript_segments = conversation.transcript_segments[:0]
+        conversations.append(conversation)
+    conversations_collected = config['configurable'].get('conversations_collected', [])
+    for conv in conversations:
+        conv_dict = conv.dict()
+        conv_dict.pop('transcript_segments', None)
+        conversations_collected.append(conv_dict)
+    return Conversation.conversations_to_string(conversations, use_transcript=True, people=people)
+
+
+def measure(fn, calls):
+    timings = []
+    for _ in range(calls):
+        started = time.perf_counter()
+        result = fn()
+        timings.append(time.perf_counter() - started)
+    timings.sort()
+    return timings[len(timings) // 2] * 1000, timings[-1] * 1000, result
+
+
+if __name__ == '__main__':
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    calls = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+    rng = random.Random(5)
+
+    conversations = sorted(
+        (synthetic_conversation(rng, i) for i in range(n)), key=lambda c: c['created_at'], reverse=True
+    )
+    stored = {}
+    for conversation in conversations:
+        level = conversation['data_protection_level']
+        stored[conversation['id']] = conversations_db._prepare_conversation_for_write(conversation, UID, level)
+    digest_store = {}
+    for conversation in conversations:
+        digest = digests.build_digest(
+            Conversation(**conversation),
+            people=[p['name'] for p in rng.sample(PEOPLE, 2)],
+            entities=[rng.choice(WORDS).capitalize() for _ in range(3)],
+        )
+        digest_store[digest.id] = digest.dict()
+
+    read_bytes = {'value': 0}
+
+    def get_conversations(uid, limit=100, offset=0, include_discarded=False, statuses=[], start_date=None, **_):
+        documents = [stored[c['id']] for c in conversations[offset : offset + limit]]
+        read_bytes['value'] += sum(stored_bytes(d) for d in documents)
+        return documents
+
+    def get_conversation_ids(uid, limit=100, offset=0, **_):
+        ids = [c['id'] for c in conversations[offset : offset + limit]]
+        read_bytes['value'] += sum(len(i) + 8 for i in ids)
+        return ids
+
+    def get_conversation_digests(uid, conversation_ids):
+        found = {i: dict(digest_store[i]) for i in conversation_ids if i in digest_store}
+        read_bytes['value'] += sum(stored_bytes(d) for d in found.values())
+        return found
+
+    conversations_db.get_conversations = prepare_for_read(decrypt_func=conversations_db._prepare_conversation_for_read)(
+        get_conversations
+    )
+    conversations_db.get_conversation_ids = get_conversation_ids
+    conversations_db.get_conversation_digests = get_conversation_digests
+    users_db.get_people_by_ids = lambda uid, ids: [p for p in PEOPLE if p['id'] in ids]
+
+    def config():
+        return {'configurable': {'user_id': UID, 'conversations_collected': []}}
+
+    def tool_call():
+        return get_conversations_tool.func(limit=5000, max_transcript_segments=0, config=config())
+
+    def unbudgeted_call():
+        ids = conversations_db.get_conversation_ids(UID, limit=5000)
+        return digests.digests_to_context(digests.get_digests(UID, ids), token_budget=10**9)[0]
+
+    versions = [
+        ('previous', lambda: previous_get_conversations(UID, config(), 5000)),
+        ('digests', tool_call),
+        ('digests (no budget)', unbudgeted_call),
+    ]
+    print(f'{n} conversations, limit=5000, max_transcript_segments=0, token budget {digests.CONTEXT_TOKENS}')
+    for name, fn in versions:
+        read_bytes['value'] = 0
+        p50, worst, result = measure(fn, calls)
+        read = read_bytes['value'] / calls
+        tokens = num_tokens_from_string(result)
+        print(
+            f'  {name:20} p50 {p50:8.1f} ms   max {worst:8.1f} ms   output {tokens:8d} tokens   '
+            f'read {read / 2**20:7.1f} MiB/call'
+        )
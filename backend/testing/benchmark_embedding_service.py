@@ -0,0 +1,125 @@
+"""
+Benchmark: embedding calls through `utils.llm.embedding_service.EmbeddingService` vs one API call per text.
+
+Serves a fake OpenAI `/v1/embeddings` endpoint locally. It answers with deterministic vectors after a fixed
+latency plus a small per-text cost, and counts requests and embedded texts. A burst of concurrent callers
+embeds texts drawn from a small pool (repeated chat questions, topic queries):
+- previous: `OpenAIEmbeddings.embed_documents([text])` per caller
+- service: cached and coalesced into batched calls (in-process tier only, Redis is not needed here)
+- warm: the same burst again, served from the cache
+
+It checks that both return the same vectors.
+
+Run from backend/: python testing/benchmark_embedding_service.py [callers] [distinct_texts]
+"""
+
+import base64
+import json
+import os
+import random
+import sys
+import threading
+import time
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from langchain_openai import OpenAIEmbeddings  # noqa: E402
+
+from utils.llm.embedding_service import EmbeddingService  # noqa: E402
+
+DIMENSIONS = 3072
+CALL_LATENCY = 0.15
+PER_TEXT_LATENCY = 0.002
+
+
+def fake_vector(text: str):
+    rng = random.Random(text)
+    return [rng.uniform(-1, 1) for _ in range(DIMENSIONS)]
+
+
+class EmbeddingsHandler(BaseHTTPRequestHandler):
+    stats = {'requests': 0, 'texts': 0}
+    lock = threading.Lock()
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        texts = body['input'] if isinstance(body['input'], list) else [body['input']]
+        with self.lock:
+            self.stats['requests'] += 1
+            self.stats['texts'] += len(texts)
+        time.sleep(CALL_LATENCY + PER_TEXT_LATENCY * len(texts))
+
+        data = []
+        for i, text in enumerate(texts):
+            vector = array('f', fake_vector(str(text)))
+            if body.get('encoding_format') == 'base64':
+                embedding = base64.b64encode(vector.tobytes()).decode('ascii')
+            else:
+                embedding = vector.tolist()
+            data.append({'object': 'embedding', 'index': i, 'embedding': embedding})
+        payload = json.dumps(
+            {'object': 'list', 'data': data, 'model': body['model'], 'usage': {'prompt_tokens': 0, 'total_tokens': 0}}
+        ).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+def run(name: str, embed, texts):
+    EmbeddingsHandler.stats.update(requests=0, texts=0)
+    latencies = []
+
+    def call(text):
+        started = time.perf_counter()
+        vector = embed(text)
+        latencies.append(time.perf_counter() - started)
+        return vector
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=64) as executor:
+        vectors = list(executor.map(call, texts))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    print(
+        f'  {name:9} {elapsed * 1000:8.0f} ms total, p50 {latencies[len(latencies) // 2] * 1000:6.0f} ms, '
+        f'p99 {latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000:6.0f} ms, '
+        f'{EmbeddingsHandler.stats["requests"]} API calls for {EmbeddingsHandler.stats["texts"]} texts'
+    )
+    return vectors
+
+
+if __name__ == '__main__':
+    callers = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    distinct = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), EmbeddingsHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    client = OpenAIEmbeddings(
+        model='text-embedding-3-large',
+        api_key='fake',
+        base_url=f'http://127.0.0.1:{server.server_port}/v1',
+        check_embedding_ctx_length=False,
+    )
+    service = EmbeddingService('text-embedding-3-large', client.embed_documents, use_redis=False)
+
+    rng = random.Random(5)
+    pool = [f'what did I talk about with person {i} last week?' for i in range(distinct)]
+    texts = [rng.choice(pool) for _ in range(callers)]
+
+    print(f'{callers} concurrent callers, {distinct} distinct texts, {CALL_LATENCY * 1000:.0f} ms per API call')
+    previous = run('previous', lambda text: client.embed_documents([text])[0], texts)
+    cold = run('service', service.embed, texts)
+    run('warm', service.embed, texts)
+
+    assert all(abs(a - b) < 1e-6 for x, y in zip(previous, cold) for a, b in zip(x, y))
+    server.shutdown()
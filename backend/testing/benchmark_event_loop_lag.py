@@ -0,0 +1,88 @@
+"""
+Benchmark: event-loop lag while handlers read Redis.
+
+Many concurrent "handlers" each run a webhook lookup (status + url) in a loop. A probe coroutine sleeps 5ms at a
+time and records how late it wakes up, which is how long the loop was blocked. Compares:
+- the sync `database.redis_db` helpers called from coroutines (previous behaviour),
+- `database.redis_db_async` with one pipelined round trip per lookup.
+
+Runs against a local Redis (REDIS_DB_HOST/REDIS_DB_PORT/REDIS_DB_PASSWORD, e.g. `docker run -p 6379:6379 redis`).
+
+Run from backend/: REDIS_DB_HOST=localhost python testing/benchmark_event_loop_lag.py [handlers] [lookups]
+"""
+
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from database import redis_db, redis_db_async  # noqa: E402
+from models.users import WebhookType  # noqa: E402
+
+UIDS = [f'loop-lag-bench-{i}' for i in range(50)]
+
+
+def seed():
+    for uid in UIDS:
+        redis_db.set_user_webhook_db(uid, WebhookType.realtime_transcript, 'https://example.com/hook')
+        redis_db.enable_user_webhook_db(uid, WebhookType.realtime_transcript)
+
+
+async def sync_handler(uid: str, lookups: int):
+    for _ in range(lookups):
+        if redis_db.user_webhook_status_db(uid, WebhookType.realtime_transcript):
+            redis_db.get_user_webhook_db(uid, WebhookType.realtime_transcript)
+        await asyncio.sleep(0)
+
+
+async def async_handler(uid: str, lookups: int):
+    for _ in range(lookups):
+        await redis_db_async.get_user_webhook_with_status(uid, WebhookType.realtime_transcript)
+
+
+async def probe(lags: list, stop: asyncio.Event, interval: float = 0.005):
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        lags.append(time.perf_counter() - started - interval)
+
+
+async def run(handler, handlers: int, lookups: int):
+    lags, stop = [], asyncio.Event()
+    probe_task = asyncio.create_task(probe(lags, stop))
+    started = time.perf_counter()
+    await asyncio.gather(*[handler(UIDS[i % len(UIDS)], lookups) for i in range(handlers)])
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await probe_task
+
+    lags.sort()
+    if not lags:
+        # the probe never got to run, the loop was blocked for the whole run
+        lags = [elapsed]
+    return {
+        'throughput': handlers * lookups / elapsed,
+        'p50_ms': lags[len(lags) // 2] * 1000,
+        'p99_ms': lags[min(len(lags) - 1, int(len(lags) * 0.99))] * 1000,
+        'max_ms': lags[-1] * 1000,
+    }
+
+
+async def main(handlers: int, lookups: int):
+    seed()
+    for name, handler in [('sync client ', sync_handler), ('async client', async_handler)]:
+        stats = await run(handler, handlers, lookups)
+        print(
+            f'{name}: {stats["throughput"]:8.0f} lookups/s, loop lag p50 {stats["p50_ms"]:7.2f} ms, '
+            f'p99 {stats["p99_ms"]:7.2f} ms, max {stats["max_ms"]:7.2f} ms'
+        )
+    await redis_db_async.close()
+
+
+if __name__ == '__main__':
+    handlers = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    lookups = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    print(f'{handlers} concurrent handlers x {lookups} webhook lookups')
+    asyncio.run(main(handlers, lookups))
@@ -0,0 +1,226 @@
+"""
+Offline evaluation: dense vs lexical vs hybrid (reciprocal rank fusion) conversation retrieval.
+
+Generates synthetic users. Each conversation is about one or two concepts (fitness, finance, ...), written with
+varying synonyms, and may mention people and project code names in its title, overview and memories. Dense
+retrieval uses `database.local_vector_index.LocalVectorIndex` with a deterministic offline embedder. Like real
+embeddings, it maps synonyms and paraphrases of a concept close together and blurs rare proper nouns. Lexical
+retrieval is `utils.retrieval.lexical`, built from the same conversations and memories through its Firestore reads,
+which are replaced here with the synthetic data.
+
+Reports recall@k per query type (person name, project name, paraphrased concept) for each method, plus retrieval
+latency and index build time.
+
+Run from backend/: python testing/benchmark_hybrid_retrieval.py [users] [conversations_per_user] [queries_per_user]
+"""
+
+import hashlib
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import numpy as np  # noqa: E402
+
+import database.conversations as conversations_db  # noqa: E402
+import database.memories as memories_db  # noqa: E402
+import database.vector_db as vector_db  # noqa: E402
+from database.local_vector_index import LocalVectorIndex  # noqa: E402
+from utils.retrieval import hybrid, lexical  # noqa: E402
+
+DIMENSIONS = 256
+KS = (5, 10)
+CONCEPTS = {
+    'fitness': ['workout', 'gym', 'exercise', 'running', 'training', 'marathon'],
+    'finance': ['budget', 'expenses', 'savings', 'investment', 'taxes', 'mortgage'],
+    'travel': ['trip', 'flight', 'vacation', 'itinerary', 'hotel', 'passport'],
+    'cooking': ['recipe', 'dinner', 'baking', 'groceries', 'meal', 'kitchen'],
+    'career': ['promotion', 'interview', 'resume', 'salary', 'manager', 'hiring'],
+    'health': ['doctor', 'sleep', 'medication', 'therapy', 'symptoms', 'checkup'],
+    'family': ['kids', 'parents', 'wedding', 'birthday', 'sister', 'anniversary'],
+    'music': ['guitar', 'concert', 'playlist', 'band', 'album', 'rehearsal'],
+    'software': ['deploy', 'bug', 'database', 'refactor', 'release', 'latency'],
+    'home': ['renovation', 'furniture', 'garden', 'plumber', 'lease', 'moving'],
+}
+# how users ask about a concept, in words the conversations never use
+CONCEPT_PARAPHRASES = {
+    'fitness': ['staying in shape', 'physical activity'],
+    'finance': ['money situation', 'personal spending'],
+    'travel': ['going abroad', 'getting away'],
+    'cooking': ['what to eat', 'preparing food'],
+    'career': ['my job', 'work prospects'],
+    'health': ['feeling unwell', 'medical stuff'],
+    'family': ['relatives', 'my household'],
+    'music': ['songs', 'playing an instrument'],
+    'software': ['coding work', 'the codebase'],
+    'home': ['my apartment', 'fixing up the house'],
+}
+FIRST_NAMES = 'Priya Mateo Aisha Lars Keiko Tomasz Amara Diego Ingrid Ravi Noor Elena Kwame Sofia Hugo Mina'.split()
+LAST_NAMES = 'Raman Okafor Lindqvist Haddad Nakamura Kowalski Mensah Castillo Berg Iyer Petrov Santos'.split()
+PROJECTS = 'Falcon Juniper Aurora Basalt Cobalt Meridian Orchid Quartz Sequoia Tundra Zephyr Halcyon'.split()
+FILLER = 'talked about next steps and agreed to follow up later this week after checking the details'.split()
+
+_concept_of = {word: concept for concept, words in CONCEPTS.items() for word in words}
+_concept_of.update(
+    {
+        token: concept
+        for concept, phrases in CONCEPT_PARAPHRASES.items()
+        for phrase in phrases
+        for token in phrase.split()
+        if token not in ('in', 'my', 'to', 'the', 'an', 'up', 'what')
+    }
+)
+_proper_nouns = {name.lower() for name in FIRST_NAMES + LAST_NAMES + PROJECTS}
+
+
+def _hashed_vector(token: str) -> np.ndarray:
+    seed = int.from_bytes(hashlib.sha256(token.encode('utf-8')).digest()[:8], 'little')
+    return np.random.default_rng(seed).standard_normal(DIMENSIONS).astype(np.float32)
+
+
+class ConceptEmbedder:
+    """Offline stand-in for the embeddings API: concept synonyms share a direction, names only partly register."""
+
+    def embed(self, text: str):
+        vector = np.zeros(DIMENSIONS, dtype=np.float32)
+        for token in lexical.tokenize(text):
+            if token in _concept_of:
+                vector += _hashed_vector('concept:' + _concept_of[token])
+            elif token in _proper_nouns:
+                vector += 0.4 * _hashed_vector(token)
+            else:
+                vector += 0.1 * _hashed_vector(token)
+        return (vector / (np.linalg.norm(vector) or 1)).tolist()
+
+
+def synthetic_user(rng: random.Random, uid: str, n_conversations: int):
+    people = [f'{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}' for _ in range(25)]
+    projects = rng.sample(PROJECTS, 6)
+    now = datetime(2026, 10, 1, tzinfo=timezone.utc)
+    conversations, memories = [], []
+    for i in range(n_conversations):
+        concepts = rng.sample(list(CONCEPTS), rng.choice([1, 1, 2]))
+        words = [rng.choice(CONCEPTS[concept]) for concept in concepts for _ in range(3)]
+        mentioned = rng.sample(people, rng.choice([0, 0, 1, 2]))
+        project = rng.choice(projects) if rng.random() < 0.2 else None
+        title = f'{words[0].title()} {words[1]}' + (f' with {mentioned[0]}' if mentioned else '')
+        overview = ' '.join(
+            [f'Discussed {words[2]} and {words[-1]}.']
+            + [f'{person} shared thoughts on the {rng.choice(words)}.' for person in mentioned[1:]]
+            + ([f'Project {project} came up regarding {rng.choice(words)}.'] if project else [])
+            + [' '.join(rng.sample(FILLER, 8))]
+        )
+        conversation_id = f'conv{i}'
+        conversations.append(
+            {
+                'id': conversation_id,
+                'created_at': now - timedelta(hours=rng.randrange(24 * 365)),
+                'structured': {'title': title, 'overview': overview},
+                'concepts': set(concepts),
+                'people': set(mentioned),
+                'project': project,
+            }
+        )
+        for person in mentioned[:1]:
+            memories.append({'conversation_id': conversation_id, 'content': f'{person} cares about {words[-1]}'})
+    return people, projects, conversations, memories
+
+
+def make_queries(rng: random.Random, people, projects, conversations, n: int):
+    queries = []
+    for _ in range(n):
+        kind = rng.choice(['person', 'project', 'concept'])
+        if kind == 'person':
+            person = rng.choice(people)
+            relevant = {c['id'] for c in conversations if person in c['people']}
+            text = f'what did {person} and I talk about'
+        elif kind == 'project':
+            project = rng.choice(projects)
+            relevant = {c['id'] for c in conversations if c['project'] == project}
+            text = f'any updates on project {project}'
+        else:
+            concept = rng.choice(list(CONCEPTS))
+            relevant = {c['id'] for c in conversations if concept in c['concepts']}
+            text = f'anything about {rng.choice(CONCEPT_PARAPHRASES[concept])} lately'
+        if relevant:
+            queries.append((kind, text, relevant))
+    return queries
+
+
+def percentiles(timings):
+    timings = sorted(timings)
+    return timings[len(timings) // 2] * 1000, timings[min(len(timings) - 1, int(len(timings) * 0.99))] * 1000
+
+
+if __name__ == '__main__':
+    n_users = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    n_conversations = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+    n_queries = int(sys.argv[3]) if len(sys.argv) > 3 else 60
+    rng = random.Random(11)
+
+    embedder = ConceptEmbedder()
+    vector_db.embedding_service = embedder
+    vector_db.index = LocalVectorIndex(tempfile.mkdtemp(prefix='hybrid-bench-'), flush_seconds=0)
+
+    users = {}
+    for u in range(n_users):
+        uid = f'user{u}'
+        people, projects, conversations, memories = synthetic_user(rng, uid, n_conversations)
+        users[uid] = (conversations, memories)
+        vector_db.index.upsert(
+            vectors=[
+                {
+                    'id': f'{uid}-{c["id"]}',
+                    'values': embedder.embed(c['structured']['title'] + '\n' + c['structured']['overview']),
+                    'metadata': {'uid': uid, 'memory_id': c['id'], 'created_at': int(c['created_at'].timestamp())},
+                }
+                for c in conversations
+            ],
+            namespace='ns1',
+        )
+        users[uid] += (make_queries(rng, people, projects, conversations, n_queries),)
+
+    conversations_db.get_conversations_search_fields = lambda uid: users[uid][0]
+    memories_db.get_memories_search_fields = lambda uid: users[uid][1]
+
+    build_timings = []
+    for uid in users:
+        started = time.perf_counter()
+        lexical.get_user_index(uid)
+        build_timings.append(time.perf_counter() - started)
+
+    methods = {
+        'dense': lambda uid, q, k: vector_db.query_vectors(q, uid, k=k),
+        'lexical': lambda uid, q, k: lexical.search_conversations(uid, q, k),
+        'hybrid': lambda uid, q, k: hybrid.search_conversations(uid, q, k=k),
+    }
+    hits = defaultdict(float)
+    counts = defaultdict(int)
+    timings = defaultdict(list)
+    for uid, (_, _, queries) in users.items():
+        for kind, text, relevant in queries:
+            counts[kind] += 1
+            for name, search in methods.items():
+                started = time.perf_counter()
+                found = search(uid, text, max(KS))
+                timings[name].append(time.perf_counter() - started)
+                for k in KS:
+                    hits[(name, kind, k)] += len(set(found[:k]) & relevant) / min(k, len(relevant))
+
+    print(f'{n_users} users x {n_conversations} conversations, {sum(counts.values())} queries')
+    p50, p99 = percentiles(build_timings)
+    print(f'lexical index build per user: p50 {p50:.1f} ms, p99 {p99:.1f} ms')
+    header = ''.join(f'{kind + f" @{k}":>14}' for kind in counts for k in KS)
+    print(f'recall          {header}')
+    for name in methods:
+        row = ''.join(f'{hits[(name, kind, k)] / counts[kind]:14.3f}' for kind in counts for k in KS)
+        print(f'  {name:13} {row}')
+    print('latency (search only, warm lexical index)')
+    for name in methods:
+        p50, p99 = percentiles(timings[name])
+        print(f'  {name:13} p50 {p50:7.2f} ms   p99 {p99:7.2f} ms')
@@ -0,0 +1,139 @@
+"""
+Benchmark: recall and latency of `database.local_vector_index.LocalVectorIndex` on CPU.
+
+Upserts N synthetic vectors for one user (clustered, like real embeddings, with `created_at` spread over a year),
+then runs noisy copies of stored vectors as queries and compares against the exact scan:
+- exact: brute-force cosine scan of the partition
+- ivf: the inverted file index at several `nprobe` values, recall@10 against the exact top 10
+- filtered: `query_vectors`-style filter (uid + last 30 days)
+Also times flushing the partition to disk and loading it back.
+
+One user holding all N vectors is the worst case, real partitions are per user and much smaller. The default
+dimension is reduced from the 3072 of text-embedding-3-large so 1M vectors fit in memory on a small machine.
+
+Run from backend/: python testing/benchmark_local_vector_index.py [vectors] [dimensions] [queries]
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import numpy as np  # noqa: E402
+
+from database.local_vector_index import LocalVectorIndex  # noqa: E402
+
+UID = 'bench-user'
+TOP_K = 10
+NOW = 1_760_000_000
+YEAR = 365 * 24 * 3600
+
+
+def percentiles(timings):
+    timings = sorted(timings)
+    return timings[len(timings) // 2] * 1000, timings[min(len(timings) - 1, int(len(timings) * 0.99))] * 1000
+
+
+def synthetic(rng, centers: np.ndarray, n: int) -> np.ndarray:
+    noise = 0.8 * rng.standard_normal((n, centers.shape[1])).astype(np.float32)
+    return centers[rng.integers(0, len(centers), n)] + noise
+
+
+def exact_top(partition, query, rows=None) -> set:
+    if rows is None:
+        rows = np.arange(partition.count)
+        scores = partition.vectors[: partition.count] @ query
+    else:
+        scores = partition.vectors[rows] @ query
+    return set(rows[np.argpartition(-scores, TOP_K - 1)[:TOP_K]].tolist())
+
+
+def run_queries(index, queries, filter_for):
+    timings, results = [], []
+    for i, query in enumerate(queries):
+        started = time.perf_counter()
+        matches = index.query(vector=query, top_k=TOP_K, filter=filter_for(i), namespace='ns1')['matches']
+        timings.append(time.perf_counter() - started)
+        results.append({m['id'] for m in matches})
+    return timings, results
+
+
+def recall(results, truths) -> float:
+    return sum(len(r & t) for r, t in zip(results, truths)) / sum(len(t) for t in truths)
+
+
+if __name__ == '__main__':
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    dims = int(sys.argv[2]) if len(sys.argv) > 2 else 128
+    n_queries = int(sys.argv[3]) if len(sys.argv) > 3 else 200
+    rng = np.random.default_rng(7)
+    path = tempfile.mkdtemp(prefix='vector-index-bench-')
+    index = LocalVectorIndex(path, flush_seconds=0)
+
+    centers = rng.standard_normal((5000, dims)).astype(np.float32)
+    started = time.perf_counter()
+    batch = 50_000
+    for start in range(0, n, batch):
+        vectors = synthetic(rng, centers, min(batch, n - start))
+        created = rng.integers(NOW - YEAR, NOW, len(vectors))
+        index.upsert(
+            vectors=[
+                {
+                    'id': f'{UID}-conv-{start + i}',
+                    'values': vector,
+                    'metadata': {'uid': UID, 'memory_id': f'conv-{start + i}', 'created_at': int(created[i])},
+                }
+                for i, vector in enumerate(vectors)
+            ],
+            namespace='ns1',
+        )
+    partition = index._partition('ns1', UID)
+    built = time.perf_counter() - started
+    print(f'{n} vectors x {dims} dims, {len(partition.lists)} IVF lists, built in {built:.1f} s')
+
+    picks = rng.integers(0, partition.count, n_queries)
+    queries = partition.vectors[picks] + 0.05 * rng.standard_normal((n_queries, dims)).astype(np.float32)
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+    ids = np.array(partition.ids)
+
+    timings = []
+    truths = []
+    for query in queries:
+        started = time.perf_counter()
+        truths.append(set(ids[list(exact_top(partition, query))].tolist()))
+        timings.append(time.perf_counter() - started)
+    p50, p99 = percentiles(timings)
+    print(f'  exact scan         p50 {p50:8.2f} ms   p99 {p99:8.2f} ms   recall@{TOP_K} 1.000')
+
+    for nprobe in (8, 16, 32, 64):
+        index.nprobe = nprobe
+        timings, results = run_queries(index, queries, lambda i: {'uid': UID})
+        p50, p99 = percentiles(timings)
+        print(
+            f'  ivf nprobe={nprobe:<3}     p50 {p50:8.2f} ms   p99 {p99:8.2f} ms   '
+            f'recall@{TOP_K} {recall(results, truths):.3f}'
+        )
+
+    index.nprobe = 32
+    window = {'$gte': NOW - 30 * 24 * 3600, '$lte': NOW}
+    in_window = np.flatnonzero(
+        (partition.columns['created_at'][: partition.count] >= window['$gte'])
+        & (partition.columns['created_at'][: partition.count] <= window['$lte'])
+    )
+    filtered_truths = [set(ids[list(exact_top(partition, query, in_window))].tolist()) for query in queries]
+    timings, results = run_queries(index, queries, lambda i: {'uid': UID, 'created_at': window})
+    p50, p99 = percentiles(timings)
+    print(
+        f'  filtered (30 days) p50 {p50:8.2f} ms   p99 {p99:8.2f} ms   '
+        f'recall@{TOP_K} {recall(results, filtered_truths):.3f}   ({len(in_window)} vectors in range)'
+    )
+
+    started = time.perf_counter()
+    index.flush()
+    flushed = time.perf_counter() - started
+    started = time.perf_counter()
+    reloaded = LocalVectorIndex(path, flush_seconds=0)
+    assert reloaded.query(vector=queries[0], top_k=TOP_K, filter={'uid': UID}, namespace='ns1')['matches']
+    print(f'  flush {flushed:.2f} s, reload + first query {time.perf_counter() - started:.2f} s')
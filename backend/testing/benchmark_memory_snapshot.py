@@ -0,0 +1,124 @@
+"""
+Benchmark: `get_memories` read latency for a user with many memories, at the limits its callers use (5000 for
+`get_memories_tool`, 250 for persona prompts, 100 for memory extraction).
+
+Builds one user's memories as they are stored (a share of them at the 'enhanced' protection level, i.e. encrypted).
+Firestore reads are replaced with in-memory reads of the stored documents, so read latency over the network is not
+included; the bytes each version reads from Firestore are reported instead. Redis is real and must be reachable
+(REDIS_DB_HOST / REDIS_DB_PORT). Compares:
+- previous: stream the ordered documents, decrypt them with `prepare_for_read` and filter user reviews
+- snapshot (local): the user's snapshot is loaded in this process, a read checks its version in Redis
+- snapshot (redis): another process wrote it, the snapshot is loaded from Redis and decrypted
+- snapshot (build): nothing is cached, the snapshot is built from Firestore and stored
+
+Run from backend/: python testing/benchmark_memory_snapshot.py [memories] [calls]
+"""
+
+import json
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import database.memories as memories_db  # noqa: E402
+from database.helpers import prepare_for_read  # noqa: E402
+
+UID = 'bench-user'
+NOW = datetime(2026, 10, 1, tzinfo=timezone.utc)
+WORDS = (
+    'likes hiking on weekends works as a product designer in berlin prefers tea over coffee is learning spanish '
+    'has a sister named anna plays guitar wants to run a marathon next spring'
+).split()
+CATEGORIES = ['interesting', 'system', 'manual', 'core', 'hobbies', 'work', 'skills', 'habits']
+
+
+def synthetic_memory(rng: random.Random, i: int) -> dict:
+    created_at = NOW - timedelta(minutes=rng.randrange(2 * 365 * 24 * 60))
+    category = rng.choice(CATEGORIES)
+    return {
+        'id': f'memory-{i}',
+        'uid': UID,
+        'content': ' '.join(rng.choice(WORDS) for _ in range(rng.randint(6, 20))).capitalize(),
+        'category': category,
+        'visibility': rng.choice(['public', 'private']),
+        'tags': [],
+        'created_at': created_at,
+        'updated_at': created_at,
+        'memory_id': f'conv-{rng.randrange(2000)}',
+        'conversation_id': None,
+        'reviewed': False,
+        'user_review': False if rng.random() < 0.03 else None,
+        'manually_added': category == 'manual',
+        'edited': False,
+        'scoring': f"{int(category != 'system')}_{rng.randrange(10)}_{int(created_at.timestamp()):012d}",
+        'app_id': None,
+        'data_protection_level': 'enhanced' if rng.random() < 0.3 else 'standard',
+        'is_locked': False,
+    }
+
+
+def stored_bytes(document: dict) -> int:
+    return len(json.dumps(document, default=str))
+
+
+def measure(fn, calls, before=None):
+    timings = []
+    for _ in range(calls):
+        if before:
+            before()
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    timings.sort()
+    return timings[len(timings) // 2] * 1000, timings[min(len(timings) - 1, int(len(timings) * 0.99))] * 1000
+
+
+if __name__ == '__main__':
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    calls = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    rng = random.Random(5)
+
+    memories = [synthetic_memory(rng, i) for i in range(n)]
+    stored = [memories_db._prepare_data_for_write(m, UID, m['data_protection_level']) for m in memories]
+    # Firestore's order for the previous query
+    ordered = sorted(stored, key=lambda m: (m['scoring'], m['created_at']), reverse=True)
+    read_bytes = {'value': 0}
+
+    def stream_stored_memories(uid):
+        read_bytes['value'] += sum(stored_bytes(m) for m in stored)
+        return [dict(m) for m in stored]
+
+    @prepare_for_read(decrypt_func=memories_db._prepare_memory_for_read)
+    def previous_get_memories(uid, limit=100, offset=0):
+        documents = [dict(m) for m in ordered[offset : offset + limit]]
+        read_bytes['value'] += sum(stored_bytes(m) for m in documents)
+        return [m for m in documents if m['user_review'] is not False]
+
+    memories_db._stream_stored_memories = stream_stored_memories
+    memories_db.invalidate_memories_snapshot(UID)
+
+    def drop_local():
+        memories_db._snapshots.clear()
+
+    def drop_all():
+        memories_db.invalidate_memories_snapshot(UID)
+
+    print(f'{n} memories, {calls} calls each')
+    for limit in (5000, 250, 100):
+        memories_db.get_memories(UID, limit=limit)
+        versions = [
+            ('previous', lambda: previous_get_memories(UID, limit=limit), None),
+            ('snapshot (local)', lambda: memories_db.get_memories(UID, limit=limit), None),
+            ('snapshot (redis)', lambda: memories_db.get_memories(UID, limit=limit), drop_local),
+            ('snapshot (build)', lambda: memories_db.get_memories(UID, limit=limit), drop_all),
+        ]
+        print(f'limit={limit}')
+        for name, fn, before in versions:
+            read_bytes['value'] = 0
+            p50, p99 = measure(fn, calls, before)
+            read = read_bytes['value'] / calls
+            print(f'  {name:18} p50 {p50:8.2f} ms   p99 {p99:8.2f} ms   firestore read {read / 2**20:6.2f} MiB/call')
+    memories_db.invalidate_memories_snapshot(UID)
@@ -0,0 +1,193 @@
+"""
+Benchmark: 500 conversations closing at once through `process_conversation`, a thread per post-processing task vs the
+bounded task runner (utils/other/task_runner.py).
+
+The conversation is structured beforehand; everything after that is a local fake with injected latency: the app
+prompt the request waits for (on its own thread in both versions, the previous one started a thread and joined it),
+and the vector, memories, trends, action items, webhook and persona tasks that follow.
+Closes come from a pool of request threads, like the server's, all submitted at once. Each version runs in its own
+process and reports:
+- peak count of the threads doing post-processing (not the request threads), sampled every millisecond
+- peak resident memory (VmHWM)
+- close latency, what the request waits for
+- time until every background task finished
+
+Run from backend/: python testing/benchmark_post_conversation_burst.py [closes] [request_threads]
+"""
+
+import os
+import subprocess
+import sys
+import threading
+import time
+import types
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+LATENCY_MS = {
+    'app': 80,
+    'vector': 30,
+    'memories': 150,
+    'trends': 80,
+    'action_items': 20,
+    'webhook': 30,
+    'personas': 200,
+}
+UID = 'bench-user'
+
+
+def sleep(name: str):
+    time.sleep(LATENCY_MS[name] / 1000)
+
+
+class ThreadPerTaskGroup:
+    """What process_conversation did before: a thread per task."""
+
+    def __init__(self, runner, label):
+        pass
+
+    def submit(self, stage, fn, *args, **kwargs):
+        threading.Thread(target=fn, args=args, kwargs=kwargs).start()
+
+
+def peak_rss_mib() -> float:
+    with open('/proc/self/status') as status:
+        for line in status:
+            if line.startswith('VmHWM:'):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def run(version: str, closes: int, request_threads: int):
+    import utils.conversations.process_conversation as pc
+    from models.conversation import CreateConversation, Structured
+    from models.transcript_segment import TranscriptSegment
+
+    pending = {'count': 0}
+    lock = threading.Lock()
+
+    def background(name):
+        def task(*args, **kwargs):
+            sleep(name)
+            with lock:
+                pending['count'] -= 1
+
+        return task
+
+    def counted(submit):
+        def wrapper(stage, fn, *args, **kwargs):
+            with lock:
+                pending['count'] += 1
+            return submit(stage, fn, *args, **kwargs)
+
+        return wrapper
+
+    summary_app = types.SimpleNamespace(id='summary_assistant', name='Summary')
+    pc._get_structured = lambda *args, **kwargs: (Structured(title='Weekly sync', overview='Plans for the week'), False)
+    pc.get_available_apps = lambda uid: []
+    pc.get_default_conversation_summarized_apps = lambda: [summary_app]
+    pc.redis_db.get_user_preferred_app = lambda uid: summary_app.id
+    pc.get_app_result = lambda *args, **kwargs: sleep('app') or 'Summary of the conversation'
+    pc.record_app_usage = lambda *args, **kwargs: None
+    pc.record_usage = lambda *args, **kwargs: None
+    pc.conversations_db.upsert_conversation = lambda *args, **kwargs: None
+    for name, attribute in [
+        ('vector', 'save_structured_vector'),
+        ('memories', '_extract_memories'),
+        ('trends', '_extract_trends'),
+        ('action_items', '_save_action_items'),
+        ('webhook', 'conversation_created_webhook'),
+        ('personas', '_update_personas'),
+    ]:
+        setattr(pc, attribute, background(name))
+
+    if version == 'previous':
+        pc.TaskGroup = ThreadPerTaskGroup
+    group_class = pc.TaskGroup
+
+    class CountedGroup(group_class):
+        def __init__(self, runner, label):
+            super().__init__(runner, label)
+            self.submit = counted(super().submit)
+
+    pc.TaskGroup = CountedGroup
+
+    now = datetime.now(timezone.utc)
+    segments = [
+        TranscriptSegment(
+            id=str(uuid.uuid4()), text=f'line {i}', speaker='SPEAKER_00', is_user=False, start=i, end=i + 1
+        )
+        for i in range(20)
+    ]
+
+    def close(_):
+        started = time.perf_counter()
+        conversation = CreateConversation(started_at=now, finished_at=now, transcript_segments=segments)
+        pc.process_conversation(UID, 'en', conversation)
+        return time.perf_counter() - started
+
+    baseline = {t.ident for t in threading.enumerate()}
+    peak = {'threads': 0}
+    sampling = threading.Event()
+
+    def sample():
+        # threads started for the burst, other than the request threads
+        while not sampling.is_set():
+            threads = [t for t in threading.enumerate() if t.ident not in baseline and not t.name.startswith('request')]
+            peak['threads'] = max(peak['threads'], len(threads) - 1)
+            time.sleep(0.001)
+
+    sampler = threading.Thread(target=sample, daemon=True)
+    sampler.start()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=request_threads, thread_name_prefix='request') as requests:
+        latencies = sorted(requests.map(close, range(closes)))
+    while True:
+        with lock:
+            if pending['count'] == 0:
+                break
+        time.sleep(0.005)
+    total = time.perf_counter() - started
+    sampling.set()
+
+    p50 = latencies[len(latencies) // 2] * 1000
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000
+    print(
+        f'  {version:8} peak background threads {peak["threads"]:5d}   peak RSS {peak_rss_mib():7.1f} MiB   '
+        f'close p50 {p50:7.1f} ms   p99 {p99:7.1f} ms   all background work done in {total:5.2f} s',
+        flush=True,
+    )
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] == '--run':
+        # quiet the per-conversation logs of process_conversation
+        with open(os.devnull, 'w') as devnull:
+            stdout, sys.stdout = sys.stdout, devnull
+            try:
+                import utils.conversations.process_conversation  # noqa: F401
+            finally:
+                sys.stdout = stdout
+        version, closes, request_threads = sys.argv[2], int(sys.argv[3]), int(sys.argv[4])
+        real_print = print
+
+        def print(*args, **kwargs):  # noqa: A001
+            if args and isinstance(args[0], str) and args[0].startswith('  '):
+                real_print(*args, **kwargs)
+
+        import builtins
+
+        builtins.print = print
+        run(version, closes, request_threads)
+        sys.exit(0)
+
+    closes = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    request_threads = int(sys.argv[2]) if len(sys.argv) > 2 else 40
+    print(f'{closes} conversation closes from {request_threads} request threads, injected latencies (ms): {LATENCY_MS}')
+    for version in ('previous', 'runner'):
+        subprocess.run(
+            [sys.executable, __file__, '--run', version, str(closes), str(request_threads)], check=True, env=os.environ
+        )
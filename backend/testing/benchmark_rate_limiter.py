@@ -0,0 +1,69 @@
+"""
+Benchmark and check of the sliding-window rate limiter.
+
+Runs against a local Redis (REDIS_DB_HOST/REDIS_DB_PORT/REDIS_DB_PASSWORD, e.g. `docker run -p 6379:6379 redis`):
+1. simulates several workers hitting the same endpoint concurrently and checks the limit holds globally,
+2. measures limiter overhead per request for the Redis script and the in-process fallback.
+
+Run from backend/: REDIS_DB_HOST=localhost python testing/benchmark_rate_limiter.py
+"""
+
+import os
+import sys
+import threading
+import time
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from fastapi import HTTPException  # noqa: E402
+
+from database import redis_db  # noqa: E402
+from utils.other import endpoints, metrics  # noqa: E402
+
+
+def fake_request(ip: str):
+    return SimpleNamespace(client=SimpleNamespace(host=ip))
+
+
+def check_global_limit(workers: int = 8, attempts_per_worker: int = 50, limit: int = 100):
+    endpoint = f'bench-{time.time()}'
+    accepted = [0] * workers
+
+    def worker(i):
+        for _ in range(attempts_per_worker):
+            try:
+                endpoints.rate_limit_custom(endpoint, fake_request('10.0.0.1'), limit, 60)
+                accepted[i] += 1
+            except HTTPException:
+                pass
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(workers)]
+    [t.start() for t in threads]
+    [t.join() for t in threads]
+    total = sum(accepted)
+    print(f'{workers} workers x {attempts_per_worker} attempts, limit {limit}: accepted {total}')
+    assert total == limit, f'expected exactly {limit} accepted requests, got {total}'
+
+
+def overhead(requests: int = 5000):
+    metrics.reset()
+    for i in range(requests):
+        endpoints.rate_limit_custom('bench-overhead', fake_request(f'10.1.{i % 250}.{i % 200}'), 10**9, 60)
+    return metrics.snapshot('rate_limit.')['latencies']['rate_limit.check']
+
+
+if __name__ == '__main__':
+    if not redis_db.r.ping():
+        sys.exit('local Redis not reachable')
+
+    check_global_limit()
+    print('redis script  ', overhead())
+
+    # force the in-process fallback
+    original = redis_db.check_sliding_window_rate_limit
+    redis_db.check_sliding_window_rate_limit = lambda *args, **kwargs: None
+    try:
+        print('in-process    ', overhead())
+    finally:
+        redis_db.check_sliding_window_rate_limit = original
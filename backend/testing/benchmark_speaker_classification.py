@@ -0,0 +1,217 @@
+"""
+Benchmark: per-conversation speaker classification latency against the number of known people.
+
+Times the whole path of the speech profile endpoint for N people:
+- current: `get_reference_embeddings` (embeddings cached in the bucket at upload time), then `classify_segments`
+  from modal/speech_profile_modal.py, i.e. one decode, `embed_chunks` in batches and `score_against_references`
+- previous: `classify_segments` as it was, one `verify_files` per 30s chunk and per reference (user + people), each
+  call loading and embedding both files
+
+The speechbrain model is replaced with a tiny torch encoder (framing, projection, mean pooling) that exposes the
+`load_audio`, `encode_batch` and `verify_files` calls the endpoint uses, so the numbers measure the work around the
+model rather than the ECAPA network itself; the real model only makes each embedding more expensive. Storage is an
+in-memory bucket. The previous flow gets its reference recordings already on disk, its downloads aren't counted.
+
+Run from backend/: python testing/benchmark_speaker_classification.py [minutes]
+"""
+
+import contextlib
+import importlib.util
+import io
+import os
+import sys
+import tempfile
+import time
+import types
+import wave
+from unittest.mock import MagicMock
+
+import numpy as np
+import torch
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from pydub import AudioSegment  # noqa: E402
+
+import utils.other.storage as storage  # noqa: E402
+from utils.stt.speech_profile import get_reference_embeddings  # noqa: E402
+
+UID = 'bench-user'
+SAMPLE_RATE = 16000
+EMBEDDING_DIM = 192  # spkrec-ecapa-voxceleb
+FRAME, HOP = 400, 160
+
+
+class TinyEncoder:
+    """Stands in for speechbrain's SpeakerRecognition with the same call shapes."""
+
+    def __init__(self):
+        generator = torch.Generator().manual_seed(0)
+        self.frames = torch.randn(FRAME, 64, generator=generator) / FRAME**0.5
+        self.output = torch.randn(64, EMBEDDING_DIM, generator=generator) / 8
+
+    @classmethod
+    def from_hparams(cls, **kwargs):
+        return cls()
+
+    def load_audio(self, path: str) -> torch.Tensor:
+        aseg = AudioSegment.from_wav(path).set_frame_rate(SAMPLE_RATE).set_channels(1).set_sample_width(2)
+        return torch.tensor(aseg.get_array_of_samples(), dtype=torch.float32) / 32768.0
+
+    def encode_batch(self, wavs: torch.Tensor, wav_lens: torch.Tensor = None) -> torch.Tensor:
+        if wav_lens is None:
+            wav_lens = torch.ones(len(wavs))
+        frames = torch.relu(wavs.unfold(1, FRAME, HOP) @ self.frames)
+        valid = (torch.arange(frames.shape[1]) < (wav_lens * frames.shape[1]).unsqueeze(1)).unsqueeze(2)
+        pooled = (frames * valid).sum(1) / valid.sum(1).clamp(min=1)
+        return (pooled @ self.output).unsqueeze(1)
+
+    def verify_files(self, path_x: str, path_y: str, threshold: float = 0.25):
+        x = self.encode_batch(self.load_audio(path_x).unsqueeze(0)).squeeze()
+        y = self.encode_batch(self.load_audio(path_y).unsqueeze(0)).squeeze()
+        score = torch.nn.functional.cosine_similarity(x, y, dim=0)
+        return score.unsqueeze(0), (score > threshold).unsqueeze(0)
+
+
+def load_speech_profile_modal():
+    # modal and speechbrain only exist in the deployed image
+    sys.modules['modal'] = MagicMock()
+    sys.modules['modal.gpu'] = sys.modules['modal'].gpu
+    for name in ('speechbrain', 'speechbrain.inference'):
+        sys.modules[name] = types.ModuleType(name)
+    sys.modules['speechbrain.inference.speaker'] = types.SimpleNamespace(SpeakerRecognition=TinyEncoder)
+    path = os.path.join(os.path.dirname(__file__), '..', 'modal', 'speech_profile_modal.py')
+    spec = importlib.util.spec_from_file_location('speech_profile_modal', path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+class Blob:
+    generations = iter(range(1, 1 << 30))
+
+    def __init__(self, bucket, name):
+        self.bucket, self.name, self.metadata, self.generation = bucket, name, None, None
+
+    def upload_from_string(self, data, content_type=None):
+        self.data, self.generation = data, next(Blob.generations)
+        self.bucket.blobs[self.name] = self
+
+    def download_as_bytes(self, if_generation_match=None):
+        return self.bucket.blobs[self.name].data
+
+
+class Bucket:
+    def __init__(self):
+        self.blobs = {}
+
+    def blob(self, name):
+        return Blob(self, name)
+
+    def get_blob(self, name):
+        return self.blobs.get(name)
+
+    def list_blobs(self, prefix):
+        return [blob for name, blob in sorted(self.blobs.items()) if name.startswith(prefix)]
+
+
+def write_wav(path: str, samples: np.ndarray):
+    with wave.open(path, 'wb') as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(SAMPLE_RATE)
+        f.writeframes((samples * 32767).astype('<i2').tobytes())
+
+
+def voice(rng, seconds: float) -> np.ndarray:
+    t = np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE
+    return (0.3 * np.sin(2 * np.pi * rng.uniform(90, 300) * t) + 0.05 * rng.standard_normal(len(t))).astype(np.float32)
+
+
+def setup(directory: str, people: int, rng):
+    """Bucket with the user's profile and each person's samples, plus their cached embeddings."""
+    bucket = Bucket()
+    storage.storage_client = types.SimpleNamespace(bucket=lambda name: bucket)
+    bucket.blob(f'{UID}/speech_profile.wav').upload_from_string(b'wav')
+    for i in range(people):
+        bucket.blob(f'{UID}/people_profiles/person-{i}/sample.wav').upload_from_string(b'wav')
+
+    reference_paths = {}
+    versions = {'speech_profile': storage.get_speech_profile_version(UID)}
+    versions.update({f'person_{pid}': v for pid, v in storage.get_user_people_speech_samples_versions(UID).items()})
+    for name, version in versions.items():
+        path = os.path.join(directory, f'{name}.wav')
+        write_wav(path, voice(rng, 30))
+        reference_paths[name] = path
+        buffer = io.BytesIO()
+        np.save(buffer, modal.embed_file(path).astype(np.float32))
+        storage.upload_speech_embedding(UID, name, buffer.getvalue(), version)
+    return reference_paths
+
+
+def previous_classify(audio_file_path: str, reference_paths: dict, segments):
+    """The previous `classify_segments`, one `verify_files` per chunk per reference."""
+    matches = [{'is_user': False, 'person_id': None}] * len(segments)
+    file_name = os.path.basename(audio_file_path)
+    for i, segment in enumerate(segments):
+        duration = segment.end - segment.start
+        by_chunk_matches = {}
+        for j in range(0, int(duration), 30):
+            start = segment.start + j
+            end = min(segment.end, start + 30)
+            temporal_file = os.path.join(os.path.dirname(audio_file_path), f'{file_name}_{start}_{end}.wav')
+            AudioSegment.from_wav(audio_file_path)[start * 1000 : end * 1000].export(temporal_file, format='wav')
+            for name, path in reference_paths.items():
+                score, prediction = modal.model.verify_files(temporal_file, path)
+                by_chunk_matches[name] = by_chunk_matches.get(name, 0) + (float(score[0]) if prediction[0] else 0)
+            os.remove(temporal_file)
+        if by_chunk_matches:
+            max_match = max(by_chunk_matches, key=by_chunk_matches.get)
+            matches[i] = {'is_user': max_match == 'speech_profile', 'person_id': max_match}
+    return matches
+
+
+def current_classify(audio_file_path: str, segments):
+    labels, references = get_reference_embeddings(UID, modal.embed_file)
+    return modal.classify_segments(audio_file_path, labels, references, segments)
+
+
+def measure(fn, *args, runs: int = 3) -> float:
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            fn(*args)
+        timings.append(time.perf_counter() - started)
+    return sorted(timings)[len(timings) // 2] * 1000
+
+
+def run(minutes: int, people: int):
+    rng = np.random.default_rng(people)
+    with tempfile.TemporaryDirectory() as directory:
+        reference_paths = setup(directory, people, rng)
+        audio_file_path = os.path.join(directory, 'conversation.wav')
+        write_wav(audio_file_path, voice(rng, minutes * 60))
+        # transcript segments of 20-90s, so some span several 30s chunks
+        segments, t = [], 0.0
+        while t < minutes * 60:
+            end = min(minutes * 60, t + float(rng.uniform(20, 90)))
+            segments.append(modal.TranscriptSegment(start=t, end=end, text=''))
+            t = end
+        return (
+            len(segments),
+            measure(current_classify, audio_file_path, segments),
+            measure(previous_classify, audio_file_path, reference_paths, segments),
+        )
+
+
+modal = load_speech_profile_modal()
+
+if __name__ == '__main__':
+    torch.set_num_threads(1)
+    minutes = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    print(f'{minutes} min conversation, p50 of 3 runs')
+    print(f'{"people":>6} {"segments":>9} {"current ms":>11} {"previous ms":>12}')
+    for people in (0, 1, 5, 20):
+        segments, current, previous = run(minutes, people)
+        print(f'{people:>6} {segments:>9} {current:>11.1f} {previous:>12.1f}')
@@ -0,0 +1,87 @@
+"""
+Benchmark: speech-profile VAD trimming latency.
+
+Compares the previous trimming loop (one `AudioSegment.from_wav` per voice segment) with the
+single-decode numpy slicing in `utils.stt.vad.trim_to_voice_segments`.
+
+Run from backend/:
+    python testing/benchmark_speech_profile_vad.py path/to/profile.wav [more.wav ...]
+Without arguments a 60s synthetic 16kHz recording is generated. Voice segments are laid out
+every 3 seconds, so the hosted VAD endpoint is not needed.
+"""
+
+import math
+import os
+import shutil
+import struct
+import sys
+import tempfile
+import time
+import wave
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from pydub import AudioSegment  # noqa: E402
+
+from utils.stt.vad import trim_to_voice_segments  # noqa: E402
+
+
+def synthetic_recording(path: str, seconds: int = 60, sample_rate: int = 16000):
+    frames = b''.join(
+        struct.pack('<h', int(8000 * math.sin(2 * math.pi * 220 * i / sample_rate)))
+        for i in range(seconds * sample_rate)
+    )
+    with wave.open(path, 'wb') as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(sample_rate)
+        f.writeframes(frames)
+
+
+def voice_segments(duration: float):
+    segments, t = [], 0.5
+    while t + 1.5 < duration:
+        segments.append({'start': t, 'end': t + 1.5})
+        t += 3
+    return segments
+
+
+def previous_trim(file_path: str, segments):
+    trimmed_aseg = AudioSegment.empty()
+    for i, segment in enumerate(segments):
+        start = segment['start'] * 1000
+        end = segment['end'] * 1000
+        trimmed_aseg += AudioSegment.from_wav(file_path)[start:end]
+        if i < len(segments) - 1:
+            trimmed_aseg += AudioSegment.from_wav(file_path)[end : end + 1000]
+    trimmed_aseg.export(file_path, format="wav")
+
+
+def measure(fn, source: str, segments, runs: int = 5):
+    timings = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for _ in range(runs):
+            target = os.path.join(tmp, 'sample.wav')
+            shutil.copy(source, target)
+            started = time.perf_counter()
+            fn(target, segments)
+            timings.append(time.perf_counter() - started)
+    timings.sort()
+    return timings[len(timings) // 2] * 1000
+
+
+if __name__ == '__main__':
+    paths = sys.argv[1:]
+    if not paths:
+        tmp_path = os.path.join(tempfile.mkdtemp(), 'synthetic.wav')
+        synthetic_recording(tmp_path)
+        paths = [tmp_path]
+
+    for path in paths:
+        duration = AudioSegment.from_wav(path).duration_seconds
+        segments = voice_segments(duration)
+        before = measure(previous_trim, path, segments)
+        after = measure(trim_to_voice_segments, path, segments)
+        print(f'{os.path.basename(path)} ({duration:.0f}s, {len(segments)} segments)')
+        print(f'  per-segment decode: {before:8.2f} ms')
+        print(f'  single decode:      {after:8.2f} ms')
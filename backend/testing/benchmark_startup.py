@@ -0,0 +1,60 @@
+"""
+Benchmark: cold start of the API process.
+
+Imports `main` in fresh interpreters and reports wall-clock import time and peak resident memory, with
+and without warming up the lazily loaded models and clients.
+
+Run from backend/ with the service environment loaded (.env):
+    python testing/benchmark_startup.py [--runs 3]
+"""
+
+import argparse
+import os
+import resource
+import subprocess
+import sys
+import time
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+IMPORT_MAIN = '''
+import resource, time
+started = time.perf_counter()
+import main
+elapsed = time.perf_counter() - started
+warm = 0.0
+if {warm_up}:
+    from utils.other.lazy import warm_up
+    started = time.perf_counter()
+    warm_up()
+    warm = time.perf_counter() - started
+print(elapsed, warm, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+'''
+
+
+def run_once(warm_up: bool):
+    code = IMPORT_MAIN.format(warm_up=warm_up)
+    started = time.perf_counter()
+    out = subprocess.run([sys.executable, '-c', code], cwd=BACKEND_DIR, capture_output=True, text=True)
+    wall = time.perf_counter() - started
+    if out.returncode != 0:
+        raise RuntimeError(out.stderr[-2000:])
+    import_s, warm_s, maxrss = out.stdout.strip().splitlines()[-1].split()
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    rss_mb = int(maxrss) / (1024 * 1024 if sys.platform == 'darwin' else 1024)
+    return wall, float(import_s), float(warm_s), rss_mb
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--runs', type=int, default=3)
+    args = parser.parse_args()
+
+    for warm_up in (False, True):
+        results = sorted(run_once(warm_up) for _ in range(args.runs))
+        wall, import_s, warm_s, rss_mb = results[len(results) // 2]
+        label = 'import + warm_up()' if warm_up else 'import only'
+        print(
+            f'{label:<20} process {wall:6.2f}s  import main {import_s:6.2f}s  '
+            f'warm up {warm_s:6.2f}s  max rss {rss_mb:8.1f} MB'
+        )
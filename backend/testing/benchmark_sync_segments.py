@@ -0,0 +1,113 @@
+"""
+Benchmark: matching a 500-segment sync dump to existing conversations.
+
+Compares the previous flow (one range scan + merge/re-sort of the target conversation per segment)
+with the in-memory timeline index and per-conversation batched merges.
+
+Run from backend/: python testing/benchmark_sync_segments.py
+"""
+
+import os
+import random
+import sys
+import time
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from utils.conversations.timeline import (  # noqa: E402
+    ConversationTimelineIndex,
+    cluster_unmatched,
+    group_segments_by_conversation,
+    merge_segments_into_conversation,
+)
+
+SEGMENTS = 500
+CONVERSATIONS = 300
+SEGMENTS_PER_CONVERSATION = 60
+SPAN_SECONDS = 3 * 24 * 3600
+BASE = 1_730_000_000
+
+
+def _dt(ts: float) -> datetime:
+    return datetime.fromtimestamp(ts, tz=timezone.utc)
+
+
+def build_fixture(seed: int = 7):
+    rng = random.Random(seed)
+    conversations = []
+    for i in range(CONVERSATIONS):
+        start = BASE + rng.uniform(0, SPAN_SECONDS)
+        duration = rng.uniform(60, 1800)
+        conversations.append(
+            {
+                'id': f'c{i}',
+                'created_at': _dt(start),
+                'started_at': _dt(start),
+                'finished_at': _dt(start + duration),
+                'transcript_segments': [
+                    {
+                        'start': j * duration / SEGMENTS_PER_CONVERSATION,
+                        'end': (j + 1) * duration / SEGMENTS_PER_CONVERSATION,
+                    }
+                    for j in range(SEGMENTS_PER_CONVERSATION)
+                ],
+            }
+        )
+    synced = []
+    for _ in range(SEGMENTS):
+        start = BASE + rng.uniform(0, SPAN_SECONDS)
+        length = rng.uniform(5, 90)
+        synced.append(
+            (start, start + length, [{'start': 0.0, 'end': length / 2}, {'start': length / 2, 'end': length}])
+        )
+    return conversations, synced
+
+
+def per_segment(conversations, synced):
+    """Previous behaviour: each segment scans the time window and merges into its conversation on its own."""
+    updates = 0
+    for start, end, segments in synced:
+        lower, upper = start - 120, end + 120
+        window = [
+            c for c in conversations if c['finished_at'].timestamp() >= lower and c['started_at'].timestamp() <= upper
+        ]
+        window.sort(key=lambda c: c['created_at'], reverse=True)
+        closest, min_diff = None, float('inf')
+        for c in window:
+            diff1 = abs(c['started_at'].timestamp() - start)
+            diff2 = abs(c['finished_at'].timestamp() - end)
+            if diff1 < min_diff or diff2 < min_diff:
+                min_diff, closest = min(diff1, diff2), c
+        if closest:
+            closest['transcript_segments'] = merge_segments_into_conversation(closest, [(start, segments)])
+            updates += 1
+    return updates
+
+
+def indexed(conversations, synced):
+    index = ConversationTimelineIndex(conversations)
+    matched, unmatched = group_segments_by_conversation(index, synced)
+    for conversation, batches in matched.values():
+        conversation['transcript_segments'] = merge_segments_into_conversation(conversation, batches)
+    cluster_unmatched(unmatched)
+    return len(matched)
+
+
+def bench(fn, runs: int = 5):
+    timings, result = [], None
+    for _ in range(runs):
+        conversations, synced = build_fixture()
+        started = time.perf_counter()
+        result = fn(conversations, synced)
+        timings.append(time.perf_counter() - started)
+    timings.sort()
+    return timings[len(timings) // 2] * 1000, result
+
+
+if __name__ == '__main__':
+    naive_ms, naive_writes = bench(per_segment)
+    index_ms, index_writes = bench(indexed)
+    print(f'{SEGMENTS} segments, {CONVERSATIONS} conversations over {SPAN_SECONDS // 3600}h')
+    print(f'per-segment scan: {naive_ms:8.2f} ms, {SEGMENTS} range queries, {naive_writes} conversation writes')
+    print(f'timeline index:   {index_ms:8.2f} ms, 1 range query, {index_writes} conversation writes')
@@ -0,0 +1,158 @@
+"""
+Benchmark: end-to-end latency of `retrieve_memories_for_topics` for 10 topics, a thread per topic vs batched.
+
+The embedding API, the vector index and Firestore are in-process fakes with injected latency: an embedding call costs
+a fixed latency plus a little per text, an index query, the conversations' `get_all` and each conversation's photos
+query a fixed latency each. Conversations are read by the real `get_conversations_by_id` on the fake Firestore client.
+Embeddings go through a real `EmbeddingService`, with its Redis tier (REDIS_DB_HOST / REDIS_DB_PORT must be
+reachable). Compares:
+- previous: a thread per topic, each embeds its topic (`query_vectors`) and queries the index, then the
+  conversations' photos are read one conversation after the other
+- batched: the topics are embedded in one call, the index is queried on a shared pool (`query_vectors_many`), the
+  photos are read concurrently
+Cold runs use new topics, so every embedding is computed; warm runs repeat them, so they come from the local cache.
+It checks that both return the same conversations for each topic.
+
+Run from backend/: python testing/benchmark_topic_retrieval.py [runs] [topics]
+"""
+
+import hashlib
+import itertools
+import os
+import sys
+import threading
+import time
+from collections import defaultdict
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import database.conversations as conversations_db  # noqa: E402
+import database.helpers as db_helpers  # noqa: E402
+import database.vector_db as vector_db  # noqa: E402
+import utils.retrieval.rag as rag  # noqa: E402
+from utils.llm.embedding_service import EmbeddingService  # noqa: E402
+from utils.other import metrics  # noqa: E402
+
+UID = 'bench-user'
+LATENCY_MS = {'embedding_call': 150, 'embedding_per_text': 2, 'index_query': 40, 'get_all': 60, 'photos_query': 20}
+CONVERSATIONS = 400
+
+
+def sleep(name: str, times: int = 1):
+    time.sleep(LATENCY_MS[name] * times / 1000)
+
+
+def fake_embed_batch(texts):
+    sleep('embedding_call')
+    sleep('embedding_per_text', len(texts))
+    return [[float(b) for b in hashlib.sha256(text.encode()).digest()[:8]] for text in texts]
+
+
+class FakeIndex:
+    def query(self, vector, top_k, include_metadata, filter, namespace):
+        sleep('index_query')
+        seed = int(sum(vector))
+        ids = [(seed * 31 + i * 17) % CONVERSATIONS for i in range(top_k)]
+        return {'matches': [{'id': f'{filter["uid"]}-conversation-{i}'} for i in ids]}
+
+
+class FakeReference:
+    def __init__(self, path=()):
+        self.path = path
+
+    def collection(self, name):
+        return FakeReference(self.path + (name,))
+
+    def document(self, name):
+        return FakeReference(self.path + (name,))
+
+    def stream(self):
+        # a conversation's photos
+        sleep('photos_query')
+        return []
+
+
+class FakeSnapshot:
+    exists = True
+
+    def __init__(self, reference):
+        self.reference = reference
+
+    def to_dict(self):
+        return {'id': self.reference.path[-1], 'discarded': False, 'data_protection_level': 'standard'}
+
+
+class FakeFirestore(FakeReference):
+    def get_all(self, references):
+        sleep('get_all')
+        return [FakeSnapshot(reference) for reference in references]
+
+
+class SequentialExecutor:
+    def map(self, fn, items):
+        return map(fn, items)
+
+
+def previous_retrieve_memories_for_topics(uid, topics, dates_range):
+    # the implementation this benchmark replaced
+    def retrieve_for_topic(uid, topic, start_timestamp, end_timestamp, k, memories_id):
+        result = vector_db.query_vectors(topic, uid, starts_at=start_timestamp, ends_at=end_timestamp, k=k)
+        for memory_id in result:
+            memories_id[memory_id].append(topic)
+        return result
+
+    memories_id = defaultdict(list)
+    top_k = 10 if len(topics) == 1 else 5
+    threads = [
+        threading.Thread(target=retrieve_for_topic, args=(uid, topic, None, None, top_k, memories_id))
+        for topic in topics
+    ]
+    [t.start() for t in threads]
+    [t.join() for t in threads]
+    return memories_id, conversations_db.get_conversations_by_id(uid, memories_id.keys())
+
+
+def percentiles(timings):
+    timings = sorted(timings)
+    return timings[len(timings) // 2] * 1000, timings[min(len(timings) - 1, int(len(timings) * 0.99))] * 1000
+
+
+if __name__ == '__main__':
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    n_topics = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+
+    vector_db.embedding_service = EmbeddingService(f'bench-{time.time()}', fake_embed_batch)
+    vector_db.index = FakeIndex()
+    conversations_db.db = FakeFirestore()
+    photos_executor = db_helpers._photos_executor
+    counter = itertools.count()
+
+    versions = [('previous', previous_retrieve_memories_for_topics), ('batched', rag.retrieve_memories_for_topics)]
+    print(f'{runs} runs of {n_topics} topics, injected latencies (ms): {LATENCY_MS}')
+    for temperature in ('cold', 'warm'):
+        for name, retrieve in versions:
+            db_helpers._photos_executor = SequentialExecutor() if name == 'previous' else photos_executor
+            topic_sets = [[f'topic {next(counter)}' for _ in range(n_topics)] for _ in range(runs)]
+            if temperature == 'warm':
+                # first pass fills the cache
+                for topics in topic_sets:
+                    retrieve(UID, topics, [])
+            metrics.reset()
+            timings = []
+            for topics in topic_sets:
+                started = time.perf_counter()
+                memories_id, conversations = retrieve(UID, topics, [])
+                timings.append(time.perf_counter() - started)
+            p50, p99 = percentiles(timings)
+            batches = metrics.snapshot('embeddings.')['counters'].get('embeddings.batches', 0) / runs
+            print(
+                f'  {temperature:4} {name:8} p50 {p50:7.1f} ms   p99 {p99:7.1f} ms   '
+                f'embedding calls/run {batches:4.1f}   conversations/run {len(conversations)}'
+            )
+
+    topics = [f'check {i}' for i in range(n_topics)]
+    db_helpers._photos_executor = photos_executor
+    previous, _ = previous_retrieve_memories_for_topics(UID, topics, [])
+    batched, _ = rag.retrieve_memories_for_topics(UID, topics, [])
+    assert {k: sorted(v) for k, v in previous.items()} == {k: sorted(v) for k, v in batched.items()}
+    print('same conversations per topic: ok')
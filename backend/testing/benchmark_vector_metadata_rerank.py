@@ -0,0 +1,181 @@
+"""
+Benchmark: `database.vector_db.query_vectors_by_metadata`, per-query latency and response payload size.
+
+Runs against the embedded `database.local_vector_index.LocalVectorIndex`, loaded with one user's conversations
+(topics, entities, people drawn from a small vocabulary, `created_at` over a year). Payload size is the JSON size of
+the query response, what the Pinecone REST API would send. Compares:
+- previous: top_k=1000 with full metadata on every query, overlaps counted in a Python loop
+- current: metadata only when there are terms to rerank on (otherwise top_k=limit), overlaps scored in numpy
+for a question with topic/people filters and one with a date range only, then the reranking step alone on 1000
+matches.
+
+Run from backend/: python testing/benchmark_vector_metadata_rerank.py [conversations] [queries]
+"""
+
+import contextlib
+import io
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import numpy as np  # noqa: E402
+
+import database.vector_db as vector_db  # noqa: E402
+from database.local_vector_index import LocalVectorIndex  # noqa: E402
+
+UID = 'bench-user'
+DIMENSIONS = 256
+NOW = datetime(2026, 10, 1, tzinfo=timezone.utc)
+
+
+def previous_rerank(matches, uid, people, topics, entities, limit):
+    conversation_id_to_matches = defaultdict(int)
+    for item in matches:
+        metadata = item['metadata']
+        conversation_id = metadata['memory_id']
+        for topic in topics:
+            if topic in metadata.get('topics', []):
+                conversation_id_to_matches[conversation_id] += 1
+        for entity in entities:
+            if entity in metadata.get('entities', []):
+                conversation_id_to_matches[conversation_id] += 1
+        for person in people:
+            if person in metadata.get('people', []):
+                conversation_id_to_matches[conversation_id] += 1
+    conversations_id = [item['id'].replace(f'{uid}-', '') for item in matches]
+    conversations_id.sort(key=lambda x: conversation_id_to_matches[x], reverse=True)
+    return conversations_id[:limit]
+
+
+def current_rerank(matches, uid, people, topics, entities, limit):
+    terms_by_field = {'topics': topics, 'entities': entities, 'people': people}
+    scores = vector_db._metadata_overlap_scores(matches, {f: t for f, t in terms_by_field.items() if t})
+    conversations_id = [item['id'].replace(f'{uid}-', '') for item in matches]
+    return [conversations_id[i] for i in np.argsort(-scores, kind='stable')[:limit]]
+
+
+def previous_query_vectors_by_metadata(uid, vector, dates_filter, people, topics, entities, dates, limit=5):
+    filter_data = {'$and': [{'uid': {'$eq': uid}}]}
+    if people or topics or entities or dates:
+        filter_data['$and'].append(
+            {'$or': [{'people': {'$in': people}}, {'topics': {'$in': topics}}, {'entities': {'$in': entities}}]}
+        )
+    if dates_filter and len(dates_filter) == 2 and dates_filter[0] and dates_filter[1]:
+        filter_data['$and'].append(
+            {'created_at': {'$gte': int(dates_filter[0].timestamp()), '$lte': int(dates_filter[1].timestamp())}}
+        )
+    xc = vector_db.index.query(
+        vector=vector, filter=filter_data, namespace="ns1", include_values=False, include_metadata=True, top_k=1000
+    )
+    return previous_rerank(xc['matches'], uid, people, topics, entities, limit)
+
+
+class MeasuredIndex:
+    """Wraps the index to record the JSON size of every query response."""
+
+    def __init__(self, index):
+        self.index = index
+        self.payload_bytes = 0
+
+    def query(self, **kwargs):
+        response = self.index.query(**kwargs)
+        self.payload_bytes += len(json.dumps(response))
+        return response
+
+
+def run(fn, index, queries, kwargs):
+    index.payload_bytes = 0
+    timings, results = [], []
+    for vector in queries:
+        started = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            results.append(fn(UID, vector, **kwargs))
+        timings.append(time.perf_counter() - started)
+    timings.sort()
+    p50 = timings[len(timings) // 2] * 1000
+    p99 = timings[min(len(timings) - 1, int(len(timings) * 0.99))] * 1000
+    return p50, p99, index.payload_bytes / len(queries), results
+
+
+if __name__ == '__main__':
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    n_queries = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+    rng = random.Random(3)
+    np_rng = np.random.default_rng(3)
+
+    topics = [f'topic {i}' for i in range(300)]
+    people = [f'person {i}' for i in range(150)]
+    vectors = np_rng.standard_normal((n, DIMENSIONS)).astype(np.float32)
+    local_index = LocalVectorIndex(tempfile.mkdtemp(prefix='rerank-bench-'), flush_seconds=0)
+    local_index.upsert(
+        vectors=[
+            {
+                'id': f'{UID}-conv-{i}',
+                'values': vectors[i],
+                'metadata': {
+                    'uid': UID,
+                    'memory_id': f'conv-{i}',
+                    'created_at': int((NOW - timedelta(seconds=rng.randrange(365 * 24 * 3600))).timestamp()),
+                    'topics': rng.sample(topics, 5),
+                    'entities': rng.sample(topics, 5),
+                    'people': rng.sample(people, 3),
+                    'dates': [],
+                },
+            }
+            for i in range(n)
+        ],
+        namespace='ns1',
+    )
+    index = vector_db.index = MeasuredIndex(local_index)
+    queries = [np_rng.standard_normal(DIMENSIONS).astype(np.float32).tolist() for _ in range(n_queries)]
+
+    scenarios = {
+        'topics + people': dict(
+            dates_filter=[None, None],
+            people=people[:4],
+            topics=topics[:6],
+            entities=topics[:6],
+            dates=[],
+            limit=100,
+        ),
+        'date range only': dict(
+            dates_filter=[NOW - timedelta(days=90), NOW],
+            people=[],
+            topics=[],
+            entities=[],
+            dates=[],
+            limit=100,
+        ),
+    }
+    print(f'{n} conversations, {n_queries} queries per scenario')
+    for scenario, kwargs in scenarios.items():
+        print(f'  {scenario}:')
+        versions = [('previous', previous_query_vectors_by_metadata), ('current', vector_db.query_vectors_by_metadata)]
+        for name, fn in versions:
+            p50, p99, payload, results = run(fn, index, queries, kwargs)
+            print(f'    {name:9} p50 {p50:7.2f} ms   p99 {p99:7.2f} ms   payload {payload / 1024:8.1f} KiB/query')
+            if name == 'previous':
+                expected = results
+        assert results == expected
+
+    kwargs = scenarios['topics + people']
+    terms = dict(people=kwargs['people'], topics=kwargs['topics'], entities=kwargs['entities'], limit=kwargs['limit'])
+    matches = local_index.query(
+        vector=queries[0], top_k=1000, filter={'uid': UID}, namespace='ns1', include_metadata=True
+    )['matches']
+    print(f'  reranking {len(matches)} matches alone:')
+    for name, rerank in [('previous', previous_rerank), ('current', current_rerank)]:
+        started = time.perf_counter()
+        for _ in range(100):
+            ranked = rerank(matches, UID, **terms)
+        print(f'    {name:9} {(time.perf_counter() - started) * 10:7.3f} ms')
+        if name == 'previous':
+            expected = ranked
+    assert ranked == expected
@@ -0,0 +1,119 @@
+"""
+Load test of the two-tier generic cache (`database.cache`).
+
+Runs against a local Redis (REDIS_DB_HOST/REDIS_DB_PORT/REDIS_DB_PASSWORD, e.g. `docker run -p 6379:6379 redis`):
+1. 500 threads request the same cold key at once, the slow producer must run exactly once,
+2. the same with 500 coroutines through `aget_or_compute`,
+3. an expired key keeps being served while a single background refresh recomputes it,
+4. a warm read loop reports hit ratio and latency from the in-process metrics.
+
+Run from backend/: REDIS_DB_HOST=localhost python testing/load_test_generic_cache.py
+"""
+
+import asyncio
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from database import cache  # noqa: E402
+from utils.other import metrics  # noqa: E402
+
+CONCURRENCY = 500
+
+
+def cold_key_threads():
+    path = f'load-test:threads:{time.time()}'
+    calls = []
+    barrier = threading.Barrier(CONCURRENCY)
+    results = [None] * CONCURRENCY
+
+    def compute():
+        calls.append(1)
+        time.sleep(0.5)
+        return {'apps': list(range(100))}
+
+    def worker(i):
+        barrier.wait()
+        results[i] = cache.get_or_compute(path, compute, ttl=60)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(CONCURRENCY)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+    cache.invalidate(path)
+
+    assert len(calls) == 1, f'compute ran {len(calls)} times'
+    assert all(r == results[0] for r in results)
+    print(f'{CONCURRENCY} threads, cold key: compute ran {len(calls)}x, all done in {elapsed * 1000:.0f} ms')
+
+
+async def cold_key_coroutines():
+    path = f'load-test:async:{time.time()}'
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.5)
+        return {'releases': list(range(100))}
+
+    started = time.perf_counter()
+    results = await asyncio.gather(*[cache.aget_or_compute(path, compute, ttl=60) for _ in range(CONCURRENCY)])
+    elapsed = time.perf_counter() - started
+    cache.invalidate(path)
+
+    assert len(calls) == 1, f'compute ran {len(calls)} times'
+    assert all(r == results[0] for r in results)
+    print(f'{CONCURRENCY} coroutines, cold key: compute ran {len(calls)}x, all done in {elapsed * 1000:.0f} ms')
+
+
+def stale_while_revalidate():
+    path = f'load-test:stale:{time.time()}'
+    version = [0]
+
+    def compute():
+        version[0] += 1
+        time.sleep(0.2)
+        return {'version': version[0]}
+
+    cache.get_or_compute(path, compute, ttl=1, stale_ttl=30, local_ttl=1)
+    time.sleep(1.1)
+
+    started = time.perf_counter()
+    served = [cache.get_or_compute(path, compute, ttl=1, stale_ttl=30, local_ttl=1) for _ in range(100)]
+    elapsed = time.perf_counter() - started
+    time.sleep(0.5)
+    refreshed = cache.get_or_compute(path, compute, ttl=1, stale_ttl=30, local_ttl=1)
+    cache.invalidate(path)
+
+    assert served[0] == {'version': 1}, served[0]
+    assert refreshed == {'version': 2} and version[0] == 2, (refreshed, version[0])
+    print(f'stale key: 100 reads served in {elapsed * 1000:.1f} ms while one refresh ran in the background')
+
+
+def warm_reads(reads: int = 20000):
+    path = f'load-test:warm:{time.time()}'
+    cache.get_or_compute(path, lambda: {'apps': list(range(100))}, ttl=60)
+    for _ in range(reads):
+        cache.get_or_compute(path, lambda: None, ttl=60)
+    cache.invalidate(path)
+
+
+if __name__ == '__main__':
+    metrics.reset()
+    cold_key_threads()
+    asyncio.run(cold_key_coroutines())
+    stale_while_revalidate()
+    warm_reads()
+
+    snapshot = metrics.snapshot('cache.')
+    print(f'hit ratio: {cache.hit_ratio():.4f}')
+    for name, value in sorted(snapshot['counters'].items()):
+        print(f'  {name:20} {value}')
+    for name, stats in sorted(snapshot['latencies'].items()):
+        print(f'  {name:20} {stats}')
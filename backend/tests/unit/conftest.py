@@ -0,0 +1,10 @@
+"""
+Pytest configuration for unit tests. These run without credentials or network access.
+"""
+
+import os
+import sys
+
+backend_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '../..'))
+if backend_dir not in sys.path:
+    sys.path.insert(0, backend_dir)
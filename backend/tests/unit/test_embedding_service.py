@@ -0,0 +1,99 @@
+import threading
+
+import httpx
+import openai
+import pytest
+
+from utils.llm.embedding_service import EmbeddingService
+
+
+def vector(text: str):
+    return [float(len(text)), 1.0]
+
+
+def api_error(cls, status: int) -> openai.APIStatusError:
+    request = httpx.Request('POST', 'http://provider/embeddings')
+    return cls('error', response=httpx.Response(status, request=request), body=None)
+
+
+def embed_concurrently(embeddings: EmbeddingService, texts) -> dict:
+    results = {}
+
+    def embed(text):
+        try:
+            results[text] = embeddings.embed(text)
+        except Exception as e:
+            results[text] = e
+
+    threads = [threading.Thread(target=embed, args=(text,)) for text in texts]
+    [t.start() for t in threads]
+    [t.join(2) for t in threads]
+    assert not any(t.is_alive() for t in threads)
+    return results
+
+
+def service(embed_batch) -> EmbeddingService:
+    return EmbeddingService('test-model', embed_batch, batch_window=0.01, use_redis=False)
+
+
+def test_short_batch_fails_every_caller():
+    def short(texts):
+        return [vector(text) for text in texts[:-1]]
+
+    embeddings = service(short)
+    errors = []
+
+    def embed(text):
+        try:
+            embeddings.embed(text)
+        except ValueError as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=embed, args=(f'text {i}',)) for i in range(3)]
+    [t.start() for t in threads]
+    [t.join(2) for t in threads]
+    assert not any(t.is_alive() for t in threads)
+    assert len(errors) == 3
+    assert not embeddings._in_flight
+
+
+def test_uncached_texts_are_embedded_every_time():
+    calls = []
+
+    def embed_batch(texts):
+        calls.append(list(texts))
+        return [vector(text) for text in texts]
+
+    embeddings = service(embed_batch)
+    assert embeddings.embed('conversation', cache=False) == vector('conversation')
+    assert embeddings.embed('conversation', cache=False) == vector('conversation')
+    assert len(calls) == 2
+    assert not embeddings._local
+
+    embeddings.embed('question')
+    embeddings.embed('question')
+    assert len(calls) == 3
+
+
+def test_rejected_text_does_not_fail_its_batch():
+    def embed_batch(texts):
+        if 'bad' in texts:
+            raise api_error(openai.BadRequestError, 400)
+        return [vector(text) for text in texts]
+
+    results = embed_concurrently(service(embed_batch), ('good', 'bad', 'fine'))
+    assert results['good'] == vector('good') and results['fine'] == vector('fine')
+    assert isinstance(results['bad'], openai.BadRequestError)
+
+
+def test_rate_limited_batch_fails_once():
+    calls = []
+
+    def embed_batch(texts):
+        calls.append(list(texts))
+        raise api_error(openai.RateLimitError, 429)
+
+    with pytest.raises(openai.RateLimitError):
+        service(embed_batch).embed_many(['one', 'two', 'three'])
+    # the batch isn't resent text by text
+    assert calls == [['one', 'two', 'three']]
@@ -0,0 +1,155 @@
+"""
+Unit tests for the response cache of chat helper prompts.
+
+Run: pytest backend/tests/unit/test_llm_response_cache.py -v
+"""
+
+import threading
+import time
+
+import pytest
+from pydantic import BaseModel
+
+from utils.llm.response_cache import ResponseCache, cached_response, hit_ratio
+from utils.other import metrics
+
+
+class Answer(BaseModel):
+    value: bool
+
+
+class FakeLLM:
+    """Stands in for a chat model: counts invocations and answers whether the prompt mentions a date."""
+
+    def __init__(self, delay: float = 0.0, fail: bool = False):
+        self.invocations = 0
+        self.delay = delay
+        self.fail = fail
+        self._lock = threading.Lock()
+
+    def with_structured_output(self, schema):
+        return self
+
+    def invoke(self, prompt: str) -> Answer:
+        with self._lock:
+            self.invocations += 1
+        if self.delay:
+            time.sleep(self.delay)
+        if self.fail:
+            raise RuntimeError('llm unavailable')
+        return Answer(value='yesterday' in prompt.lower())
+
+
+@pytest.fixture
+def llm():
+    return FakeLLM()
+
+
+@pytest.fixture
+def cache():
+    metrics.reset()
+    return ResponseCache(max_items=3)
+
+
+def make_helper(llm: FakeLLM, cache: ResponseCache, version: int = 1, ttl: int = 60):
+    @cached_response('requires_context', version=version, ttl=ttl, cache=cache)
+    def requires_context(question: str) -> bool:
+        return llm.with_structured_output(Answer).invoke(f'User question: {question}').value
+
+    return requires_context
+
+
+def test_identical_and_trivially_different_questions_call_the_llm_once(llm, cache):
+    requires_context = make_helper(llm, cache)
+    answers = [
+        requires_context('What did I do yesterday?'),
+        requires_context('what did I do yesterday'),
+        requires_context('  What  did I do YESTERDAY?! '),
+    ]
+    assert answers == [True, True, True]
+    assert llm.invocations == 1
+    assert requires_context('Hello') is False
+    assert llm.invocations == 2
+
+
+def test_prompt_version_is_part_of_the_key(llm, cache):
+    make_helper(llm, cache, version=1)('Hello')
+    make_helper(llm, cache, version=2)('Hello')
+    assert llm.invocations == 2
+
+
+def test_entries_expire(llm, cache, monkeypatch):
+    requires_context = make_helper(llm, cache, ttl=10)
+    now = time.time()
+    monkeypatch.setattr(time, 'time', lambda: now)
+    requires_context('Hello')
+    monkeypatch.setattr(time, 'time', lambda: now + 11)
+    requires_context('Hello')
+    assert llm.invocations == 2
+
+
+def test_size_is_bounded(llm, cache):
+    requires_context = make_helper(llm, cache)
+    for question in ['one', 'two', 'three', 'four']:
+        requires_context(question)
+    requires_context('four')
+    assert llm.invocations == 4
+    # least recently used
+    requires_context('one')
+    assert llm.invocations == 5
+
+
+def test_failures_are_not_cached(cache):
+    llm = FakeLLM(fail=True)
+    requires_context = make_helper(llm, cache)
+    for _ in range(2):
+        with pytest.raises(RuntimeError):
+            requires_context('Hello')
+    assert llm.invocations == 2
+
+
+def test_concurrent_misses_share_one_call(cache):
+    llm = FakeLLM(delay=0.1)
+    requires_context = make_helper(llm, cache)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(requires_context('Hello'))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == [False] * 8
+    assert llm.invocations == 1
+
+
+def test_hit_rate_and_latency_are_observable(llm, cache):
+    requires_context = make_helper(llm, cache)
+    for _ in range(4):
+        requires_context('Hello')
+    counters = metrics.snapshot('llm_cache.')['counters']
+    assert counters['llm_cache.requires_context.miss'] == 1
+    assert counters['llm_cache.requires_context.hit'] == 3
+    assert hit_ratio('requires_context') == 0.75
+    assert metrics.snapshot('llm_cache.')['latencies']['llm_cache.requires_context']['count'] == 4
+
+
+def test_results_are_copied(cache):
+    @cached_response('structured_filters', version=1, cache=cache)
+    def select_filters(question: str) -> dict:
+        return {'topics': ['work']}
+
+    select_filters('q')['topics'].append('changed')
+    assert select_filters('q') == {'topics': ['work']}
+
+
+def test_only_the_question_is_normalized(cache):
+    calls = []
+
+    @cached_response('structured_filters', version=1, cache=cache)
+    def select_filters(question: str, filters_available: dict) -> dict:
+        calls.append(filters_available)
+        return {'people': [p for p in filters_available['people'] if p in question]}
+
+    assert select_filters('Did I meet Ann?', {'people': ['Ann']}) == {'people': ['Ann']}
+    assert select_filters('did I meet Ann', {'people': ['Ann']}) == {'people': ['Ann']}
+    assert select_filters('did I meet Ann', {'people': ['ANN']}) == {'people': []}
+    assert len(calls) == 2
@@ -0,0 +1,195 @@
+"""
+Simulation of the LLM scheduler against a local fake provider that enforces a tokens per minute limit like OpenAI's
+(429 with Retry-After once the minute's budget is used), called through the real OpenAI SDK.
+"""
+
+import asyncio
+import threading
+import time
+
+import httpx
+import openai
+
+from utils.llm import scheduler as llm_scheduler
+from utils.llm.scheduler import BACKGROUND, INTERACTIVE, LLMScheduler, llm_priority
+from utils.other import metrics
+
+# small enough for tests to take a second or two: 100 tokens/s
+TOKENS_PER_MINUTE = 6000
+# 101 tokens with the role and a completion limit of 50
+PROMPT = 'x' * 200
+
+
+class FakeProvider:
+    def __init__(self, tokens_per_minute: int):
+        self.tokens_per_minute = tokens_per_minute
+        self.tokens = float(tokens_per_minute)
+        self.refilled_at = time.monotonic()
+        self.lock = threading.Lock()
+        self.served = []
+        self.throttled = 0
+
+    def handle(self, request: httpx.Request) -> httpx.Response:
+        cost = llm_scheduler.estimate_tokens(request.content)
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(
+                self.tokens_per_minute, self.tokens + (now - self.refilled_at) * self.tokens_per_minute / 60
+            )
+            self.refilled_at = now
+            if self.tokens < cost:
+                self.throttled += 1
+                retry_after_ms = (cost - self.tokens) * 60 / self.tokens_per_minute * 1000
+                return httpx.Response(429, headers={'retry-after-ms': str(retry_after_ms)}, json={'error': {}})
+            self.tokens -= cost
+            self.served.append(request.headers['x-caller'])
+        return httpx.Response(
+            200,
+            json={
+                'id': 'chatcmpl-1',
+                'object': 'chat.completion',
+                'created': 0,
+                'model': 'fake',
+                'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': 'ok'}, 'finish_reason': 'stop'}],
+            },
+        )
+
+
+def make_client(scheduler: LLMScheduler, provider: FakeProvider, max_retries: int = 0) -> openai.OpenAI:
+    transport = llm_scheduler.ScheduledTransport(httpx.MockTransport(provider.handle), scheduler)
+    http_client = httpx.Client(transport=transport)
+    return openai.OpenAI(api_key='test', base_url='http://provider', http_client=http_client, max_retries=max_retries)
+
+
+def complete(client: openai.OpenAI, caller: str):
+    client.chat.completions.create(
+        model='fake',
+        messages=[{'role': 'user', 'content': PROMPT}],
+        max_tokens=50,
+        extra_headers={'x-caller': caller},
+    )
+
+
+def test_estimate_tokens():
+    body = b'{"messages": [{"role": "user", "content": "' + b'x' * 400 + b'"}], "max_tokens": 20}'
+    # the role counts as prompt too
+    assert llm_scheduler.estimate_tokens(body) == 121
+    image = b'{"messages": [{"role": "user", "content": [{"type": "image_url", "image_url": {"url": "data:..."}}]}]}'
+    expected = llm_scheduler.IMAGE_TOKENS + 1 + llm_scheduler.DEFAULT_COMPLETION_TOKENS
+    assert llm_scheduler.estimate_tokens(image) == expected
+
+
+def test_interactive_requests_go_before_queued_background_ones():
+    metrics.reset()
+    # 500 tokens/s, the 9 queued requests take about 2s
+    provider = FakeProvider(5 * TOKENS_PER_MINUTE)
+    scheduler = LLMScheduler(tokens_per_minute=5 * TOKENS_PER_MINUTE, requests_per_minute=0, reserve=0.2)
+    client = make_client(scheduler, provider)
+
+    def background(i):
+        with llm_priority(BACKGROUND):
+            complete(client, f'background-{i}')
+
+    def interactive(i):
+        with llm_priority(INTERACTIVE):
+            complete(client, f'interactive-{i}')
+
+    # as if the rest of the minute's budget were used
+    scheduler._tokens, scheduler._refilled_at = 5 * TOKENS_PER_MINUTE * 0.2 + 303, time.monotonic()
+    # post-conversation processing floods the scheduler, users start chatting right after
+    threads = [threading.Thread(target=background, args=(i,)) for i in range(12)]
+    [t.start() for t in threads]
+    deadline = time.monotonic() + 1
+    while scheduler._depth[BACKGROUND] < 6 and time.monotonic() < deadline:
+        time.sleep(0.001)
+    chat = [threading.Thread(target=interactive, args=(i,)) for i in range(3)]
+    [t.start() for t in chat]
+    [t.join() for t in threads + chat]
+
+    assert provider.throttled == 0
+    assert len(provider.served) == 15
+    # the first background requests fit the budget above the reserve, the interactive ones go before the rest
+    interactive_at = [i for i, caller in enumerate(provider.served) if caller.startswith('interactive')]
+    first = interactive_at[0]
+    assert interactive_at == [first, first + 1, first + 2]
+    # while background requests were still waiting
+    assert len(provider.served) - first - 3 >= 5
+
+    snapshot = metrics.snapshot('llm_scheduler.')
+    assert snapshot['counters']['llm_scheduler.delayed.background'] >= 12 - first
+    assert snapshot['counters']['llm_scheduler.delayed.interactive'] == 3
+    assert snapshot['gauges']['llm_scheduler.queue_depth.background'] == 0
+    interactive_wait = snapshot['latencies']['llm_scheduler.wait.interactive']['max_ms']
+    background_wait = snapshot['latencies']['llm_scheduler.wait.background']['max_ms']
+    assert interactive_wait < background_wait
+
+
+def test_background_requests_leave_the_reserve_to_interactive_ones():
+    metrics.reset()
+    provider = FakeProvider(TOKENS_PER_MINUTE)
+    scheduler = LLMScheduler(tokens_per_minute=TOKENS_PER_MINUTE, requests_per_minute=0, reserve=0.5)
+    scheduler._tokens = TOKENS_PER_MINUTE * 0.5
+    client = make_client(scheduler, provider)
+
+    started = time.perf_counter()
+    with llm_priority(INTERACTIVE):
+        complete(client, 'interactive')
+    assert time.perf_counter() - started < 0.1
+
+    done = threading.Event()
+
+    def background():
+        with llm_priority(BACKGROUND):
+            complete(client, 'background')
+        done.set()
+
+    threading.Thread(target=background).start()
+    # the bucket has to refill above the reserve first, about 1s at 100 tokens/s
+    assert not done.wait(0.5)
+    assert done.wait(2)
+
+
+def test_provider_rate_limit_pauses_the_queue():
+    metrics.reset()
+    # the scheduler doesn't know the limit, the provider's 429s tell it to wait
+    provider = FakeProvider(TOKENS_PER_MINUTE)
+    provider.tokens = 100
+    scheduler = LLMScheduler(tokens_per_minute=0, requests_per_minute=0)
+    client = make_client(scheduler, provider, max_retries=5)
+
+    started = time.perf_counter()
+    for i in range(3):
+        complete(client, f'request-{i}')
+
+    assert len(provider.served) == 3
+    assert time.perf_counter() - started >= 0.9
+    assert metrics.snapshot('llm_scheduler.')['counters']['llm_scheduler.throttled'] >= 1
+
+
+def test_async_requests_are_scheduled():
+    metrics.reset()
+    provider = FakeProvider(TOKENS_PER_MINUTE)
+    scheduler = LLMScheduler(tokens_per_minute=TOKENS_PER_MINUTE, requests_per_minute=0, reserve=0.0)
+    scheduler._tokens = 200
+    transport = llm_scheduler.AsyncScheduledTransport(httpx.MockTransport(provider.handle), scheduler)
+    client = openai.AsyncOpenAI(
+        api_key='test', base_url='http://provider', http_client=httpx.AsyncClient(transport=transport), max_retries=0
+    )
+
+    async def complete_async(caller: str):
+        await client.chat.completions.create(
+            model='fake',
+            messages=[{'role': 'user', 'content': PROMPT}],
+            max_tokens=50,
+            extra_headers={'x-caller': caller},
+        )
+
+    async def main():
+        await asyncio.gather(*[complete_async(f'request-{i}') for i in range(4)])
+
+    started = time.perf_counter()
+    asyncio.run(main())
+    assert sorted(provider.served) == [f'request-{i}' for i in range(4)]
+    assert provider.throttled == 0
+    # 2 fit the initial budget, the other 2 wait for 200 tokens to refill
+    assert time.perf_counter() - started >= 1.5
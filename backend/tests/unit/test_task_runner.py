@@ -0,0 +1,135 @@
+import contextvars
+import threading
+import time
+
+import pytest
+
+from utils.other import metrics, task_runner
+from utils.other.task_runner import Stage, TaskGroup, TaskRunner
+
+request_id = contextvars.ContextVar('request_id', default=None)
+
+
+@pytest.fixture(autouse=True)
+def fast_watchdog(monkeypatch):
+    monkeypatch.setattr(task_runner, 'WATCHDOG_INTERVAL', 0.02)
+    metrics.reset()
+
+
+def counters(runner: TaskRunner) -> dict:
+    return metrics.snapshot(f'tasks.{runner.name}.')['counters']
+
+
+def test_failing_task_is_retried():
+    runner = TaskRunner('test_retry', max_workers=2, max_pending=10)
+    calls = []
+
+    def flaky():
+        calls.append(1)
+        if len(calls) < 3:
+            raise ValueError('flaky')
+        return 'done'
+
+    future = runner.submit(Stage('flaky', retries=2, retry_delay=0.01), flaky)
+    assert future.result(timeout=2) == 'done'
+    assert len(calls) == 3
+    assert counters(runner) == {'tasks.test_retry.flaky.retried': 2, 'tasks.test_retry.flaky.ok': 1}
+
+
+def test_task_fails_after_its_retries():
+    runner = TaskRunner('test_fail', max_workers=2, max_pending=10)
+
+    def broken():
+        raise ValueError('broken')
+
+    future = runner.submit(Stage('broken', retries=1, retry_delay=0.01), broken)
+    with pytest.raises(ValueError):
+        future.result(timeout=2)
+    assert counters(runner) == {'tasks.test_fail.broken.retried': 1, 'tasks.test_fail.broken.failed': 1}
+    assert runner.drain(1)
+
+
+def test_slow_task_is_reported_and_not_waited_for():
+    runner = TaskRunner('test_timeout', max_workers=2, max_pending=10)
+    release = threading.Event()
+    group = TaskGroup(runner, 'uid/conversation')
+    group.submit(Stage('slow', timeout=0.05, retries=2), lambda: release.wait(2) and 1 / 0)
+    group.submit(Stage('fast', timeout=0.05), lambda: None)
+
+    started = time.monotonic()
+    assert not group.wait()
+    assert time.monotonic() - started < 1
+    assert counters(runner)['tasks.test_timeout.slow.timeout'] == 1
+
+    # a timed out attempt isn't retried
+    release.set()
+    assert runner.drain(1)
+    assert counters(runner)['tasks.test_timeout.slow.failed'] == 1
+    assert 'tasks.test_timeout.slow.retried' not in counters(runner)
+
+
+def test_pending_tasks_are_bounded():
+    runner = TaskRunner('test_bound', max_workers=2, max_pending=4)
+    release = threading.Event()
+    submitted = []
+
+    def submit_all():
+        for i in range(8):
+            runner.submit(Stage('blocked'), release.wait, 2)
+            submitted.append(i)
+
+    submitter = threading.Thread(target=submit_all)
+    submitter.start()
+    time.sleep(0.1)
+    # the fifth submission waits for a slot
+    assert len(submitted) == 4
+    gauges = metrics.snapshot('tasks.test_bound.')['gauges']
+    assert gauges['tasks.test_bound.running'] == 2
+    assert gauges['tasks.test_bound.queued'] == 2
+
+    release.set()
+    submitter.join(2)
+    assert len(submitted) == 8
+    assert counters(runner)['tasks.test_bound.backpressure'] >= 1
+    assert runner.drain(1)
+
+
+def test_non_blocking_submit_drops_tasks_when_full():
+    runner = TaskRunner('test_drop', max_workers=1, max_pending=1)
+    release = threading.Event()
+    runner.submit(Stage('blocked'), release.wait, 2)
+
+    started = time.monotonic()
+    future = runner.submit(Stage('optional'), lambda: None, block=False)
+    assert time.monotonic() - started < 0.5
+    with pytest.raises(RuntimeError):
+        future.result(timeout=1)
+    assert counters(runner)['tasks.test_drop.dropped'] == 1
+
+    release.set()
+    assert runner.drain(1)
+
+
+def test_drain_waits_for_tasks_then_rejects_new_ones():
+    runner = TaskRunner('test_drain', max_workers=2, max_pending=10)
+    done = []
+    for i in range(4):
+        runner.submit(Stage('work'), lambda i=i: time.sleep(0.05) or done.append(i))
+
+    assert runner.drain(2)
+    assert sorted(done) == [0, 1, 2, 3]
+
+    future = runner.submit(Stage('work'), done.append, 4)
+    with pytest.raises(RuntimeError):
+        future.result(timeout=1)
+    assert counters(runner)['tasks.test_drain.rejected'] == 1
+
+
+def test_tasks_run_in_the_callers_context():
+    runner = TaskRunner('test_context', max_workers=1, max_pending=10)
+    token = request_id.set('request-1')
+    try:
+        future = runner.submit(Stage('read'), request_id.get)
+    finally:
+        request_id.reset(token)
+    assert future.result(timeout=1) == 'request-1'
@@ -0,0 +1,183 @@
+import asyncio
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from models.app import App
+from utils.apps import (
+    build_capability_category_groups_response,
+    build_pagination_metadata,
+    compute_app_score,
+    filter_apps_by_capability,
+    get_approved_available_apps,
+    get_capabilities_list,
+    get_popular_apps,
+    group_apps_by_capability,
+    group_capability_apps_by_category,
+    normalize_app_numeric_fields,
+    sort_apps_by_installs,
+)
+from utils.other import metrics
+
+# Per-process snapshot of the public app catalog.
+#
+# Built in the background from the same data as before (cached approved apps + installs + ratings), with every
+# listing order and serialized app precomputed, so /v2/apps pages are list slices. Snapshots are immutable and
+# shared across requests: per-user data is applied on copies (see `utils.apps.get_available_apps`).
+#
+# Refreshed every APP_CATALOG_REFRESH_SECONDS, or right after `invalidate()`, while the previous snapshot keeps
+# being served.
+
+REFRESH_SECONDS = int(os.getenv('APP_CATALOG_REFRESH_SECONDS', '60'))
+
+
+class AppCatalogSnapshot:
+    def __init__(self, approved_apps: List[App], popular_apps: List[App], include_reviews: bool):
+        self.include_reviews = include_reviews
+        self.built_at = time.time()
+        self.approved_apps: Tuple[App, ...] = tuple(approved_apps)
+        self.popular_apps: Tuple[App, ...] = tuple(popular_apps)
+
+        # /v2/apps listings: approved public apps without personas
+        listed = [a for a in approved_apps if a.approved and not a.private and not a.is_a_persona()]
+
+        # Sorting sets `score` on the models, so orders are computed on throwaway copies.
+        def copies() -> List[App]:
+            return [a.model_copy() for a in listed]
+
+        # listings serialize an app with its score only where the previous per-request code had computed it
+        self._serialized: Dict[str, dict] = {}
+        self._serialized_with_score: Dict[str, dict] = {}
+        for app in listed:
+            data = normalize_app_numeric_fields(app.model_dump(mode='json'))
+            self._serialized[app.id] = data
+            self._serialized_with_score[app.id] = {**data, 'score': compute_app_score(app)}
+
+        self.capabilities = get_capabilities_list()
+        self._by_capability: Dict[str, Tuple[str, ...]] = {}
+        self._category_groups: Dict[str, List[dict]] = {}
+        for capability in self.capabilities:
+            capability_id = capability['id']
+            apps = filter_apps_by_capability(copies(), capability_id)
+            self._by_capability[capability_id] = tuple(a.id for a in sort_apps_by_installs(apps))
+            apps = filter_apps_by_capability(copies(), capability_id)
+            by_category = group_capability_apps_by_category(apps, capability_id)
+            self._category_groups[capability_id] = build_capability_category_groups_response(by_category, capability_id)
+
+        grouped = group_apps_by_capability(copies(), self.capabilities)
+        self._groups: List[Tuple[str, List[dict]]] = []
+        ordered_keys = [c['id'] for c in self.capabilities] + [k for k in grouped if k not in self._by_capability]
+        for capability_id in ordered_keys:
+            if grouped.get(capability_id):
+                data = [
+                    (self._serialized if a.score is None else self._serialized_with_score)[a.id]
+                    for a in grouped[capability_id]
+                ]
+                self._groups.append((capability_id, data))
+
+    def __len__(self):
+        return len(self._serialized)
+
+    def _serialize(self, app_ids) -> List[dict]:
+        return [self._serialized_with_score[app_id] for app_id in app_ids]
+
+    def capability_title(self, capability_id: str) -> str:
+        return next(
+            (c['title'] for c in self.capabilities if c['id'] == capability_id),
+            capability_id.title().replace('_', ' '),
+        )
+
+    def capability_page(self, capability_id: str, offset: int, limit: int) -> dict:
+        app_ids = self._by_capability.get(capability_id, ())
+        return {
+            'data': self._serialize(app_ids[offset : offset + limit]),
+            'pagination': build_pagination_metadata(len(app_ids), offset, limit, capability_id),
+            'capability': {'id': capability_id, 'title': self.capability_title(capability_id)},
+        }
+
+    def capability_groups(self, offset: int, limit: int) -> List[dict]:
+        return [
+            {
+                'capability': {'id': capability_id, 'title': self.capability_title(capability_id)},
+                'data': data[offset : offset + limit],
+                'pagination': build_pagination_metadata(len(data), offset, limit, capability_id),
+            }
+            for capability_id, data in self._groups
+        ]
+
+    def capability_category_groups(self, capability_id: str) -> Tuple[List[dict], int]:
+        """Groups by master category and the number of apps in the capability."""
+        return self._category_groups.get(capability_id, []), len(self._by_capability.get(capability_id, ()))
+
+
+_snapshots: Dict[bool, Tuple[AppCatalogSnapshot, float]] = {}
+_build_lock = threading.Lock()
+_refreshing = set()
+_refreshing_lock = threading.Lock()
+
+
+def _build(include_reviews: bool) -> AppCatalogSnapshot:
+    start = time.perf_counter()
+    snapshot = AppCatalogSnapshot(
+        get_approved_available_apps(include_reviews=include_reviews), get_popular_apps(), include_reviews
+    )
+    _snapshots[include_reviews] = (snapshot, snapshot.built_at + REFRESH_SECONDS)
+    metrics.observe('app_catalog.build', time.perf_counter() - start)
+    metrics.set_gauge('app_catalog.apps', len(snapshot))
+    return snapshot
+
+
+def _refresh_in_background(include_reviews: bool):
+    with _refreshing_lock:
+        if include_reviews in _refreshing:
+            return
+        _refreshing.add(include_reviews)
+
+    def refresh():
+        try:
+            _build(include_reviews)
+        except Exception as e:
+            print('app_catalog: refresh failed', e)
+        finally:
+            with _refreshing_lock:
+                _refreshing.discard(include_reviews)
+
+    threading.Thread(target=refresh, daemon=True).start()
+
+
+def get_snapshot(include_reviews: bool = False) -> AppCatalogSnapshot:
+    """The current catalog snapshot, built synchronously only the first time a process needs it."""
+    entry = _snapshots.get(include_reviews)
+    if entry is None:
+        with _build_lock:
+            entry = _snapshots.get(include_reviews)
+            if entry is None:
+                return _build(include_reviews)
+
+    snapshot, refresh_at = entry
+    if time.time() >= refresh_at:
+        _refresh_in_background(include_reviews)
+    return snapshot
+
+
+async def aget_snapshot(include_reviews: bool = False) -> AppCatalogSnapshot:
+    if include_reviews in _snapshots:
+        return get_snapshot(include_reviews)
+    return await asyncio.to_thread(get_snapshot, include_reviews)
+
+
+def peek_snapshot(include_reviews: bool = False) -> Optional[AppCatalogSnapshot]:
+    """The current snapshot without building one, for callers that have their own fallback."""
+    entry = _snapshots.get(include_reviews)
+    if entry is None:
+        return None
+    if time.time() >= entry[1]:
+        _refresh_in_background(include_reviews)
+    return entry[0]
+
+
+def invalidate():
+    """Rebuilds this process's snapshots on next use. Other workers catch up within REFRESH_SECONDS."""
+    for include_reviews, (snapshot, _) in list(_snapshots.items()):
+        _snapshots[include_reviews] = (snapshot, 0)
@@ -18,6 +18,7 @@ from utils.apps import get_available_apps
 from utils.notifications import send_notification
 from utils.llm.clients import generate_embedding
 from utils.llm.proactive_notification import get_proactive_message
+from utils.llm.scheduler import INTERACTIVE, llm_priority
 from database.vector_db import query_vectors_by_metadata
 import database.conversations as conversations_db
 
@@ -197,6 +198,7 @@ def _set_proactive_noti_sent_at(uid: str, app: App):
     redis_db.set_proactive_noti_sent_at(uid, app.id, int(ts), ttl=PROACTIVE_NOTI_LIMIT_SECONDS)
 
 
+@llm_priority(INTERACTIVE)
 def _process_proactive_notification(uid: str, app: App, data):
     if not app.has_capability("proactive_notification") or not data:
         print(f"App {app.id} is not proactive_notification or data invalid", uid)
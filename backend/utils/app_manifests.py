@@ -0,0 +1,148 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+import requests
+
+from database import redis_db
+from utils.apps import parse_chat_tools_manifest
+from utils.other import metrics
+
+# Cache of third-party chat tools manifests (`external_integration.chat_tools_manifest_url`).
+#
+# An entry holds the validated tools, the response's ETag / Last-Modified, a `version` (hash of the tools) and
+# when it was last checked. Entries older than MANIFEST_REFRESH_SECONDS are revalidated in the background with
+# a conditional GET, so an unchanged manifest costs a 304 and keeps its version. Entries are kept in this
+# process and in Redis, so every worker starts from the same validators.
+
+MANIFEST_REFRESH_SECONDS = int(os.getenv('APP_MANIFEST_REFRESH_SECONDS', '300'))
+MANIFEST_REDIS_TTL = 60 * 60 * 24 * 7
+
+_entries: Dict[str, dict] = {}
+# don't retry unreachable manifests on every chat request
+_retry_at: Dict[str, float] = {}
+_refreshing = set()
+_refreshing_lock = threading.Lock()
+
+
+def tools_version(tools: List[Dict[str, Any]]) -> str:
+    return hashlib.sha1(json.dumps(tools, sort_keys=True, default=str).encode('utf-8')).hexdigest()[:16]
+
+
+def _cache_path(manifest_url: str) -> str:
+    return f'app_manifest:{manifest_url}'
+
+
+def fetch_manifest(manifest_url: str, entry: Optional[dict] = None, timeout: int = 10) -> Optional[dict]:
+    """
+    GETs the manifest, conditionally when `entry` has validators. Returns the new entry (`entry` with a new
+    check time on a 304), or None if the manifest can't be fetched or has no valid tools.
+    """
+    headers = {'Accept': 'application/json', 'User-Agent': 'Omi-App-Store/1.0'}
+    if entry and entry.get('etag'):
+        headers['If-None-Match'] = entry['etag']
+    if entry and entry.get('last_modified'):
+        headers['If-Modified-Since'] = entry['last_modified']
+
+    try:
+        print(f"📥 Fetching chat tools manifest from: {manifest_url}")
+        response = requests.get(manifest_url, timeout=timeout, headers=headers)
+
+        if response.status_code == 304 and entry:
+            metrics.incr('app_manifests.not_modified')
+            return {**entry, 'checked_at': time.time()}
+
+        if response.status_code != 200:
+            print(f"⚠️ Manifest fetch failed with status {response.status_code}: {manifest_url}")
+            return None
+
+        tools = parse_chat_tools_manifest(response.json(), manifest_url)
+        if not tools:
+            return None
+        metrics.incr('app_manifests.fetched')
+        return {
+            'tools': tools,
+            'version': tools_version(tools),
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified'),
+            'checked_at': time.time(),
+        }
+
+    except requests.Timeout:
+        print(f"⚠️ Manifest fetch timed out: {manifest_url}")
+        return None
+    except requests.RequestException as e:
+        print(f"⚠️ Manifest fetch request error: {e}")
+        return None
+    except ValueError as e:
+        print(f"⚠️ Invalid JSON in manifest response: {e}")
+        return None
+    except Exception as e:
+        print(f"⚠️ Unexpected error fetching manifest: {e}")
+        return None
+
+
+def _load(manifest_url: str) -> Optional[dict]:
+    entry = _entries.get(manifest_url)
+    if entry is None:
+        entry = redis_db.get_generic_cache(_cache_path(manifest_url))
+        if entry:
+            _entries[manifest_url] = entry
+    return entry
+
+
+def _store(manifest_url: str, entry: dict):
+    _entries[manifest_url] = entry
+    _retry_at.pop(manifest_url, None)
+    redis_db.set_generic_cache(_cache_path(manifest_url), entry, ttl=MANIFEST_REDIS_TTL)
+
+
+def refresh(manifest_url: str, timeout: int = 10) -> Optional[dict]:
+    """Revalidates the manifest now. Returns its current entry, or None if it can't be fetched."""
+    entry = fetch_manifest(manifest_url, _load(manifest_url), timeout=timeout)
+    if entry is None:
+        metrics.incr('app_manifests.failed')
+        _retry_at[manifest_url] = time.time() + MANIFEST_REFRESH_SECONDS
+        return None
+    _store(manifest_url, entry)
+    return entry
+
+
+def _refresh_in_background(manifest_url: str):
+    with _refreshing_lock:
+        if manifest_url in _refreshing:
+            return
+        _refreshing.add(manifest_url)
+
+    def run():
+        try:
+            # another worker may have revalidated it already
+            entry = redis_db.get_generic_cache(_cache_path(manifest_url))
+            if entry and time.time() < entry['checked_at'] + MANIFEST_REFRESH_SECONDS:
+                _entries[manifest_url] = entry
+            else:
+                refresh(manifest_url)
+        except Exception as e:
+            print('app_manifests: refresh failed', manifest_url, e)
+        finally:
+            with _refreshing_lock:
+                _refreshing.discard(manifest_url)
+
+    threading.Thread(target=run, daemon=True).start()
+
+
+def peek(manifest_url: str) -> Optional[dict]:
+    """
+    This process's entry for the manifest, without waiting on the network: missing or stale entries are
+    (re)fetched in the background and picked up by later calls.
+    """
+    entry = _entries.get(manifest_url)
+    now = time.time()
+    if (entry is None or now >= entry['checked_at'] + MANIFEST_REFRESH_SECONDS) and now >= _retry_at.get(
+        manifest_url, 0
+    ):
+        _refresh_in_background(manifest_url)
+    return entry
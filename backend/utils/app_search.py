@@ -0,0 +1,290 @@
+import bisect
+import math
+import re
+import threading
+from collections import OrderedDict, defaultdict
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from models.app import App
+from utils import app_catalog
+
+# In-process inverted index for app search.
+#
+# Names, descriptions, categories and capabilities are tokenized into one index. A query token matches
+# vocabulary terms exactly, by prefix ("slac" -> "slack") or with one typo ("slakc" -> "slack"). Relevance is
+# blended with popularity, so among equally relevant apps the installed ones come first.
+#
+# The public catalog index follows `utils.app_catalog` snapshots: only added, removed or edited apps are
+# re-tokenized, installs and ratings are refreshed in place.
+
+_TOKEN_RE = re.compile(r'[a-z0-9]+')
+
+FIELD_WEIGHTS = {'name': 3.0, 'category': 1.5, 'capabilities': 1.0, 'description': 1.0}
+EXACT_MATCH = 1.0
+PREFIX_MATCH = 0.7
+TYPO_MATCH = 0.4
+TYPO_MIN_LENGTH = 4
+MAX_PREFIX_EXPANSIONS = 64
+POPULARITY_WEIGHT = 0.5
+RESULTS_CACHED = 256
+
+# same orderings as the `sort` options of /v2/apps/search: (key, reverse)
+SORTS = {
+    'rating_desc': (lambda a: a.rating_avg or 0, True),
+    'rating_asc': (lambda a: a.rating_avg or 0, False),
+    'name_asc': (lambda a: a.name.lower(), False),
+    'name_desc': (lambda a: a.name.lower(), True),
+    'installs_desc': (lambda a: a.installs or 0, True),
+}
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    return _TOKEN_RE.findall(text.lower()) if text else []
+
+
+def _deletes(term: str) -> Set[str]:
+    return {term[:i] + term[i + 1 :] for i in range(len(term))}
+
+
+class AppSearchIndex:
+    def __init__(self):
+        self._apps: Dict[str, App] = {}
+        self._signatures: Dict[str, tuple] = {}
+        self._doc_terms: Dict[str, Dict[str, float]] = {}
+        self._postings: Dict[str, Dict[str, float]] = {}
+        # single-character deletions of every term -> terms, for typo lookups
+        self._deletes: Dict[str, Set[str]] = defaultdict(set)
+        self._terms: List[str] = []
+        self._terms_dirty = False
+        # relevance multiplier per app, from its installs
+        self._boosts: Dict[str, float] = {}
+        # filter lookups, rebuilt on sync
+        self._ids_by_category: Dict[str, Set[str]] = {}
+        self._ids_by_capability: Dict[str, Set[str]] = {}
+        self._ratings: Dict[str, float] = {}
+        # (tokens, category, capability, min_rating, sort) -> ordered matching app ids, until the next sync
+        self._results: OrderedDict = OrderedDict()
+
+    def __len__(self):
+        return len(self._apps)
+
+    @staticmethod
+    def _signature(app: App) -> tuple:
+        return app.name, app.description, app.category, tuple(sorted(app.capabilities or ()))
+
+    def _index_app(self, app: App):
+        terms: Dict[str, float] = {}
+        fields = [
+            ('name', app.name),
+            ('description', app.description),
+            ('category', app.category),
+            ('capabilities', ' '.join(app.capabilities or ())),
+        ]
+        for field, text in fields:
+            for token in tokenize(text):
+                # a term counts once per app at its strongest field, long descriptions don't win by repetition
+                terms[token] = max(terms.get(token, 0), FIELD_WEIGHTS[field])
+
+        for term, weight in terms.items():
+            postings = self._postings.get(term)
+            if postings is None:
+                postings = self._postings[term] = {}
+                for deleted in _deletes(term):
+                    self._deletes[deleted].add(term)
+                self._terms_dirty = True
+            postings[app.id] = weight
+        self._doc_terms[app.id] = terms
+
+    def _unindex_app(self, app_id: str):
+        for term in self._doc_terms.pop(app_id, ()):
+            postings = self._postings[term]
+            postings.pop(app_id, None)
+            if postings:
+                continue
+            del self._postings[term]
+            for deleted in _deletes(term):
+                terms = self._deletes[deleted]
+                terms.discard(term)
+                if not terms:
+                    del self._deletes[deleted]
+            self._terms_dirty = True
+
+    def sync(self, apps: Iterable[App]) -> int:
+        """Brings the index in line with `apps`. Returns how many apps had to be (re/un)indexed."""
+        changed = 0
+        seen = set()
+        for app in apps:
+            seen.add(app.id)
+            self._apps[app.id] = app
+            signature = self._signature(app)
+            if self._signatures.get(app.id) != signature:
+                self._unindex_app(app.id)
+                self._index_app(app)
+                self._signatures[app.id] = signature
+                changed += 1
+
+        for app_id in [app_id for app_id in self._apps if app_id not in seen]:
+            self._unindex_app(app_id)
+            del self._apps[app_id]
+            del self._signatures[app_id]
+            changed += 1
+
+        if self._terms_dirty:
+            self._terms = sorted(self._postings)
+            self._terms_dirty = False
+        self._results.clear()
+        self._ids_by_category = defaultdict(set)
+        self._ids_by_capability = defaultdict(set)
+        for app_id, app in self._apps.items():
+            self._ids_by_category[app.category].add(app_id)
+            for capability in app.capabilities or ():
+                self._ids_by_capability[capability].add(app_id)
+        self._ratings = {app_id: app.rating_avg or 0 for app_id, app in self._apps.items()}
+        max_popularity = max((math.log1p(a.installs or 0) for a in self._apps.values()), default=0) or 1.0
+        self._boosts = {
+            app_id: 1 + POPULARITY_WEIGHT * math.log1p(app.installs or 0) / max_popularity
+            for app_id, app in self._apps.items()
+        }
+        return changed
+
+    def _expand(self, token: str) -> Dict[str, float]:
+        """Vocabulary terms matching a query token, with their match quality."""
+        matches = {}
+        if token in self._postings:
+            matches[token] = EXACT_MATCH
+
+        i = bisect.bisect_left(self._terms, token)
+        end = min(len(self._terms), i + MAX_PREFIX_EXPANSIONS)
+        while i < end and self._terms[i].startswith(token):
+            matches.setdefault(self._terms[i], PREFIX_MATCH)
+            i += 1
+
+        if len(token) >= TYPO_MIN_LENGTH:
+            # missing letter, extra letter, and substituted or swapped letters
+            candidates = set(self._deletes.get(token, ()))
+            for deleted in _deletes(token):
+                if deleted in self._postings:
+                    candidates.add(deleted)
+                candidates.update(self._deletes.get(deleted, ()))
+            for term in candidates:
+                matches.setdefault(term, TYPO_MATCH)
+        return matches
+
+    def _relevance(self, tokens: List[str]) -> Dict[str, float]:
+        scores = None
+        for token in dict.fromkeys(tokens):
+            token_scores: Dict[str, float] = {}
+            # strongest expansion first, so weaker ones only fill in apps it didn't match
+            expansions = sorted(self._expand(token).items(), key=lambda x: x[1], reverse=True)
+            for term, quality in expansions:
+                postings = self._postings[term]
+                factor = quality * math.log(1 + len(self._apps) / len(postings))
+                if not token_scores:
+                    token_scores = {app_id: weight * factor for app_id, weight in postings.items()}
+                    continue
+                for app_id, weight in postings.items():
+                    score = weight * factor
+                    if score > token_scores.get(app_id, 0):
+                        token_scores[app_id] = score
+            # every query token has to match
+            if scores is None:
+                scores = token_scores
+            else:
+                scores = {app_id: s + token_scores[app_id] for app_id, s in scores.items() if app_id in token_scores}
+            if not scores:
+                return {}
+        return scores or {}
+
+    def _allowed(self, category: Optional[str], capability: Optional[str], min_rating: Optional[float]) -> Set[str]:
+        allowed = None
+        if category is not None:
+            allowed = self._ids_by_category.get(category, set())
+        if capability is not None:
+            ids = self._ids_by_capability.get(capability, set())
+            allowed = ids if allowed is None else allowed & ids
+        if min_rating is not None:
+            ids = {app_id for app_id, rating in self._ratings.items() if rating >= min_rating}
+            allowed = ids if allowed is None else allowed & ids
+        return allowed
+
+    def _matching_ids(
+        self,
+        tokens: Tuple[str, ...],
+        category: Optional[str],
+        capability: Optional[str],
+        min_rating: Optional[float],
+        sort: Optional[str],
+    ) -> Tuple[str, ...]:
+        key = (tokens, category, capability, min_rating, sort)
+        ids = self._results.get(key)
+        if ids is not None:
+            self._results.move_to_end(key)
+            return ids
+
+        if category is not None or capability is not None or min_rating is not None:
+            # filtering keeps the order of the unfiltered results
+            allowed = self._allowed(category, capability, min_rating)
+            ids = tuple(app_id for app_id in self._matching_ids(tokens, None, None, None, sort) if app_id in allowed)
+        elif sort is not None:
+            key_fn, reverse = SORTS[sort]
+            if tokens:
+                apps = [self._apps[app_id] for app_id in self._matching_ids(tokens, None, None, None, None)]
+            else:
+                apps = self._apps.values()
+            ids = tuple(app.id for app in sorted(apps, key=key_fn, reverse=reverse))
+        else:
+            scores = self._relevance(list(tokens))
+            boosts = self._boosts
+            ids = tuple(sorted(scores, key=lambda app_id: scores[app_id] * boosts[app_id], reverse=True))
+
+        self._results[key] = ids
+        if len(self._results) > RESULTS_CACHED:
+            self._results.popitem(last=False)
+        return ids
+
+    def search(
+        self,
+        q: Optional[str] = None,
+        category: Optional[str] = None,
+        capability: Optional[str] = None,
+        min_rating: Optional[float] = None,
+        sort: Optional[str] = None,
+        offset: int = 0,
+        limit: Optional[int] = None,
+    ) -> Tuple[List[App], int]:
+        """
+        A page of the apps matching `q` and the filters, and how many match in total. Ordered by `sort` when it
+        is one of SORTS, otherwise by blended relevance for text queries and by name without one.
+
+        Results are kept until the next `sync`, so paging through them or repeating a query is a slice.
+        """
+        tokens = tuple(dict.fromkeys(tokenize(q)))
+        if sort not in SORTS:
+            sort = None if tokens else 'name_asc'
+        ids = self._matching_ids(tokens, category, capability, min_rating, sort)
+        end = None if limit is None else offset + limit
+        return [self._apps[app_id] for app_id in ids[offset:end]], len(ids)
+
+
+_catalog_index = AppSearchIndex()
+_catalog_index_lock = threading.Lock()
+_indexed_snapshot = None
+
+
+def search_public_apps(
+    q: Optional[str] = None,
+    category: Optional[str] = None,
+    capability: Optional[str] = None,
+    min_rating: Optional[float] = None,
+    sort: Optional[str] = None,
+    offset: int = 0,
+    limit: Optional[int] = None,
+) -> Tuple[List[App], int]:
+    """Searches the approved public catalog (personas excluded). Returned models are shared, copy before editing."""
+    global _indexed_snapshot
+    snapshot = app_catalog.get_snapshot(include_reviews=True)
+    with _catalog_index_lock:
+        if snapshot is not _indexed_snapshot:
+            _catalog_index.sync(app for app in snapshot.approved_apps if not app.is_a_persona())
+            _indexed_snapshot = snapshot
+        return _catalog_index.search(q, category, capability, min_rating, sort, offset=offset, limit=limit)
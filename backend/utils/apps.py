@@ -1,3 +1,4 @@
+import asyncio
 import math
 import os
 import threading
@@ -36,17 +37,17 @@ from database.auth import get_user_name
 from database.conversations import get_conversations
 import database.users as users_db
 from database.memories import get_memories, get_user_public_memories
+from database import cache, redis_db_async
 from database.redis_db import (
     get_enabled_apps,
     get_app_reviews,
-    get_generic_cache,
-    set_generic_cache,
     set_app_usage_history_cache,
     get_app_usage_history_cache,
     get_app_money_made_cache,
     set_app_money_made_cache,
     get_apps_installs_count,
     get_apps_reviews,
+    get_apps_rating_summaries,
     get_app_cache_by_id,
     set_app_cache_by_id,
     set_app_review_cache,
@@ -67,6 +68,7 @@ from models.conversation import Conversation
 from models.other import Person
 from utils import stripe
 from utils.llm.persona import condense_conversations, condense_memories, generate_persona_description, condense_tweets
+from utils.llm.scheduler import BACKGROUND, llm_priority
 from utils.social import get_twitter_timeline, TwitterProfile, get_twitter_profile
 
 MarketplaceAppReviewUIDs = (
@@ -114,6 +116,11 @@ def weighted_rating(app):
     return (v / (v + m) * R) + (m / (v + m) * C)
 
 
+def apply_rating_summary(app_dict: dict, summary: dict | None):
+    app_dict['rating_avg'] = summary['avg'] if summary else None
+    app_dict['rating_count'] = summary['count'] if summary else 0
+
+
 def compute_app_score(app: App) -> float:
     """
     Compute app ranking score using the formula:
@@ -134,53 +141,43 @@ def compute_app_score(app: App) -> float:
     return round(score, 4)
 
 
+def get_public_approved_apps_data() -> List:
+    return cache.get_or_compute('get_public_approved_apps_data', get_public_approved_apps_db, 60 * 10)
+
+
 def get_popular_apps() -> List[App]:
-    popular_apps = []
-    if cached_apps := get_generic_cache('get_popular_apps_data'):
-        print('get_popular_apps from cache')
-        popular_apps = cached_apps
-    else:
-        print('get_popular_apps from db')
-        popular_apps = get_popular_apps_db()
-        set_generic_cache('get_popular_apps_data', popular_apps, 60 * 30)  # 30 minutes cached
+    popular_apps = cache.get_or_compute('get_popular_apps_data', get_popular_apps_db, 60 * 30)
 
     app_ids = [app['id'] for app in popular_apps]
     apps_install = get_apps_installs_count(app_ids)
-    apps_reviews = get_apps_reviews(app_ids)
+    apps_ratings = get_apps_rating_summaries(app_ids)
 
     apps = []
     for app in popular_apps:
-        app_dict = app
+        app_dict = {**app}
         app_dict['installs'] = apps_install.get(app['id'], 0)
-        reviews = apps_reviews.get(app['id'], {})
-        sorted_reviews = reviews.values()
-        rating_avg = sum([x['score'] for x in sorted_reviews]) / len(sorted_reviews) if reviews else None
-        app_dict['rating_avg'] = rating_avg
-        app_dict['rating_count'] = len(sorted_reviews)
+        apply_rating_summary(app_dict, apps_ratings.get(app['id']))
         apps.append(App(**app_dict))
     apps = sorted(apps, key=lambda x: x.installs, reverse=True)
     return apps
 
 
 def get_available_apps(uid: str, include_reviews: bool = False) -> List[App]:
+    if not include_reviews:
+        # hot path (realtime integrations, conversation processing): public apps come prebuilt from the catalog
+        from utils import app_catalog
+
+        return _get_available_apps_from_catalog(uid, app_catalog.get_snapshot())
+
     private_data = []
     public_approved_data = []
     public_unapproved_data = []
     tester_apps = []
     all_apps = []
     tester = is_tester(uid)
-    if cachedApps := get_generic_cache('get_public_approved_apps_data'):
-        print('get_public_approved_plugins_data from cache')
-        public_approved_data = cachedApps
-        public_unapproved_data = get_public_unapproved_apps(uid)
-        private_data = get_private_apps(uid)
-        pass
-    else:
-        print('get_public_approved_plugins_data from db')
-        private_data = get_private_apps(uid)
-        public_approved_data = get_public_approved_apps_db()
-        public_unapproved_data = get_public_unapproved_apps(uid)
-        set_generic_cache('get_public_approved_apps_data', public_approved_data, 60 * 10)  # 10 minutes cached
+    public_approved_data = get_public_approved_apps_data()
+    public_unapproved_data = get_public_unapproved_apps(uid)
+    private_data = get_private_apps(uid)
     if tester:
         tester_apps = get_apps_for_tester_db(uid)
     user_enabled = set(get_enabled_apps(uid))
@@ -190,20 +187,18 @@ def get_available_apps(uid: str, include_reviews: bool = False) -> List[App]:
     app_ids = [app['id'] for app in all_apps]
     apps_install = get_apps_installs_count(app_ids)
     apps_review = get_apps_reviews(app_ids) if include_reviews else {}
+    apps_ratings = get_apps_rating_summaries(app_ids) if include_reviews else {}
 
     for app in all_apps:
-        app_dict = app
+        app_dict = {**app}
         app_dict['enabled'] = app['id'] in user_enabled
         app_dict['rejected'] = app['approved'] is False
         app_dict['installs'] = apps_install.get(app['id'], 0)
         if include_reviews:
             reviews = apps_review.get(app['id'], {})
-            sorted_reviews = reviews.values()
-            rating_avg = sum([x['score'] for x in sorted_reviews]) / len(sorted_reviews) if reviews else None
             app_dict['reviews'] = [details for details in reviews.values() if details['review']]
             app_dict['user_review'] = reviews.get(uid)
-            app_dict['rating_avg'] = rating_avg
-            app_dict['rating_count'] = len(sorted_reviews)
+            apply_rating_summary(app_dict, apps_ratings.get(app['id']))
         apps.append(App(**app_dict))
     if include_reviews:
         apps = sorted(apps, key=weighted_rating, reverse=True)
@@ -235,11 +230,8 @@ def get_available_app_by_id_with_reviews(app_id: str, uid: str | None) -> dict |
     app['money_made'] = get_app_money_made_amount(app['id']) if not app['private'] else None
     app['usage_count'] = get_app_usage_count(app['id']) if not app['private'] else None
     reviews = get_app_reviews(app['id'])
-    sorted_reviews = reviews.values()
-    rating_avg = sum([x['score'] for x in sorted_reviews]) / len(sorted_reviews) if reviews else None
     app['reviews'] = [details for details in reviews.values() if details['review']]
-    app['rating_avg'] = rating_avg
-    app['rating_count'] = len(sorted_reviews)
+    apply_rating_summary(app, get_apps_rating_summaries([app['id']]).get(app['id']))
     app['user_review'] = reviews.get(uid)
 
     # enabled
@@ -263,30 +255,19 @@ def get_private_apps(uid: str) -> List:
 
 
 def get_approved_available_apps(include_reviews: bool = False) -> list[App]:
-    all_apps = []
-    if cached_apps := get_generic_cache('get_public_approved_apps_data'):
-        print('get_public_approved_apps_data from cache')
-        all_apps = cached_apps
-        pass
-    else:
-        all_apps = get_public_approved_apps_db()
-        set_generic_cache('get_public_approved_apps_data', all_apps, 60 * 10)  # 10 minutes cached
+    all_apps = get_public_approved_apps_data()
 
     app_ids = [app['id'] for app in all_apps]
     apps_installs = get_apps_installs_count(app_ids)
-    apps_reviews = get_apps_reviews(app_ids) if include_reviews else {}
+    apps_ratings = get_apps_rating_summaries(app_ids) if include_reviews else {}
 
     apps = []
     for app in all_apps:
-        app_dict = app
+        app_dict = {**app}
         app_dict['installs'] = apps_installs.get(app['id'], 0)
         if include_reviews:
-            reviews = apps_reviews.get(app['id'], {})
-            sorted_reviews = reviews.values()
-            rating_avg = sum([x['score'] for x in sorted_reviews]) / len(sorted_reviews) if reviews else None
             app_dict['reviews'] = []
-            app_dict['rating_avg'] = rating_avg
-            app_dict['rating_count'] = len(sorted_reviews)
+            apply_rating_summary(app_dict, apps_ratings.get(app['id']))
         apps.append(App(**app_dict))
     if include_reviews:
         apps = sorted(apps, key=weighted_rating, reverse=True)
@@ -484,7 +465,17 @@ def find_app_subscription(app_id: str, uid: str, status_filter: str = 'all') ->
 
 
 def is_audio_bytes_app_enabled(uid: str):
-    enabled_apps = get_enabled_apps(uid)
+    return _has_audio_bytes_apps(get_enabled_apps(uid))
+
+
+async def ais_audio_bytes_app_enabled(uid: str):
+    enabled_apps = await redis_db_async.get_enabled_apps(uid)
+    if not enabled_apps:
+        return False
+    return await asyncio.to_thread(_has_audio_bytes_apps, enabled_apps)
+
+
+def _has_audio_bytes_apps(enabled_apps: List[str]) -> bool:
     # https://firebase.google.com/docs/firestore/query-data/queries#in_and_array-contains-any
     limit = 30
     enabled_apps = list(set(enabled_apps))
@@ -613,6 +604,7 @@ def update_personas_async(uid: str):
         print(f"[PERSONAS] No personas found for uid={uid}")
 
 
+@llm_priority(BACKGROUND)
 def sync_update_persona_prompt(persona: dict):
     """Synchronous wrapper for update_persona_prompt"""
     import asyncio
@@ -786,6 +778,29 @@ def is_user_app_enabled(uid: str, app_id: str) -> bool:
 # ********************************
 
 
+def _get_available_apps_from_catalog(uid: str, snapshot) -> List[App]:
+    private_data = get_private_apps(uid)
+    public_unapproved_data = get_public_unapproved_apps(uid)
+    tester_apps = get_apps_for_tester_db(uid) if is_tester(uid) else []
+    user_enabled = set(get_enabled_apps(uid))
+
+    user_apps = public_unapproved_data + tester_apps
+    apps_install = get_apps_installs_count([app['id'] for app in private_data + user_apps])
+
+    def build(app: dict) -> App:
+        app_dict = {**app}
+        app_dict['enabled'] = app['id'] in user_enabled
+        app_dict['rejected'] = app['approved'] is False
+        app_dict['installs'] = apps_install.get(app['id'], 0)
+        return App(**app_dict)
+
+    # snapshot models are shared, only the ones the user enabled are copied
+    public_apps = [
+        app.model_copy(update={'enabled': True}) if app.id in user_enabled else app for app in snapshot.approved_apps
+    ]
+    return [build(app) for app in private_data] + public_apps + [build(app) for app in user_apps]
+
+
 def normalize_app_numeric_fields(app_dict: dict) -> dict:
     """Ensure numeric fields that clients expect as float are emitted as float."""
 
@@ -1217,59 +1232,83 @@ def fetch_app_chat_tools_from_manifest(manifest_url: str, timeout: int = 10) ->
         ]
     }
     """
-    import requests
+    from utils import app_manifests
 
     if not manifest_url:
         return None
 
-    try:
-        print(f"📥 Fetching chat tools manifest from: {manifest_url}")
+    # revalidated against the manifest cache, an unchanged manifest costs a 304
+    entry = app_manifests.refresh(manifest_url, timeout=timeout)
+    if not entry:
+        return None
+    # callers resolve endpoints in place, the cached tools stay as published
+    return [dict(tool) for tool in entry['tools']]
 
-        response = requests.get(
-            manifest_url, timeout=timeout, headers={'Accept': 'application/json', 'User-Agent': 'Omi-App-Store/1.0'}
-        )
 
-        if response.status_code != 200:
-            print(f"⚠️ Manifest fetch failed with status {response.status_code}: {manifest_url}")
-            return None
+def parse_chat_tools_manifest(data: Any, manifest_url: str) -> List[Dict[str, Any]] | None:
+    """Validated tool definitions from a manifest response body, or None if it has none."""
+    # Validate response structure
+    if not isinstance(data, dict):
+        print(f"⚠️ Invalid manifest format (not a dict): {manifest_url}")
+        return None
 
-        data = response.json()
+    tools = data.get('tools', [])
 
-        # Validate response structure
-        if not isinstance(data, dict):
-            print(f"⚠️ Invalid manifest format (not a dict): {manifest_url}")
-            return None
+    if not isinstance(tools, list):
+        print(f"⚠️ Invalid manifest format ('tools' is not a list): {manifest_url}")
+        return None
 
-        tools = data.get('tools', [])
+    # Validate and normalize each tool
+    validated_tools = []
+    for tool in tools:
+        validated_tool = _validate_tool_definition(tool)
+        if validated_tool:
+            validated_tools.append(validated_tool)
+        else:
+            print(f"⚠️ Skipping invalid tool in manifest: {tool.get('name', 'unknown')}")
+
+    print(f"✅ Fetched {len(validated_tools)} chat tools from manifest")
+    return validated_tools if validated_tools else None
 
-        if not isinstance(tools, list):
-            print(f"⚠️ Invalid manifest format ('tools' is not a list): {manifest_url}")
-            return None
 
-        # Validate and normalize each tool
-        validated_tools = []
+def resolve_chat_tool_endpoints(tools: List[Dict[str, Any]], app_home_url: str | None) -> List[Dict[str, Any]]:
+    """Resolves relative tool endpoints against the app's home URL, in place."""
+    base_url = (app_home_url or '').rstrip('/')
+    if base_url:
         for tool in tools:
-            validated_tool = _validate_tool_definition(tool)
-            if validated_tool:
-                validated_tools.append(validated_tool)
-            else:
-                print(f"⚠️ Skipping invalid tool in manifest: {tool.get('name', 'unknown')}")
+            endpoint = tool.get('endpoint', '')
+            if endpoint.startswith('/') and not endpoint.startswith('//'):
+                tool['endpoint'] = f"{base_url}{endpoint}"
+    return tools
 
-        print(f"✅ Fetched {len(validated_tools)} chat tools from manifest")
-        return validated_tools if validated_tools else None
 
-    except requests.Timeout:
-        print(f"⚠️ Manifest fetch timed out: {manifest_url}")
-        return None
-    except requests.RequestException as e:
-        print(f"⚠️ Manifest fetch request error: {e}")
-        return None
-    except ValueError as e:
-        print(f"⚠️ Invalid JSON in manifest response: {e}")
-        return None
-    except Exception as e:
-        print(f"⚠️ Unexpected error fetching manifest: {e}")
-        return None
+def get_app_chat_tools_definition(app_id: str) -> dict:
+    """
+    Name, stored chat tools and manifest URL of an app, cached for agentic chat. Empty if the app doesn't exist.
+    `version` changes whenever the stored tools do.
+    """
+    from utils import app_manifests
+
+    def compute():
+        app_data = get_app_by_id_db(app_id)
+        if not app_data:
+            return {}
+        app = App(**app_data)
+        tools = [tool.model_dump() for tool in app.chat_tools or []]
+        external_integration = app.external_integration
+        return {
+            'name': app.name,
+            'tools': tools,
+            'version': app_manifests.tools_version(tools),
+            'manifest_url': external_integration.chat_tools_manifest_url if external_integration else None,
+            'app_home_url': external_integration.app_home_url if external_integration else None,
+        }
+
+    return cache.get_or_compute(f'app_chat_tools:{app_id}', compute, 60 * 10)
+
+
+def invalidate_app_chat_tools_definition(app_id: str):
+    cache.invalidate(f'app_chat_tools:{app_id}')
 
 
 def _validate_tool_definition(tool: Dict[str, Any]) -> Dict[str, Any] | None:
@@ -0,0 +1,136 @@
+import os
+from typing import Iterable, List, Optional, Tuple
+
+import database.conversations as conversations_db
+import database.users as users_db
+from models.conversation import Conversation, ConversationDigest
+from utils.llm.clients import num_tokens_from_string
+from utils.other import metrics
+from utils.other.task_runner import Stage, TaskRunner
+
+# Per-conversation digests: title, overview, people, entities, action items and events, with their token count. They
+# are written when a conversation is processed, so LLM tools can list many conversations without loading and
+# decrypting transcripts, and fit them to a token budget without tokenizing at request time. Conversations processed
+# before digests existed get one built from their structured fields on first read, which is then stored.
+
+CONTEXT_TOKENS = int(os.getenv('DIGEST_CONTEXT_TOKENS', '30000'))
+
+# Digest writes off the request: refreshes after a conversation's title, events or action items are edited, and
+# storing the digests built on read (dropped when the runner is full, the next read builds them again).
+digest_tasks = TaskRunner(
+    'digests',
+    max_workers=int(os.getenv('DIGEST_TASK_WORKERS', '4')),
+    max_pending=int(os.getenv('DIGEST_TASK_MAX_PENDING', '200')),
+)
+REFRESH_STAGE = Stage('refresh', timeout=30, retries=1)
+BACKFILL_STAGE = Stage('backfill', timeout=30, retries=1)
+
+SEPARATOR = "\n\n---------------------\n\n"
+# the separator and the "Conversation #N" header, per digest
+_OVERHEAD_TOKENS = 12
+
+
+def _unique(values: Iterable[str]) -> List[str]:
+    seen, result = set(), []
+    for value in values:
+        value = (value or '').strip()
+        if value and value.lower() not in seen:
+            seen.add(value.lower())
+            result.append(value)
+    return result
+
+
+def build_digest(conversation: Conversation, people: Iterable[str] = (), entities: Iterable[str] = ()):
+    structured = conversation.structured
+    digest = ConversationDigest(
+        id=conversation.id,
+        created_at=conversation.created_at,
+        started_at=conversation.started_at,
+        finished_at=conversation.finished_at,
+        category=structured.category,
+        emoji=structured.emoji,
+        title=structured.title,
+        overview=structured.overview,
+        people=_unique(people),
+        entities=_unique(entities),
+        action_items=[item.description for item in structured.action_items],
+        events=[f"{event.title} ({event.start} - {event.duration} minutes)" for event in structured.events],
+    )
+    digest.tokens = num_tokens_from_string(digest.as_context())
+    return digest
+
+
+def save_conversation_digest(uid: str, conversation: Conversation, metadata: Optional[dict] = None):
+    """
+    Writes the digest of a processed conversation. `metadata` is what was extracted from its transcript for the
+    vector index (people, entities); without it, the people and entities of the stored digest are kept.
+    """
+    if conversation.discarded:
+        conversations_db.delete_conversation_digest(uid, conversation.id)
+        return
+
+    people, entities = [], []
+    person_ids = conversation.get_person_ids()
+    if person_ids:
+        people = [person['name'] for person in users_db.get_people_by_ids(uid, person_ids) if person.get('name')]
+    if metadata is not None:
+        people += metadata.get('people') or []
+        entities = metadata.get('entities') or []
+    else:
+        stored = conversations_db.get_conversation_digests(uid, [conversation.id]).get(conversation.id)
+        if stored:
+            people += stored.get('people') or []
+            entities = stored.get('entities') or []
+
+    digest = build_digest(conversation, people, entities)
+    conversations_db.upsert_conversation_digests(uid, [digest.dict()])
+
+
+def refresh_digest(uid: str, conversation: Conversation):
+    """Rewrites the digest of an edited conversation in the background, keeping its people and entities."""
+    digest_tasks.submit(REFRESH_STAGE, save_conversation_digest, uid, conversation, label=f'{uid}/{conversation.id}')
+
+
+def get_digests(uid: str, conversation_ids: List[str]) -> List[ConversationDigest]:
+    """Digests of the given conversations, in the given order. Missing ones are built and stored in the background."""
+    if not conversation_ids:
+        return []
+    stored = conversations_db.get_conversation_digests(uid, conversation_ids)
+    missing = [conversation_id for conversation_id in conversation_ids if conversation_id not in stored]
+    metrics.incr('digests.hit', len(stored))
+    if missing:
+        metrics.incr('digests.miss', len(missing))
+        built = []
+        for data in conversations_db.get_conversations_digest_fields(uid, missing):
+            try:
+                conversation = Conversation(**{'started_at': None, 'finished_at': None, **data})
+            except Exception as e:
+                print(f"get_digests: skipping conversation {data.get('id')}: {e}")
+                continue
+            built.append(build_digest(conversation))
+        stored.update({digest.id: digest.dict() for digest in built})
+        if built:
+            digest_tasks.submit(
+                BACKFILL_STAGE,
+                conversations_db.upsert_conversation_digests,
+                uid,
+                [digest.dict() for digest in built],
+                label=uid,
+                block=False,
+            )
+    return [ConversationDigest(**stored[i]) for i in conversation_ids if i in stored]
+
+
+def digests_to_context(
+    digests: List[ConversationDigest], token_budget: int = CONTEXT_TOKENS
+) -> Tuple[str, List[ConversationDigest]]:
+    """Numbered digests in order, as many as fit in `token_budget`. Returns the text and the digests it includes."""
+    parts, included, used = [], [], 0
+    for digest in digests:
+        cost = (digest.tokens or num_tokens_from_string(digest.as_context())) + _OVERHEAD_TOKENS
+        if included and used + cost > token_budget:
+            break
+        used += cost
+        included.append(digest)
+        parts.append(f"Conversation #{len(included)}\n{digest.as_context()}")
+    return SEPARATOR.join(parts), included
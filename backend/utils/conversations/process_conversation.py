@@ -1,7 +1,6 @@
 import os
 import random
 import re
-import threading
 import uuid
 from datetime import timezone, timedelta, datetime
 from typing import Union, Tuple, List, Optional
@@ -31,7 +30,7 @@ from models.other import Person
 from models.task import Task, TaskStatus, TaskAction, TaskActionProvider
 from models.trend import Trend
 from models.notification_message import NotificationMessage
-from utils.apps import get_available_apps, update_personas_async, sync_update_persona_prompt
+from utils.apps import get_available_apps, sync_update_persona_prompt
 from utils.llm.conversation_processing import (
     get_transcript_structure,
     get_app_result,
@@ -41,9 +40,11 @@ from utils.llm.conversation_processing import (
     get_reprocess_transcript_structure,
 )
 from utils.analytics import record_usage
+from utils.conversations import digests
 from utils.llm.memories import extract_memories_from_text, new_memories_extractor
 from utils.llm.external_integrations import summarize_experience_text
 from utils.llm.trends import trends_extractor
+from utils.llm.scheduler import BACKGROUND, llm_priority
 from utils.llm.chat import (
     retrieve_metadata_from_text,
     retrieve_metadata_from_message,
@@ -54,11 +55,31 @@ from utils.llm.external_integrations import get_message_structure
 from utils.llm.clients import generate_embedding
 from utils.notifications import send_notification
 from utils.other.hume import get_hume, HumeJobCallbackModel, HumeJobModelPredictionResponseModel
+from utils.other import metrics
+from utils.other.task_runner import Stage, TaskGroup, TaskRunner
+from utils.retrieval import lexical
 from utils.retrieval.rag import retrieve_rag_conversation_context
 from utils.webhooks import conversation_created_webhook
 from utils.notifications import send_action_item_data_message
 
+# Work that follows a conversation's processing runs on a bounded runner (see task_runner.py) instead of a thread per
+# task. Only stages that can run twice are retried.
+post_conversation_tasks = TaskRunner(
+    'post_conversation',
+    max_workers=int(os.getenv('POST_CONVERSATION_WORKERS', '64')),
+    max_pending=int(os.getenv('POST_CONVERSATION_MAX_PENDING', '2000')),
+)
+
+VECTOR_STAGE = Stage('vector', timeout=60, retries=2)
+DIGEST_STAGE = Stage('digest', timeout=30, retries=2)
+MEMORIES_STAGE = Stage('memories', timeout=120, retries=1)
+TRENDS_STAGE = Stage('trends', timeout=60)
+ACTION_ITEMS_STAGE = Stage('action_items', timeout=60)
+WEBHOOK_STAGE = Stage('webhook', timeout=45)
+PERSONAS_STAGE = Stage('personas', timeout=300, retries=1)
 
+
+@llm_priority(BACKGROUND)
 def _get_structured(
     uid: str,
     language_code: str,
@@ -263,8 +284,7 @@ def _trigger_apps(
     # Clear existing app results
     conversation.apps_results = []
 
-    threads = []
-
+    @llm_priority(BACKGROUND)
     def execute_app(app):
         result = get_app_result(
             conversation.get_transcript(False, people=people), conversation.photos, app, language_code=language_code
@@ -273,13 +293,16 @@ def _trigger_apps(
         if not is_reprocess:
             record_app_usage(uid, app.id, UsageHistoryType.memory_created_prompt, conversation_id=conversation.id)
 
+    # at most one app, on the request's thread since it waits for the result anyway
     for app in filtered_apps:
-        threads.append(threading.Thread(target=execute_app, args=(app,)))
-
-    [t.start() for t in threads]
-    [t.join() for t in threads]
+        try:
+            with metrics.timer('conversation_app'):
+                execute_app(app)
+        except Exception as e:
+            print(f"Error running app {app.id} for conversation {conversation.id}: {e}")
 
 
+@llm_priority(BACKGROUND)
 def _extract_memories(uid: str, conversation: Conversation):
     # TODO: maybe instead (once they can edit them) we should not tie it this hard
     memories_db.delete_memories_for_conversation(uid, conversation.id)
@@ -304,6 +327,8 @@ def _extract_memories(uid: str, conversation: Conversation):
         parsed_memories.append(memory_db_obj)
         # print('_extract_memories:', memory.category.value.upper(), '|', memory.content)
 
+    lexical.set_conversation_memories(uid, conversation.id, [memory.content for memory in parsed_memories])
+
     if len(parsed_memories) == 0:
         print(f"No memories extracted for conversation {conversation.id}")
         return
@@ -329,12 +354,14 @@ def send_new_memories_notification(user_id: str, memories: [MemoryDB]):
     send_notification(user_id, "omi" + ' says', message, NotificationMessage.get_message_as_dict(ai_message))
 
 
+@llm_priority(BACKGROUND)
 def _extract_trends(uid: str, conversation: Conversation):
     extracted_items = trends_extractor(uid, conversation)
     parsed = [Trend(category=item.category, topics=[item.topic], type=item.type) for item in extracted_items]
     trends_db.save_trends(conversation, parsed)
 
 
+@llm_priority(BACKGROUND)
 def _save_action_items(uid: str, conversation: Conversation):
     """
     Save action items from a conversation to the dedicated action_items collection.
@@ -380,7 +407,7 @@ def _save_action_items(uid: str, conversation: Conversation):
 
 
 def save_structured_vector(uid: str, conversation: Conversation, update_only: bool = False):
-    vector = generate_embedding(str(conversation.structured)) if not update_only else None
+    vector = generate_embedding(str(conversation.structured), cache=False) if not update_only else None
     tz = notification_db.get_user_time_zone(uid)
 
     metadata = {}
@@ -412,19 +439,17 @@ def save_structured_vector(uid: str, conversation: Conversation, update_only: bo
     else:
         print('save_structured_vector updating metadata')
         update_vector_metadata(uid, conversation.id, metadata)
+    lexical.index_conversation(uid, conversation)
+    digests.save_conversation_digest(uid, conversation, metadata)
 
 
-def _update_personas_async(uid: str):
-    print(f"[PERSONAS] Starting persona updates in background thread for uid={uid}")
+def _update_personas(uid: str):
+    # one after the other: a user has few personas, and a task must not wait for tasks of its own runner
     personas = get_omi_personas_by_uid_db(uid)
+    for persona in personas or []:
+        sync_update_persona_prompt(persona)
     if personas:
-        threads = []
-        for persona in personas:
-            threads.append(threading.Thread(target=sync_update_persona_prompt, args=(persona,)))
-
-        [t.start() for t in threads]
-        [t.join() for t in threads]
-        print(f"[PERSONAS] Finished persona updates in background thread for uid={uid}")
+        print(f"[PERSONAS] Finished persona updates for uid={uid}")
 
 
 def process_conversation(
@@ -443,6 +468,7 @@ def process_conversation(
 
     structured, discarded = _get_structured(uid, language_code, conversation, force_process, people=people)
     conversation = _get_conversation_obj(uid, structured, conversation)
+    tasks = TaskGroup(post_conversation_tasks, f'{uid}/{conversation.id}')
 
     if not discarded:
         # Analytics tracking
@@ -474,20 +500,14 @@ def process_conversation(
         _trigger_apps(
             uid, conversation, is_reprocess=is_reprocess, app_id=app_id, language_code=language_code, people=people
         )
-        (
-            threading.Thread(
-                target=save_structured_vector,
-                args=(
-                    uid,
-                    conversation,
-                ),
-            ).start()
-            if not is_reprocess
-            else None
-        )
-        threading.Thread(target=_extract_memories, args=(uid, conversation)).start()
-        threading.Thread(target=_extract_trends, args=(uid, conversation)).start()
-        threading.Thread(target=_save_action_items, args=(uid, conversation)).start()
+        if not is_reprocess:
+            tasks.submit(VECTOR_STAGE, save_structured_vector, uid, conversation)
+        else:
+            # the vector and its metadata are kept on reprocess, the digest follows the new structure
+            tasks.submit(DIGEST_STAGE, digests.save_conversation_digest, uid, conversation)
+        tasks.submit(MEMORIES_STAGE, _extract_memories, uid, conversation)
+        tasks.submit(TRENDS_STAGE, _extract_trends, uid, conversation)
+        tasks.submit(ACTION_ITEMS_STAGE, _save_action_items, uid, conversation)
 
     # Create audio files from chunks if private cloud sync was enabled
     if not is_reprocess and conversation.private_cloud_sync_enabled:
@@ -505,15 +525,9 @@ def process_conversation(
     conversations_db.upsert_conversation(uid, conversation.dict())
 
     if not is_reprocess:
-        threading.Thread(
-            target=conversation_created_webhook,
-            args=(
-                uid,
-                conversation,
-            ),
-        ).start()
+        tasks.submit(WEBHOOK_STAGE, conversation_created_webhook, uid, conversation)
         # Update persona prompts with new conversation
-        threading.Thread(target=update_personas_async, args=(uid,)).start()
+        tasks.submit(PERSONAS_STAGE, _update_personas, uid)
 
     # TODO: trigger external integrations here too
 
@@ -3,15 +3,24 @@ import os
 from datetime import datetime
 from typing import Dict
 
-import typesense
-
-client = typesense.Client(
-    {
-        'nodes': [{'host': os.getenv('TYPESENSE_HOST'), 'port': os.getenv('TYPESENSE_HOST_PORT'), 'protocol': 'https'}],
-        'api_key': os.getenv('TYPESENSE_API_KEY'),
-        'connection_timeout_seconds': 2,
-    }
-)
+from utils.other.lazy import Lazy
+
+
+def _create_client():
+    import typesense
+
+    return typesense.Client(
+        {
+            'nodes': [
+                {'host': os.getenv('TYPESENSE_HOST'), 'port': os.getenv('TYPESENSE_HOST_PORT'), 'protocol': 'https'}
+            ],
+            'api_key': os.getenv('TYPESENSE_API_KEY'),
+            'connection_timeout_seconds': 2,
+        }
+    )
+
+
+client = Lazy('typesense', _create_client)
 
 
 def search_conversations(
@@ -0,0 +1,122 @@
+from bisect import bisect_left, bisect_right
+from typing import Dict, List, Optional, Tuple
+
+# conversations within this distance (seconds) of a synced segment are considered a match
+MATCH_THRESHOLD_SECONDS = 120
+
+
+class ConversationTimelineIndex:
+    """
+    In-memory interval index over a user's conversations, used to match synced audio segments
+    to existing conversations without a Firestore range scan per segment.
+
+    Conversations are kept sorted by `started_at`. Together with the longest known conversation
+    duration, this bounds the slice of candidates that can overlap any window to two bisects.
+    """
+
+    def __init__(self, conversations: List[dict], threshold: int = MATCH_THRESHOLD_SECONDS):
+        self.threshold = threshold
+        # original Firestore query ordered by created_at DESC, ties resolve in that order
+        ordered = sorted(conversations, key=lambda c: c.get('created_at') or c['started_at'], reverse=True)
+        self._entries: List[Tuple[float, float, int, dict]] = sorted(
+            (
+                (conversation['started_at'].timestamp(), conversation['finished_at'].timestamp(), rank, conversation)
+                for rank, conversation in enumerate(ordered)
+            ),
+            key=lambda entry: (entry[0], entry[2]),
+        )
+        self._starts: List[float] = [entry[0] for entry in self._entries]
+        self._max_duration = max((end - start for start, end, _, _ in self._entries), default=0.0)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def candidates(self, start_timestamp: float, end_timestamp: float) -> List[dict]:
+        """Conversations with finished_at >= start - threshold and started_at <= end + threshold."""
+        lower = start_timestamp - self.threshold
+        upper = end_timestamp + self.threshold
+        lo = bisect_left(self._starts, lower - self._max_duration)
+        hi = bisect_right(self._starts, upper)
+        matches = [entry for entry in self._entries[lo:hi] if entry[1] >= lower]
+        matches.sort(key=lambda entry: entry[2])
+        return [entry[3] for entry in matches]
+
+    def closest(self, start_timestamp: float, end_timestamp: float) -> Optional[dict]:
+        """The candidate whose start or end is closest to the given ones."""
+        closest_conversation = None
+        min_diff = float('inf')
+        for conversation in self.candidates(start_timestamp, end_timestamp):
+            diff1 = abs(conversation['started_at'].timestamp() - start_timestamp)
+            diff2 = abs(conversation['finished_at'].timestamp() - end_timestamp)
+            if diff1 < min_diff or diff2 < min_diff:
+                min_diff = min(diff1, diff2)
+                closest_conversation = conversation
+        return closest_conversation
+
+
+def merge_segments_into_conversation(conversation: dict, new_segments: List[Tuple[float, List[dict]]]) -> List[dict]:
+    """
+    Merges every batch of synced segments targeting `conversation` in a single pass.
+
+    `new_segments` is a list of (absolute start timestamp, segment dicts relative to that timestamp).
+    Returns the conversation's transcript segments re-sorted and made relative to its `started_at`.
+    """
+    conversation_start = conversation['started_at'].timestamp()
+
+    timed: List[Tuple[float, dict]] = [
+        (conversation_start + segment['start'], segment) for segment in conversation.get('transcript_segments', [])
+    ]
+    for timestamp, segments in new_segments:
+        timed.extend((timestamp + segment['start'], segment) for segment in segments)
+
+    # stable sort keeps existing segments first when timestamps collide
+    timed.sort(key=lambda x: x[0])
+
+    merged = []
+    for timestamp, segment in timed:
+        duration = segment['end'] - segment['start']
+        segment['start'] = timestamp - conversation_start
+        segment['end'] = segment['start'] + duration
+        merged.append(segment)
+    return merged
+
+
+def group_segments_by_conversation(
+    index: ConversationTimelineIndex, synced: List[Tuple[float, float, List[dict]]]
+) -> Tuple[Dict[str, Tuple[dict, List[Tuple[float, List[dict]]]]], List[Tuple[float, float, List[dict]]]]:
+    """
+    Matches each (start, end, segments) entry against the index.
+
+    Returns matched batches grouped per conversation id, and the entries with no matching conversation.
+    """
+    matched: Dict[str, Tuple[dict, List[Tuple[float, List[dict]]]]] = {}
+    unmatched = []
+    for start, end, segments in synced:
+        conversation = index.closest(start, end)
+        if not conversation:
+            unmatched.append((start, end, segments))
+            continue
+        matched.setdefault(conversation['id'], (conversation, []))[1].append((start, segments))
+    return matched, unmatched
+
+
+def cluster_unmatched(
+    unmatched: List[Tuple[float, float, List[dict]]], threshold: int = MATCH_THRESHOLD_SECONDS
+) -> List[Tuple[float, float, List[dict]]]:
+    """
+    Groups unmatched entries closer than `threshold` into one new conversation, mirroring what
+    per-segment matching would have done once the first of them had been created.
+    Segment `start`/`end` are rewritten relative to the cluster start.
+    """
+    clusters: List[Tuple[float, float, List[dict]]] = []
+    for start, end, segments in sorted(unmatched, key=lambda x: x[0]):
+        if clusters and start - clusters[-1][1] < threshold:
+            cluster_start, cluster_end, cluster_segments = clusters[-1]
+            offset = start - cluster_start
+            for segment in segments:
+                segment['start'] += offset
+                segment['end'] += offset
+            clusters[-1] = (cluster_start, max(cluster_end, end), cluster_segments + segments)
+        else:
+            clusters.append((start, end, list(segments)))
+    return clusters
@@ -1,4 +1,4 @@
-from .clients import llm_mini, llm_mini_stream, llm_medium_stream, llm_medium
+from .clients import llm_mini, llm_mini_stream, llm_medium_stream, llm_medium, llm_mini_deterministic
 import json
 import re
 import os
@@ -18,6 +18,7 @@ from models.conversation import CategoryEnum, Conversation, ActionItem, Event, C
 from models.other import Person
 from models.transcript_segment import TranscriptSegment
 from utils.llms.memory import get_prompt_memories
+from utils.llm.response_cache import cached_response
 
 
 # ****************************************
@@ -70,6 +71,7 @@ class DatesContext(BaseModel):
     )
 
 
+@cached_response('requires_context', version=1)
 def requires_context(question: str) -> bool:
     prompt = f'''
     Based on the current question your task is to determine whether the user is asking a question that requires context outside the conversation to be answered.
@@ -78,7 +80,7 @@ def requires_context(question: str) -> bool:
     User's Question:
     {question}
     '''
-    with_parser = llm_mini.with_structured_output(RequiresContext)
+    with_parser = llm_mini_deterministic.with_structured_output(RequiresContext)
     response: RequiresContext = with_parser.invoke(prompt)
     try:
         return response.value
@@ -90,6 +92,7 @@ class IsAnOmiQuestion(BaseModel):
     value: bool = Field(description="If the message is an Omi/Friend related question")
 
 
+@cached_response('is_an_omi_question', version=1)
 def retrieve_is_an_omi_question(question: str) -> bool:
     prompt = f'''
     Task: Determine if the user is asking about the Omi/Friend app itself (product features, functionality, purchasing) 
@@ -144,7 +147,7 @@ def retrieve_is_an_omi_question(question: str) -> bool:
     '''.replace(
         '    ', ''
     ).strip()
-    with_parser = llm_mini.with_structured_output(IsAnOmiQuestion)
+    with_parser = llm_mini_deterministic.with_structured_output(IsAnOmiQuestion)
     response: IsAnOmiQuestion = with_parser.invoke(prompt)
     try:
         return response.value
@@ -156,6 +159,7 @@ class IsFileQuestion(BaseModel):
     value: bool = Field(description="If the message is related to file/image")
 
 
+@cached_response('is_file_question', version=1)
 def retrieve_is_file_question(question: str) -> bool:
     prompt = f'''
     Based on the current question, your task is to determine whether the user is referring to a file or an image that was just attached or mentioned earlier in the conversation.
@@ -174,7 +178,7 @@ def retrieve_is_file_question(question: str) -> bool:
     {question}
     '''
 
-    with_parser = llm_mini.with_structured_output(IsFileQuestion)
+    with_parser = llm_mini_deterministic.with_structured_output(IsFileQuestion)
     response: IsFileQuestion = with_parser.invoke(prompt)
     try:
         return response.value
@@ -183,12 +187,18 @@ def retrieve_is_file_question(question: str) -> bool:
 
 
 def retrieve_context_dates_by_question(question: str, tz: str) -> List[datetime]:
+    # to the minute, so the same question asked within a minute is answered from the cache
+    return _retrieve_context_dates(question, tz, datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M'))
+
+
+@cached_response('context_dates', version=1, ttl=60)
+def _retrieve_context_dates(question: str, tz: str, now_utc: str) -> List[datetime]:
     prompt = f'''
     You MUST determine the appropriate date range in {tz} that provides context for answering the <question> provided.
 
     If the <question> does not reference a date or a date range, respond with an empty list: []
 
-    Current date time in UTC: {datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')}
+    Current date time in UTC: {now_utc}
 
     <question>
     {question}
@@ -200,7 +210,7 @@ def retrieve_context_dates_by_question(question: str, tz: str) -> List[datetime]
 
     # print(prompt)
     # print(llm_mini.invoke(prompt).content)
-    with_parser = llm_mini.with_structured_output(DatesContext)
+    with_parser = llm_mini_deterministic.with_structured_output(DatesContext)
     response: DatesContext = with_parser.invoke(prompt)
     return response.dates_range
 
@@ -259,8 +269,10 @@ def answer_simple_message(uid: str, messages: List[Message], plugin: Optional[Ap
     return llm_mini.invoke(prompt).content
 
 
-def answer_simple_message_stream(uid: str, messages: List[Message], plugin: Optional[App] = None, callbacks=[]) -> str:
-    prompt = _get_answer_simple_message_prompt(uid, messages, plugin)
+def answer_simple_message_stream(
+    uid: str, messages: List[Message], plugin: Optional[App] = None, callbacks=[], prompt: Optional[str] = None
+) -> str:
+    prompt = prompt or _get_answer_simple_message_prompt(uid, messages, plugin)
     return llm_mini_stream.invoke(prompt, {'callbacks': callbacks}).content
 
 
@@ -1049,6 +1061,14 @@ def _process_extracted_metadata(uid: str, prompt: str) -> dict:
 
 
 def select_structured_filters(question: str, filters_available: dict) -> dict:
+    try:
+        return _select_structured_filters(question, filters_available)
+    except ValidationError:
+        return {}
+
+
+@cached_response('structured_filters', version=1)
+def _select_structured_filters(question: str, filters_available: dict) -> dict:
     prompt = f'''
     Based on a question asked by the user to an AI, the AI needs to search for the user information related to topics, entities, people, and dates that will help it answering.
     Your task is to identify the correct fields that can be related to the question and can help answering.
@@ -1065,16 +1085,14 @@ def select_structured_filters(question: str, filters_available: dict) -> dict:
         '    ', ''
     ).strip()
     # print(prompt)
-    with_parser = llm_mini.with_structured_output(FiltersToUse)
-    try:
-        response: FiltersToUse = with_parser.invoke(prompt)
-        # print('select_structured_filters:', response.dict())
-        response.topics = [t for t in response.topics if t in filters_available['topics']]
-        response.people = [p for p in response.people if p in filters_available['people']]
-        response.entities = [e for e in response.entities if e in filters_available['entities']]
-        return response.dict()
-    except ValidationError:
-        return {}
+    with_parser = llm_mini_deterministic.with_structured_output(FiltersToUse)
+    # a ValidationError propagates, so the fallback isn't cached
+    response: FiltersToUse = with_parser.invoke(prompt)
+    # print('select_structured_filters:', response.dict())
+    response.topics = [t for t in response.topics if t in filters_available['topics']]
+    response.people = [p for p in response.people if p in filters_available['people']]
+    response.entities = [e for e in response.entities if e in filters_available['entities']]
+    return response.dict()
 
 
 # **************************************************
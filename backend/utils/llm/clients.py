@@ -6,22 +6,29 @@ from langchain_openai import ChatOpenAI, OpenAIEmbeddings
 import tiktoken
 
 from models.conversation import Structured
+from utils.llm.embedding_service import EmbeddingService
+from utils.llm.scheduler import scheduled_http_clients
+from utils.other.lazy import Lazy
 
+# OpenAI chat clients send their requests through the LLM scheduler (see scheduler.py)
+_scheduled = scheduled_http_clients()
 
 # Base models for general use
-llm_mini = ChatOpenAI(model='gpt-4.1-mini')
-llm_mini_stream = ChatOpenAI(model='gpt-4.1-mini', streaming=True)
-llm_large = ChatOpenAI(model='o1-preview')
-llm_large_stream = ChatOpenAI(model='o1-preview', streaming=True, temperature=1)
-llm_high = ChatOpenAI(model='o4-mini')
-llm_high_stream = ChatOpenAI(model='o4-mini', streaming=True, temperature=1)
-llm_medium = ChatOpenAI(model='gpt-4.1')
-llm_medium_stream = ChatOpenAI(model='gpt-4.1', streaming=True)
-llm_medium_experiment = ChatOpenAI(model='gpt-5.1')
+llm_mini = ChatOpenAI(model='gpt-4.1-mini', **_scheduled)
+llm_mini_stream = ChatOpenAI(model='gpt-4.1-mini', streaming=True, **_scheduled)
+# temperature 0, for helper prompts whose answers are cached (see response_cache.py)
+llm_mini_deterministic = ChatOpenAI(model='gpt-4.1-mini', temperature=0, **_scheduled)
+llm_large = ChatOpenAI(model='o1-preview', **_scheduled)
+llm_large_stream = ChatOpenAI(model='o1-preview', streaming=True, temperature=1, **_scheduled)
+llm_high = ChatOpenAI(model='o4-mini', **_scheduled)
+llm_high_stream = ChatOpenAI(model='o4-mini', streaming=True, temperature=1, **_scheduled)
+llm_medium = ChatOpenAI(model='gpt-4.1', **_scheduled)
+llm_medium_stream = ChatOpenAI(model='gpt-4.1', streaming=True, **_scheduled)
+llm_medium_experiment = ChatOpenAI(model='gpt-5.1', **_scheduled)
 
 # Specialized models for agentic workflows
-llm_agent = ChatOpenAI(model='gpt-5.1')
-llm_agent_stream = ChatOpenAI(model='gpt-5.1', streaming=True)
+llm_agent = ChatOpenAI(model='gpt-5.1', **_scheduled)
+llm_agent_stream = ChatOpenAI(model='gpt-5.1', streaming=True, **_scheduled)
 llm_persona_mini_stream = ChatOpenAI(
     temperature=0.8,
     model="google/gemini-flash-1.5-8b",
@@ -38,10 +45,13 @@ llm_persona_medium_stream = ChatOpenAI(
     default_headers={"X-Title": "Omi Chat"},
     streaming=True,
 )
-embeddings = OpenAIEmbeddings(model="text-embedding-3-large")
+embeddings = Lazy('openai_embeddings', lambda: OpenAIEmbeddings(model="text-embedding-3-large"))
+# cached and batched access to `embeddings`, prefer it over calling the client directly
+embedding_service = EmbeddingService('text-embedding-3-large', lambda texts: embeddings.embed_documents(texts))
 parser = PydanticOutputParser(pydantic_object=Structured)
 
-encoding = tiktoken.encoding_for_model('gpt-4')
+# loading the BPE ranks can hit the network on a cold container
+encoding = Lazy('tiktoken', lambda: tiktoken.encoding_for_model('gpt-4'))
 
 
 def num_tokens_from_string(string: str) -> int:
@@ -50,5 +60,6 @@ def num_tokens_from_string(string: str) -> int:
     return num_tokens
 
 
-def generate_embedding(content: str) -> List[float]:
-    return embeddings.embed_documents([content])[0]
+def generate_embedding(content: str, cache: bool = True) -> List[float]:
+    """`cache=False` for texts embedded once to be stored, e.g. whole conversations."""
+    return embedding_service.embed(content, cache=cache)
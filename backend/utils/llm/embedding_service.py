@@ -0,0 +1,206 @@
+import hashlib
+import os
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+import openai
+
+from database import redis_db
+from utils.other import metrics
+
+# Content-addressed embedding cache with request coalescing.
+#
+# Vectors are keyed by a hash of model and text, looked up in an in-process LRU, then Redis (float32, the
+# precision the embedding API returns). Misses are not embedded one by one: they wait up to BATCH_WINDOW_MS for
+# other misses (from any thread) and go out as one batched call, and concurrent requests for the same text share
+# that call's result.
+#
+# Texts embedded to be stored (whole conversations) are unique and rarely embedded again: they go through the same
+# batches with `cache=False`, which keeps them out of both cache tiers.
+#
+# Returned vectors are shared between callers, treat them as read-only.
+
+BATCH_WINDOW_MS = float(os.getenv('EMBEDDING_BATCH_WINDOW_MS', '5'))
+MAX_BATCH_SIZE = int(os.getenv('EMBEDDING_MAX_BATCH_SIZE', '64'))
+LOCAL_MAX_ITEMS = int(os.getenv('EMBEDDING_LOCAL_CACHE_ITEMS', '2048'))
+REDIS_TTL = 60 * 60 * 24 * 7
+
+
+def _encode(vector: List[float]) -> bytes:
+    return array('f', vector).tobytes()
+
+
+def _decode(data: bytes) -> List[float]:
+    vector = array('f')
+    vector.frombytes(data)
+    return vector.tolist()
+
+
+class EmbeddingService:
+    def __init__(
+        self,
+        model: str,
+        embed_batch: Callable[[List[str]], List[List[float]]],
+        batch_window: float = BATCH_WINDOW_MS / 1000,
+        max_batch_size: int = MAX_BATCH_SIZE,
+        local_max_items: int = LOCAL_MAX_ITEMS,
+        use_redis: bool = True,
+    ):
+        self.model = model
+        self._embed_batch = embed_batch
+        self._batch_window = batch_window
+        self._max_batch_size = max_batch_size
+        self._use_redis = use_redis
+
+        self._local: OrderedDict = OrderedDict()
+        self._local_max_items = local_max_items
+        self._local_lock = threading.Lock()
+
+        # key -> (text, future, cache) waiting for the next batch; key -> future for batches being embedded
+        self._pending: OrderedDict = OrderedDict()
+        self._in_flight: Dict[str, Future] = {}
+        self._cond = threading.Condition()
+        self._collector: Optional[threading.Thread] = None
+        self._executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='embeddings')
+
+    def key(self, text: str) -> str:
+        return hashlib.sha256(f'{self.model}\0{text}'.encode('utf-8')).hexdigest()
+
+    def _get_local(self, key: str) -> Optional[List[float]]:
+        with self._local_lock:
+            vector = self._local.get(key)
+            if vector is not None:
+                self._local.move_to_end(key)
+            return vector
+
+    def _set_local(self, vectors: Dict[str, List[float]]):
+        with self._local_lock:
+            for key, vector in vectors.items():
+                self._local[key] = vector
+                self._local.move_to_end(key)
+            while len(self._local) > self._local_max_items:
+                self._local.popitem(last=False)
+
+    def _submit(self, texts: Dict[str, str], cache: bool) -> Dict[str, Future]:
+        futures = {}
+        with self._cond:
+            for key, text in texts.items():
+                future = self._in_flight.get(key)
+                if future is None and key in self._pending:
+                    pending_text, future, pending_cache = self._pending[key]
+                    self._pending[key] = (pending_text, future, pending_cache or cache)
+                if future is None:
+                    future = Future()
+                    self._pending[key] = (text, future, cache)
+                else:
+                    metrics.incr('embeddings.coalesced')
+                futures[key] = future
+            if self._collector is None:
+                self._collector = threading.Thread(target=self._collect, daemon=True, name='embeddings-collector')
+                self._collector.start()
+            self._cond.notify()
+        return futures
+
+    def _collect(self):
+        while True:
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+                # give concurrent misses a moment to join the batch
+                deadline = time.monotonic() + self._batch_window
+                while len(self._pending) < self._max_batch_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+
+                batch = {}
+                while self._pending and len(batch) < self._max_batch_size:
+                    key, entry = self._pending.popitem(last=False)
+                    batch[key] = entry
+                    self._in_flight[key] = entry[1]
+            self._executor.submit(self._run_batch, batch)
+
+    def _run_batch(self, batch: Dict[str, tuple]):
+        keys = list(batch)
+        start = time.perf_counter()
+        try:
+            vectors = self._embed_batch([batch[key][0] for key in keys])
+        except openai.BadRequestError as e:
+            self._split_or_fail(batch, e)
+            return
+        except Exception as e:
+            # rate limits, timeouts and server errors would fail every text again, the whole batch fails once
+            self._resolve(batch, error=e)
+            return
+        if len(vectors) != len(keys):
+            self._split_or_fail(batch, ValueError(f'{len(vectors)} embeddings returned for {len(keys)} texts'))
+            return
+
+        try:
+            metrics.observe('embeddings.batch', time.perf_counter() - start)
+            metrics.incr('embeddings.batches')
+            metrics.incr('embeddings.embedded', len(keys))
+            computed = dict(zip(keys, vectors))
+            cacheable = {key: vector for key, vector in computed.items() if batch[key][2]}
+            self._set_local(cacheable)
+        except Exception as e:
+            self._resolve(batch, error=e)
+            return
+        self._resolve(batch, computed)
+
+        if self._use_redis and cacheable:
+            redis_db.set_cached_embeddings({key: _encode(v) for key, v in cacheable.items()}, ttl=REDIS_TTL)
+
+    def _split_or_fail(self, batch: Dict[str, tuple], error: Exception):
+        # a rejected input must not fail the requests it happened to be batched with
+        if len(batch) == 1:
+            self._resolve(batch, error=error)
+            return
+        for key, entry in batch.items():
+            self._run_batch({key: entry})
+
+    def _resolve(self, batch: Dict[str, tuple], computed: Dict[str, List[float]] = None, error: Exception = None):
+        with self._cond:
+            for key in batch:
+                self._in_flight.pop(key, None)
+        for key, (_, future, _) in batch.items():
+            if error is None:
+                future.set_result(computed[key])
+            else:
+                future.set_exception(error)
+
+    def embed_many(self, texts: List[str], cache: bool = True) -> List[List[float]]:
+        """
+        Embeddings of `texts`, in order. Cached vectors are reused, the rest are embedded in shared batches.
+        With `cache=False` the caches are neither read nor written, for texts embedded once to be stored.
+        """
+        keys = [self.key(text) for text in texts]
+        found: Dict[str, List[float]] = {}
+        for key in keys if cache else []:
+            if key not in found and (vector := self._get_local(key)) is not None:
+                found[key] = vector
+        metrics.incr('embeddings.local_hit', len(found))
+
+        missing = {key: text for key, text in zip(keys, texts) if key not in found}
+        if missing and cache and self._use_redis:
+            cached = redis_db.get_cached_embeddings(list(missing)) or [None] * len(missing)
+            from_redis = {key: _decode(data) for key, data in zip(missing, cached) if data}
+            if from_redis:
+                metrics.incr('embeddings.redis_hit', len(from_redis))
+                self._set_local(from_redis)
+                found.update(from_redis)
+                missing = {key: text for key, text in missing.items() if key not in from_redis}
+
+        if missing:
+            metrics.incr('embeddings.miss', len(missing))
+            for key, future in self._submit(missing, cache).items():
+                found[key] = future.result()
+        return [found[key] for key in keys]
+
+    def embed(self, text: str, cache: bool = True) -> List[float]:
+        return self.embed_many([text], cache=cache)[0]
@@ -0,0 +1,142 @@
+import copy
+import functools
+import hashlib
+import inspect
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Iterable, Optional
+
+from utils.other import metrics
+
+# Response cache for the small helper prompts the chat flow runs before answering (does the question need context, is
+# it about Omi, which dates does it refer to, ...).
+#
+# Results are keyed by the helper, its prompt version and its arguments (the question normalized), and kept in an in-process LRU for
+# `ttl` seconds. Concurrent calls with the same key share one LLM call, failures are not cached. Only use it for
+# temperature-0 prompts whose answer depends on nothing but the arguments, and bump `version` when the prompt changes.
+#
+# Per helper, `llm_cache.<name>.hit|miss|coalesced` counters and `llm_cache.<name>` latencies are in /v1/metrics.
+
+TTL = int(os.getenv('LLM_RESPONSE_CACHE_TTL', '3600'))
+MAX_ITEMS = int(os.getenv('LLM_RESPONSE_CACHE_ITEMS', '4096'))
+
+
+def normalize(value: Any) -> Any:
+    """Case, whitespace and trailing punctuation don't change what a helper answers."""
+    if isinstance(value, str):
+        return ' '.join(value.lower().split()).rstrip('?!. ')
+    if isinstance(value, dict):
+        return {str(key): normalize(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple, set)):
+        return [normalize(item) for item in value]
+    return value
+
+
+class ResponseCache:
+    def __init__(self, max_items: int = MAX_ITEMS):
+        self.max_items = max_items
+        self._items: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self._flights: Dict[str, Future] = {}
+
+    def get(self, key: str) -> Optional[tuple]:
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return None
+            value, expires_at = item
+            if time.time() >= expires_at:
+                del self._items[key]
+                return None
+            self._items.move_to_end(key)
+            return (value,)
+
+    def set(self, key: str, value: Any, ttl: int):
+        with self._lock:
+            self._items[key] = (value, time.time() + ttl)
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_items:
+                self._items.popitem(last=False)
+
+    def get_or_call(self, name: str, key: str, call: Callable[[], Any], ttl: int) -> Any:
+        start = time.perf_counter()
+        try:
+            if (entry := self.get(key)) is not None:
+                metrics.incr(f'llm_cache.{name}.hit')
+                return entry[0]
+
+            with self._lock:
+                future = self._flights.get(key)
+                owner = future is None
+                if owner:
+                    future = self._flights[key] = Future()
+            if not owner:
+                metrics.incr(f'llm_cache.{name}.coalesced')
+                return future.result()
+
+            metrics.incr(f'llm_cache.{name}.miss')
+            try:
+                value = call()
+                self.set(key, value, ttl)
+                future.set_result(value)
+                return value
+            except BaseException as e:
+                future.set_exception(e)
+                raise
+            finally:
+                with self._lock:
+                    self._flights.pop(key, None)
+        finally:
+            metrics.observe(f'llm_cache.{name}', time.perf_counter() - start)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+
+_cache = ResponseCache()
+
+
+def cached_response(
+    name: str,
+    version: int,
+    ttl: int = TTL,
+    cache: Optional[ResponseCache] = None,
+    normalized_args: Iterable[str] = ('question',),
+):
+    """
+    Caches what the decorated helper returns for its arguments. Only the `normalized_args` (free text typed by the
+    user) are normalized, data arguments are keyed verbatim. Results are copied on the way out, so callers can change
+    them.
+    """
+    normalized_args = frozenset(normalized_args)
+
+    def decorator(func):
+        signature = inspect.signature(func)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            arguments = {
+                arg: normalize(value) if arg in normalized_args else value for arg, value in bound.arguments.items()
+            }
+            payload = json.dumps([name, version, arguments], sort_keys=True, default=str)
+            key = hashlib.sha256(payload.encode('utf-8')).hexdigest()
+            value = (cache or _cache).get_or_call(name, key, lambda: func(*args, **kwargs), ttl)
+            return copy.deepcopy(value)
+
+        return wrapper
+
+    return decorator
+
+
+def hit_ratio(name: str) -> Optional[float]:
+    counters = metrics.snapshot(f'llm_cache.{name}.')['counters']
+    hits = counters.get(f'llm_cache.{name}.hit', 0) + counters.get(f'llm_cache.{name}.coalesced', 0)
+    total = hits + counters.get(f'llm_cache.{name}.miss', 0)
+    return hits / total if total else None
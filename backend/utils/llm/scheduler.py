@@ -0,0 +1,333 @@
+import asyncio
+import contextlib
+import contextvars
+import heapq
+import itertools
+import json
+import os
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+import httpx
+import openai
+
+from utils.other import metrics
+
+# Process-wide scheduler for OpenAI chat completions.
+#
+# Every chat client in clients.py sends its requests through ScheduledTransport, which waits for the scheduler before
+# a request goes out. The scheduler keeps a token bucket (tokens and requests per minute, refilled continuously) and
+# a queue ordered by priority class, then arrival:
+# - INTERACTIVE: chat answers and realtime proactive notifications, a user is waiting
+# - DEFAULT: anything that doesn't say
+# - BACKGROUND: post-conversation processing (structuring, memories, trends, action items, app prompts, personas)
+# Requests are served strictly in queue order, so a waiting interactive request goes before any background one, and
+# background requests can't use the last RESERVE share of the bucket, which is kept for the other classes. A request's
+# cost is estimated from its body (prompt characters / 4, plus its completion limit) when it is sent.
+#
+# A 429 from the provider pauses the whole queue for its Retry-After; the SDK's own retry then queues again.
+#
+# The priority is a context variable, set with `llm_priority(...)` (a context manager and a decorator). Threads don't
+# inherit it: set it in the thread's target. Per class, `llm_scheduler.queue_depth.<class>` gauges,
+# `llm_scheduler.wait.<class>` latencies and `llm_scheduler.delayed.<class>` counters, and the
+# `llm_scheduler.throttled` counter of 429s are in /v1/metrics.
+
+INTERACTIVE = 0
+DEFAULT = 1
+BACKGROUND = 2
+PRIORITY_NAMES = {INTERACTIVE: 'interactive', DEFAULT: 'default', BACKGROUND: 'background'}
+
+ENABLED = os.getenv('LLM_SCHEDULER', '1') == '1'
+# this worker's share of the organization's limits, 0 disables that budget
+TOKENS_PER_MINUTE = int(os.getenv('LLM_SCHEDULER_TPM', '2000000'))
+REQUESTS_PER_MINUTE = int(os.getenv('LLM_SCHEDULER_RPM', '5000'))
+RESERVE = float(os.getenv('LLM_SCHEDULER_RESERVE', '0.2'))
+
+CHARS_PER_TOKEN = 4
+IMAGE_TOKENS = 800
+DEFAULT_COMPLETION_TOKENS = 1024
+DEFAULT_RETRY_AFTER = 1.0
+
+_priority: contextvars.ContextVar[int] = contextvars.ContextVar('llm_priority', default=DEFAULT)
+
+
+@contextlib.contextmanager
+def llm_priority(priority: int):
+    """LLM calls made inside are scheduled with `priority`. Also works as a decorator."""
+    token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def set_llm_priority(priority: int):
+    """For the rest of the current context, e.g. an async generator that can't wrap its body in `llm_priority`."""
+    _priority.set(priority)
+
+
+def current_priority() -> int:
+    return _priority.get()
+
+
+def _prompt_chars(value) -> int:
+    if isinstance(value, str):
+        return len(value)
+    if isinstance(value, dict):
+        if value.get('type') in ('image_url', 'input_image'):
+            return IMAGE_TOKENS * CHARS_PER_TOKEN
+        return sum(_prompt_chars(item) for item in value.values())
+    if isinstance(value, list):
+        return sum(_prompt_chars(item) for item in value)
+    return 0
+
+
+def estimate_tokens(body: bytes) -> int:
+    """Prompt and completion tokens a chat completion request can use, roughly."""
+    try:
+        payload = json.loads(body)
+    except (TypeError, ValueError):
+        return DEFAULT_COMPLETION_TOKENS
+    if not isinstance(payload, dict):
+        return DEFAULT_COMPLETION_TOKENS
+    prompt = _prompt_chars(payload.get('messages') or payload.get('input') or payload.get('prompt')) // CHARS_PER_TOKEN
+    completion = payload.get('max_completion_tokens') or payload.get('max_tokens') or DEFAULT_COMPLETION_TOKENS
+    return prompt + completion
+
+
+class _Waiter:
+    def __init__(self, priority: int, cost: int, loop: Optional[asyncio.AbstractEventLoop] = None):
+        self.priority = priority
+        self.cost = cost
+        self.queued_at = time.perf_counter()
+        self.loop = loop
+        if loop is None:
+            self.event = threading.Event()
+        else:
+            self.future = loop.create_future()
+
+    def cancelled(self) -> bool:
+        return self.loop is not None and self.future.done()
+
+    def grant(self):
+        if self.loop is None:
+            self.event.set()
+            return
+        try:
+            self.loop.call_soon_threadsafe(self._resolve)
+        except RuntimeError:
+            # the waiting loop is closed
+            pass
+
+    def _resolve(self):
+        if not self.future.done():
+            self.future.set_result(None)
+
+
+class LLMScheduler:
+    def __init__(
+        self,
+        tokens_per_minute: int = TOKENS_PER_MINUTE,
+        requests_per_minute: int = REQUESTS_PER_MINUTE,
+        reserve: float = RESERVE,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.tokens_per_minute = tokens_per_minute
+        self.requests_per_minute = requests_per_minute
+        self.reserve = reserve
+        self._clock = clock
+        self._cond = threading.Condition()
+        self._queue: List[tuple] = []
+        self._seq = itertools.count()
+        self._depth: Dict[int, int] = {priority: 0 for priority in PRIORITY_NAMES}
+        self._tokens = float(tokens_per_minute)
+        self._requests = float(requests_per_minute)
+        self._refilled_at = clock()
+        self._paused_until = 0.0
+        self._dispatcher: Optional[threading.Thread] = None
+
+    # bucket, called with the lock held
+
+    def _refill(self, now: float):
+        elapsed = max(0.0, now - self._refilled_at)
+        self._refilled_at = now
+        self._tokens = min(self.tokens_per_minute, self._tokens + elapsed * self.tokens_per_minute / 60)
+        self._requests = min(self.requests_per_minute, self._requests + elapsed * self.requests_per_minute / 60)
+
+    def _floor(self, priority: int, capacity: int) -> float:
+        return self.reserve * capacity if priority == BACKGROUND else 0.0
+
+    def _cost(self, priority: int, cost: int) -> float:
+        # a request bigger than what its class may ever use would never go out
+        if not self.tokens_per_minute:
+            return 0.0
+        return min(cost, self.tokens_per_minute - self._floor(priority, self.tokens_per_minute))
+
+    def _delay(self, priority: int, cost: int, now: float) -> float:
+        """Seconds until a request fits, 0 if it does now."""
+        delay = max(0.0, self._paused_until - now)
+        if self.tokens_per_minute:
+            missing = self._cost(priority, cost) + self._floor(priority, self.tokens_per_minute) - self._tokens
+            delay = max(delay, missing * 60 / self.tokens_per_minute)
+        if self.requests_per_minute:
+            missing = 1 + self._floor(priority, self.requests_per_minute) - self._requests
+            delay = max(delay, missing * 60 / self.requests_per_minute)
+        return delay
+
+    def _take(self, priority: int, cost: int):
+        self._tokens -= self._cost(priority, cost)
+        if self.requests_per_minute:
+            self._requests -= 1
+
+    # queue
+
+    def _try_now(self, priority: int, cost: int) -> bool:
+        if self._queue:
+            return False
+        now = self._clock()
+        self._refill(now)
+        if self._delay(priority, cost, now) > 0:
+            return False
+        self._take(priority, cost)
+        return True
+
+    def _enqueue(self, waiter: _Waiter):
+        heapq.heappush(self._queue, (waiter.priority, next(self._seq), waiter))
+        self._set_depth(waiter.priority, 1)
+        metrics.incr(f'llm_scheduler.delayed.{PRIORITY_NAMES[waiter.priority]}')
+        if self._dispatcher is None:
+            self._dispatcher = threading.Thread(target=self._dispatch, name='llm-scheduler', daemon=True)
+            self._dispatcher.start()
+        self._cond.notify()
+
+    def _set_depth(self, priority: int, change: int):
+        self._depth[priority] += change
+        metrics.set_gauge(f'llm_scheduler.queue_depth.{PRIORITY_NAMES[priority]}', self._depth[priority])
+
+    def _grant_ready(self) -> Optional[float]:
+        """Grants the queue's head while it fits. Returns how long to wait for the next one, None if it is empty."""
+        while self._queue:
+            _, _, waiter = self._queue[0]
+            if waiter.cancelled():
+                heapq.heappop(self._queue)
+                self._set_depth(waiter.priority, -1)
+                continue
+            now = self._clock()
+            self._refill(now)
+            delay = self._delay(waiter.priority, waiter.cost, now)
+            if delay > 0:
+                return delay
+            heapq.heappop(self._queue)
+            self._set_depth(waiter.priority, -1)
+            self._take(waiter.priority, waiter.cost)
+            waiter.grant()
+        return None
+
+    def _dispatch(self):
+        with self._cond:
+            while True:
+                self._cond.wait(timeout=self._grant_ready())
+
+    def _observe_wait(self, priority: int, started: float):
+        metrics.observe(f'llm_scheduler.wait.{PRIORITY_NAMES[priority]}', time.perf_counter() - started)
+
+    def acquire(self, cost: int, priority: Optional[int] = None):
+        """Blocks until a request of about `cost` tokens may go out."""
+        priority = current_priority() if priority is None else priority
+        with self._cond:
+            if self._try_now(priority, cost):
+                self._observe_wait(priority, time.perf_counter())
+                return
+            waiter = _Waiter(priority, cost)
+            self._enqueue(waiter)
+        waiter.event.wait()
+        self._observe_wait(priority, waiter.queued_at)
+
+    async def acquire_async(self, cost: int, priority: Optional[int] = None):
+        priority = current_priority() if priority is None else priority
+        with self._cond:
+            if self._try_now(priority, cost):
+                self._observe_wait(priority, time.perf_counter())
+                return
+            waiter = _Waiter(priority, cost, asyncio.get_running_loop())
+            self._enqueue(waiter)
+        # cancelling the task cancels the future, the dispatcher then drops the waiter
+        await waiter.future
+        self._observe_wait(priority, waiter.queued_at)
+
+    def on_response(self, status_code: int, headers: httpx.Headers):
+        if status_code != 429:
+            return
+        metrics.incr('llm_scheduler.throttled')
+        retry_after = DEFAULT_RETRY_AFTER
+        try:
+            if 'retry-after-ms' in headers:
+                retry_after = float(headers['retry-after-ms']) / 1000
+            elif 'retry-after' in headers:
+                retry_after = float(headers['retry-after'])
+        except ValueError:
+            pass
+        with self._cond:
+            self._paused_until = max(self._paused_until, self._clock() + retry_after)
+            self._cond.notify()
+
+
+scheduler = LLMScheduler()
+
+
+def _request_cost(request: httpx.Request) -> int:
+    try:
+        return estimate_tokens(request.content)
+    except httpx.RequestNotRead:
+        return DEFAULT_COMPLETION_TOKENS
+
+
+class ScheduledTransport(httpx.BaseTransport):
+    def __init__(self, transport: Optional[httpx.BaseTransport] = None, llm_scheduler: Optional[LLMScheduler] = None):
+        self._transport = transport or httpx.HTTPTransport(limits=openai.DEFAULT_CONNECTION_LIMITS)
+        self._scheduler = llm_scheduler or scheduler
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        self._scheduler.acquire(_request_cost(request))
+        response = self._transport.handle_request(request)
+        self._scheduler.on_response(response.status_code, response.headers)
+        return response
+
+    def close(self):
+        self._transport.close()
+
+
+class AsyncScheduledTransport(httpx.AsyncBaseTransport):
+    def __init__(
+        self, transport: Optional[httpx.AsyncBaseTransport] = None, llm_scheduler: Optional[LLMScheduler] = None
+    ):
+        self._transport = transport or httpx.AsyncHTTPTransport(limits=openai.DEFAULT_CONNECTION_LIMITS)
+        self._scheduler = llm_scheduler or scheduler
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        await self._scheduler.acquire_async(_request_cost(request))
+        response = await self._transport.handle_async_request(request)
+        self._scheduler.on_response(response.status_code, response.headers)
+        return response
+
+    async def aclose(self):
+        await self._transport.aclose()
+
+
+_http_clients: Dict[str, httpx.Client] = {}
+_http_clients_lock = threading.Lock()
+
+
+def scheduled_http_clients() -> dict:
+    """
+    `http_client` and `http_async_client` for OpenAI chat clients, shared by all of them. Empty when the scheduler is
+    disabled.
+    """
+    if not ENABLED:
+        return {}
+    with _http_clients_lock:
+        if not _http_clients:
+            _http_clients['http_client'] = openai.DefaultHttpxClient(transport=ScheduledTransport())
+            _http_clients['http_async_client'] = openai.DefaultAsyncHttpxClient(transport=AsyncScheduledTransport())
+        return dict(_http_clients)
@@ -1,18 +1,66 @@
-import json
+import hashlib
 import os
+import threading
 import time
+import uuid
+from collections import OrderedDict, deque
 
 from fastapi import Header, HTTPException
 from fastapi import Request
 from firebase_admin import auth
 from firebase_admin.auth import InvalidIdTokenError
 
+from database import redis_db
+from utils.other import metrics
+
 
 def get_user(uid: str):
     user = auth.get_user(uid)
     return user
 
 
+# Verified ID tokens, keyed by token hash, each kept until the token's own expiry (capped by the max TTL)
+_token_cache: OrderedDict = OrderedDict()
+_token_cache_lock = threading.Lock()
+TOKEN_CACHE_ENABLED = os.getenv('ID_TOKEN_CACHE_ENABLED', 'true').lower() == 'true'
+TOKEN_CACHE_MAX_TTL = int(os.getenv('ID_TOKEN_CACHE_MAX_TTL', '300'))
+TOKEN_CACHE_MAX_SIZE = 10000
+# Revocation can only be checked against Firebase, so enabling it bypasses the cache
+CHECK_REVOKED = os.getenv('FIREBASE_CHECK_REVOKED', 'false').lower() == 'true'
+
+
+def verify_id_token(token: str) -> dict:
+    """auth.verify_id_token with a short-lived in-process cache of successful verifications."""
+    if CHECK_REVOKED or not TOKEN_CACHE_ENABLED:
+        return auth.verify_id_token(token, check_revoked=CHECK_REVOKED)
+
+    key = hashlib.sha256(token.encode('utf-8')).hexdigest()
+    now = time.time()
+    with _token_cache_lock:
+        entry = _token_cache.get(key)
+        if entry:
+            decoded_token, expires_at = entry
+            if now < expires_at:
+                _token_cache.move_to_end(key)
+                return decoded_token
+            del _token_cache[key]
+
+    decoded_token = auth.verify_id_token(token)
+    expires_at = min(decoded_token.get('exp', now), now + TOKEN_CACHE_MAX_TTL)
+    if expires_at > now:
+        with _token_cache_lock:
+            _token_cache[key] = (decoded_token, expires_at)
+            if len(_token_cache) > TOKEN_CACHE_MAX_SIZE:
+                _token_cache.popitem(last=False)
+    return decoded_token
+
+
+def invalidate_cached_tokens(uid: str):
+    with _token_cache_lock:
+        for key in [k for k, (decoded, _) in _token_cache.items() if decoded.get('uid') == uid]:
+            del _token_cache[key]
+
+
 def get_current_user_uid(authorization: str = Header(None)):
     if authorization and os.getenv('ADMIN_KEY') in authorization:
         return authorization.split(os.getenv('ADMIN_KEY'))[1]
@@ -24,48 +72,62 @@ def get_current_user_uid(authorization: str = Header(None)):
 
     try:
         token = authorization.split(' ')[1]
-        decoded_token = auth.verify_id_token(token)
+        decoded_token = verify_id_token(token)
         # print('get_current_user_uid', decoded_token['uid'])
         return decoded_token['uid']
-    except InvalidIdTokenError as e:
+    except (InvalidIdTokenError, auth.UserDisabledError) as e:
         if os.getenv('LOCAL_DEVELOPMENT') == 'true':
             return '123'
         print(e)
         raise HTTPException(status_code=401, detail="Invalid authorization token")
 
 
-cached = {}
+class InProcessSlidingWindowLimiter:
+    """Fallback when Redis is unreachable: per worker, but bounded and evicting least recently used keys."""
 
+    def __init__(self, max_keys: int = 10000):
+        self.max_keys = max_keys
+        self._windows: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
 
-def rate_limit_custom(endpoint: str, request: Request, requests_per_window: int, window_seconds: int):
-    ip = request.client.host
-    key = f"rate_limit:{endpoint}:{ip}"
+    def check(self, key: str, limit: int, window_seconds: int, now: float):
+        with self._lock:
+            window = self._windows.get(key)
+            if window is None:
+                window = self._windows[key] = deque()
+            self._windows.move_to_end(key)
+            while window and window[0] <= now - window_seconds:
+                window.popleft()
+            if len(window) >= limit:
+                return False, 0, int((window[0] + window_seconds - now) * 1000)
+            window.append(now)
+            if len(self._windows) > self.max_keys:
+                self._windows.popitem(last=False)
+            return True, limit - len(window), 0
 
-    # Check if the IP is already rate-limited
-    current = cached.get(key)
-    if current:
-        current = json.loads(current)
-        remaining = current["remaining"]
-        timestamp = current["timestamp"]
-        current_time = int(time.time())
 
-        # Check if the time window has expired
-        if current_time - timestamp >= window_seconds:
-            remaining = requests_per_window - 1  # Reset the counter for the new window
-            timestamp = current_time
-        elif remaining == 0:
-            raise HTTPException(status_code=429, detail="Too Many Requests")
+_local_limiter = InProcessSlidingWindowLimiter()
 
-        remaining -= 1
 
-    else:
-        # If no previous data found, start a new time window
-        remaining = requests_per_window - 1
-        timestamp = int(time.time())
+def rate_limit_custom(endpoint: str, request: Request, requests_per_window: int, window_seconds: int):
+    ip = request.client.host
+    key = f"rate_limit:{endpoint}:{ip}"
 
-    # Update the rate limit info in Redis
-    current = {"timestamp": timestamp, "remaining": remaining}
-    cached[key] = json.dumps(current)
+    start = time.perf_counter()
+    result = redis_db.check_sliding_window_rate_limit(key, requests_per_window, window_seconds, uuid.uuid4().hex)
+    if result is None:
+        metrics.incr('rate_limit.fallback')
+        result = _local_limiter.check(key, requests_per_window, window_seconds, time.time())
+    metrics.observe('rate_limit.check', time.perf_counter() - start)
+
+    allowed, _, retry_after_ms = result
+    if not allowed:
+        metrics.incr('rate_limit.rejected')
+        raise HTTPException(
+            status_code=429,
+            detail="Too Many Requests",
+            headers={"Retry-After": str(max(1, -(-retry_after_ms // 1000)))},
+        )
 
     return True
 
@@ -94,4 +156,5 @@ def timeit(func):
 
 def delete_account(uid: str):
     auth.delete_user(uid)
+    invalidate_cached_tokens(uid)
     return {"message": "User deleted"}
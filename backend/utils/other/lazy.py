@@ -0,0 +1,60 @@
+import threading
+import time
+from typing import Callable, Dict, Generic, Iterable, Optional, TypeVar
+
+T = TypeVar('T')
+
+_registry: Dict[str, 'Lazy'] = {}
+
+
+class Lazy(Generic[T]):
+    """
+    Heavy model or client built on first use instead of at import time.
+
+    Attribute access is forwarded to the underlying instance, so module-level names like
+    `index = Lazy('pinecone', ...)` keep working for call sites such as `index.query(...)`.
+    Construction happens at most once, even when the first uses race across threads.
+    """
+
+    def __init__(self, name: str, factory: Callable[[], T]):
+        self._name = name
+        self._factory = factory
+        self._instance: Optional[T] = None
+        self._lock = threading.Lock()
+        _registry[name] = self
+
+    @property
+    def initialized(self) -> bool:
+        return self._instance is not None
+
+    def get(self) -> T:
+        instance = self._instance
+        if instance is not None:
+            return instance
+        with self._lock:
+            if self._instance is None:
+                start = time.time()
+                self._instance = self._factory()
+                print(f'lazy: initialized {self._name} in {time.time() - start:.2f}s')
+            return self._instance
+
+    def __getattr__(self, item):
+        # only reached for names not defined on Lazy itself
+        if item.startswith('__') and item.endswith('__'):
+            raise AttributeError(item)
+        return getattr(self.get(), item)
+
+    def __repr__(self):
+        return f'Lazy({self._name}, initialized={self.initialized})'
+
+
+def warm_up(names: Optional[Iterable[str]] = None):
+    """Initializes the registered resources (all of them when `names` is empty), skipping any that fail."""
+    wanted = set(names) if names else None
+    for name, resource in list(_registry.items()):
+        if wanted is not None and name not in wanted:
+            continue
+        try:
+            resource.get()
+        except Exception as e:
+            print(f'lazy: warm up failed for {name}', e)
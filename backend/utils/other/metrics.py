@@ -0,0 +1,85 @@
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+# In-process counters, gauges and latency samples. Per worker, exposed through /v1/metrics.
+
+_lock = threading.Lock()
+_counters: Dict[str, int] = defaultdict(int)
+_gauges: Dict[str, float] = {}
+_latencies: Dict[str, 'LatencyStats'] = {}
+
+
+class LatencyStats:
+    """Count and total over the process lifetime, percentiles over the most recent samples."""
+
+    def __init__(self, size: int = 2048):
+        self.samples = deque(maxlen=size)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, seconds: float):
+        self.samples.append(seconds)
+        self.count += 1
+        self.total += seconds
+
+    def snapshot(self) -> dict:
+        ordered = sorted(self.samples)
+        if not ordered:
+            return {'count': 0}
+
+        def pct(p):
+            return round(ordered[min(len(ordered) - 1, int(len(ordered) * p))] * 1000, 3)
+
+        return {
+            'count': self.count,
+            'avg_ms': round(self.total / self.count * 1000, 3),
+            'p50_ms': pct(0.5),
+            'p99_ms': pct(0.99),
+            'max_ms': round(ordered[-1] * 1000, 3),
+        }
+
+
+def incr(name: str, value: int = 1):
+    with _lock:
+        _counters[name] += value
+
+
+def set_gauge(name: str, value: float):
+    with _lock:
+        _gauges[name] = value
+
+
+def observe(name: str, seconds: float):
+    with _lock:
+        stats = _latencies.get(name)
+        if stats is None:
+            stats = _latencies[name] = LatencyStats()
+        stats.observe(seconds)
+
+
+@contextmanager
+def timer(name: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - start)
+
+
+def snapshot(prefix: Optional[str] = None) -> dict:
+    with _lock:
+        return {
+            'counters': {k: v for k, v in _counters.items() if not prefix or k.startswith(prefix)},
+            'gauges': {k: v for k, v in _gauges.items() if not prefix or k.startswith(prefix)},
+            'latencies': {k: v.snapshot() for k, v in _latencies.items() if not prefix or k.startswith(prefix)},
+        }
+
+
+def reset():
+    with _lock:
+        _counters.clear()
+        _gauges.clear()
+        _latencies.clear()
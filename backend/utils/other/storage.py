@@ -1,8 +1,11 @@
 import datetime
+import hashlib
 import json
 import os
-from typing import List
+from collections import defaultdict
+from typing import Dict, List, Optional
 
+from google.api_core.exceptions import NotFound, PreconditionFailed
 from google.cloud import storage
 from google.oauth2 import service_account
 from google.cloud.storage import transfer_manager
@@ -37,6 +40,7 @@ def upload_profile_audio(file_path: str, uid: str):
     path = f'{uid}/speech_profile.wav'
     blob = bucket.blob(path)
     blob.upload_from_filename(file_path)
+    delete_speech_embedding(uid, 'speech_profile')
     return f'https://storage.googleapis.com/{speech_profiles_bucket}/{path}'
 
 
@@ -65,6 +69,7 @@ def upload_additional_profile_audio(file_path: str, uid: str) -> None:
     path = f'{uid}/additional_profile_recordings/{file_path.split("/")[-1]}'
     blob = bucket.blob(path)
     blob.upload_from_filename(file_path)
+    delete_speech_embedding(uid, 'speech_profile')
 
 
 def delete_additional_profile_audio(uid: str, file_name: str) -> None:
@@ -73,6 +78,7 @@ def delete_additional_profile_audio(uid: str, file_name: str) -> None:
     if blob.exists():
         print('delete_additional_profile_audio deleting', file_name)
         blob.delete()
+        delete_speech_embedding(uid, 'speech_profile')
 
 
 def get_additional_profile_recordings(uid: str, download: bool = False) -> List[str]:
@@ -99,6 +105,7 @@ def upload_user_person_speech_sample(file_path: str, uid: str, person_id: str) -
     path = f'{uid}/people_profiles/{person_id}/{file_path.split("/")[-1]}'
     blob = bucket.blob(path)
     blob.upload_from_filename(file_path)
+    delete_speech_embedding(uid, f'person_{person_id}')
 
 
 def delete_user_person_speech_sample(uid: str, person_id: str, file_name: str) -> None:
@@ -106,6 +113,7 @@ def delete_user_person_speech_sample(uid: str, person_id: str, file_name: str) -
     blob = bucket.blob(f'{uid}/people_profiles/{person_id}/{file_name}')
     if blob.exists():
         blob.delete()
+        delete_speech_embedding(uid, f'person_{person_id}')
 
 
 def delete_speech_sample_for_people(uid: str, file_name: str) -> None:
@@ -115,6 +123,7 @@ def delete_speech_sample_for_people(uid: str, file_name: str) -> None:
         if file_name in blob.name:
             print('delete_speech_sample_for_people deleting', blob.name)
             blob.delete()
+            delete_speech_embedding(uid, f'person_{blob.name.split("/")[-2]}')
 
 
 def delete_user_person_speech_samples(uid: str, person_id: str) -> None:
@@ -122,6 +131,7 @@ def delete_user_person_speech_samples(uid: str, person_id: str) -> None:
     blobs = bucket.list_blobs(prefix=f'{uid}/people_profiles/{person_id}/')
     for blob in blobs:
         blob.delete()
+    delete_speech_embedding(uid, f'person_{person_id}')
 
 
 def get_user_people_ids(uid: str) -> List[str]:
@@ -144,6 +154,63 @@ def get_user_person_speech_samples(uid: str, person_id: str, download: bool = Fa
     return [_get_signed_url(blob, 60) for blob in blobs]
 
 
+# ********************************************
+# ************ SPEAKER EMBEDDINGS ************
+# ********************************************
+
+# Reference speaker embeddings (float32 .npy) for the user's profile and each person, computed once by the
+# speaker identification service and dropped whenever the samples they were computed from change. Each one also
+# records the version of its samples (their names and generations), and is only served while they still match: a
+# computation that started before the samples changed may upload after they were dropped.
+
+
+def _samples_version(blobs) -> str:
+    return hashlib.sha256('\n'.join(sorted(f'{blob.name}:{blob.generation}' for blob in blobs)).encode()).hexdigest()
+
+
+def get_speech_profile_version(uid: str) -> Optional[str]:
+    bucket = storage_client.bucket(speech_profiles_bucket)
+    profile = bucket.get_blob(f'{uid}/speech_profile.wav')
+    if profile is None:
+        return None
+    return _samples_version([profile, *bucket.list_blobs(prefix=f'{uid}/additional_profile_recordings/')])
+
+
+def get_user_people_speech_samples_versions(uid: str) -> Dict[str, str]:
+    """The version of each person's speech samples, by person id."""
+    bucket = storage_client.bucket(speech_profiles_bucket)
+    samples = defaultdict(list)
+    for blob in bucket.list_blobs(prefix=f'{uid}/people_profiles/'):
+        samples[blob.name.split("/")[-2]].append(blob)
+    return {person_id: _samples_version(blobs) for person_id, blobs in samples.items()}
+
+
+def get_speech_embedding(uid: str, name: str, version: str) -> Optional[bytes]:
+    bucket = storage_client.bucket(speech_profiles_bucket)
+    blob = bucket.get_blob(f'{uid}/embeddings/{name}.npy')
+    if blob is None or (blob.metadata or {}).get('samples_version') != version:
+        return None
+    try:
+        return blob.download_as_bytes(if_generation_match=blob.generation)
+    except (NotFound, PreconditionFailed):
+        # replaced or dropped since
+        return None
+
+
+def upload_speech_embedding(uid: str, name: str, data: bytes, version: str) -> None:
+    bucket = storage_client.bucket(speech_profiles_bucket)
+    blob = bucket.blob(f'{uid}/embeddings/{name}.npy')
+    blob.metadata = {'samples_version': version}
+    blob.upload_from_string(data, content_type='application/octet-stream')
+
+
+def delete_speech_embedding(uid: str, name: str) -> None:
+    bucket = storage_client.bucket(speech_profiles_bucket)
+    blob = bucket.blob(f'{uid}/embeddings/{name}.npy')
+    if blob.exists():
+        blob.delete()
+
+
 # ********************************************
 # ************* POST PROCESSING **************
 # ********************************************
@@ -0,0 +1,203 @@
+import concurrent.futures
+import contextvars
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional
+
+from utils.other import metrics
+
+# Bounded runner for background work started by a request.
+#
+# Tasks run on a fixed pool of worker threads, and at most `max_pending` of them are queued or running at once: past
+# that, submitting blocks until one finishes, so a burst slows its callers down instead of growing threads and memory
+# without bound. Never submit from the event loop, run the caller with `asyncio.to_thread` instead. Tasks that can be
+# skipped (e.g. best-effort backfills) are submitted with `block=False`, and dropped when the runner is full. Every
+# task runs a Stage, which sets its timeout and retries, in the caller's context variables, and belongs to the
+# TaskGroup of the request that started it (its label is in the logs, `wait()` waits for its tasks).
+# - a failing attempt is retried after `retry_delay * 2**attempt` seconds, `retries` times; only give retries to
+#   stages that can run twice
+# - an attempt still running after its stage's timeout is reported (a thread can't be interrupted), then isn't retried,
+#   and `TaskGroup.wait()` stops waiting for it
+# - on shutdown, `drain_all()` stops every runner from accepting tasks and waits for the ones it has
+#
+# Per runner, `tasks.<runner>.queued|running` gauges and `tasks.<runner>.backpressure|dropped|rejected` counters,
+# per stage, `tasks.<runner>.<stage>` latencies and `tasks.<runner>.<stage>.ok|failed|retried|timeout` counters are
+# in /v1/metrics.
+
+DRAIN_TIMEOUT = float(os.getenv('TASK_RUNNER_DRAIN_TIMEOUT', '20'))
+WATCHDOG_INTERVAL = 1.0
+
+
+@dataclass(frozen=True)
+class Stage:
+    name: str
+    timeout: float = 60.0
+    retries: int = 0
+    retry_delay: float = 1.0
+
+
+class _Attempt:
+    def __init__(self, stage: Stage, label: str):
+        self.stage = stage
+        self.label = label
+        self.deadline = time.monotonic() + stage.timeout
+        self.timed_out = False
+
+
+class TaskRunner:
+    def __init__(self, name: str, max_workers: int, max_pending: int):
+        self.name = name
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._cond = threading.Condition()
+        self._queued = 0
+        self._running: Dict[int, _Attempt] = {}
+        self._closed = False
+        self._watchdog: Optional[threading.Thread] = None
+        _runners.append(self)
+
+    def submit(self, stage: Stage, fn: Callable, *args, label: str = '', block: bool = True, **kwargs) -> Future:
+        if self._closed:
+            metrics.incr(f'tasks.{self.name}.rejected')
+            print(f'task {self.name}.{stage.name} [{label}] rejected, shutting down')
+            return _failed(RuntimeError(f'task runner {self.name} is shutting down'))
+
+        if not self._slots.acquire(blocking=False):
+            if not block:
+                metrics.incr(f'tasks.{self.name}.dropped')
+                return _failed(RuntimeError(f'task runner {self.name} is full'))
+            metrics.incr(f'tasks.{self.name}.backpressure')
+            self._slots.acquire()
+        with self._cond:
+            self._queued += 1
+            self._set_gauges()
+            if self._watchdog is None:
+                self._watchdog = threading.Thread(target=self._watch, name=f'{self.name}-watchdog', daemon=True)
+                self._watchdog.start()
+        future = Future()
+        context = contextvars.copy_context()
+        self._executor.submit(self._run, stage, label, future, context, fn, args, kwargs)
+        return future
+
+    def _set_gauges(self):
+        metrics.set_gauge(f'tasks.{self.name}.queued', self._queued)
+        metrics.set_gauge(f'tasks.{self.name}.running', len(self._running))
+
+    def _run(self, stage: Stage, label: str, future: Future, context, fn: Callable, args, kwargs):
+        name = f'tasks.{self.name}.{stage.name}'
+        try:
+            for attempt in range(stage.retries + 1):
+                current = _Attempt(stage, label)
+                with self._cond:
+                    self._queued -= 1
+                    self._running[id(current)] = current
+                    self._set_gauges()
+                start = time.perf_counter()
+                try:
+                    result = context.run(fn, *args, **kwargs)
+                    error = None
+                except Exception as e:
+                    error = e
+                finally:
+                    metrics.observe(name, time.perf_counter() - start)
+                    with self._cond:
+                        self._running.pop(id(current), None)
+                        self._set_gauges()
+
+                if error is None:
+                    metrics.incr(f'{name}.ok')
+                    future.set_result(result)
+                    return
+                if current.timed_out or attempt == stage.retries:
+                    metrics.incr(f'{name}.failed')
+                    print(f'task {self.name}.{stage.name} [{label}] failed: {error}')
+                    future.set_exception(error)
+                    return
+                metrics.incr(f'{name}.retried')
+                print(f'task {self.name}.{stage.name} [{label}] failed, retrying: {error}')
+                with self._cond:
+                    # waiting for its retry counts as queued
+                    self._queued += 1
+                    self._set_gauges()
+                time.sleep(stage.retry_delay * 2**attempt)
+        finally:
+            self._slots.release()
+            with self._cond:
+                self._cond.notify_all()
+
+    def _watch(self):
+        while True:
+            time.sleep(WATCHDOG_INTERVAL)
+            now = time.monotonic()
+            with self._cond:
+                late = [a for a in self._running.values() if not a.timed_out and a.deadline <= now]
+                for attempt in late:
+                    attempt.timed_out = True
+            for attempt in late:
+                metrics.incr(f'tasks.{self.name}.{attempt.stage.name}.timeout')
+                print(
+                    f'task {self.name}.{attempt.stage.name} [{attempt.label}] '
+                    f'still running after its {attempt.stage.timeout}s timeout'
+                )
+
+    def close(self):
+        self._closed = True
+
+    def drain(self, timeout: float = DRAIN_TIMEOUT) -> bool:
+        """Stops accepting tasks, then waits up to `timeout` seconds for the others. True if they all finished."""
+        self.close()
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while self._queued or self._running:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    print(f'task runner {self.name}: {self._queued} queued, {len(self._running)} running at shutdown')
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+
+def _failed(error: Exception) -> Future:
+    future = Future()
+    future.set_exception(error)
+    return future
+
+
+class TaskGroup:
+    """The tasks one request started, on one runner."""
+
+    def __init__(self, runner: TaskRunner, label: str):
+        self.runner = runner
+        self.label = label
+        self._futures: List[Future] = []
+        self._timeout = 0.0
+
+    def submit(self, stage: Stage, fn: Callable, *args, **kwargs) -> Future:
+        future = self.runner.submit(stage, fn, *args, label=self.label, **kwargs)
+        self._futures.append(future)
+        self._timeout = max(self._timeout, stage.timeout * (stage.retries + 1))
+        return future
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Waits for the group's tasks, at most as long as its slowest stage may take. True if they all finished."""
+        timeout = self._timeout if timeout is None else timeout
+        _, not_done = concurrent.futures.wait(self._futures, timeout=timeout)
+        if not_done:
+            print(f'task group {self.runner.name} [{self.label}]: {len(not_done)} tasks still running after {timeout}s')
+        return not not_done
+
+
+_runners: List[TaskRunner] = []
+
+
+def drain_all(timeout: float = DRAIN_TIMEOUT) -> bool:
+    deadline = time.monotonic() + timeout
+    for runner in _runners:
+        runner.close()
+    drained = True
+    for runner in list(_runners):
+        drained = runner.drain(max(0.0, deadline - time.monotonic())) and drained
+    return drained
@@ -6,19 +6,24 @@ to use to gather context and answer user questions. Unlike the previous graph-ba
 approach, this lets the LLM make decisions about what information it needs.
 """
 
+import os
 import re
 import uuid
 import asyncio
 import contextvars
+import threading
+from collections import OrderedDict
 from datetime import datetime, timezone
 from typing import List, Optional, AsyncGenerator, Tuple, Any
 
 import database.notifications as notification_db
+from database import redis_db_async
 
 from langchain.callbacks.base import BaseCallbackHandler
-from langchain_core.messages import SystemMessage, AIMessage, HumanMessage
+from langchain_core.messages import SystemMessage, AIMessage, HumanMessage, ToolMessage
+from langchain_core.runnables.config import get_config_list, get_executor_for_config
 from langgraph.checkpoint.memory import MemorySaver
-from langgraph.prebuilt import create_react_agent
+from langgraph.prebuilt import ToolNode, create_react_agent
 from langgraph.prebuilt.chat_agent_executor import AgentState
 
 # Context variable to store config for tools
@@ -56,8 +61,131 @@ from utils.retrieval.tools.app_tools import load_app_tools, get_tool_status_mess
 from utils.retrieval.safety import AgentSafetyGuard, SafetyGuardError
 from utils.llm.clients import llm_agent, llm_agent_stream
 from utils.llm.chat import _get_agentic_qa_prompt
+from utils.other import metrics
 from utils.other.endpoints import timeit
 
+CORE_TOOLS = (
+    get_conversations_tool,
+    vector_search_conversations_tool,
+    get_memories_tool,
+    get_action_items_tool,
+    create_action_item_tool,
+    update_action_item_tool,
+    get_omi_product_info_tool,
+    perplexity_search_tool,
+    get_calendar_events_tool,
+    create_calendar_event_tool,
+    update_calendar_event_tool,
+    delete_calendar_event_tool,
+    get_gmail_messages_tool,
+    get_whoop_sleep_tool,
+    get_whoop_recovery_tool,
+    get_whoop_workout_tool,
+    search_notion_pages_tool,
+    get_twitter_tweets_tool,
+    get_github_pull_requests_tool,
+    get_github_issues_tool,
+    create_github_issue_tool,
+    close_github_issue_tool,
+    search_files_tool,
+)
+# Standard tool names that don't come from apps
+CORE_TOOL_NAMES = frozenset(tool.name for tool in CORE_TOOLS)
+
+MAX_CONCURRENT_TOOL_CALLS = int(os.getenv('AGENT_MAX_CONCURRENT_TOOL_CALLS', '4'))
+
+
+class GuardedToolNode(ToolNode):
+    """
+    Runs the tool calls of one model turn concurrently, at most `max_concurrent_tool_calls` (request config,
+    MAX_CONCURRENT_TOOL_CALLS by default) at a time.
+
+    The request's AgentSafetyGuard validates every call before any of them runs, and checks their outputs once
+    all have finished, both in the order the model emitted them, so limits trip the same way on every run.
+    Results keep that order too. A SafetyGuardError stops the graph.
+    """
+
+    @staticmethod
+    def _request_settings(config) -> Tuple[Optional[AgentSafetyGuard], int]:
+        configurable = config.get('configurable', {})
+        limit = configurable.get('max_concurrent_tool_calls') or MAX_CONCURRENT_TOOL_CALLS
+        return configurable.get('safety_guard'), max(1, limit)
+
+    @staticmethod
+    def _validate_calls(safety_guard: Optional[AgentSafetyGuard], tool_calls: List[dict]):
+        if safety_guard:
+            for call in tool_calls:
+                safety_guard.validate_tool_call(call['name'], call['args'])
+
+    @staticmethod
+    def _check_outputs(safety_guard: Optional[AgentSafetyGuard], outputs: List):
+        if safety_guard:
+            for output in outputs:
+                if isinstance(output, ToolMessage) and output.content:
+                    safety_guard.check_context_size(str(output.content))
+
+    def _func(self, input, config, *, store):
+        tool_calls, input_type = self._parse_input(input, store)
+        safety_guard, limit = self._request_settings(config)
+        self._validate_calls(safety_guard, tool_calls)
+
+        config_list = get_config_list(config, len(tool_calls))
+        with get_executor_for_config({**config, 'max_concurrency': limit}) as executor:
+            outputs = [*executor.map(self._run_one, tool_calls, [input_type] * len(tool_calls), config_list)]
+
+        self._check_outputs(safety_guard, outputs)
+        return self._combine_tool_outputs(outputs, input_type)
+
+    async def _afunc(self, input, config, *, store):
+        tool_calls, input_type = self._parse_input(input, store)
+        safety_guard, limit = self._request_settings(config)
+        self._validate_calls(safety_guard, tool_calls)
+
+        semaphore = asyncio.Semaphore(limit)
+
+        async def run(call):
+            async with semaphore:
+                return await self._arun_one(call, input_type, config)
+
+        outputs = await asyncio.gather(*(run(call) for call in tool_calls))
+
+        self._check_outputs(safety_guard, outputs)
+        return self._combine_tool_outputs(outputs, input_type)
+
+
+# Compiled agents keyed by model and tool set. A graph keeps no per-request state (user, chat session, safety
+# guard and collected conversations travel in the config), so requests with the same tools share one.
+AGENT_GRAPH_CACHE_SIZE = int(os.getenv('AGENT_GRAPH_CACHE_SIZE', '256'))
+_agent_graphs: OrderedDict = OrderedDict()
+_agent_graphs_lock = threading.Lock()
+
+
+def _agent_fingerprint(model, tools: List) -> tuple:
+    # Core tools are module level and app tools are memoized per app version (see app_tools), so identity
+    # tracks content. Cached graphs hold on to their tools, which keeps the ids from being reused.
+    return id(model), tuple((tool.name, id(tool)) for tool in tools)
+
+
+def get_agent_graph(model, tools: List):
+    """The compiled ReAct agent for `model` and `tools`, built on first use."""
+    key = _agent_fingerprint(model, tools)
+    with _agent_graphs_lock:
+        graph = _agent_graphs.get(key)
+        if graph is not None:
+            _agent_graphs.move_to_end(key)
+            metrics.incr('agentic.graph_cache_hit')
+            return graph
+
+    metrics.incr('agentic.graph_cache_miss')
+    with metrics.timer('agentic.graph_build'):
+        graph = create_react_agent(model=model, tools=GuardedToolNode(tools))
+
+    with _agent_graphs_lock:
+        graph = _agent_graphs.setdefault(key, graph)
+        while len(_agent_graphs) > AGENT_GRAPH_CACHE_SIZE:
+            _agent_graphs.popitem(last=False)
+    return graph
+
 
 def get_tool_display_name(tool_name: str, tool_obj: Optional[Any] = None) -> str:
     """
@@ -216,31 +344,7 @@ def execute_agentic_chat(
     system_prompt = _get_agentic_qa_prompt(uid, app)
 
     # Get all tools
-    tools = [
-        get_conversations_tool,
-        vector_search_conversations_tool,
-        get_memories_tool,
-        get_action_items_tool,
-        create_action_item_tool,
-        update_action_item_tool,
-        get_omi_product_info_tool,
-        perplexity_search_tool,
-        get_calendar_events_tool,
-        create_calendar_event_tool,
-        update_calendar_event_tool,
-        delete_calendar_event_tool,
-        get_gmail_messages_tool,
-        get_whoop_sleep_tool,
-        get_whoop_recovery_tool,
-        get_whoop_workout_tool,
-        search_notion_pages_tool,
-        get_twitter_tweets_tool,
-        get_github_pull_requests_tool,
-        get_github_issues_tool,
-        create_github_issue_tool,
-        close_github_issue_tool,
-        search_files_tool,
-    ]
+    tools = list(CORE_TOOLS)
 
     # Load tools from enabled apps
     try:
@@ -256,10 +360,7 @@ def execute_agentic_chat(
     lc_messages.extend(_messages_to_langchain(messages))
 
     # Create agent with tools
-    agent = create_react_agent(
-        model=llm_agent,
-        tools=tools,
-    )
+    agent = get_agent_graph(llm_agent, tools)
 
     # Run agent
     config = {
@@ -297,6 +398,8 @@ async def execute_agentic_chat_stream(
     app: Optional[App] = None,
     callback_data: dict = None,
     chat_session: Optional[ChatSession] = None,
+    system_prompt: Optional[str] = None,
+    app_tools: Optional[List] = None,
 ) -> AsyncGenerator[str, None]:
     """
     Execute an agentic chat interaction with streaming.
@@ -307,43 +410,23 @@ async def execute_agentic_chat_stream(
         app: Optional app/plugin
         callback_data: Dict to store callback data (answer, memories, etc.)
         chat_session: Optional chat session for file context
+        system_prompt: The system prompt, when the caller already built it (e.g. prefetched)
+        app_tools: The tools of the user's enabled apps, when the caller already loaded them
 
     Yields:
         Formatted chunks with "data: " or "think: " prefixes
     """
     # Build system prompt with file context
-    system_prompt = _get_agentic_qa_prompt(uid, app, messages)
+    if system_prompt is None:
+        system_prompt = _get_agentic_qa_prompt(uid, app, messages)
 
     # Get all tools
-    tools = [
-        get_conversations_tool,
-        vector_search_conversations_tool,
-        get_memories_tool,
-        get_action_items_tool,
-        create_action_item_tool,
-        update_action_item_tool,
-        get_omi_product_info_tool,
-        perplexity_search_tool,
-        get_calendar_events_tool,
-        create_calendar_event_tool,
-        update_calendar_event_tool,
-        delete_calendar_event_tool,
-        get_gmail_messages_tool,
-        get_whoop_sleep_tool,
-        get_whoop_recovery_tool,
-        get_whoop_workout_tool,
-        search_notion_pages_tool,
-        get_twitter_tweets_tool,
-        get_github_pull_requests_tool,
-        get_github_issues_tool,
-        create_github_issue_tool,
-        close_github_issue_tool,
-        search_files_tool,
-    ]
+    tools = list(CORE_TOOLS)
 
     # Load tools from enabled apps
     try:
-        app_tools = load_app_tools(uid)
+        if app_tools is None:
+            app_tools = load_app_tools(uid, enabled_app_ids=await redis_db_async.get_enabled_apps(uid))
         tools.extend(app_tools)
         if app_tools:
             print(f"🔧 Added {len(app_tools)} app tools to chat")
@@ -357,10 +440,7 @@ async def execute_agentic_chat_stream(
     callback = AsyncStreamingCallback()
 
     # Create streaming agent with callback
-    agent = create_react_agent(
-        model=llm_agent_stream,
-        tools=tools,
-    )
+    agent = get_agent_graph(llm_agent_stream, tools)
 
     # Run agent with streaming
     # Add a list to collect conversations from tools for citation
@@ -473,10 +553,9 @@ async def _run_agent_stream(
                     full_response.append(token)
                     await callback.put_data(token)
 
-            # Track tool usage and validate with safety guard
+            # Track tool usage
             elif kind == "on_tool_start":
                 tool_name = event.get("name", "unknown")
-                tool_input = event.get("data", {}).get("input", {})
                 print(f"🔧 Tool started: {tool_name}")
 
                 # Extract app_id from tool name if it's from an app tool
@@ -484,35 +563,8 @@ async def _run_agent_stream(
                 app_id = None
                 tools_list = config.get('configurable', {}).get('tools', [])
 
-                # Standard tool names that don't come from apps
-                standard_tool_names = {
-                    'get_conversations_tool',
-                    'vector_search_conversations_tool',
-                    'get_memories_tool',
-                    'get_action_items_tool',
-                    'create_action_item_tool',
-                    'update_action_item_tool',
-                    'get_omi_product_info_tool',
-                    'perplexity_search_tool',
-                    'get_calendar_events_tool',
-                    'create_calendar_event_tool',
-                    'update_calendar_event_tool',
-                    'delete_calendar_event_tool',
-                    'get_gmail_messages_tool',
-                    'get_whoop_sleep_tool',
-                    'get_whoop_recovery_tool',
-                    'get_whoop_workout_tool',
-                    'search_notion_pages_tool',
-                    'get_twitter_tweets_tool',
-                    'get_github_pull_requests_tool',
-                    'get_github_issues_tool',
-                    'create_github_issue_tool',
-                    'close_github_issue_tool',
-                    'search_files_tool',
-                }
-
                 # If tool name is not a standard tool and contains underscore, it's likely an app tool
-                if tool_name not in standard_tool_names and '_' in tool_name:
+                if tool_name not in CORE_TOOL_NAMES and '_' in tool_name:
                     parts = tool_name.split('_', 1)
                     if len(parts) == 2:
                         # First part is likely the app_id
@@ -529,23 +581,11 @@ async def _run_agent_stream(
                 tool_display_name = get_tool_display_name(tool_name, tool_obj)
                 await callback.put_thought(tool_display_name, app_id=app_id)
 
-                # Validate tool call with safety guard
+                # Calls were validated by the tool node before running, warn about approaching limits
                 if safety_guard:
-                    try:
-                        safety_guard.validate_tool_call(tool_name, tool_input)
-
-                        # Check if we should warn user about approaching limits
-                        warning = safety_guard.should_warn_user()
-                        if warning:
-                            await callback.put_thought(warning)
-                    except SafetyGuardError as e:
-                        # Send friendly error message to user (no technical jargon)
-                        error_msg = f"\n\n{str(e)}"
-                        await callback.put_data(error_msg)
-                        print(f"🛡️ Safety Guard blocked tool call: {e}")
-                        # Signal completion and stop processing
-                        await callback.end()
-                        return
+                    warning = safety_guard.should_warn_user()
+                    if warning:
+                        await callback.put_thought(warning)
 
             elif kind == "on_tool_end":
                 tool_name = event.get("name", "unknown")
@@ -597,19 +637,6 @@ async def _run_agent_stream(
                         else:
                             await callback.put_thought('No events found')
 
-                # Check context size with safety guard
-                if safety_guard and output:
-                    try:
-                        safety_guard.check_context_size(output)
-                    except SafetyGuardError as e:
-                        # Send friendly error message to user (no technical jargon)
-                        error_msg = f"\n\n{str(e)}"
-                        await callback.put_data(error_msg)
-                        print(f"🛡️ Safety Guard blocked due to context size: {e}")
-                        # Signal completion and stop processing
-                        await callback.end()
-                        return
-
             elif kind == "on_tool_error":
                 tool_name = event.get("name", "unknown")
                 error = event.get("data", {}).get("error", "")
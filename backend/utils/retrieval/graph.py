@@ -15,6 +15,7 @@ from typing_extensions import TypedDict, Literal
 # os.environ['GOOGLE_APPLICATION_CREDENTIALS'] = '../../' + os.getenv('GOOGLE_APPLICATION_CREDENTIALS')
 import database.conversations as conversations_db
 import database.users as users_db
+from database import redis_db_async
 from database.redis_db import get_filter_category_items
 from database.vector_db import query_vectors_by_metadata
 import database.notifications as notification_db
@@ -41,9 +42,12 @@ from utils.other.chat_file import FileChatTool
 from utils.other.endpoints import timeit
 from utils.app_integrations import get_github_docs_content
 from utils.retrieval.agentic import execute_agentic_chat_stream
+from utils.retrieval.prefetch import AGENTIC_KEYS, NO_CONTEXT_KEYS, ChatPrefetch, start_chat_prefetch
+import utils.retrieval.prefetch as chat_prefetch
+from utils.llm.scheduler import INTERACTIVE, llm_priority, scheduled_http_clients, set_llm_priority
 
-model = ChatOpenAI(model="gpt-4.1-mini")
-llm_medium_stream = ChatOpenAI(model='gpt-4.1', streaming=True)
+model = ChatOpenAI(model="gpt-4.1-mini", **scheduled_http_clients())
+llm_medium_stream = ChatOpenAI(model='gpt-4.1', streaming=True, **scheduled_http_clients())
 
 
 class StructuredFilters(TypedDict):
@@ -112,10 +116,24 @@ class GraphState(TypedDict):
 
     chat_session: Optional[ChatSession]
 
+    # speculative pre-processing started with the request, streaming only (not checkpointed)
+    prefetch: Optional[ChatPrefetch]
+
+
+def _prefetched(state: GraphState, key: str, fallback):
+    prefetch = state.get("prefetch")
+    return prefetch.get(key, fallback) if prefetch else fallback()
+
+
+def _cancel_prefetch(state: GraphState, keys=None):
+    prefetch = state.get("prefetch")
+    if prefetch:
+        prefetch.cancel(keys)
+
 
 def determine_conversation(state: GraphState):
     print("determine_conversation")
-    question = extract_question_from_conversation(state.get("messages", []))
+    question = _prefetched(state, "question", lambda: extract_question_from_conversation(state.get("messages", [])))
     print("determine_conversation parsed question:", question)
 
     # # stream
@@ -137,17 +155,21 @@ def determine_conversation_type(
     # persona
     app: App = state.get("plugin_selected")
     if app and app.is_a_persona():
+        _cancel_prefetch(state)
         return "persona_question"
 
     # chat
     # no context
     question = state.get("parsed_question", "")
     if not question or len(question) == 0:
+        _cancel_prefetch(state, AGENTIC_KEYS)
         return "no_context_conversation"
 
     requires = requires_context(question)
     if requires:
+        _cancel_prefetch(state, NO_CONTEXT_KEYS)
         return "agentic_context_dependent_conversation"
+    _cancel_prefetch(state, AGENTIC_KEYS)
     return "no_context_conversation"
 
 
@@ -158,8 +180,13 @@ def no_context_conversation(state: GraphState):
     streaming = state.get("streaming")
     if streaming:
         # state['callback'].put_thought_nowait("Reasoning")
+        prompt = _prefetched(state, "simple_prompt", lambda: None)
         answer: str = answer_simple_message_stream(
-            state.get("uid"), state.get("messages"), state.get("plugin_selected"), callbacks=[state.get('callback')]
+            state.get("uid"),
+            state.get("messages"),
+            state.get("plugin_selected"),
+            callbacks=[state.get('callback')],
+            prompt=prompt,
         )
         return {"answer": answer, "ask_for_nps": False}
 
@@ -224,21 +251,29 @@ def agentic_context_dependent_conversation(state: GraphState):
     streaming = state.get("streaming")
     if streaming:
         callback_data = {}
+        system_prompt = _prefetched(state, "agentic_prompt", lambda: None)
+        app_tools = _prefetched(state, "app_tools", lambda: None)
 
         async def run_agentic_stream():
-            async for chunk in execute_agentic_chat_stream(
-                uid,
-                messages,
-                app,
-                callback_data=callback_data,
-                chat_session=state.get("chat_session"),
-            ):
-                if chunk:
-                    # Forward streaming chunks through callback
-                    if chunk.startswith("data: "):
-                        state.get('callback').put_data_nowait(chunk.replace("data: ", ""))
-                    elif chunk.startswith("think: "):
-                        state.get('callback').put_thought_nowait(chunk.replace("think: ", ""))
+            try:
+                async for chunk in execute_agentic_chat_stream(
+                    uid,
+                    messages,
+                    app,
+                    callback_data=callback_data,
+                    chat_session=state.get("chat_session"),
+                    system_prompt=system_prompt,
+                    app_tools=app_tools,
+                ):
+                    if chunk:
+                        # Forward streaming chunks through callback
+                        if chunk.startswith("data: "):
+                            state.get('callback').put_data_nowait(chunk.replace("data: ", ""))
+                        elif chunk.startswith("think: "):
+                            state.get('callback').put_thought_nowait(chunk.replace("think: ", ""))
+            finally:
+                # the async Redis client of this short-lived loop
+                await redis_db_async.close()
 
         # Run the async streaming
         asyncio.run(run_agentic_stream())
@@ -477,6 +512,7 @@ graph_stream = workflow.compile()
 
 
 @timeit
+@llm_priority(INTERACTIVE)
 def execute_graph_chat(
     uid: str, messages: List[Message], app: Optional[App] = None, cited: Optional[bool] = False
 ) -> Tuple[str, bool, List[Conversation]]:
@@ -498,7 +534,14 @@ async def execute_graph_chat_stream(
     chat_session: Optional[ChatSession] = None,
 ) -> AsyncGenerator[str, None]:
     print('execute_graph_chat_stream app: ', app.id if app else '<none>')
-    tz = notification_db.get_user_time_zone(uid)
+    # a user is waiting for the answer; the generator's context ends with the response, so it isn't reset
+    set_llm_priority(INTERACTIVE)
+    prefetch = start_chat_prefetch(uid, messages, app) if chat_prefetch.ENABLED else None
+    if prefetch:
+        # the question is being extracted meanwhile
+        tz = await asyncio.to_thread(prefetch.get, 'tz', lambda: notification_db.get_user_time_zone(uid))
+    else:
+        tz = notification_db.get_user_time_zone(uid)
     callback = AsyncStreamingCallback()
 
     task = asyncio.create_task(
@@ -512,21 +555,26 @@ async def execute_graph_chat_stream(
                 "streaming": True,
                 "callback": callback,
                 "chat_session": chat_session,
+                "prefetch": prefetch,
             },
             {"configurable": {"thread_id": str(uuid.uuid4())}},
         )
     )
 
-    while True:
-        try:
-            chunk = await callback.queue.get()
-            if chunk:
-                yield chunk
-            else:
+    try:
+        while True:
+            try:
+                chunk = await callback.queue.get()
+                if chunk:
+                    yield chunk
+                else:
+                    break
+            except asyncio.CancelledError:
                 break
-        except asyncio.CancelledError:
-            break
-    await task
+        await task
+    finally:
+        if prefetch:
+            prefetch.cancel()
     result = task.result()
     callback_data['answer'] = result.get("answer")
     callback_data['memories_found'] = result.get("memories_found", [])
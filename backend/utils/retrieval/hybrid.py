@@ -0,0 +1,43 @@
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+import database.vector_db as vector_db
+from utils.other import metrics
+from utils.retrieval import lexical
+
+# Conversation retrieval that fuses dense (vector) and lexical (BM25) rankings with reciprocal rank fusion: a
+# conversation scores sum(1 / (RRF_K + rank)) over the rankings it appears in. Dense search covers paraphrases,
+# lexical search covers exact names and keywords that embeddings blur.
+
+RRF_K = 60
+# candidates taken from each ranking, per requested result
+CANDIDATES_PER_RESULT = 4
+MIN_CANDIDATES = 20
+
+_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix='hybrid-retrieval')
+
+
+def reciprocal_rank_fusion(rankings: List[List[str]], k: int = RRF_K) -> List[str]:
+    scores: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking):
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (k + rank + 1)
+    # ties keep first-seen order, i.e. the dense ranking's
+    return sorted(scores, key=lambda doc_id: scores[doc_id], reverse=True)
+
+
+def search_conversations(
+    uid: str, query: str, starts_at: Optional[int] = None, ends_at: Optional[int] = None, k: int = 5
+) -> List[str]:
+    """Ids of the `k` conversations best matching `query`, by meaning or by keyword."""
+    candidates = max(k * CANDIDATES_PER_RESULT, MIN_CANDIDATES)
+    dense = _executor.submit(vector_db.query_vectors, query, uid, starts_at=starts_at, ends_at=ends_at, k=candidates)
+    try:
+        with metrics.timer('hybrid.lexical'):
+            lexical_ids = lexical.search_conversations(uid, query, candidates, starts_at, ends_at)
+    except Exception as e:
+        print('hybrid.search_conversations: lexical search failed', e)
+        lexical_ids = []
+    dense_ids = dense.result()
+    metrics.incr('hybrid.lexical_only', len(set(lexical_ids) - set(dense_ids)))
+    return reciprocal_rank_fusion([dense_ids, lexical_ids])[:k]
@@ -0,0 +1,228 @@
+import math
+import os
+import re
+import threading
+import time
+from collections import Counter, OrderedDict, defaultdict
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+import database.conversations as conversations_db
+import database.memories as memories_db
+from models.conversation import Conversation
+from utils.other import metrics
+
+# Per-user BM25 index over conversation titles, overviews and the memories extracted from each conversation.
+#
+# Indexes live in an in-process LRU. They are built on first use from two projected Firestore reads (no transcripts)
+# and rebuilt after LEXICAL_INDEX_TTL. In between, conversations processed or deleted by this process update the
+# loaded index in place.
+
+MAX_USERS = int(os.getenv('LEXICAL_INDEX_USERS', '512'))
+INDEX_TTL = int(os.getenv('LEXICAL_INDEX_TTL', '600'))
+
+# BM25F: term frequencies are length-normalized and weighted per field, then saturated once per document
+FIELD_WEIGHTS = {'title': 3.0, 'overview': 1.0, 'memories': 1.5}
+K1 = 1.2
+B = 0.75
+
+_TOKEN_RE = re.compile(r'\w+')
+_STOPWORDS = frozenset(
+    'a an and are as at be but by did do does for from had has have he her his how i in is it its me my of on or '
+    'our she so that the their them they this to was we were what when where which who why will with you your'.split()
+)
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    if not text:
+        return []
+    return [token for token in _TOKEN_RE.findall(text.lower()) if token not in _STOPWORDS]
+
+
+class LexicalIndex:
+    def __init__(self):
+        self._fields: Dict[str, Dict[str, str]] = {}
+        self._created_at: Dict[str, Optional[float]] = {}
+        # term -> doc -> field -> term frequency
+        self._postings: Dict[str, Dict[str, Dict[str, int]]] = defaultdict(dict)
+        self._lengths: Dict[str, Dict[str, int]] = {}
+        self._total_lengths: Counter = Counter()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._fields)
+
+    def _remove(self, doc_id: str):
+        lengths = self._lengths.pop(doc_id, None)
+        if lengths is None:
+            return
+        self._total_lengths.subtract(lengths)
+        for field, text in self._fields.pop(doc_id).items():
+            for term in set(tokenize(text)):
+                postings = self._postings.get(term)
+                if postings is not None:
+                    postings.pop(doc_id, None)
+                    if not postings:
+                        del self._postings[term]
+        self._created_at.pop(doc_id, None)
+
+    def _add(self, doc_id: str, fields: Dict[str, str], created_at: Optional[float]):
+        self._fields[doc_id] = fields
+        self._created_at[doc_id] = created_at
+        lengths = {}
+        for field, text in fields.items():
+            tokens = tokenize(text)
+            lengths[field] = len(tokens)
+            for term, count in Counter(tokens).items():
+                self._postings[term].setdefault(doc_id, {})[field] = count
+        self._lengths[doc_id] = lengths
+        self._total_lengths.update(lengths)
+
+    def upsert(self, doc_id: str, created_at: Optional[float] = None, **fields: Optional[str]):
+        """Sets the given fields of a document, fields not passed keep their current text."""
+        with self._lock:
+            current = dict(self._fields.get(doc_id, {}))
+            if created_at is None:
+                created_at = self._created_at.get(doc_id)
+            current.update({field: text or '' for field, text in fields.items() if field in FIELD_WEIGHTS})
+            self._remove(doc_id)
+            self._add(doc_id, current, created_at)
+
+    def remove(self, doc_id: str):
+        with self._lock:
+            self._remove(doc_id)
+
+    def search(
+        self, query: str, k: int, starts_at: Optional[float] = None, ends_at: Optional[float] = None
+    ) -> List[Tuple[str, float]]:
+        terms = set(tokenize(query))
+        with self._lock:
+            n_docs = len(self._fields)
+            if not terms or not n_docs:
+                return []
+            avg_lengths = {field: max(1.0, self._total_lengths[field] / n_docs) for field in FIELD_WEIGHTS}
+
+            scores: Dict[str, float] = defaultdict(float)
+            for term in terms:
+                postings = self._postings.get(term)
+                # terms in most of the user's documents don't discriminate (classic BM25 idf <= 0), skipping them
+                # keeps filler-only matches out of the ranking; tiny indexes keep every term
+                if not postings or (n_docs > 10 and len(postings) > n_docs / 2):
+                    continue
+                idf = math.log(1 + (n_docs - len(postings) + 0.5) / (len(postings) + 0.5))
+                for doc_id, frequencies in postings.items():
+                    lengths = self._lengths[doc_id]
+                    tf = sum(
+                        FIELD_WEIGHTS[field] * count / (1 - B + B * lengths[field] / avg_lengths[field])
+                        for field, count in frequencies.items()
+                    )
+                    scores[doc_id] += idf * tf * (K1 + 1) / (tf + K1)
+
+            if starts_at is not None or ends_at is not None:
+                created_at = self._created_at
+                scores = {
+                    doc_id: score
+                    for doc_id, score in scores.items()
+                    if _in_range(created_at[doc_id], starts_at, ends_at)
+                }
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+
+
+def _in_range(created_at: Optional[float], starts_at: Optional[float], ends_at: Optional[float]) -> bool:
+    if created_at is None:
+        return False
+    return (starts_at is None or created_at >= starts_at) and (ends_at is None or created_at <= ends_at)
+
+
+def _timestamp(value) -> Optional[float]:
+    return value.timestamp() if isinstance(value, datetime) else None
+
+
+def build_user_index(uid: str) -> LexicalIndex:
+    index = LexicalIndex()
+    memories_by_conversation = defaultdict(list)
+    for memory in memories_db.get_memories_search_fields(uid):
+        conversation_id = memory.get('conversation_id') or memory.get('memory_id')
+        if conversation_id and memory.get('content'):
+            memories_by_conversation[conversation_id].append(memory['content'])
+    for conversation in conversations_db.get_conversations_search_fields(uid):
+        structured = conversation.get('structured') or {}
+        index.upsert(
+            conversation['id'],
+            created_at=_timestamp(conversation.get('created_at')),
+            title=structured.get('title'),
+            overview=structured.get('overview'),
+            memories='\n'.join(memories_by_conversation.get(conversation['id'], [])),
+        )
+    return index
+
+
+_indexes: 'OrderedDict[str, Tuple[float, LexicalIndex]]' = OrderedDict()
+_indexes_lock = threading.Lock()
+# striped, so builds for one user are serialized without keeping a lock per user
+_build_locks = [threading.Lock() for _ in range(64)]
+
+
+def _loaded(uid: str) -> Optional[LexicalIndex]:
+    with _indexes_lock:
+        entry = _indexes.get(uid)
+        if entry is None or time.time() - entry[0] > INDEX_TTL:
+            return None
+        _indexes.move_to_end(uid)
+        return entry[1]
+
+
+def get_user_index(uid: str) -> LexicalIndex:
+    index = _loaded(uid)
+    if index is not None:
+        metrics.incr('lexical.index_hit')
+        return index
+    # one build per user at a time, concurrent searches wait for it
+    with _build_locks[hash(uid) % len(_build_locks)]:
+        index = _loaded(uid)
+        if index is not None:
+            return index
+        metrics.incr('lexical.index_build')
+        with metrics.timer('lexical.index_build'):
+            index = build_user_index(uid)
+        with _indexes_lock:
+            _indexes[uid] = (time.time(), index)
+            _indexes.move_to_end(uid)
+            while len(_indexes) > MAX_USERS:
+                _indexes.popitem(last=False)
+    return index
+
+
+def search_conversations(
+    uid: str, query: str, k: int, starts_at: Optional[float] = None, ends_at: Optional[float] = None
+) -> List[str]:
+    """Conversation ids ranked by BM25 over titles, overviews and memories."""
+    return [doc_id for doc_id, _ in get_user_index(uid).search(query, k, starts_at, ends_at)]
+
+
+def index_conversation(uid: str, conversation: Conversation):
+    """Updates a processed conversation's title and overview in the user's index, if it is loaded."""
+    index = _loaded(uid)
+    if index is None:
+        return
+    if conversation.discarded:
+        index.remove(conversation.id)
+        return
+    index.upsert(
+        conversation.id,
+        created_at=_timestamp(conversation.created_at),
+        title=conversation.structured.title,
+        overview=conversation.structured.overview,
+    )
+
+
+def set_conversation_memories(uid: str, conversation_id: str, contents: List[str]):
+    index = _loaded(uid)
+    if index is not None:
+        index.upsert(conversation_id, memories='\n'.join(contents))
+
+
+def remove_conversation(uid: str, conversation_id: str):
+    index = _loaded(uid)
+    if index is not None:
+        index.remove(conversation_id)
@@ -0,0 +1,96 @@
+import contextvars
+import os
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+import database.memories as memories_db
+import database.notifications as notification_db
+from models.app import App
+from models.chat import Message, MessageSender
+from utils.llm.chat import (
+    _get_agentic_qa_prompt,
+    _get_answer_simple_message_prompt,
+    extract_question_from_conversation,
+    requires_context,
+)
+from utils.other import metrics
+from utils.retrieval.tools.app_tools import load_app_tools
+
+# Speculative pre-processing for chat messages.
+#
+# Before its first token, a message goes through question extraction, then classification, then the prompt of the
+# branch it was routed to (user name, time zone, memories, app tools). ChatPrefetch starts all of it when the message
+# arrives:
+# - the question, and the classification of the user's last message: the extracted question usually is that message,
+#   and the response cache hands the speculative answer (or the call still in flight) over to the real one
+# - the user's time zone, and their memories snapshot, which the agent is told to read first
+# - the prompt of both branches, with the app tools for the agentic one
+#
+# Graph nodes take results from it and fall back to computing them. Once the branch is known, work for the other one
+# is cancelled; work that already started finishes in the background and is dropped.
+
+ENABLED = os.getenv('CHAT_PREFETCH', '1') == '1'
+
+AGENTIC_KEYS = ('agentic_prompt', 'app_tools')
+NO_CONTEXT_KEYS = ('simple_prompt',)
+
+_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv('CHAT_PREFETCH_WORKERS', '32')), thread_name_prefix='chat-prefetch'
+)
+
+
+class ChatPrefetch:
+    def __init__(self):
+        self._futures: Dict[str, Future] = {}
+
+    def submit(self, key: str, fn: Callable, *args, **kwargs) -> Future:
+        # in the caller's context, so the LLM calls keep its priority
+        future = _executor.submit(contextvars.copy_context().run, fn, *args, **kwargs)
+        self._futures[key] = future
+        return future
+
+    def get(self, key: str, fallback: Callable[[], Any]) -> Any:
+        """The prefetched result for `key`, or `fallback()` if it wasn't prefetched, was cancelled or failed."""
+        future = self._futures.get(key)
+        if future is None or future.cancelled():
+            metrics.incr('chat.prefetch.miss')
+            return fallback()
+        try:
+            result = future.result()
+        except Exception as e:
+            print(f'chat prefetch {key} failed: {e}')
+            metrics.incr('chat.prefetch.error')
+            return fallback()
+        metrics.incr('chat.prefetch.hit')
+        return result
+
+    def cancel(self, keys: Optional[Iterable[str]] = None):
+        for key in list(self._futures) if keys is None else keys:
+            future = self._futures.get(key)
+            if future is not None and future.cancel():
+                metrics.incr('chat.prefetch.cancelled')
+
+
+def _last_user_message(messages: List[Message]) -> Optional[str]:
+    """The user's message, if the turn being answered is a single one."""
+    if len(messages) < 1 or messages[-1].sender != MessageSender.human:
+        return None
+    if len(messages) > 1 and messages[-2].sender == MessageSender.human:
+        return None
+    return messages[-1].text or None
+
+
+def start_chat_prefetch(uid: str, messages: List[Message], app: Optional[App] = None) -> ChatPrefetch:
+    prefetch = ChatPrefetch()
+    prefetch.submit('question', extract_question_from_conversation, messages)
+    if app and app.is_a_persona():
+        return prefetch
+
+    if last_message := _last_user_message(messages):
+        prefetch.submit('requires_context', requires_context, last_message)
+    prefetch.submit('tz', notification_db.get_user_time_zone, uid)
+    prefetch.submit('memories', memories_db.get_memories_snapshot, uid)
+    prefetch.submit('agentic_prompt', _get_agentic_qa_prompt, uid, app, messages)
+    prefetch.submit('app_tools', load_app_tools, uid)
+    prefetch.submit('simple_prompt', _get_answer_simple_message_prompt, uid, messages, app)
+    return prefetch
@@ -6,7 +6,9 @@ in the Omi chat when the app is installed by a user.
 """
 
 import contextvars
-from typing import List, Optional, Callable, Any, Dict
+import threading
+from collections import OrderedDict
+from typing import List, Optional, Callable, Any, Dict, Tuple
 import httpx
 from pydantic import BaseModel, Field, create_model
 from langchain_core.tools import StructuredTool
@@ -24,6 +26,12 @@ except ImportError:
 # Global mapping of tool names to status messages
 _tool_status_messages: Dict[str, str] = {}
 
+# Tools built per (app id, app name, tools version). They hold no per-user state (the user comes from the
+# agent config at call time), so every chat with the app enabled shares them.
+_built_app_tools: OrderedDict = OrderedDict()
+_built_app_tools_lock = threading.Lock()
+BUILT_APP_TOOLS_MAX_ITEMS = 1024
+
 
 def _create_pydantic_model_from_schema(tool_name: str, parameters: Dict[str, Any]) -> type:
     """
@@ -214,43 +222,80 @@ async def _call_tool_endpoint(kwargs: dict, config: Optional[RunnableConfig], ap
         return f"Error calling {app_tool.name}: {str(e)}"
 
 
-def load_app_tools(uid: str) -> List[Callable]:
+def _current_tool_definitions(definition: dict) -> Tuple[str, List[dict]]:
+    """The app's tools from its cached manifest when there is one, otherwise the ones stored with the app."""
+    from utils import app_manifests
+
+    if definition.get('manifest_url'):
+        entry = app_manifests.peek(definition['manifest_url'])
+        if entry:
+            return entry['version'], entry['tools']
+    return definition['version'], definition['tools']
+
+
+def _build_app_tools(app_id: str, app_name: str, tool_definitions: List[dict], app_home_url: Optional[str]):
+    from utils.apps import resolve_chat_tool_endpoints
+
+    tools = []
+    for tool_definition in resolve_chat_tool_endpoints([dict(t) for t in tool_definitions], app_home_url):
+        try:
+            app_tool = ChatTool(**tool_definition)
+            tools.append(create_app_tool(app_tool, app_id, app_name))
+            print(f"✅ Loaded tool '{app_tool.name}' from app '{app_name}' ({app_id})")
+        except Exception as e:
+            print(f"❌ Error creating tool {tool_definition.get('name')} for app {app_id}: {e}")
+    return tools
+
+
+def get_app_tools(app_id: str) -> List[Callable]:
+    """Tools of one app, built once per version of its tool definitions."""
+    from utils.apps import get_app_chat_tools_definition
+
+    definition = get_app_chat_tools_definition(app_id)
+    if not definition:
+        return []
+
+    version, tool_definitions = _current_tool_definitions(definition)
+    if not tool_definitions:
+        return []
+
+    key = (app_id, definition['name'], version)
+    with _built_app_tools_lock:
+        tools = _built_app_tools.get(key)
+        if tools is not None:
+            _built_app_tools.move_to_end(key)
+            return tools
+
+    tools = _build_app_tools(app_id, definition['name'], tool_definitions, definition.get('app_home_url'))
+    with _built_app_tools_lock:
+        _built_app_tools[key] = tools
+        while len(_built_app_tools) > BUILT_APP_TOOLS_MAX_ITEMS:
+            _built_app_tools.popitem(last=False)
+    return tools
+
+
+def load_app_tools(uid: str, enabled_app_ids: Optional[List[str]] = None) -> List[Callable]:
     """
     Load all tools from enabled apps for a user.
 
     Args:
         uid: User ID
+        enabled_app_ids: The user's enabled apps when the caller already fetched them (e.g. asynchronously)
 
     Returns:
         List of LangChain tool functions
     """
     from database.redis_db import get_enabled_apps
-    from database.apps import get_app_by_id_db
-    from models.app import App
 
-    enabled_app_ids = get_enabled_apps(uid)
+    if enabled_app_ids is None:
+        enabled_app_ids = get_enabled_apps(uid)
     tools = []
 
     for app_id in enabled_app_ids:
-        app_data = get_app_by_id_db(app_id)
-        if not app_data:
-            continue
-
         try:
-            app = App(**app_data)
+            tools.extend(get_app_tools(app_id))
         except Exception as e:
-            print(f"Error parsing app {app_id}: {e}")
-            continue
-
-        # Only load tools if app has chat_tools defined
-        if app.chat_tools and len(app.chat_tools) > 0:
-            for app_tool in app.chat_tools:
-                try:
-                    tool_func = create_app_tool(app_tool, app.id, app.name)
-                    tools.append(tool_func)
-                    print(f"✅ Loaded tool '{app_tool.name}' from app '{app.name}' ({app_id})")
-                except Exception as e:
-                    print(f"❌ Error creating tool {app_tool.name} for app {app_id}: {e}")
+            print(f"Error loading tools for app {app_id}: {e}")
 
     print(f"📦 Loaded {len(tools)} app tools for user {uid}")
     return tools
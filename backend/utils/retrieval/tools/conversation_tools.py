@@ -12,10 +12,11 @@ from langchain_core.tools import tool
 
 import database.conversations as conversations_db
 import database.users as users_db
-import database.vector_db as vector_db
 from models.conversation import Conversation
 from models.other import Person
+from utils.conversations import digests
 from utils.conversations.search import search_conversations
+from utils.retrieval import hybrid
 from utils.llm.clients import embeddings
 
 # Import agent_config_context for fallback config access
@@ -26,6 +27,17 @@ except ImportError:
     agent_config_context = contextvars.ContextVar('agent_config', default=None)
 
 
+def _no_conversations_message(start_dt: Optional[datetime], end_dt: Optional[datetime]) -> str:
+    date_info = ""
+    if start_dt and end_dt:
+        date_info = f" between {start_dt.strftime('%Y-%m-%d')} and {end_dt.strftime('%Y-%m-%d')}"
+    elif start_dt:
+        date_info = f" after {start_dt.strftime('%Y-%m-%d')}"
+    elif end_dt:
+        date_info = f" before {end_dt.strftime('%Y-%m-%d')}"
+    return f"No conversations found{date_info}. The user may not have recorded any conversations yet, or the date range may be outside their conversation history."
+
+
 @tool
 def get_conversations_tool(
     start_date: Optional[str] = None,
@@ -55,8 +67,11 @@ def get_conversations_tool(
     Examples: "summarize my week", "what did I do this month", "recap my year"
 
     Transcript retrieval guidance:
-    - By default (max_transcript_segments=0), no transcript segments are included
-    - Only increase max_transcript_segments when user explicitly needs transcript content
+    - By default (max_transcript_segments=0), no transcript segments are included and each conversation is a compact
+      digest (title, overview, people, entities, action items, events); as many as fit the context are returned,
+      with a note on how to page through the rest
+    - Only increase max_transcript_segments when user explicitly needs transcript content, and then narrow the
+      date range or limit to the conversations that need it
     - Use reasonable limits (10-50 segments) for most queries - this usually covers key parts
     - Set max_transcript_segments=100 only when user needs extensive transcript details
     - AVOID max_transcript_segments=-1 (full transcript) unless absolutely critical:
@@ -74,7 +89,7 @@ def get_conversations_tool(
     Args:
         start_date: Filter conversations after this date (ISO format in user's timezone: YYYY-MM-DDTHH:MM:SS+HH:MM, e.g. "2024-01-19T15:00:00-08:00")
         end_date: Filter conversations before this date (ISO format in user's timezone: YYYY-MM-DDTHH:MM:SS+HH:MM, e.g. "2024-01-19T23:59:59-08:00")
-        limit: Number of conversations to retrieve (default: 20, max: 100)
+        limit: Number of conversations to retrieve (default: 20, max: 5000)
         offset: Pagination offset (default: 0)
         include_discarded: Include deleted conversations (default: False)
         statuses: Filter by status, comma-separated (default: all)
@@ -163,6 +178,39 @@ def get_conversations_tool(
     if statuses:
         status_list = [s.strip() for s in statuses.split(',') if s.strip()]
 
+    # Without transcripts, list precomputed digests: no transcript reads or decryption, sized to the context budget
+    if max_transcript_segments == 0:
+        conversation_ids = conversations_db.get_conversation_ids(
+            uid,
+            limit=limit,
+            offset=offset,
+            start_date=start_dt,
+            end_date=end_dt,
+            include_discarded=include_discarded,
+            statuses=status_list,
+        )
+        print(f"📊 get_conversations_tool - found {len(conversation_ids)} conversations, using digests")
+        if not conversation_ids:
+            msg = _no_conversations_message(start_dt, end_dt)
+            print(f"⚠️ get_conversations_tool - {msg}")
+            return msg
+
+        conversation_digests = digests.get_digests(uid, conversation_ids)
+        result, included = digests.digests_to_context(conversation_digests)
+
+        # Store conversations in config for citation tracking (as lightweight dicts)
+        conversations_collected = config['configurable'].get('conversations_collected', [])
+        conversations_collected.extend(digest.as_conversation_dict() for digest in included)
+
+        omitted = len(conversation_digests) - len(included)
+        if omitted:
+            result += (
+                f"\n\nNote: {omitted} more conversations were left out to fit the context. "
+                f"Use offset={offset + len(included)} to see them, or a narrower date range."
+            )
+        print(f"🔍 get_conversations_tool - {len(included)} digests, result length: {len(result)}")
+        return result
+
     # Get conversations
     conversations_data = conversations_db.get_conversations(
         uid,
@@ -177,15 +225,7 @@ def get_conversations_tool(
     print(f"📊 get_conversations_tool - found {len(conversations_data) if conversations_data else 0} conversations")
 
     if not conversations_data:
-        date_info = ""
-        if start_dt and end_dt:
-            date_info = f" between {start_dt.strftime('%Y-%m-%d')} and {end_dt.strftime('%Y-%m-%d')}"
-        elif start_dt:
-            date_info = f" after {start_dt.strftime('%Y-%m-%d')}"
-        elif end_dt:
-            date_info = f" before {end_dt.strftime('%Y-%m-%d')}"
-
-        msg = f"No conversations found{date_info}. The user may not have recorded any conversations yet, or the date range may be outside their conversation history."
+        msg = _no_conversations_message(start_dt, end_dt)
         print(f"⚠️ get_conversations_tool - {msg}")
         return msg
 
@@ -512,19 +552,19 @@ def vector_search_conversations_tool(
     """
     Search conversations using semantic vector search based on meaning and context.
 
-    This tool uses AI embeddings to find conversations that are semantically similar to your query,
-    even if they don't contain the exact keywords. Perfect for conceptual/thematic searches.
+    This tool combines AI embeddings, which find conversations semantically similar to your query even without the
+    exact keywords, with keyword matching on conversation titles, summaries and memories, so exact names and terms
+    mentioned in them are found too. Perfect for conceptual/thematic searches and for names or keywords.
 
     **When to use this tool:**
     - Searching for concepts, themes, or topics (e.g., "discussions about personal growth", "health-related talks")
     - Finding similar conversations even without exact keyword matches
     - Broad subject searches (e.g., "what have I talked about regarding relationships?")
+    - Finding conversations about a specific person, project or place by name (e.g., "Alex", "Project Falcon")
     - Understanding overall themes or patterns in conversations
 
     **When NOT to use this tool:**
-    - For exact keyword or phrase searches (use search_conversations_tool instead)
-    - For searching specific names, dates, or factual data (use search_conversations_tool instead)
-    - For precise location or entity matching (use search_conversations_tool instead)
+    - For exact phrase searches inside transcripts (use search_conversations_tool instead)
 
     **Tip:** For best results, use descriptive phrases about the concept you're looking for rather than specific keywords.
 
@@ -611,8 +651,8 @@ def vector_search_conversations_tool(
     limit = min(limit, 20)
 
     try:
-        # Perform vector search
-        conversation_ids = vector_db.query_vectors(query=query, uid=uid, starts_at=starts_at, ends_at=ends_at, k=limit)
+        # Vector search fused with keyword search over titles, overviews and memories
+        conversation_ids = hybrid.search_conversations(uid, query, starts_at=starts_at, ends_at=ends_at, k=limit)
 
         print(f"📊 vector_search_conversations_tool - found {len(conversation_ids)} results for query: '{query}'")
 
@@ -12,7 +12,8 @@ from database.apps import (
     get_persona_by_id_db,
     get_persona_by_username_twitter_handle_db,
 )
-from database.redis_db import delete_generic_cache, save_username, is_username_taken
+from database import cache
+from database.redis_db import save_username, is_username_taken
 from utils.llm.persona import condense_tweets, generate_twitter_persona_prompt
 from utils.conversations.memories import process_twitter_memories
 
@@ -180,7 +181,8 @@ async def upsert_persona_from_twitter_profile(username: str, handle: str, uid: s
     # Save persona to database
     upsert_app_to_db(persona)
     save_username(username, uid)
-    delete_generic_cache('get_public_approved_apps_data')
+    cache.invalidate('get_public_approved_apps_data')
+    _invalidate_app_catalog()
 
     # Create memories from persona prompt and tweets
     create_memories_from_twitter_tweets(uid, persona['id'], timeline.timeline)
@@ -241,7 +243,8 @@ async def add_twitter_to_persona(handle: str, persona_id) -> Dict[str, Any]:
     }
 
     update_app_in_db(persona)
-    delete_generic_cache('get_public_approved_apps_data')
+    cache.invalidate('get_public_approved_apps_data')
+    _invalidate_app_catalog()
 
     # Get tweets from the Twitter timeline
     timeline = await get_twitter_timeline(handle)
@@ -251,3 +254,10 @@ async def add_twitter_to_persona(handle: str, persona_id) -> Dict[str, Any]:
         create_memories_from_twitter_tweets(persona['uid'], persona_id, timeline.timeline)
 
     return persona
+
+
+def _invalidate_app_catalog():
+    # utils.app_catalog builds on utils.apps, which imports this module
+    from utils import app_catalog
+
+    app_catalog.invalidate()
@@ -1,7 +1,9 @@
+import io
 import json
 import os
-from typing import List
+from typing import Callable, List, Optional, Tuple
 
+import numpy as np
 import requests
 from pydub import AudioSegment
 
@@ -10,6 +12,10 @@ from utils.other.storage import (
     get_additional_profile_recordings,
     get_user_people_ids,
     get_user_person_speech_samples,
+    get_user_people_speech_samples_versions,
+    get_speech_embedding,
+    get_speech_profile_version,
+    upload_speech_embedding,
 )
 
 
@@ -63,3 +69,89 @@ def get_people_with_speech_samples(uid: str):
         aseg.export(path, format='wav')
         people.append({'id': pid, 'path': path})
     return people
+
+
+# ******************************************
+# ********** REFERENCE EMBEDDINGS **********
+# ******************************************
+
+
+def _get_or_compute_embedding(
+    uid: str,
+    name: str,
+    version: str,
+    build_audio: Callable[[], Optional[str]],
+    embed_file: Callable[[str], np.ndarray],
+) -> Optional[np.ndarray]:
+    # `version` is read before the samples: if they change while this computes, the upload is already stale
+    if data := get_speech_embedding(uid, name, version):
+        return np.load(io.BytesIO(data))
+
+    path = build_audio()
+    if not path:
+        return None
+    try:
+        embedding = np.asarray(embed_file(path), dtype=np.float32)
+    finally:
+        os.remove(path)
+
+    buffer = io.BytesIO()
+    np.save(buffer, embedding)
+    upload_speech_embedding(uid, name, buffer.getvalue(), version)
+    return embedding
+
+
+def _build_person_audio(uid: str, person_id: str) -> Optional[str]:
+    file_paths = get_user_person_speech_samples(uid, person_id, download=True)
+    if not file_paths:
+        return None
+    aseg = AudioSegment.empty()
+    for path in file_paths:
+        aseg += AudioSegment.from_wav(path)
+        os.remove(path)
+    path = f'_temp/{uid}_{person_id}_complete_speech_profile.wav'
+    aseg.export(path, format='wav')
+    return path
+
+
+def get_reference_embeddings(
+    uid: str, embed_file: Callable[[str], np.ndarray], include_people: bool = True
+) -> Tuple[List[str], Optional[np.ndarray]]:
+    """
+    Returns the labels ('user' or a person id) and the stacked reference embeddings for `uid`.
+    Embeddings are only computed (through `embed_file`) the first time after a profile or sample changes.
+    """
+    labels, embeddings = [], []
+    profile_version = get_speech_profile_version(uid)
+    if profile_version is None:
+        return [], None
+    user_embedding = _get_or_compute_embedding(
+        uid, 'speech_profile', profile_version, lambda: get_speech_profile_expanded(uid), embed_file
+    )
+    if user_embedding is None:
+        return [], None
+    labels.append('user')
+    embeddings.append(user_embedding)
+
+    if include_people:
+        for pid, version in get_user_people_speech_samples_versions(uid).items():
+            embedding = _get_or_compute_embedding(
+                uid, f'person_{pid}', version, lambda pid=pid: _build_person_audio(uid, pid), embed_file
+            )
+            if embedding is not None:
+                labels.append(pid)
+                embeddings.append(embedding)
+
+    return labels, np.stack(embeddings)
+
+
+def score_against_references(chunk_embeddings: np.ndarray, references: np.ndarray, threshold: float = 0.25):
+    """
+    Cosine similarity of every chunk (rows) against every reference (columns).
+    Scores under `threshold` count as 0, same as a negative `verify_files` prediction.
+    """
+    chunks = chunk_embeddings / np.linalg.norm(chunk_embeddings, axis=1, keepdims=True).clip(min=1e-8)
+    refs = references / np.linalg.norm(references, axis=1, keepdims=True).clip(min=1e-8)
+    scores = chunks @ refs.T
+    scores[scores <= threshold] = 0
+    return scores
@@ -9,6 +9,7 @@ import websockets
 from deepgram import DeepgramClient, DeepgramClientOptions, LiveTranscriptionEvents
 from deepgram.clients.live.v1 import LiveOptions
 
+from utils.other.lazy import Lazy
 from utils.stt.soniox_util import *
 
 headers = {"Authorization": f"Token {os.getenv('DEEPGRAM_API_KEY')}", "Content-Type": "audio/*"}
@@ -248,10 +249,10 @@ if is_dg_self_hosted:
     deepgram_beta_options.url = dg_self_hosted_url
     print(f"Using Deepgram self-hosted at: {dg_self_hosted_url}")
 
-deepgram = DeepgramClient(os.getenv('DEEPGRAM_API_KEY'), deepgram_options)
+deepgram = Lazy('deepgram', lambda: DeepgramClient(os.getenv('DEEPGRAM_API_KEY'), deepgram_options))
 
 # unused fn
-deepgram_beta = DeepgramClient(os.getenv('DEEPGRAM_API_KEY'), deepgram_beta_options)
+deepgram_beta = Lazy('deepgram_beta', lambda: DeepgramClient(os.getenv('DEEPGRAM_API_KEY'), deepgram_beta_options))
 
 
 async def process_audio_dg(
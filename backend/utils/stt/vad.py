@@ -1,18 +1,26 @@
 import os
 from enum import Enum
+from typing import List
 
 import numpy as np
 import requests
-import torch
 from fastapi import HTTPException
 from pydub import AudioSegment
 
 from database import redis_db
+from utils.other.lazy import Lazy
 
-torch.set_num_threads(1)
-torch.hub.set_dir('pretrained_models')
-model, utils = torch.hub.load(repo_or_dir='snakers4/silero-vad', model='silero_vad')
-(get_speech_timestamps, save_audio, read_audio, VADIterator, collect_chunks) = utils
+
+def _load_silero():
+    import torch
+
+    torch.set_num_threads(1)
+    torch.hub.set_dir('pretrained_models')
+    # (model, (get_speech_timestamps, save_audio, read_audio, VADIterator, collect_chunks))
+    return torch.hub.load(repo_or_dir='snakers4/silero-vad', model='silero_vad')
+
+
+silero = Lazy('silero_vad', _load_silero)
 
 
 class SpeechState(str, Enum):
@@ -21,35 +29,29 @@ class SpeechState(str, Enum):
 
 
 def is_speech_present(data, vad_iterator, window_size_samples=256):
-    data_int16 = np.frombuffer(data, dtype=np.int16)
-    data_float32 = data_int16.astype(np.float32) / 32768.0
-    has_start, has_end = False, False
+    import torch
 
-    for i in range(0, len(data_float32), window_size_samples):
-        chunk = data_float32[i : i + window_size_samples]
-        if len(chunk) < window_size_samples:
-            break
+    data_int16 = np.frombuffer(data, dtype=np.int16)
+    usable = len(data_int16) - len(data_int16) % window_size_samples
+    if usable == 0:
+        vad_iterator.reset_states()
+        return SpeechState.no_speech
+
+    # convert the whole buffer once and view it as a (n_windows, window_size) batch, silero keeps recurrent
+    # state across windows of a stream so rows are still fed in order, but without per-window conversions
+    windows = torch.from_numpy(data_int16[:usable].astype(np.float32) / 32768.0).view(-1, window_size_samples)
+    for chunk in windows:
         speech_dict = vad_iterator(chunk, return_seconds=False)
         if speech_dict:
-            # print(speech_dict)
             vad_iterator.reset_states()
             return SpeechState.speech_found
 
-            # if not has_start and 'start' in speech_dict:
-            #     has_start = True
-            #
-            # if not has_end and 'end' in speech_dict:
-            #     has_end = True
-
-    # if has_start:
-    #     return SpeechState.speech_found
-    # elif has_end:
-    #     return SpeechState.no_speech
     vad_iterator.reset_states()
     return SpeechState.no_speech
 
 
 def is_audio_empty(file_path, sample_rate=8000):
+    model, (get_speech_timestamps, _, read_audio, _, _) = silero.get()
     wav = read_audio(file_path)
     timestamps = get_speech_timestamps(wav, model, sampling_rate=sample_rate)
     if len(timestamps) == 1:
@@ -100,13 +102,22 @@ def apply_vad_for_speech_profile(file_path: str):
             joined_segments.append(segment)
 
     # trim silence out of file_path, but leave 1 sec of silence within chunks
-    trimmed_aseg = AudioSegment.empty()
-    for i, segment in enumerate(joined_segments):
-        start = segment['start'] * 1000
-        end = segment['end'] * 1000
-        trimmed_aseg += AudioSegment.from_wav(file_path)[start:end]
-        if i < len(joined_segments) - 1:
-            trimmed_aseg += AudioSegment.from_wav(file_path)[end : end + 1000]
-
-    # file_path.replace('.wav', '-cleaned.wav')
-    trimmed_aseg.export(file_path, format="wav")
+    trim_to_voice_segments(file_path, joined_segments)
+
+
+def trim_to_voice_segments(file_path: str, segments: List[dict], padding_seconds: float = 1):
+    """Decodes `file_path` once and keeps `segments` (seconds), each followed by `padding_seconds` but the last."""
+    aseg = AudioSegment.from_wav(file_path)
+    samples = np.array(aseg.get_array_of_samples()).reshape(-1, aseg.channels)
+    padding = int(padding_seconds * aseg.frame_rate)
+
+    pieces = []
+    for i, segment in enumerate(segments):
+        start = int(segment['start'] * aseg.frame_rate)
+        end = int(segment['end'] * aseg.frame_rate)
+        if i < len(segments) - 1:
+            end += padding
+        pieces.append(samples[start:end])
+
+    trimmed = np.concatenate(pieces) if pieces else samples[:0]
+    aseg._spawn(trimmed.tobytes()).export(file_path, format="wav")
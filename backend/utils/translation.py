@@ -4,10 +4,10 @@ import re
 from collections import OrderedDict
 from typing import List
 
-from google.cloud import translate_v3
 from langdetect import detect as langdetect_detect, DetectorFactory
 from langdetect.lang_detect_exception import LangDetectException
 
+from utils.other.lazy import Lazy
 
 # LRU Cache for language detection
 detection_cache = OrderedDict()
@@ -111,8 +111,15 @@ _non_lexical_utterances_pattern = re.compile(
     r'\b(' + '|'.join(re.escape(word) for word in _non_lexical_utterances) + r')\b', re.IGNORECASE
 )
 
-# Initialize the translation client globally
-_client = translate_v3.TranslationServiceClient()
+
+def _create_translation_client():
+    from google.cloud import translate_v3
+
+    return translate_v3.TranslationServiceClient()
+
+
+# Translation client, created on first use
+_client = Lazy('google_translate', _create_translation_client)
 _parent = f"projects/{PROJECT_ID}/locations/global"
 _mime_type = "text/plain"
 
@@ -13,6 +13,7 @@ from database.redis_db import (
     enable_user_webhook_db,
     set_user_webhook_db,
 )
+from database import redis_db_async
 from models.conversation import Conversation
 from models.users import WebhookType
 import database.notifications as notification_db
@@ -63,9 +64,8 @@ def day_summary_webhook(uid, summary: str):
 
 async def realtime_transcript_webhook(uid, segments: List[dict]):
     print("realtime_transcript_webhook", uid)
-    toggled = user_webhook_status_db(uid, WebhookType.realtime_transcript)
+    toggled, webhook_url = await redis_db_async.get_user_webhook_with_status(uid, WebhookType.realtime_transcript)
     if toggled:
-        webhook_url = get_user_webhook_db(uid, WebhookType.realtime_transcript)
         if not webhook_url:
             return
         webhook_url += f'?uid={uid}'
@@ -93,26 +93,36 @@ async def realtime_transcript_webhook(uid, segments: List[dict]):
 def get_audio_bytes_webhook_seconds(uid: str):
     toggled = user_webhook_status_db(uid, WebhookType.audio_bytes)
     if toggled:
-        webhook_url = get_user_webhook_db(uid, WebhookType.audio_bytes)
-        if not webhook_url:
-            return
-        parts = webhook_url.split(',')
-        if len(parts) == 2:
-            try:
-                return int(parts[1])
-            except ValueError:
-                pass
-        return 5
+        return _audio_bytes_webhook_seconds(get_user_webhook_db(uid, WebhookType.audio_bytes))
     else:
         return
 
 
+async def aget_audio_bytes_webhook_seconds(uid: str):
+    toggled, webhook_url = await redis_db_async.get_user_webhook_with_status(uid, WebhookType.audio_bytes)
+    if toggled:
+        return _audio_bytes_webhook_seconds(webhook_url)
+    else:
+        return
+
+
+def _audio_bytes_webhook_seconds(webhook_url: str):
+    if not webhook_url:
+        return
+    parts = webhook_url.split(',')
+    if len(parts) == 2:
+        try:
+            return int(parts[1])
+        except ValueError:
+            pass
+    return 5
+
+
 async def send_audio_bytes_developer_webhook(uid: str, sample_rate: int, data: bytearray):
     print("send_audio_bytes_developer_webhook", uid)
     # TODO: add a lock, send shorter segments, validate regex.
-    toggled = user_webhook_status_db(uid, WebhookType.audio_bytes)
+    toggled, webhook_url = await redis_db_async.get_user_webhook_with_status(uid, WebhookType.audio_bytes)
     if toggled:
-        webhook_url = get_user_webhook_db(uid, WebhookType.audio_bytes)
         webhook_url = webhook_url.split(',')[0]
         if not webhook_url:
             return